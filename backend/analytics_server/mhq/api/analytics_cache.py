@@ -0,0 +1,10 @@
+from flask import Blueprint
+
+from mhq.service.analytics_cache import get_analytics_cache
+
+app = Blueprint("analytics_cache", __name__)
+
+
+@app.route("/analytics_cache/stats", methods=["GET"])
+def get_analytics_cache_stats():
+    return get_analytics_cache().get_stats()
@@ -14,7 +14,11 @@ from mhq.service.deployments.factory import get_deployments_factory
 from mhq.service.code.pr_analytics import get_pr_analytics_service
 from mhq.service.code.pr_filter import apply_pr_filter
 
-from mhq.api.request_utils import coerce_workflow_filter, queryschema
+from mhq.api.request_utils import (
+    cached_team_metrics,
+    coerce_workflow_filter,
+    queryschema,
+)
 from mhq.api.resources.deployment_resources import (
     adapt_deployment,
     adapt_deployment_frequency_metrics,
@@ -145,6 +149,7 @@ def get_prs_included_in_deployment(deployment_id: str):
         }
     ),
 )
+@cached_team_metrics("deployment_frequency")
 def get_team_deployment_frequency(
     team_id: str,
     from_time: datetime,
@@ -183,6 +188,7 @@ def get_team_deployment_frequency(
         }
     ),
 )
+@cached_team_metrics("deployment_frequency_trends")
 def get_team_deployment_frequency_trends(
     team_id: str,
     from_time: datetime,
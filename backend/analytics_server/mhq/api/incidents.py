@@ -8,7 +8,10 @@ from voluptuous import Required, Schema, Coerce, All, Optional
 from mhq.service.code.pr_filter import apply_pr_filter
 from mhq.store.models.code.filter import PRFilter
 from mhq.store.models.settings import SettingType, EntityType
-from mhq.service.incidents.models.mean_time_to_recovery import ChangeFailureRateMetrics
+from mhq.service.incidents.models.mean_time_to_recovery import (
+    ChangeFailureRateCounts,
+    ChangeFailureRateMetrics,
+)
 from mhq.service.deployments.deployment_service import (
     get_deployments_service,
 )
@@ -16,6 +19,7 @@ from mhq.service.deployments.models.models import Deployment
 from mhq.store.models.code.workflows.filter import WorkflowFilter
 from mhq.utils.time import Interval
 from mhq.service.incidents.incidents import get_incident_service
+from mhq.service.incidents.rollups import get_incident_rollups_service
 from mhq.api.resources.incident_resources import (
     adapt_change_failure_rate,
     adapt_deployments_with_related_incidents,
@@ -23,7 +27,11 @@ from mhq.api.resources.incident_resources import (
     adapt_mean_time_to_recovery_metrics,
 )
 from mhq.store.models.incidents import Incident
-from mhq.api.request_utils import coerce_workflow_filter, queryschema
+from mhq.api.request_utils import (
+    cached_team_metrics,
+    coerce_workflow_filter,
+    queryschema,
+)
 from mhq.service.query_validator import get_query_validator
 
 
@@ -128,6 +136,7 @@ def get_deployments_with_related_incidents(
         }
     ),
 )
+@cached_team_metrics("mttr")
 def get_team_mttr(
     team_id: str,
     from_time: datetime,
@@ -161,6 +170,7 @@ def get_team_mttr(
         }
     ),
 )
+@cached_team_metrics("mttr_trends")
 def get_team_mttr_trends(
     team_id: str,
     from_time: datetime,
@@ -175,10 +185,10 @@ def get_team_mttr_trends(
         pr_filter, EntityType.TEAM, team_id, [SettingType.EXCLUDED_PRS_SETTING]
     )
 
-    incident_service = get_incident_service()
+    incident_rollups_service = get_incident_rollups_service()
 
     weekly_mean_time_to_recovery_metrics = (
-        incident_service.get_team_mean_time_to_recovery_trends(
+        incident_rollups_service.get_team_mean_time_to_recovery_trends(
             team_id, interval, pr_filter
         )
     )
@@ -202,6 +212,7 @@ def get_team_mttr_trends(
         }
     ),
 )
+@cached_team_metrics("cfr")
 def get_team_cfr(
     team_id: str,
     from_time: datetime,
@@ -248,6 +259,7 @@ def get_team_cfr(
         }
     ),
 )
+@cached_team_metrics("cfr_trends")
 def get_team_cfr_trends(
     team_id: str,
     from_time: datetime,
@@ -264,21 +276,11 @@ def get_team_cfr_trends(
         pr_filter, EntityType.TEAM, team_id, [SettingType.EXCLUDED_PRS_SETTING]
     )
 
-    deployments: List[
-        Deployment
-    ] = get_deployments_service().get_team_all_deployments_in_interval(
-        team_id, interval, pr_filter, workflow_filter
-    )
-
-    incident_service = get_incident_service()
-
-    incidents: List[Incident] = incident_service.get_team_incidents(
-        team_id, interval, pr_filter
-    )
+    incident_rollups_service = get_incident_rollups_service()
 
-    team_weekly_change_failure_rate: Dict[datetime, ChangeFailureRateMetrics] = (
-        incident_service.get_weekly_change_failure_rate(
-            interval, deployments, incidents
+    team_weekly_change_failure_rate: Dict[datetime, ChangeFailureRateCounts] = (
+        incident_rollups_service.get_team_weekly_change_failure_rate(
+            team_id, interval, pr_filter, workflow_filter
         )
     )
 
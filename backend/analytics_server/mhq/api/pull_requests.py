@@ -13,7 +13,7 @@ from mhq.store.models.code import PRFilter
 from mhq.store.models.core import Team
 from mhq.service.query_validator import get_query_validator
 
-from mhq.api.request_utils import queryschema
+from mhq.api.request_utils import cached_team_metrics, queryschema
 from mhq.api.resources.code_resouces import (
     adapt_lead_time_metrics,
     adapt_pull_request,
@@ -104,6 +104,7 @@ def get_lead_time_prs(
         }
     ),
 )
+@cached_team_metrics("lead_time")
 def get_team_lead_time(
     team_id: str,
     from_time: datetime,
@@ -141,6 +142,7 @@ def get_team_lead_time(
         }
     ),
 )
+@cached_team_metrics("lead_time_trends")
 def get_team_lead_time_trends(
     team_id: str,
     from_time: datetime,
@@ -11,6 +11,8 @@ from mhq.store.models.code.repository import TeamRepos
 from mhq.service.code.models.org_repo import RawTeamOrgRepo
 from mhq.store.models.code import WorkflowFilter, CodeProvider
 
+from mhq.service.analytics_cache import get_analytics_cache
+from mhq.service.query_validator import get_query_validator
 from mhq.service.workflows.workflow_filter import get_workflow_filter_processor
 
 
@@ -37,6 +39,29 @@ def queryschema(schema):
     return decorator
 
 
+def cached_team_metrics(endpoint: str):
+    """
+    Serves the team metrics view from the analytics cache. Goes below the schema
+    decorator, as the parsed query params are part of the cache key.
+    """
+
+    def decorator(f):
+        @wraps(f)
+        def new_func(team_id: str, **kwargs):
+            team = get_query_validator().team_validator(team_id)
+            return get_analytics_cache().get_or_compute(
+                endpoint,
+                str(team.org_id),
+                team_id,
+                kwargs,
+                lambda: f(team_id, **kwargs),
+            )
+
+        return new_func
+
+    return decorator
+
+
 def uuid_validator(s: str):
     UUID(s)
     return s
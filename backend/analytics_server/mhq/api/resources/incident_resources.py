@@ -1,4 +1,4 @@
-from typing import Dict, List
+from typing import Dict, List, Union
 
 from mhq.api.resources.core_resources import adapt_user_info
 from mhq.api.resources.deployment_resources import adapt_deployment
@@ -6,6 +6,7 @@ from mhq.service.deployments.models.models import Deployment
 from mhq.service.incidents.models.mean_time_to_recovery import (
     MeanTimeToRecoveryMetrics,
     ChangeFailureRateMetrics,
+    ChangeFailureRateCounts,
 )
 from mhq.store.models.incidents import Incident
 
@@ -66,7 +67,9 @@ def adapt_mean_time_to_recovery_metrics(
     }
 
 
-def adapt_change_failure_rate(change_failure_rate: ChangeFailureRateMetrics):
+def adapt_change_failure_rate(
+    change_failure_rate: Union[ChangeFailureRateMetrics, ChangeFailureRateCounts]
+):
     return {
         "change_failure_rate": change_failure_rate.change_failure_rate,
         "failed_deployments": change_failure_rate.failed_deployments_count,
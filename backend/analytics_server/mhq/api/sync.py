@@ -1,9 +1,7 @@
 from flask import Blueprint, jsonify
 
 from mhq.service.query_validator import get_query_validator
-from mhq.service.sync_data import trigger_data_sync
-from mhq.utils.lock import get_redis_lock_service
-from mhq.utils.log import LOG
+from mhq.service.sync_jobs import get_sync_job_service
 from mhq.utils.time import time_now
 
 app = Blueprint("sync", __name__)
@@ -15,10 +13,18 @@ def sync():
     if not default_org:
         return jsonify({"message": "Default org not found"}), 404
     org_id = str(default_org.id)
-    with get_redis_lock_service().acquire_lock("{org}:" + f"{str(org_id)}:data_sync"):
-        try:
-            trigger_data_sync(org_id)
-        except Exception as e:
-            LOG.error(f"Error syncing data for org {org_id}: {str(e)}")
-            return {"message": "sync failed", "time": time_now().isoformat()}, 500
-    return {"message": "sync started", "time": time_now().isoformat()}
+    job = get_sync_job_service().enqueue_org_sync(org_id)
+    return {
+        "message": "sync queued",
+        "job_id": job.id,
+        "status": job.status.value,
+        "time": time_now().isoformat(),
+    }, 202
+
+
+@app.route("/sync/<job_id>", methods=["GET"])
+def get_sync_job(job_id: str):
+    job = get_sync_job_service().get_job(job_id)
+    if not job:
+        return jsonify({"message": "Sync job not found"}), 404
+    return job.to_dict()
@@ -18,6 +18,13 @@ from mhq.exapi.schemas.timeline import (
 )
 from mhq.exapi.models.github import GitHubContributor
 from mhq.exapi.models.github_timeline import GithubPullRequestTimelineEvents
+from mhq.exapi.rate_limiter import get_rate_limit_scheduler
+from mhq.exapi.response_cache import get_exapi_response_cache
+from mhq.exapi.transport import (
+    get_http_pool_size,
+    get_http_transport,
+    get_pygithub_retry,
+)
 from mhq.store.models.code.enums import PullRequestEventType
 from mhq.utils.log import LOG
 
@@ -32,8 +39,17 @@ class GithubApiService:
     def __init__(self, access_token: str, domain: Optional[str]):
         self._token = access_token
         self.base_url = self._get_api_url(domain)
-        self._g = Github(self._token, base_url=self.base_url, per_page=PAGE_SIZE)
+        self._transport = get_http_transport("github")
+        self._rate_limiter = get_rate_limit_scheduler()
+        self._g = Github(
+            self._token,
+            base_url=self.base_url,
+            per_page=PAGE_SIZE,
+            retry=get_pygithub_retry(self._token, self._rate_limiter),
+            pool_size=get_http_pool_size("github"),
+        )
         self.headers = {"Authorization": f"Bearer {self._token}"}
+        self._cache = get_exapi_response_cache()
 
     def _get_api_url(self, domain: str) -> str:
         if not domain:
@@ -41,6 +57,20 @@ class GithubApiService:
         else:
             return f"{domain}/api/v3"
 
+    def _get(
+        self, url: str, endpoint: str, params: Optional[Dict] = None
+    ) -> requests.Response:
+        return self._rate_limiter.request(
+            self._token,
+            lambda: self._cache.get(
+                url,
+                endpoint=endpoint,
+                headers=self.headers,
+                params=params,
+                transport=self._transport,
+            ),
+        )
+
     @contextlib.contextmanager
     def temp_config(self, per_page: int = 30):
         self._g.per_page = per_page
@@ -55,7 +85,7 @@ class GithubApiService:
         """
         url = f"{self.base_url}/user"
         try:
-            response = requests.get(url, headers=self.headers)
+            response = self._transport.get(url, "github/user", headers=self.headers)
         except GithubException as e:
             raise Exception(f"Error in PAT validation, Error: {e.data}")
         return response.status_code == 200
@@ -99,13 +129,17 @@ class GithubApiService:
         return [repo.__dict__["_rawData"] for repo in repos]
 
     def get_repo(self, org_login: str, repo_name: str) -> Optional[GithubRepository]:
-        try:
-            return self._g.get_repo(f"{org_login}/{repo_name}")
-        except GithubException as e:
-            raise e
+        github_url = f"{self.base_url}/repos/{org_login}/{repo_name}"
+        response = self._get(github_url, endpoint="github/repo")
+        if response.status_code == HTTPStatus.NOT_FOUND:
+            raise UnknownObjectException(response.status_code, response.json())
+        if response.status_code != HTTPStatus.OK:
+            raise GithubException(response.status_code, response.json())
+
+        return self._g.create_from_raw_data(GithubRepository, response.json())
 
     def get_repo_contributors(self, github_repo: GithubRepository) -> [Tuple[str, int]]:
-        contributors = list(github_repo.get_contributors())
+        contributors = self.get_contributors(github_repo.owner.login, github_repo.name)
         return [(u.login, u.contributions) for u in contributors]
 
     def get_pull_requests(
@@ -160,10 +194,11 @@ class GithubApiService:
         def _fetch_contributors(page: int = 0):
             github_url = f"{self.base_url}/repos/{org_login}/{repo_name}/contributors"
             query_params = dict(per_page=PAGE_SIZE, page=page)
-            response = requests.get(
-                github_url, headers=self.headers, params=query_params
+            response = self._get(
+                github_url, endpoint="github/repo_contributors", params=query_params
             )
-            assert response.status_code == HTTPStatus.OK
+            if response.status_code != HTTPStatus.OK:
+                raise GithubException(response.status_code, response.text)
             return response.json()
 
         data = _fetch_contributors(page=page)
@@ -212,10 +247,11 @@ class GithubApiService:
         def _fetch_members(page: int = 0):
             github_url = f"{self.base_url}/orgs/{org_login}/members"
             query_params = dict(per_page=PAGE_SIZE, page=page)
-            response = requests.get(
-                github_url, headers=self.headers, params=query_params
+            response = self._get(
+                github_url, endpoint="github/org_members", params=query_params
             )
-            assert response.status_code == HTTPStatus.OK
+            if response.status_code != HTTPStatus.OK:
+                raise GithubException(response.status_code, response.text)
             return response.json()
 
         data = _fetch_members(page=page)
@@ -254,8 +290,8 @@ class GithubApiService:
                 page=page,
                 created=f"created:>={bookmark.isoformat()}",
             )
-            response = requests.get(
-                github_url, headers=self.headers, params=query_params
+            response = self._get(
+                github_url, endpoint="github/workflow_runs", params=query_params
             )
 
             if response.status_code == HTTPStatus.NOT_FOUND:
@@ -265,7 +301,8 @@ class GithubApiService:
                 )
                 return {}
 
-            assert response.status_code == HTTPStatus.OK
+            if response.status_code != HTTPStatus.OK:
+                raise GithubException(response.status_code, response.text)
             return response.json()
 
         data = _fetch_workflow_runs(page=page)
@@ -286,8 +323,8 @@ class GithubApiService:
         query_params = {"per_page": PAGE_SIZE, "page": page}
 
         try:
-            response = requests.get(
-                github_url, headers=self.headers, params=query_params
+            response = self._get(
+                github_url, endpoint="github/pr_timeline", params=query_params
             )
         except requests.RequestException as e:
             raise GithubException(
@@ -300,7 +337,7 @@ class GithubApiService:
                 f"PR {pr_number} not found for repo {repo_name}",
             )
 
-        if response.status_code == HTTPStatus.FORBIDDEN:
+        if response.status_code in [HTTPStatus.FORBIDDEN, HTTPStatus.TOO_MANY_REQUESTS]:
             raise GithubRateLimitExceeded("GitHub API rate limit exceeded")
 
         if response.status_code != HTTPStatus.OK:
@@ -0,0 +1,376 @@
+from datetime import datetime
+from http import HTTPStatus
+from typing import Dict, List, Optional, Tuple
+
+import pytz
+import requests
+from github.GithubException import GithubException
+
+from mhq.exapi.github import GithubRateLimitExceeded
+from mhq.exapi.models.github_graphql import (
+    GithubGraphQLPullRequest,
+    GithubGraphQLRef,
+    GithubGraphQLUser,
+)
+from mhq.exapi.models.github_timeline import GithubPullRequestTimelineEvents
+from mhq.exapi.rate_limiter import get_rate_limit_scheduler
+from mhq.exapi.transport import get_http_transport
+from mhq.utils.time import ISO_8601_DATE_FORMAT
+
+PR_BATCH_SIZE = 50
+CONNECTION_PAGE_SIZE = 100
+# GraphQL calls draw from a separate quota than the REST api
+GRAPHQL_RATE_LIMIT_RESOURCE = "graphql"
+
+PAGE_INFO_FIELDS = "pageInfo { hasNextPage endCursor }"
+
+REVIEWS_CONNECTION = "reviews"
+READY_FOR_REVIEW_CONNECTION = "timelineItems"
+COMMITS_CONNECTION = "commits"
+
+CONNECTION_FIELDS = {
+    REVIEWS_CONNECTION: f"""
+        {PAGE_INFO_FIELDS}
+        nodes {{
+            databaseId state submittedAt body url
+            author {{ __typename login }}
+        }}
+    """,
+    READY_FOR_REVIEW_CONNECTION: f"""
+        {PAGE_INFO_FIELDS}
+        nodes {{
+            ... on ReadyForReviewEvent {{
+                id createdAt
+                actor {{ __typename login }}
+            }}
+        }}
+    """,
+    COMMITS_CONNECTION: f"""
+        totalCount
+        {PAGE_INFO_FIELDS}
+        nodes {{
+            commit {{
+                oid message url committedDate
+                committer {{ name email }}
+                author {{ name email date user {{ login }} }}
+            }}
+        }}
+    """,
+}
+
+CONNECTION_ARGS = {
+    REVIEWS_CONNECTION: f"first: {CONNECTION_PAGE_SIZE}",
+    READY_FOR_REVIEW_CONNECTION: f"first: {CONNECTION_PAGE_SIZE}, itemTypes: [READY_FOR_REVIEW_EVENT]",
+    COMMITS_CONNECTION: f"first: {CONNECTION_PAGE_SIZE}",
+}
+
+PULL_REQUEST_FIELDS = f"""
+    number title url state
+    createdAt updatedAt mergedAt closedAt
+    baseRefName headRefName
+    additions deletions changedFiles
+    author {{ __typename login }}
+    mergeCommit {{ oid }}
+    reviewRequests(first: {CONNECTION_PAGE_SIZE}) {{
+        nodes {{ requestedReviewer {{ ... on User {{ login }} }} }}
+    }}
+    {REVIEWS_CONNECTION}({CONNECTION_ARGS[REVIEWS_CONNECTION]}) {{
+        {CONNECTION_FIELDS[REVIEWS_CONNECTION]}
+    }}
+    {READY_FOR_REVIEW_CONNECTION}({CONNECTION_ARGS[READY_FOR_REVIEW_CONNECTION]}) {{
+        {CONNECTION_FIELDS[READY_FOR_REVIEW_CONNECTION]}
+    }}
+    {COMMITS_CONNECTION}({CONNECTION_ARGS[COMMITS_CONNECTION]}) {{
+        {CONNECTION_FIELDS[COMMITS_CONNECTION]}
+    }}
+"""
+
+PULL_REQUESTS_QUERY = f"""
+query($owner: String!, $name: String!, $first: Int!, $cursor: String) {{
+    repository(owner: $owner, name: $name) {{
+        pullRequests(
+            first: $first, after: $cursor,
+            orderBy: {{ field: UPDATED_AT, direction: DESC }}
+        ) {{
+            {PAGE_INFO_FIELDS}
+            nodes {{ {PULL_REQUEST_FIELDS} }}
+        }}
+    }}
+}}
+"""
+
+
+def _get_connection_query(connection: str) -> str:
+    return f"""
+    query($owner: String!, $name: String!, $number: Int!, $cursor: String) {{
+        repository(owner: $owner, name: $name) {{
+            pullRequest(number: $number) {{
+                {connection}({CONNECTION_ARGS[connection]}, after: $cursor) {{
+                    {CONNECTION_FIELDS[connection]}
+                }}
+            }}
+        }}
+    }}
+    """
+
+
+class GithubGraphQLException(Exception):
+    pass
+
+
+class GithubGraphQLApiService:
+    """
+    Fetches pull requests along with their reviews, ready for review events and
+    commits in batches of PR_BATCH_SIZE pull requests per GraphQL query.
+    """
+
+    def __init__(self, access_token: str, domain: Optional[str]):
+        self._token = access_token
+        self.graphql_url = self._get_graphql_url(domain)
+        self.headers = {"Authorization": f"Bearer {self._token}"}
+        self._rate_limiter = get_rate_limit_scheduler()
+        self._transport = get_http_transport("github")
+
+    def _get_graphql_url(self, domain: Optional[str]) -> str:
+        if not domain:
+            return "https://api.github.com/graphql"
+        else:
+            return f"{domain}/api/graphql"
+
+    def _execute(self, query: str, variables: Dict) -> Dict:
+        try:
+            response = self._rate_limiter.request(
+                self._token,
+                lambda: self._transport.post(
+                    self.graphql_url,
+                    "github/graphql",
+                    headers=self.headers,
+                    json={"query": query, "variables": variables},
+                ),
+                resource=GRAPHQL_RATE_LIMIT_RESOURCE,
+            )
+        except requests.RequestException as e:
+            raise GithubException(
+                HTTPStatus.SERVICE_UNAVAILABLE, f"Network error: {str(e)}"
+            ) from e
+
+        if response.status_code in [HTTPStatus.FORBIDDEN, HTTPStatus.TOO_MANY_REQUESTS]:
+            raise GithubRateLimitExceeded("GitHub API rate limit exceeded")
+
+        if response.status_code != HTTPStatus.OK:
+            raise GithubException(
+                response.status_code, f"GraphQL request failed: {response.text}"
+            )
+
+        payload = response.json()
+        errors = payload.get("errors")
+        if errors:
+            if any(error.get("type") == "RATE_LIMITED" for error in errors):
+                raise GithubRateLimitExceeded("GitHub API rate limit exceeded")
+            raise GithubGraphQLException(
+                ", ".join(error.get("message", "") for error in errors)
+            )
+
+        return payload.get("data") or {}
+
+    def get_pull_requests_page(
+        self, org_login: str, repo_name: str, cursor: Optional[str] = None
+    ) -> Tuple[List[GithubGraphQLPullRequest], Optional[str]]:
+        """
+        Fetches a page of pull requests ordered by most recently updated.
+        Nested reviews, ready for review events and commits are paginated to completion.
+        :param org_login: Owner of the repo
+        :param repo_name: Name of the repo
+        :param cursor: Cursor returned by the previous page, None for the first page
+        :return: Pull requests of the page and the cursor of the next page, if any
+        """
+        data = self._execute(
+            PULL_REQUESTS_QUERY,
+            {
+                "owner": org_login,
+                "name": repo_name,
+                "first": PR_BATCH_SIZE,
+                "cursor": cursor,
+            },
+        )
+        pull_requests = ((data.get("repository") or {}).get("pullRequests")) or {}
+        page_info = pull_requests.get("pageInfo") or {}
+        next_cursor = (
+            page_info.get("endCursor") if page_info.get("hasNextPage") else None
+        )
+
+        prs = []
+        for pr_node in pull_requests.get("nodes") or []:
+            for connection in CONNECTION_FIELDS:
+                pr_node[connection]["nodes"] += self._get_remaining_connection_nodes(
+                    org_login, repo_name, pr_node["number"], connection, pr_node
+                )
+            prs.append(self._adapt_pull_request(pr_node))
+
+        return prs, next_cursor
+
+    def _get_remaining_connection_nodes(
+        self, org_login: str, repo_name: str, number: int, connection: str, pr_node
+    ) -> List[Dict]:
+        page_info = pr_node[connection]["pageInfo"]
+        nodes = []
+        while page_info.get("hasNextPage"):
+            data = self._execute(
+                _get_connection_query(connection),
+                {
+                    "owner": org_login,
+                    "name": repo_name,
+                    "number": number,
+                    "cursor": page_info.get("endCursor"),
+                },
+            )
+            connection_data = data["repository"]["pullRequest"][connection]
+            nodes += connection_data["nodes"]
+            page_info = connection_data["pageInfo"]
+        return nodes
+
+    @staticmethod
+    def _dt_from_graphql_dt_string(dt_string: Optional[str]) -> Optional[datetime]:
+        # Matches PyGithub, which exposes naive UTC datetimes
+        if not dt_string:
+            return None
+        return datetime.strptime(dt_string, ISO_8601_DATE_FORMAT)
+
+    @staticmethod
+    def _adapt_actor(actor: Optional[Dict]) -> Optional[Dict]:
+        if not actor:
+            return None
+        return {"login": actor.get("login"), "type": actor.get("__typename")}
+
+    def _adapt_pull_request(self, pr_node: Dict) -> GithubGraphQLPullRequest:
+        author = self._adapt_actor(pr_node.get("author")) or {}
+        merge_commit = pr_node.get("mergeCommit") or {}
+        requested_reviewers = [
+            {"login": node["requestedReviewer"]["login"]}
+            for node in (pr_node.get("reviewRequests") or {}).get("nodes") or []
+            if (node.get("requestedReviewer") or {}).get("login")
+        ]
+        commits_count = pr_node[COMMITS_CONNECTION].get("totalCount", 0)
+
+        raw_data = {
+            "number": pr_node["number"],
+            "title": pr_node["title"],
+            "html_url": pr_node["url"],
+            "state": "open" if pr_node["state"] == "OPEN" else "closed",
+            "created_at": pr_node["createdAt"],
+            "updated_at": pr_node["updatedAt"],
+            "merged_at": pr_node.get("mergedAt"),
+            "closed_at": pr_node.get("closedAt"),
+            "base": {"ref": pr_node["baseRefName"]},
+            "head": {"ref": pr_node["headRefName"]},
+            "user": author,
+            "requested_reviewers": requested_reviewers,
+            "merge_commit_sha": merge_commit.get("oid"),
+            "commits": commits_count,
+            "additions": pr_node["additions"],
+            "deletions": pr_node["deletions"],
+            "changed_files": pr_node["changedFiles"],
+        }
+
+        return GithubGraphQLPullRequest(
+            number=pr_node["number"],
+            title=pr_node["title"],
+            html_url=pr_node["url"],
+            created_at=self._dt_from_graphql_dt_string(pr_node["createdAt"]),
+            updated_at=self._dt_from_graphql_dt_string(pr_node["updatedAt"]),
+            merged_at=self._dt_from_graphql_dt_string(pr_node.get("mergedAt")),
+            closed_at=self._dt_from_graphql_dt_string(pr_node.get("closedAt")),
+            state=raw_data["state"],
+            base=GithubGraphQLRef(pr_node["baseRefName"]),
+            head=GithubGraphQLRef(pr_node["headRefName"]),
+            user=GithubGraphQLUser(author.get("login")),
+            commits=commits_count,
+            additions=pr_node["additions"],
+            deletions=pr_node["deletions"],
+            changed_files=pr_node["changedFiles"],
+            raw_data=raw_data,
+            timeline_events=self._adapt_timeline_events(pr_node),
+            commit_dicts=self._adapt_commits(pr_node),
+        )
+
+    def _adapt_timeline_events(
+        self, pr_node: Dict
+    ) -> List[GithubPullRequestTimelineEvents]:
+        """
+        Builds REST timeline shaped "reviewed" and "ready_for_review" events.
+        Reviews keep their REST id, ready for review events only expose a GraphQL node id.
+        """
+        events: List[GithubPullRequestTimelineEvents] = []
+
+        for review in pr_node[REVIEWS_CONNECTION]["nodes"]:
+            if not review.get("submittedAt"):
+                continue
+            events.append(
+                GithubPullRequestTimelineEvents(
+                    "reviewed",
+                    {
+                        "event": "reviewed",
+                        "id": review["databaseId"],
+                        "user": self._adapt_actor(review.get("author")),
+                        "body": review.get("body"),
+                        "state": review["state"].lower(),
+                        "html_url": review.get("url"),
+                        "submitted_at": review["submittedAt"],
+                    },
+                )
+            )
+
+        for ready_for_review in pr_node[READY_FOR_REVIEW_CONNECTION]["nodes"]:
+            if not ready_for_review.get("id"):
+                continue
+            events.append(
+                GithubPullRequestTimelineEvents(
+                    "ready_for_review",
+                    {
+                        "event": "ready_for_review",
+                        "id": ready_for_review["id"],
+                        "actor": self._adapt_actor(ready_for_review.get("actor")),
+                        "created_at": ready_for_review["createdAt"],
+                    },
+                )
+            )
+
+        events = [
+            event
+            for event in events
+            if all([event.timestamp, event.type, event.id, event.user])
+        ]
+        events.sort(key=lambda event: event.timestamp.astimezone(pytz.UTC))
+        return events
+
+    @staticmethod
+    def _adapt_commits(pr_node: Dict) -> List[Dict]:
+        commits = []
+        for node in pr_node[COMMITS_CONNECTION]["nodes"]:
+            commit = node["commit"]
+            author = commit.get("author") or {}
+            committer = commit.get("committer") or {}
+            author_user = author.get("user")
+            commits.append(
+                {
+                    "sha": commit["oid"],
+                    "html_url": commit["url"],
+                    "commit": {
+                        "message": commit["message"],
+                        "author": {
+                            "name": author.get("name"),
+                            "email": author.get("email"),
+                            "date": author.get("date"),
+                        },
+                        "committer": {
+                            "name": committer.get("name"),
+                            "email": committer.get("email"),
+                            "date": commit["committedDate"],
+                        },
+                    },
+                    "author": (
+                        {"login": author_user["login"]} if author_user else None
+                    ),
+                }
+            )
+        return commits
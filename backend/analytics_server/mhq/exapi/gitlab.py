@@ -1,11 +1,26 @@
-from collections.abc import Awaitable
-from typing import Dict, List
+import asyncio
+from collections.abc import AsyncIterator, Awaitable
+from os import getenv
+from typing import Any, Dict, List, Mapping, Optional, Set, Tuple
 import requests
 from datetime import datetime
 from requests.exceptions import HTTPError
 import aiohttp
 
-from mhq.exapi.models.gitlab import GitlabCommit, GitlabNote, GitlabRepo, GitlabUser
+from mhq.exapi.models.gitlab import (
+    GitlabCommit,
+    GitlabMergeRequestDetails,
+    GitlabNote,
+    GitlabRepo,
+    GitlabUser,
+)
+from mhq.exapi.rate_limiter import MAX_RATE_LIMIT_RETRIES, get_rate_limit_scheduler
+from mhq.exapi.response_cache import get_exapi_response_cache
+from mhq.exapi.transport import get_http_pool_size, get_http_transport
+
+GITLAB_MR_FETCH_CONCURRENCY = int(getenv("GITLAB_MR_FETCH_CONCURRENCY", 10))
+# Largest page size GitLab allows
+GITLAB_MR_PAGE_SIZE = 100
 
 
 class GithubRateLimitExceeded(Exception):
@@ -17,6 +32,9 @@ class GitlabApiService:
         self._token = access_token
         self.base_url = f"{domain}/api/v4"
         self.headers = {"Authorization": f"Bearer {self._token}"}
+        self._cache = get_exapi_response_cache()
+        self._transport = get_http_transport("gitlab")
+        self._rate_limiter = get_rate_limit_scheduler()
 
     def check_pat(self) -> bool:
         """
@@ -26,12 +44,31 @@ class GitlabApiService:
         """
         url = f"{self.base_url}/user"
         try:
-            response = requests.get(url, headers=self.headers)
+            response = self._transport.get(url, "gitlab/user", headers=self.headers)
         except Exception as e:
             raise Exception(f"Error in PAT validation, Error: {e}")
 
         return response.status_code == 200
 
+    def _get_async_session(self) -> aiohttp.ClientSession:
+        # Sessions are bound to an event loop, so async calls get their own connection pool
+        return aiohttp.ClientSession(
+            headers=self.headers,
+            connector=aiohttp.TCPConnector(limit=get_http_pool_size("gitlab")),
+        )
+
+    def _get(self, url: str, endpoint: str, params: Dict = None) -> requests.Response:
+        return self._rate_limiter.request(
+            self._token,
+            lambda: self._cache.get(
+                url,
+                endpoint=endpoint,
+                headers=self.headers,
+                params=params,
+                transport=self._transport,
+            ),
+        )
+
     def _handle_error(self, response):
         if response.status_code != 200:
             error = response.json().get("error", "")
@@ -42,7 +79,7 @@ class GitlabApiService:
 
     def get_authenticated_user(self) -> GitlabUser:
         url = f"{self.base_url}/user"
-        response = requests.get(url, headers=self.headers)
+        response = self._get(url, endpoint="gitlab/user")
         self._handle_error(response)
         user = response.json()
         return GitlabUser(user)
@@ -57,14 +94,14 @@ class GitlabApiService:
             "order_by": "updated_at",
             "sort": "desc",
         }
-        response = requests.get(url, headers=self.headers, params=params)
+        response = self._get(url, endpoint="gitlab/user_projects", params=params)
         self._handle_error(response)
         projects = response.json()
         return list(map(GitlabRepo, projects))
 
     def get_groups(self) -> List[Dict]:
         url = f"{self.base_url}/groups"
-        response = requests.get(url, headers=self.headers)
+        response = self._get(url, endpoint="gitlab/groups")
         self._handle_error(response)
         groups = response.json()
         return groups
@@ -74,75 +111,236 @@ class GitlabApiService:
     ) -> List[GitlabRepo]:
         url = f"{self.base_url}/groups/{group_id}/projects"
         params = {"page": page, "per_page": page_size}
-        response = requests.get(url, headers=self.headers, params=params)
+        response = self._get(url, endpoint="gitlab/group_projects", params=params)
         self._handle_error(response)
         projects = response.json()
         return list(map(GitlabRepo, projects))
 
     def get_group_members(self, group_id) -> List[GitlabUser]:
         url = f"{self.base_url}/groups/{group_id}/members/all"
-        response = requests.get(url, headers=self.headers)
+        response = self._get(url, endpoint="gitlab/group_members")
         self._handle_error(response)
         members = response.json()
         return list(map(GitlabUser, members))
 
     def get_project(self, project_id) -> GitlabRepo:
         url = f"{self.base_url}/projects/{project_id}"
-        response = requests.get(url, headers=self.headers)
+        response = self._get(url, endpoint="gitlab/project")
         self._handle_error(response)
         project = response.json()
         return GitlabRepo(project)
 
     def get_project_users(self, project_id) -> List[GitlabUser]:
         url = f"{self.base_url}/projects/{project_id}/users"
-        response = requests.get(url, headers=self.headers)
+        response = self._get(url, endpoint="gitlab/project_users")
         self._handle_error(response)
         users = response.json()
         return list(map(GitlabUser, users))
 
     def get_project_languages(self, project_id) -> Dict[str, float]:
         url = f"{self.base_url}/projects/{project_id}/languages"
-        response = requests.get(url, headers=self.headers)
+        response = self._get(url, endpoint="gitlab/project_languages")
         self._handle_error(response)
         language_map = response.json()
         return language_map
 
     def get_project_contributors(self, project_id):
         url = f"{self.base_url}/projects/{project_id}/repository/contributors"
-        response = requests.get(url, headers=self.headers)
+        response = self._get(url, endpoint="gitlab/project_contributors")
         self._handle_error(response)
         contributors = response.json()
         return contributors
 
-    async def get_project_merge_requests(
-        self, project_id, updated_after: datetime, per_page=20
-    ) -> Awaitable[List[Dict]]:
-        updated_after = updated_after.isoformat()
+    async def _get_json_async(
+        self,
+        session: aiohttp.ClientSession,
+        url: str,
+        endpoint: str,
+        params: Dict = None,
+    ) -> Tuple[Any, Mapping[str, str]]:
+        """
+        GETs a url on a shared aiohttp session through the response cache, paced and
+        retried by the rate limiter.
+        :return: Parsed json body and the response headers
+        """
+        retries = 0
+        while True:
+            wait = self._rate_limiter.reserve(self._token)
+            if wait:
+                await asyncio.sleep(wait)
+
+            response = await self._cache.get_async(
+                session, url, endpoint=endpoint, headers=self.headers, params=params
+            )
+            backoff = self._rate_limiter.update(
+                self._token, response.status_code, response.headers
+            )
+            if backoff is not None and retries < MAX_RATE_LIMIT_RETRIES:
+                retries += 1
+                continue
+
+            response.raise_for_status()
+            return response.json(), response.headers
+
+    async def iter_project_merge_requests(
+        self,
+        project_id,
+        updated_after: datetime,
+        per_page: int = GITLAB_MR_PAGE_SIZE,
+        concurrency: int = GITLAB_MR_FETCH_CONCURRENCY,
+    ) -> AsyncIterator[List[Dict]]:
+        """
+        Yields pages of merge requests updated after the given time as they arrive.
+        When the first response carries X-Total-Pages the remaining pages are fetched
+        concurrently, otherwise pages are followed one by one through X-Next-Page.
+        Merge requests are listed newest created first, so merge requests created while
+        listing push others to later pages, which can repeat but never skip them.
+        """
         url = f"{self.base_url}/projects/{project_id}/merge_requests"
-        params = {"per_page": per_page, "updated_after": updated_after}
-        merge_requests = []
+        params = {
+            "per_page": per_page,
+            "updated_after": updated_after.isoformat(),
+            "order_by": "created_at",
+            "sort": "desc",
+        }
 
-        async with aiohttp.ClientSession(headers=self.headers) as session:
+        async with self._get_async_session() as session:
             page = 1
+            page_merge_requests, headers = await self._get_json_async(
+                session, url, "gitlab/merge_requests", {**params, "page": page}
+            )
+            yield page_merge_requests
+
+            total_pages = headers.get("X-Total-Pages")
+            if total_pages:
+                semaphore = asyncio.Semaphore(max(concurrency, 1))
+
+                async def _get_page(page_number: int) -> List[Dict]:
+                    async with semaphore:
+                        data, _ = await self._get_json_async(
+                            session,
+                            url,
+                            "gitlab/merge_requests",
+                            {**params, "page": page_number},
+                        )
+                        return data
+
+                for next_page in asyncio.as_completed(
+                    [
+                        _get_page(page_number)
+                        for page_number in range(2, int(total_pages) + 1)
+                    ]
+                ):
+                    yield await next_page
+                return
+
+            # GitLab leaves out the totals for large result sets
             while True:
-                params["page"] = page
-                async with session.get(url, params=params) as response:
-                    response.raise_for_status()
-                    page_merge_requests = await response.json()
-                    merge_requests.extend(page_merge_requests)
+                page = self._get_next_page(headers, page, page_merge_requests, per_page)
+                if not page:
+                    return
+
+                page_merge_requests, headers = await self._get_json_async(
+                    session, url, "gitlab/merge_requests", {**params, "page": page}
+                )
+                yield page_merge_requests
+
+    @staticmethod
+    def _get_next_page(
+        headers: Mapping[str, str], page: int, page_data: List, per_page: int
+    ) -> Optional[int]:
+        if "X-Next-Page" in headers:
+            next_page = headers.get("X-Next-Page")
+            return int(next_page) if next_page else None
 
-                    if len(page_merge_requests) < per_page:
-                        break
+        return page + 1 if len(page_data) >= per_page else None
 
-                    page += 1
+    async def get_project_merge_requests(
+        self, project_id, updated_after: datetime, per_page=GITLAB_MR_PAGE_SIZE
+    ) -> Awaitable[List[Dict]]:
+        merge_requests = []
+        async for page_merge_requests in self.iter_project_merge_requests(
+            project_id, updated_after, per_page
+        ):
+            merge_requests.extend(page_merge_requests)
 
         return merge_requests
 
+    async def get_merge_requests_details(
+        self,
+        project_id,
+        merge_request_internal_ids: List[str],
+        merged_merge_request_internal_ids: Set[str],
+        concurrency: int = GITLAB_MR_FETCH_CONCURRENCY,
+    ) -> Dict[str, GitlabMergeRequestDetails]:
+        """
+        Fetches notes of the merge requests, and commits and diffs of the merged ones, over one
+        aiohttp session with at most `concurrency` requests in flight.
+        :return: Map of merge request internal id to its details
+        """
+        semaphore = asyncio.Semaphore(max(concurrency, 1))
+        merge_requests_url = f"{self.base_url}/projects/{project_id}/merge_requests"
+
+        async with self._get_async_session() as session:
+
+            async def _get(url: str, endpoint: str) -> Any:
+                async with semaphore:
+                    data, _ = await self._get_json_async(session, url, endpoint)
+                    return data
+
+            async def _get_details(
+                merge_request_internal_id: str,
+            ) -> GitlabMergeRequestDetails:
+                url = f"{merge_requests_url}/{merge_request_internal_id}"
+                if merge_request_internal_id not in merged_merge_request_internal_ids:
+                    notes = await _get(f"{url}/notes", "gitlab/merge_request_notes")
+                    return GitlabMergeRequestDetails(notes=list(map(GitlabNote, notes)))
+
+                notes, commits, diffs = await asyncio.gather(
+                    _get(f"{url}/notes", "gitlab/merge_request_notes"),
+                    _get(f"{url}/commits", "gitlab/merge_request_commits"),
+                    _get(f"{url}/diffs", "gitlab/merge_request_diff"),
+                )
+                return GitlabMergeRequestDetails(
+                    notes=list(map(GitlabNote, notes)),
+                    commits=list(map(GitlabCommit, commits)),
+                    diffs=diffs,
+                )
+
+            details = await asyncio.gather(
+                *[
+                    _get_details(str(merge_request_internal_id))
+                    for merge_request_internal_id in merge_request_internal_ids
+                ]
+            )
+
+        return {
+            str(merge_request_internal_id): merge_request_details
+            for merge_request_internal_id, merge_request_details in zip(
+                merge_request_internal_ids, details
+            )
+        }
+
+    def get_project_merge_requests_by_internal_ids(
+        self, project_id, merge_request_internal_ids: List[str]
+    ) -> List[Dict]:
+        url = f"{self.base_url}/projects/{project_id}/merge_requests"
+        response = self._get(
+            url,
+            endpoint="gitlab/merge_requests",
+            params={
+                "iids[]": [str(iid) for iid in merge_request_internal_ids],
+                "per_page": len(merge_request_internal_ids),
+            },
+        )
+        self._handle_error(response)
+        return response.json()
+
     def get_merge_request_commits(
         self, project_id, merge_request_internal_id
     ) -> List[GitlabCommit]:
         url = f"{self.base_url}/projects/{project_id}/merge_requests/{merge_request_internal_id}/commits"
-        response = requests.get(url, headers=self.headers)
+        response = self._get(url, endpoint="gitlab/merge_request_commits")
         self._handle_error(response)
         commits = response.json()
         return list(map(GitlabCommit, commits))
@@ -151,7 +349,7 @@ class GitlabApiService:
         self, project_id, merge_request_internal_id
     ) -> List[GitlabNote]:
         url = f"{self.base_url}/projects/{project_id}/merge_requests/{merge_request_internal_id}/notes"
-        response = requests.get(url, headers=self.headers)
+        response = self._get(url, endpoint="gitlab/merge_request_notes")
         self._handle_error(response)
         notes = response.json()
         return list(map(GitlabNote, notes))
@@ -160,7 +358,7 @@ class GitlabApiService:
         self, project_id, merge_request_internal_id
     ) -> List[Dict]:
         url = f"{self.base_url}/projects/{project_id}/merge_requests/{merge_request_internal_id}/diffs"
-        response = requests.get(url, headers=self.headers)
+        response = self._get(url, endpoint="gitlab/merge_request_diff")
         self._handle_error(response)
         diff = response.json()
         return diff
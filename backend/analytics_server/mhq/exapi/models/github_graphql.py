@@ -0,0 +1,43 @@
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from mhq.exapi.models.github_timeline import GithubPullRequestTimelineEvents
+
+
+@dataclass
+class GithubGraphQLRef:
+    ref: str
+
+
+@dataclass
+class GithubGraphQLUser:
+    login: str
+
+
+@dataclass
+class GithubGraphQLPullRequest:
+    """
+    A pull request fetched over GraphQL, shaped like the PyGithub pull request so the
+    REST transformations can be reused. raw_data, timeline_events and commits hold
+    REST shaped payloads built from the GraphQL response.
+    """
+
+    number: int
+    title: str
+    html_url: str
+    created_at: datetime
+    updated_at: datetime
+    merged_at: Optional[datetime]
+    closed_at: Optional[datetime]
+    state: str
+    base: GithubGraphQLRef
+    head: GithubGraphQLRef
+    user: GithubGraphQLUser
+    commits: int
+    additions: int
+    deletions: int
+    changed_files: int
+    raw_data: Dict
+    timeline_events: List[GithubPullRequestTimelineEvents] = field(default_factory=list)
+    commit_dicts: List[Dict] = field(default_factory=list)
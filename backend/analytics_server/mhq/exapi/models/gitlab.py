@@ -1,4 +1,4 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime
 from enum import Enum
 from typing import Dict, List, Optional
@@ -169,3 +169,10 @@ class GitlabNote:
         if _is_pr_approved_event(self.data):
             return GitlabNoteType.APPROVED
         return GitlabNoteType.UPDATED
+
+
+@dataclass
+class GitlabMergeRequestDetails:
+    notes: List[GitlabNote] = field(default_factory=list)
+    commits: List[GitlabCommit] = field(default_factory=list)
+    diffs: List[Dict] = field(default_factory=list)
@@ -0,0 +1,426 @@
+import hashlib
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, fields
+from http import HTTPStatus
+from os import getenv
+from typing import Callable, Dict, Mapping, Optional, TypeVar
+
+import requests
+from redis import Redis, WatchError
+from urllib3.exceptions import MaxRetryError, ResponseError
+from urllib3.util.retry import Retry
+
+from mhq.utils.lock import get_redis_lock_service
+from mhq.utils.log import LOG
+
+# GitHub sends X-RateLimit-*, GitLab sends RateLimit-*
+REMAINING_HEADERS = ["X-RateLimit-Remaining", "RateLimit-Remaining"]
+RESET_HEADERS = ["X-RateLimit-Reset", "RateLimit-Reset"]
+LIMIT_HEADERS = ["X-RateLimit-Limit", "RateLimit-Limit"]
+
+# Share of the quota below which requests get paced over the rest of the window
+LOW_QUOTA_RATIO = 0.1
+MIN_LOW_QUOTA = 50
+# Backoff for secondary limits that do not say how long to wait
+SECONDARY_LIMIT_BACKOFF_SECONDS = 60
+MAX_WAIT_SECONDS = 60 * 60
+MAX_RATE_LIMIT_RETRIES = 5
+DEFAULT_RESOURCE = "core"
+RATE_LIMIT_STATUS_CODES = [HTTPStatus.FORBIDDEN, HTTPStatus.TOO_MANY_REQUESTS]
+
+RATE_LIMIT_STATE_STORE = getenv("RATE_LIMIT_STATE_STORE", "redis")
+# Budgets of tokens no longer in use are dropped once the quota window is long over
+BUDGET_TTL_SECONDS = 2 * MAX_WAIT_SECONDS
+MAX_BUDGET_UPDATE_ATTEMPTS = 10
+
+REDIS_KEY_PREFIX = "{rate_limits}"
+
+T = TypeVar("T")
+
+
+@dataclass
+class _TokenBudget:
+    remaining: Optional[int] = None
+    limit: Optional[int] = None
+    reset_at: Optional[float] = None
+    blocked_until: float = 0
+    tokens: float = 0
+    refilled_at: float = 0
+    secondary_backoff: float = SECONDARY_LIMIT_BACKOFF_SECONDS
+
+    def to_fields(self) -> Dict[str, str]:
+        budget_fields = {}
+        for field in fields(self):
+            value = getattr(self, field.name)
+            budget_fields[field.name] = "" if value is None else str(value)
+        return budget_fields
+
+    @classmethod
+    def from_fields(cls, budget_fields: Dict[str, str]) -> "_TokenBudget":
+        budget = cls()
+        for field in fields(cls):
+            value = budget_fields.get(field.name)
+            if value is None:
+                continue
+            if value == "":
+                setattr(budget, field.name, None)
+            elif field.name in ("remaining", "limit"):
+                setattr(budget, field.name, int(value))
+            else:
+                setattr(budget, field.name, float(value))
+        return budget
+
+
+class RateLimitStateStore(ABC):
+    """
+    Keeps the rate limit budgets, keyed by token hash and resource.
+    """
+
+    @abstractmethod
+    def update_budget(self, key: str, apply: Callable[[_TokenBudget], T]) -> T:
+        """
+        Applies the change to the budget stored under the key, atomically with
+        respect to other changes of the same budget.
+
+        :param apply: Changes the budget in place, may be called more than once
+        :return: What apply returned for the change that was stored
+        """
+
+
+class InMemoryRateLimitStateStore(RateLimitStateStore):
+    """
+    Process local budgets, used by tests and single process setups without Redis.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._budgets: Dict[str, _TokenBudget] = {}
+
+    def update_budget(self, key: str, apply: Callable[[_TokenBudget], T]) -> T:
+        with self._lock:
+            if key not in self._budgets:
+                self._budgets[key] = _TokenBudget()
+            return apply(self._budgets[key])
+
+
+class RedisRateLimitStateStore(RateLimitStateStore):
+    """
+    Shares budgets across sync worker processes and containers, one Redis hash per
+    token and resource. Changes run in WATCH/MULTI transactions, retried when
+    another process changed the budget in between.
+    """
+
+    def __init__(self, redis: Redis):
+        self._redis = redis
+
+    def update_budget(self, key: str, apply: Callable[[_TokenBudget], T]) -> T:
+        budget_key = self._budget_key(key)
+        for _ in range(MAX_BUDGET_UPDATE_ATTEMPTS):
+            with self._redis.pipeline() as pipeline:
+                try:
+                    pipeline.watch(budget_key)
+                    budget = _TokenBudget.from_fields(
+                        {
+                            _decode(field): _decode(value)
+                            for field, value in pipeline.hgetall(budget_key).items()
+                        }
+                    )
+                    result = apply(budget)
+                    pipeline.multi()
+                    pipeline.hset(budget_key, mapping=budget.to_fields())
+                    pipeline.expire(budget_key, BUDGET_TTL_SECONDS)
+                    pipeline.execute()
+                    return result
+                except WatchError:
+                    continue
+        raise Exception(f"Budget {key} kept changing, gave up updating it")
+
+    @staticmethod
+    def _budget_key(key: str) -> str:
+        return f"{REDIS_KEY_PREFIX}:budget:{key}"
+
+
+def _decode(value) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+class RateLimitScheduler:
+    """
+    Paces api requests per access token from the rate limit headers of the responses.
+
+    While plenty of quota is left requests go out unthrottled. Once the remaining quota
+    drops to the low watermark, a token bucket refilled at remaining / time-to-reset
+    spreads what is left over the window, and requests wait for the reset once it runs
+    out. Secondary limits (429s and throttling 403s) block the token for Retry-After,
+    or an exponential backoff. Budgets live in the state store, with Redis every sync
+    worker process and container draws from the same budget.
+    """
+
+    def __init__(
+        self,
+        store: Optional[RateLimitStateStore] = None,
+        clock: Callable[[], float] = time.time,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self._store = store or InMemoryRateLimitStateStore()
+        self._clock = clock
+        self._sleep = sleep
+
+    @staticmethod
+    def _get_budget_key(access_token: str, resource: str) -> str:
+        token_hash = hashlib.sha256((access_token or "").encode()).hexdigest()
+        return f"{token_hash}:{resource}"
+
+    def _update_budget(
+        self, access_token: str, resource: str, apply: Callable[[_TokenBudget], T]
+    ) -> T:
+        key = self._get_budget_key(access_token, resource)
+        try:
+            return self._store.update_budget(key, apply)
+        except Exception as e:
+            # Without the shared state requests go out unpaced, rate limited
+            # responses still back off
+            LOG.error(f"[Rate Limit] Error updating rate limit budget: {str(e)}")
+            return apply(_TokenBudget())
+
+    def reserve(self, access_token: str, resource: str = DEFAULT_RESOURCE) -> float:
+        """
+        Reserves a request slot for the token.
+        :param access_token: Token the request is made with
+        :param resource: Quota the request counts against, eg. GitHub's graphql quota
+        :return: Seconds to wait before sending the request
+        """
+        return self._update_budget(access_token, resource, self._reserve)
+
+    def _reserve(self, budget: _TokenBudget) -> float:
+        now = self._clock()
+        wait = max(budget.blocked_until - now, 0)
+
+        if budget.remaining is None:
+            return min(wait, MAX_WAIT_SECONDS)
+
+        reset_in = max((budget.reset_at or now) - now, 1)
+        if budget.remaining <= 0:
+            wait = max(wait, reset_in)
+        elif budget.remaining <= self._get_low_watermark(budget):
+            rate = budget.remaining / reset_in
+            budget.tokens = min(budget.tokens + (now - budget.refilled_at) * rate, 1)
+            budget.refilled_at = now
+            budget.tokens -= 1
+            if budget.tokens < 0:
+                wait = max(wait, -budget.tokens / rate)
+
+        budget.remaining -= 1
+        return min(wait, MAX_WAIT_SECONDS)
+
+    def wait(self, access_token: str, resource: str = DEFAULT_RESOURCE):
+        """
+        Reserves a request slot for the token and sleeps until it is due.
+        """
+        wait = self.reserve(access_token, resource)
+        if wait:
+            self._sleep(wait)
+
+    @staticmethod
+    def _get_low_watermark(budget: _TokenBudget) -> int:
+        if not budget.limit:
+            return MIN_LOW_QUOTA
+        return max(int(budget.limit * LOW_QUOTA_RATIO), MIN_LOW_QUOTA)
+
+    def update(
+        self,
+        access_token: str,
+        status_code: int,
+        headers: Mapping[str, str],
+        body: str = "",
+        resource: str = DEFAULT_RESOURCE,
+    ) -> Optional[float]:
+        """
+        Records the rate limit state sent back with a response.
+        :return: Seconds to back off before retrying, if the request was rate limited
+        """
+        remaining = self._get_int_header(headers, REMAINING_HEADERS)
+        reset_at = self._get_int_header(headers, RESET_HEADERS)
+        limit = self._get_int_header(headers, LIMIT_HEADERS)
+        retry_after = self._get_int_header(headers, ["Retry-After"])
+
+        rate_limited = self._is_rate_limited(status_code, remaining, retry_after, body)
+
+        def _update(budget: _TokenBudget) -> Optional[float]:
+            now = self._clock()
+            if remaining is not None:
+                budget.remaining = remaining
+                budget.refilled_at = now
+                budget.tokens = min(budget.tokens, 0)
+            if reset_at is not None:
+                budget.reset_at = reset_at
+            if limit is not None:
+                budget.limit = limit
+
+            if not rate_limited:
+                budget.secondary_backoff = SECONDARY_LIMIT_BACKOFF_SECONDS
+                return None
+
+            if retry_after is not None:
+                backoff = retry_after
+            elif remaining == 0 and reset_at:
+                backoff = max(reset_at - now, 1)
+            else:
+                backoff = budget.secondary_backoff
+                budget.secondary_backoff = min(
+                    budget.secondary_backoff * 2, MAX_WAIT_SECONDS
+                )
+
+            backoff = min(backoff, MAX_WAIT_SECONDS)
+            budget.blocked_until = max(budget.blocked_until, now + backoff)
+            return backoff
+
+        return self._update_budget(access_token, resource, _update)
+
+    @staticmethod
+    def _is_rate_limited(
+        status_code: int,
+        remaining: Optional[int],
+        retry_after: Optional[int],
+        body: str,
+    ) -> bool:
+        if status_code == HTTPStatus.TOO_MANY_REQUESTS:
+            return True
+        if status_code != HTTPStatus.FORBIDDEN:
+            return False
+        return (
+            remaining == 0
+            or retry_after is not None
+            or "rate limit" in (body or "").lower()
+        )
+
+    @staticmethod
+    def _get_int_header(headers: Mapping[str, str], names) -> Optional[int]:
+        for name in names:
+            value = headers.get(name)
+            if value is None:
+                continue
+            try:
+                return int(float(value))
+            except ValueError:
+                continue
+        return None
+
+    def request(
+        self,
+        access_token: str,
+        send: Callable[[], requests.Response],
+        resource: str = DEFAULT_RESOURCE,
+    ) -> requests.Response:
+        """
+        Sends a request once the token's budget allows it, retrying while it is rate limited.
+        :param access_token: Token the request is made with
+        :param send: Callable which makes the request
+        :param resource: Quota the request counts against
+        :return: Response of the last attempt
+        """
+        attempt = 0
+        while True:
+            self.wait(access_token, resource)
+            response = send()
+            backoff = self.update(
+                access_token,
+                response.status_code,
+                response.headers,
+                self._get_error_body(response),
+                resource,
+            )
+            if backoff is None or attempt >= MAX_RATE_LIMIT_RETRIES:
+                return response
+
+            attempt += 1
+            LOG.warning(
+                f"[Rate Limit] Request to {response.url} rate limited, "
+                f"retrying in {backoff}s (attempt {attempt}/{MAX_RATE_LIMIT_RETRIES})"
+            )
+
+    @staticmethod
+    def _get_error_body(response: requests.Response) -> str:
+        if response.status_code != HTTPStatus.FORBIDDEN:
+            return ""
+        try:
+            return response.text
+        except Exception:
+            return ""
+
+
+class RateLimitRetry(Retry):
+    """
+    urllib3 retry policy for clients with their own connection pool, eg. PyGithub.
+
+    Rate limited responses (429s, and 403s with an exhausted quota or Retry-After)
+    are recorded with the scheduler and retried once it lets the token through
+    again, instead of failing the request. Other 403s are handed back as they are.
+    """
+
+    def __init__(
+        self,
+        *args,
+        scheduler: Optional[RateLimitScheduler] = None,
+        access_token: str = "",
+        **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        self.scheduler = scheduler
+        self.access_token = access_token
+
+    def new(self, **kwargs) -> "RateLimitRetry":
+        retry = super().new(**kwargs)
+        retry.scheduler = self.scheduler
+        retry.access_token = self.access_token
+        return retry
+
+    def increment(self, method=None, url=None, response=None, *args, **kwargs):
+        if (
+            self.scheduler
+            and response is not None
+            and response.status in RATE_LIMIT_STATUS_CODES
+        ):
+            backoff = self.scheduler.update(
+                self.access_token, response.status, response.headers
+            )
+            if backoff is None:
+                # Not a rate limit, eg. a token without access to the resource
+                raise MaxRetryError(
+                    kwargs.get("_pool"), url, ResponseError(str(response.status))
+                )
+            LOG.warning(
+                f"[Rate Limit] Request to {url} rate limited, retrying in {backoff}s"
+            )
+        return super().increment(method, url, response, *args, **kwargs)
+
+    def sleep(self, response=None):
+        if (
+            self.scheduler
+            and response is not None
+            and response.status in RATE_LIMIT_STATUS_CODES
+        ):
+            self.scheduler.wait(self.access_token)
+            return
+        super().sleep(response)
+
+
+_scheduler = None
+
+
+def get_rate_limit_scheduler() -> RateLimitScheduler:
+    """
+    Process wide scheduler, keeping budgets in the store configured in
+    RATE_LIMIT_STATE_STORE ("redis" or "memory").
+    """
+    global _scheduler
+    if not _scheduler:
+        store: RateLimitStateStore = (
+            RedisRateLimitStateStore(get_redis_lock_service().redis)
+            if RATE_LIMIT_STATE_STORE == "redis"
+            else InMemoryRateLimitStateStore()
+        )
+        _scheduler = RateLimitScheduler(store)
+    return _scheduler
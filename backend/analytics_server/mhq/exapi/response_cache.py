@@ -0,0 +1,458 @@
+import base64
+import hashlib
+import json
+import os
+import threading
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import timedelta
+from http import HTTPStatus
+from os import getenv
+from typing import Dict, Optional
+from urllib.parse import urlencode
+
+import aiohttp
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from mhq.exapi.transport import HttpTransport
+from mhq.store.models.integrations import ExapiResponseCache
+from mhq.store.repos.integrations import ExapiResponseCacheRepoService
+from mhq.utils.log import LOG
+from mhq.utils.time import time_now
+
+EXAPI_CACHE_STORE = getenv("EXAPI_CACHE_STORE", "")
+EXAPI_CACHE_DIR = getenv("EXAPI_CACHE_DIR", "/tmp/mhq-exapi-cache")
+EXAPI_CACHE_MAX_ENTRIES = int(getenv("EXAPI_CACHE_MAX_ENTRIES", 100000))
+EXAPI_CACHE_TTL_DAYS = int(getenv("EXAPI_CACHE_TTL_DAYS", 14))
+
+# Headers that drive pagination, kept alongside the cached body
+CACHED_RESPONSE_HEADERS = [
+    "Content-Type",
+    "Link",
+    "X-Next-Page",
+    "X-Page",
+    "X-Per-Page",
+    "X-Total",
+    "X-Total-Pages",
+]
+
+
+@dataclass
+class CachedResponse:
+    key: str
+    url: str
+    endpoint: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    body: bytes
+    headers: Dict[str, str] = field(default_factory=dict)
+
+
+class ResponseCacheStore(ABC):
+    @abstractmethod
+    def get(self, key: str) -> Optional[CachedResponse]:
+        pass
+
+    @abstractmethod
+    def set(self, cached_response: CachedResponse):
+        pass
+
+    @abstractmethod
+    def touch(self, key: str):
+        """Marks a cached response as used, for LRU eviction."""
+
+    @abstractmethod
+    def evict(self):
+        """Drops responses unused for the TTL and the least recently used ones over capacity."""
+
+
+class DiskResponseCacheStore(ResponseCacheStore):
+    """
+    Keeps one JSON file per cached response. The file modification time tracks the
+    last access, which drives both TTL and LRU eviction.
+    """
+
+    def __init__(self, directory: str, max_entries: int, ttl: timedelta):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.ttl = ttl
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        try:
+            with open(self._path(key)) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        return CachedResponse(
+            key=key,
+            url=data["url"],
+            endpoint=data["endpoint"],
+            etag=data.get("etag"),
+            last_modified=data.get("last_modified"),
+            headers=data.get("headers") or {},
+            body=base64.b64decode(data["body"]),
+        )
+
+    def set(self, cached_response: CachedResponse):
+        data = dict(
+            url=cached_response.url,
+            endpoint=cached_response.endpoint,
+            etag=cached_response.etag,
+            last_modified=cached_response.last_modified,
+            headers=cached_response.headers,
+            body=base64.b64encode(cached_response.body).decode(),
+        )
+        path = self._path(cached_response.key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def touch(self, key: str):
+        try:
+            os.utime(self._path(key))
+        except OSError:
+            pass
+
+    def evict(self):
+        expiry = time_now().timestamp() - self.ttl.total_seconds()
+        entries = []
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(".json"):
+                continue
+            try:
+                accessed_at = entry.stat().st_mtime
+            except OSError:
+                continue
+            if accessed_at < expiry:
+                self._remove(entry.path)
+                continue
+            entries.append((accessed_at, entry.path))
+
+        max_entries = self.max_entries
+        entries.sort(reverse=True)
+        for _, path in entries[max_entries:]:
+            self._remove(path)
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class PostgresResponseCacheStore(ResponseCacheStore):
+    def __init__(
+        self,
+        repo_service: ExapiResponseCacheRepoService,
+        max_entries: int,
+        ttl: timedelta,
+    ):
+        self.repo_service = repo_service
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        cached_response = self.repo_service.get_cached_response(key)
+        if not cached_response:
+            return None
+
+        return CachedResponse(
+            key=cached_response.key,
+            url=cached_response.url,
+            endpoint=cached_response.endpoint,
+            etag=cached_response.etag,
+            last_modified=cached_response.last_modified,
+            headers=cached_response.headers or {},
+            body=bytes(cached_response.body),
+        )
+
+    def set(self, cached_response: CachedResponse):
+        self.repo_service.save_cached_response(
+            ExapiResponseCache(
+                key=cached_response.key,
+                url=cached_response.url,
+                endpoint=cached_response.endpoint,
+                etag=cached_response.etag,
+                last_modified=cached_response.last_modified,
+                headers=cached_response.headers,
+                body=cached_response.body,
+                accessed_at=time_now(),
+            )
+        )
+
+    def touch(self, key: str):
+        self.repo_service.update_accessed_at(key, time_now())
+
+    def evict(self):
+        self.repo_service.delete_cached_responses_accessed_before(time_now() - self.ttl)
+        self.repo_service.delete_least_recently_accessed_responses(self.max_entries)
+
+
+class ConditionalRequestCache:
+    """
+    Conditional request cache for GET calls to code provider apis.
+
+    Responses carrying an ETag or Last-Modified header are stored per url. Later
+    requests for the same url send If-None-Match/If-Modified-Since and a 304 is
+    answered with the stored body, which GitHub does not count against the rate limit.
+    Without a store every request goes straight to the network.
+    """
+
+    EVICTION_INTERVAL = 1000
+
+    def __init__(self, store: Optional[ResponseCacheStore] = None):
+        self.store = store
+        self._lock = threading.Lock()
+        self._hits: Dict[str, int] = defaultdict(int)
+        self._misses: Dict[str, int] = defaultdict(int)
+        self._writes_since_eviction = 0
+
+    def get(
+        self,
+        url: str,
+        endpoint: str,
+        headers: Optional[Dict] = None,
+        params: Optional[Dict] = None,
+        transport: Optional[HttpTransport] = None,
+    ) -> requests.Response:
+        """
+        :param url: Url to GET
+        :param endpoint: Name the request is reported under in the cache stats
+        :param headers: Request headers
+        :param params: Query params
+        :param transport: Pooled transport to send the request with
+        :return: The network response, or the cached response when the url is unchanged
+        """
+        if not self.store:
+            return self._send(url, endpoint, headers, params, transport)
+
+        key = self._get_key(url, headers, params)
+        cached_response = self._get_from_store(key)
+        response = self._send(
+            url,
+            endpoint,
+            self._get_conditional_headers(headers, cached_response),
+            params,
+            transport,
+        )
+        return self._handle_response(key, url, endpoint, cached_response, response)
+
+    async def get_async(
+        self,
+        session: aiohttp.ClientSession,
+        url: str,
+        endpoint: str,
+        headers: Optional[Dict] = None,
+        params: Optional[Dict] = None,
+    ) -> requests.Response:
+        """
+        Same as get, sending the request on an aiohttp session.
+        :param session: Session to send the request with
+        :param url: Url to GET
+        :param endpoint: Name the request is reported under in the cache stats
+        :param headers: Headers identifying the caller, the session sends its own as well
+        :param params: Query params
+        :return: The network response, or the cached response when the url is unchanged
+        """
+        if not self.store:
+            return await self._send_async(session, url, headers, params)
+
+        key = self._get_key(url, headers, params)
+        cached_response = self._get_from_store(key)
+        response = await self._send_async(
+            session,
+            url,
+            self._get_conditional_headers(headers, cached_response),
+            params,
+        )
+        return self._handle_response(key, url, endpoint, cached_response, response)
+
+    @staticmethod
+    def _get_conditional_headers(
+        headers: Optional[Dict], cached_response: Optional[CachedResponse]
+    ) -> Dict:
+        request_headers = dict(headers or {})
+        if cached_response and cached_response.etag:
+            request_headers["If-None-Match"] = cached_response.etag
+        if cached_response and cached_response.last_modified:
+            request_headers["If-Modified-Since"] = cached_response.last_modified
+        return request_headers
+
+    def _handle_response(
+        self,
+        key: str,
+        url: str,
+        endpoint: str,
+        cached_response: Optional[CachedResponse],
+        response: requests.Response,
+    ) -> requests.Response:
+        if response.status_code == HTTPStatus.NOT_MODIFIED and cached_response:
+            self._record(endpoint, hit=True)
+            self._touch(key)
+            return self._to_response(cached_response, response)
+
+        self._record(endpoint, hit=False)
+        if response.status_code == HTTPStatus.OK and (
+            response.headers.get("ETag") or response.headers.get("Last-Modified")
+        ):
+            self._save(key, url, endpoint, response)
+
+        return response
+
+    @staticmethod
+    def _send(
+        url: str,
+        endpoint: str,
+        headers: Optional[Dict],
+        params: Optional[Dict],
+        transport: Optional[HttpTransport],
+    ) -> requests.Response:
+        if transport:
+            return transport.get(url, endpoint, headers=headers, params=params)
+        return requests.get(url, headers=headers, params=params)
+
+    @staticmethod
+    async def _send_async(
+        session: aiohttp.ClientSession,
+        url: str,
+        headers: Optional[Dict],
+        params: Optional[Dict],
+    ) -> requests.Response:
+        async with session.get(url, headers=headers, params=params) as aiohttp_response:
+            response = requests.Response()
+            response.status_code = aiohttp_response.status
+            response.url = str(aiohttp_response.url)
+            response.reason = aiohttp_response.reason
+            response.headers = CaseInsensitiveDict(aiohttp_response.headers)
+            response._content = await aiohttp_response.read()
+            response.encoding = "utf-8"
+            return response
+
+    def get_stats(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            endpoints = set(self._hits) | set(self._misses)
+            return {
+                endpoint: dict(
+                    hits=self._hits[endpoint],
+                    misses=self._misses[endpoint],
+                    hit_rate=self._hits[endpoint]
+                    / (self._hits[endpoint] + self._misses[endpoint]),
+                )
+                for endpoint in sorted(endpoints)
+            }
+
+    def log_stats(self, reset: bool = True):
+        for endpoint, stats in self.get_stats().items():
+            LOG.info(
+                f"[Exapi Response Cache] {endpoint}: {stats['hits']} hits, "
+                f"{stats['misses']} misses, hit rate {stats['hit_rate']:.2%}"
+            )
+        if reset:
+            with self._lock:
+                self._hits.clear()
+                self._misses.clear()
+
+    @staticmethod
+    def _get_key(url: str, headers: Optional[Dict], params: Optional[Dict]) -> str:
+        # Responses depend on what the token can see, so the credentials are part of the key
+        authorization = (headers or {}).get("Authorization", "")
+        query = urlencode(sorted((params or {}).items()), doseq=True)
+        return hashlib.sha256(f"{authorization}|{url}?{query}".encode()).hexdigest()
+
+    def _record(self, endpoint: str, hit: bool):
+        with self._lock:
+            if hit:
+                self._hits[endpoint] += 1
+            else:
+                self._misses[endpoint] += 1
+
+    def _get_from_store(self, key: str) -> Optional[CachedResponse]:
+        try:
+            return self.store.get(key)
+        except Exception as e:
+            LOG.error(f"[Exapi Response Cache] Error reading cached response: {str(e)}")
+            return None
+
+    def _touch(self, key: str):
+        try:
+            self.store.touch(key)
+        except Exception as e:
+            LOG.error(
+                f"[Exapi Response Cache] Error touching cached response: {str(e)}"
+            )
+
+    def _save(self, key: str, url: str, endpoint: str, response: requests.Response):
+        cached_response = CachedResponse(
+            key=key,
+            url=url,
+            endpoint=endpoint,
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+            headers={
+                header: response.headers[header]
+                for header in CACHED_RESPONSE_HEADERS
+                if header in response.headers
+            },
+            body=response.content,
+        )
+        try:
+            self.store.set(cached_response)
+            with self._lock:
+                self._writes_since_eviction += 1
+                should_evict = self._writes_since_eviction >= self.EVICTION_INTERVAL
+                if should_evict:
+                    self._writes_since_eviction = 0
+            if should_evict:
+                self.store.evict()
+        except Exception as e:
+            LOG.error(f"[Exapi Response Cache] Error saving cached response: {str(e)}")
+
+    @staticmethod
+    def _to_response(
+        cached_response: CachedResponse, not_modified_response: requests.Response
+    ) -> requests.Response:
+        response = requests.Response()
+        response.status_code = HTTPStatus.OK
+        response.url = cached_response.url
+        response._content = cached_response.body
+        response.encoding = "utf-8"
+        response.headers = CaseInsensitiveDict(
+            {**cached_response.headers, **not_modified_response.headers}
+        )
+        for header in ["Content-Encoding", "Content-Length", "Transfer-Encoding"]:
+            response.headers.pop(header, None)
+        return response
+
+
+_response_cache = None
+
+
+def get_exapi_response_cache() -> ConditionalRequestCache:
+    """
+    Process wide response cache, backed by the store configured in EXAPI_CACHE_STORE
+    ("postgres" or "disk"). Caching is off when no store is configured.
+    """
+    global _response_cache
+    if _response_cache:
+        return _response_cache
+
+    ttl = timedelta(days=EXAPI_CACHE_TTL_DAYS)
+    store: Optional[ResponseCacheStore] = None
+    if EXAPI_CACHE_STORE == "postgres":
+        store = PostgresResponseCacheStore(
+            ExapiResponseCacheRepoService(), EXAPI_CACHE_MAX_ENTRIES, ttl
+        )
+    elif EXAPI_CACHE_STORE == "disk":
+        store = DiskResponseCacheStore(EXAPI_CACHE_DIR, EXAPI_CACHE_MAX_ENTRIES, ttl)
+
+    _response_cache = ConditionalRequestCache(store)
+    return _response_cache
@@ -0,0 +1,216 @@
+import random
+import threading
+import time
+from collections import defaultdict
+from http import HTTPStatus
+from os import getenv
+from typing import Callable, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from mhq.exapi.rate_limiter import (
+    RATE_LIMIT_STATUS_CODES,
+    RateLimitRetry,
+    RateLimitScheduler,
+    get_rate_limit_scheduler,
+)
+from mhq.utils.log import LOG
+
+EXAPI_HTTP_MAX_RETRIES = int(getenv("EXAPI_HTTP_MAX_RETRIES", 3))
+EXAPI_HTTP_BACKOFF_SECONDS = float(getenv("EXAPI_HTTP_BACKOFF_SECONDS", 0.5))
+EXAPI_HTTP_TIMEOUT_SECONDS = float(getenv("EXAPI_HTTP_TIMEOUT_SECONDS", 30))
+DEFAULT_POOL_SIZE = 10
+
+RETRY_STATUS_CODES = [
+    HTTPStatus.INTERNAL_SERVER_ERROR,
+    HTTPStatus.BAD_GATEWAY,
+    HTTPStatus.SERVICE_UNAVAILABLE,
+    HTTPStatus.GATEWAY_TIMEOUT,
+]
+
+
+def get_http_pool_size(integration: str) -> int:
+    """
+    Connection pool size for an integration, read from <INTEGRATION>_HTTP_POOL_SIZE.
+    Defaults to enough connections for every repo sync worker of the integration,
+    see <INTEGRATION>_SYNC_CONCURRENCY.
+    """
+    pool_size = getenv(f"{integration.upper()}_HTTP_POOL_SIZE")
+    if pool_size:
+        return max(int(pool_size), 1)
+
+    sync_concurrency = getenv(f"{integration.upper()}_SYNC_CONCURRENCY")
+    return max(int(sync_concurrency or 1), DEFAULT_POOL_SIZE)
+
+
+def get_pygithub_retry(
+    access_token: str, scheduler: Optional[RateLimitScheduler] = None
+) -> Retry:
+    """
+    Retry policy for the requests PyGithub makes through its own connection pool.
+    Rate limited responses wait for the token's budget in the rate limit scheduler.
+    """
+    return RateLimitRetry(
+        total=EXAPI_HTTP_MAX_RETRIES,
+        backoff_factor=EXAPI_HTTP_BACKOFF_SECONDS,
+        status_forcelist=[
+            int(status) for status in RETRY_STATUS_CODES + RATE_LIMIT_STATUS_CODES
+        ],
+        allowed_methods=["GET"],
+        raise_on_status=False,
+        scheduler=scheduler or get_rate_limit_scheduler(),
+        access_token=access_token,
+    )
+
+
+class HttpTransport:
+    """
+    Pooled HTTP transport shared by the api clients of an integration.
+
+    Keeps connections alive across calls, retries connection errors and transient
+    5xx responses with full jitter exponential backoff, and records per endpoint
+    latency. Rate limit responses are left to the rate limit scheduler.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        max_retries: int = EXAPI_HTTP_MAX_RETRIES,
+        backoff_seconds: float = EXAPI_HTTP_BACKOFF_SECONDS,
+        timeout: float = EXAPI_HTTP_TIMEOUT_SECONDS,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.timeout = timeout
+        self._sleep = sleep
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+
+        self._lock = threading.Lock()
+        self._calls: Dict[str, int] = defaultdict(int)
+        self._retries: Dict[str, int] = defaultdict(int)
+        self._total_latency: Dict[str, float] = defaultdict(float)
+        self._max_latency: Dict[str, float] = defaultdict(float)
+
+    def get(
+        self,
+        url: str,
+        endpoint: str,
+        headers: Optional[Dict] = None,
+        params: Optional[Dict] = None,
+    ) -> requests.Response:
+        return self.request("GET", url, endpoint, headers=headers, params=params)
+
+    def post(
+        self,
+        url: str,
+        endpoint: str,
+        headers: Optional[Dict] = None,
+        json: Optional[Dict] = None,
+    ) -> requests.Response:
+        """
+        POSTs are retried like GETs, use this only for idempotent calls such as GraphQL queries.
+        """
+        return self.request("POST", url, endpoint, headers=headers, json=json)
+
+    def request(
+        self, method: str, url: str, endpoint: str, **kwargs
+    ) -> requests.Response:
+        """
+        :param method: HTTP method
+        :param url: Url to call
+        :param endpoint: Name the call is reported under in the latency stats
+        :return: The response of the last attempt
+        :raises requests.RequestException: If the last attempt failed to connect
+        """
+        attempt = 0
+        while True:
+            started_at = time.perf_counter()
+            try:
+                response = self._session.request(
+                    method, url, timeout=self.timeout, **kwargs
+                )
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self._record(endpoint, time.perf_counter() - started_at)
+                if attempt >= self.max_retries:
+                    raise
+                LOG.warning(f"[HTTP Transport] {endpoint} call failed: {str(e)}")
+            else:
+                self._record(endpoint, time.perf_counter() - started_at)
+                if (
+                    response.status_code not in RETRY_STATUS_CODES
+                    or attempt >= self.max_retries
+                ):
+                    return response
+                LOG.warning(
+                    f"[HTTP Transport] {endpoint} call returned {response.status_code}"
+                )
+
+            attempt += 1
+            with self._lock:
+                self._retries[endpoint] += 1
+            self._sleep(self._get_backoff(attempt))
+
+    def _get_backoff(self, attempt: int) -> float:
+        # Full jitter keeps retries of concurrent workers from lining up
+        return random.uniform(0, self.backoff_seconds * 2 ** (attempt - 1))
+
+    def _record(self, endpoint: str, latency: float):
+        with self._lock:
+            self._calls[endpoint] += 1
+            self._total_latency[endpoint] += latency
+            self._max_latency[endpoint] = max(self._max_latency[endpoint], latency)
+
+    def get_stats(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {
+                endpoint: dict(
+                    calls=self._calls[endpoint],
+                    retries=self._retries[endpoint],
+                    avg_latency=self._total_latency[endpoint] / self._calls[endpoint],
+                    max_latency=self._max_latency[endpoint],
+                )
+                for endpoint in sorted(self._calls)
+            }
+
+    def log_stats(self, reset: bool = True):
+        for endpoint, stats in self.get_stats().items():
+            LOG.info(
+                f"[HTTP Transport] {endpoint}: {stats['calls']} calls, "
+                f"{stats['retries']} retries, avg {stats['avg_latency'] * 1000:.0f}ms, "
+                f"max {stats['max_latency'] * 1000:.0f}ms"
+            )
+        if reset:
+            with self._lock:
+                self._calls.clear()
+                self._retries.clear()
+                self._total_latency.clear()
+                self._max_latency.clear()
+
+
+_transports: Dict[str, HttpTransport] = {}
+_transports_lock = threading.Lock()
+
+
+def get_http_transport(integration: str) -> HttpTransport:
+    """
+    Process wide transport for an integration, eg. "github" or "gitlab".
+    """
+    with _transports_lock:
+        if integration not in _transports:
+            _transports[integration] = HttpTransport(
+                pool_size=get_http_pool_size(integration)
+            )
+        return _transports[integration]
+
+
+def log_http_transport_stats():
+    with _transports_lock:
+        transports = list(_transports.values())
+    for transport in transports:
+        transport.log_stats()
@@ -0,0 +1,383 @@
+import hashlib
+import json
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from collections import OrderedDict, defaultdict
+from dataclasses import asdict, is_dataclass
+from datetime import datetime, timedelta
+from os import getenv
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from redis import Redis
+
+from mhq.store.repos.core import AnalyticsCacheVersionRepoService
+from mhq.utils.lock import get_redis_lock_service
+from mhq.utils.log import LOG
+
+ANALYTICS_CACHE_STORE = getenv("ANALYTICS_CACHE_STORE", "memory")
+ANALYTICS_CACHE_MAX_ENTRIES = int(getenv("ANALYTICS_CACHE_MAX_ENTRIES", 2000))
+ANALYTICS_CACHE_TTL_SECONDS = int(getenv("ANALYTICS_CACHE_TTL_SECONDS", 1800))
+
+REDIS_KEY_PREFIX = "{analytics_cache}"
+
+
+def get_org_namespace(org_id: str) -> str:
+    return f"org:{org_id}"
+
+
+def get_team_namespace(team_id: str) -> str:
+    return f"team:{team_id}"
+
+
+class AnalyticsCacheStore(ABC):
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        pass
+
+    @abstractmethod
+    def set(self, key: str, value: bytes):
+        pass
+
+    @abstractmethod
+    def get_versions(self, namespaces: List[str]) -> Dict[str, int]:
+        """Data versions of the namespaces, 0 for namespaces never bumped."""
+
+    @abstractmethod
+    def bump_version(self, namespace: str):
+        """Retires every entry keyed on the namespace's current version."""
+
+    @abstractmethod
+    def record_lookup(self, endpoint: str, hit: bool):
+        pass
+
+    @abstractmethod
+    def get_lookup_counts(self) -> Dict[str, Tuple[int, int]]:
+        """Hits and misses per endpoint."""
+
+    @abstractmethod
+    def reset_lookup_counts(self):
+        pass
+
+
+class MemoryAnalyticsCacheStore(AnalyticsCacheStore):
+    """
+    Keeps serialised responses in process, evicting the least recently used ones
+    over capacity and the ones older than the TTL. Data versions live in Postgres,
+    so syncs running in other processes retire the entries too.
+    """
+
+    def __init__(
+        self,
+        version_repo_service: AnalyticsCacheVersionRepoService,
+        max_entries: int,
+        ttl: timedelta,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.version_repo_service = version_repo_service
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._hits: Dict[str, int] = defaultdict(int)
+        self._misses: Dict[str, int] = defaultdict(int)
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if not entry:
+                return None
+            expires_at, value = entry
+            if expires_at <= self._clock():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes):
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl.total_seconds(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_versions(self, namespaces: List[str]) -> Dict[str, int]:
+        versions = self.version_repo_service.get_versions(namespaces)
+        return {namespace: versions.get(namespace, 0) for namespace in namespaces}
+
+    def bump_version(self, namespace: str):
+        self.version_repo_service.bump_version(namespace)
+
+    def record_lookup(self, endpoint: str, hit: bool):
+        with self._lock:
+            if hit:
+                self._hits[endpoint] += 1
+            else:
+                self._misses[endpoint] += 1
+
+    def get_lookup_counts(self) -> Dict[str, Tuple[int, int]]:
+        with self._lock:
+            return {
+                endpoint: (self._hits[endpoint], self._misses[endpoint])
+                for endpoint in set(self._hits) | set(self._misses)
+            }
+
+    def reset_lookup_counts(self):
+        with self._lock:
+            self._hits.clear()
+            self._misses.clear()
+
+
+class RedisAnalyticsCacheStore(AnalyticsCacheStore):
+    """
+    Shares entries, data versions and lookup counts across API workers and
+    containers. Entries are stored zlib compressed and expire after the TTL.
+    Least recently used entries are left to Redis' volatile-lru eviction, which
+    only evicts keys with an expiry and so never drops a data version.
+    """
+
+    def __init__(self, redis: Redis, ttl: timedelta):
+        self._redis = redis
+        self.ttl = ttl
+
+    def get(self, key: str) -> Optional[bytes]:
+        value = self._redis.get(self._entry_key(key))
+        if value is None:
+            return None
+        return zlib.decompress(value)
+
+    def set(self, key: str, value: bytes):
+        self._redis.set(
+            self._entry_key(key),
+            zlib.compress(value),
+            ex=int(self.ttl.total_seconds()),
+        )
+
+    def get_versions(self, namespaces: List[str]) -> Dict[str, int]:
+        versions = self._redis.mget(
+            [self._version_key(namespace) for namespace in namespaces]
+        )
+        return {
+            namespace: int(version or 0)
+            for namespace, version in zip(namespaces, versions)
+        }
+
+    def bump_version(self, namespace: str):
+        self._redis.incr(self._version_key(namespace))
+
+    def record_lookup(self, endpoint: str, hit: bool):
+        self._redis.hincrby(
+            self._lookups_key(), f"{endpoint}:{'hits' if hit else 'misses'}", 1
+        )
+
+    def get_lookup_counts(self) -> Dict[str, Tuple[int, int]]:
+        counts: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        for field, count in self._redis.hgetall(self._lookups_key()).items():
+            endpoint, lookup = _decode(field).rsplit(":", 1)
+            counts[endpoint][lookup] = int(count)
+        return {
+            endpoint: (endpoint_counts["hits"], endpoint_counts["misses"])
+            for endpoint, endpoint_counts in counts.items()
+        }
+
+    def reset_lookup_counts(self):
+        self._redis.delete(self._lookups_key())
+
+    @staticmethod
+    def _entry_key(key: str) -> str:
+        return f"{REDIS_KEY_PREFIX}:entry:{key}"
+
+    @staticmethod
+    def _version_key(namespace: str) -> str:
+        return f"{REDIS_KEY_PREFIX}:version:{namespace}"
+
+    @staticmethod
+    def _lookups_key() -> str:
+        return f"{REDIS_KEY_PREFIX}:lookups"
+
+
+class AnalyticsCache:
+    """
+    Cache of team metric responses.
+
+    Entries are keyed on the endpoint, the team, the request params and the data
+    versions of the team and its org. Syncs bump the org version and settings or
+    team writes bump the version of what they touch, so a response computed before
+    a write is never served after it. Without a store every request is computed.
+    """
+
+    def __init__(self, store: Optional[AnalyticsCacheStore] = None):
+        self.store = store
+
+    def get_or_compute(
+        self,
+        endpoint: str,
+        org_id: str,
+        team_id: str,
+        params: Dict[str, Any],
+        compute: Callable[[], Any],
+    ) -> Any:
+        """
+        :param endpoint: Name the response is keyed and reported under
+        :param org_id: Org of the team
+        :param team_id: Team the response is computed for
+        :param params: Request params the response depends on
+        :param compute: Computes the JSON serialisable response on a miss
+        :return: The cached response, or the computed one on a miss
+        """
+        if not self.store:
+            return compute()
+
+        key = self._get_key(endpoint, org_id, team_id, params)
+        cached_value = self._get_from_store(key) if key else None
+        if cached_value is not None:
+            self._record(endpoint, hit=True)
+            return json.loads(cached_value)
+
+        self._record(endpoint, hit=False)
+        value = compute()
+        if key:
+            self._save(key, value)
+        return value
+
+    def invalidate_org(self, org_id: str):
+        self._bump_version(get_org_namespace(org_id))
+
+    def invalidate_team(self, team_id: str):
+        self._bump_version(get_team_namespace(team_id))
+
+    def get_stats(self) -> Dict[str, Dict[str, float]]:
+        """Hits, misses and hit rate per endpoint, across processes with Redis."""
+        if not self.store:
+            return {}
+
+        try:
+            lookup_counts = self.store.get_lookup_counts()
+        except Exception as e:
+            LOG.error(f"[Analytics Cache] Error reading lookup counts: {str(e)}")
+            return {}
+
+        return {
+            endpoint: dict(hits=hits, misses=misses, hit_rate=hits / (hits + misses))
+            for endpoint, (hits, misses) in sorted(lookup_counts.items())
+            if hits + misses
+        }
+
+    def log_stats(self, reset: bool = True):
+        for endpoint, stats in self.get_stats().items():
+            LOG.info(
+                f"[Analytics Cache] {endpoint}: {stats['hits']} hits, "
+                f"{stats['misses']} misses, hit rate {stats['hit_rate']:.2%}"
+            )
+        if reset and self.store:
+            try:
+                self.store.reset_lookup_counts()
+            except Exception as e:
+                LOG.error(f"[Analytics Cache] Error resetting lookup counts: {str(e)}")
+
+    def _get_key(
+        self, endpoint: str, org_id: str, team_id: str, params: Dict[str, Any]
+    ) -> Optional[str]:
+        try:
+            versions = self.store.get_versions(
+                [get_org_namespace(org_id), get_team_namespace(team_id)]
+            )
+        except Exception as e:
+            LOG.error(f"[Analytics Cache] Error reading data versions: {str(e)}")
+            return None
+
+        fingerprint = json.dumps(
+            dict(
+                endpoint=endpoint,
+                team_id=str(team_id),
+                params=_canonicalize(params),
+                versions=versions,
+            ),
+            sort_keys=True,
+            separators=(",", ":"),
+        )
+        return hashlib.sha256(fingerprint.encode()).hexdigest()
+
+    def _record(self, endpoint: str, hit: bool):
+        try:
+            self.store.record_lookup(endpoint, hit)
+        except Exception as e:
+            LOG.error(f"[Analytics Cache] Error recording lookup: {str(e)}")
+
+    def _get_from_store(self, key: str) -> Optional[bytes]:
+        try:
+            return self.store.get(key)
+        except Exception as e:
+            LOG.error(f"[Analytics Cache] Error reading cached response: {str(e)}")
+            return None
+
+    def _save(self, key: str, value: Any):
+        try:
+            self.store.set(key, json.dumps(value, separators=(",", ":")).encode())
+        except Exception as e:
+            LOG.error(f"[Analytics Cache] Error saving cached response: {str(e)}")
+
+    def _bump_version(self, namespace: str):
+        if not self.store:
+            return
+        try:
+            self.store.bump_version(namespace)
+        except Exception as e:
+            LOG.error(f"[Analytics Cache] Error bumping {namespace} version: {str(e)}")
+
+
+def _canonicalize(value: Any) -> Any:
+    """
+    Turns request params into plain JSON values, equal for equivalent filters
+    whatever their key or list order.
+    """
+    if is_dataclass(value):
+        value = asdict(value)
+    if isinstance(value, dict):
+        return {
+            str(key): _canonicalize(item)
+            for key, item in value.items()
+            if item is not None
+        }
+    if isinstance(value, (list, tuple, set)):
+        items = [_canonicalize(item) for item in value]
+        return sorted(items, key=lambda item: json.dumps(item, sort_keys=True))
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _decode(value: Any) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+_analytics_cache = None
+
+
+def get_analytics_cache() -> AnalyticsCache:
+    """
+    Process wide analytics cache, backed by the store configured in
+    ANALYTICS_CACHE_STORE ("memory" or "redis"). Caching is off when no store is
+    configured.
+    """
+    global _analytics_cache
+    if _analytics_cache:
+        return _analytics_cache
+
+    store: Optional[AnalyticsCacheStore] = None
+    if ANALYTICS_CACHE_STORE == "memory":
+        store = MemoryAnalyticsCacheStore(
+            AnalyticsCacheVersionRepoService(),
+            ANALYTICS_CACHE_MAX_ENTRIES,
+            timedelta(seconds=ANALYTICS_CACHE_TTL_SECONDS),
+        )
+    elif ANALYTICS_CACHE_STORE == "redis":
+        store = RedisAnalyticsCacheStore(
+            get_redis_lock_service().redis,
+            timedelta(seconds=ANALYTICS_CACHE_TTL_SECONDS),
+        )
+
+    _analytics_cache = AnalyticsCache(store)
+    return _analytics_cache
@@ -252,6 +252,10 @@ class BookmarkService:
 
         for bookmark in merge_to_deploy_broker_bookmarks:
             bookmark.bookmark = bookmark_timestamp.isoformat()
+            # Runs swept again from here get their deployment prs persisted
+            mapped_from = bookmark.deployment_prs_mapped_from_date
+            if mapped_from and bookmark_timestamp < mapped_from:
+                bookmark.deployment_prs_mapped_from = bookmark_timestamp.isoformat()
             bookmark.updated_at = time_now()
 
         self._code_repo_service.update_merge_to_deploy_broker_bookmarks(
@@ -1,3 +1,8 @@
-from .sync import sync_code_repos
+from .sync import (
+    get_code_repos_to_sync,
+    get_code_sync_concurrency,
+    sync_code_repo,
+    sync_code_repos,
+)
 from .integration import get_code_integration_service
 from .pr_filter import apply_pr_filter
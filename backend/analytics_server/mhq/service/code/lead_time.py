@@ -1,9 +1,14 @@
+from collections import defaultdict
+from dataclasses import replace
 from typing import Dict, List
 from datetime import datetime
+
+import pytz
+
 from mhq.service.code.models.lead_time import LeadTimeMetrics
 from mhq.store.models.code.repository import TeamRepos
 
-from mhq.store.models.code import PRFilter, PullRequest
+from mhq.store.models.code import PRFilter, PullRequest, PullRequestLeadTimeRollup
 from mhq.store.repos.code import CodeRepoService
 from mhq.store.models.core import Team
 
@@ -16,8 +21,17 @@ from mhq.utils.time import (
     Interval,
     fill_missing_week_buckets,
     generate_expanded_buckets,
+    split_interval_on_whole_weeks,
 )
 
+LEAD_TIME_ROLLUP_FIELDS = [
+    "first_commit_to_open",
+    "first_response_time",
+    "rework_time",
+    "merge_time",
+    "merge_to_deploy",
+]
+
 
 class LeadTimeService:
     def __init__(
@@ -50,9 +64,11 @@ class LeadTimeService:
 
         team_repos = self._code_repo_service.get_active_team_repos_by_team_id(team.id)
 
-        lead_time_metrics: List[LeadTimeMetrics] = list(
-            set(self._get_team_repos_lead_time_metrics(team_repos, interval, pr_filter))
+        lead_time_metrics: List[LeadTimeMetrics] = (
+            self._get_team_repos_lead_time_metrics(team_repos, interval, pr_filter)
         )
+        if not self._can_use_lead_time_rollups(pr_filter):
+            lead_time_metrics = list(set(lead_time_metrics))
 
         weekly_lead_time_metrics_map: Dict[datetime, List[LeadTimeMetrics]] = (
             generate_expanded_buckets(
@@ -122,6 +138,16 @@ class LeadTimeService:
             team_repos
         )
 
+        if self._can_use_lead_time_rollups(pr_filter):
+            return (
+                self._get_lead_time_rollup_metrics_for_repos_using_workflow_deployments(
+                    team_repos_using_workflow_deployments, interval, pr_filter
+                )
+                + self._get_lead_time_rollup_metrics_for_repos_using_pr_deployments(
+                    team_repos_using_pr_deployments, interval, pr_filter
+                )
+            )
+
         lead_time_metrics_using_workflow = (
             self._get_lead_time_metrics_for_repos_using_workflow_deployments(
                 team_repos_using_workflow_deployments, interval, pr_filter
@@ -169,6 +195,119 @@ class LeadTimeService:
 
         return pr_lead_time_metrics
 
+    def _can_use_lead_time_rollups(self, pr_filter: PRFilter = None) -> bool:
+        return not pr_filter or pr_filter.can_use_rollups
+
+    def _get_lead_time_rollup_metrics_for_repos_using_workflow_deployments(
+        self,
+        team_repos: List[TeamRepos],
+        interval: Interval,
+        pr_filter: PRFilter = None,
+    ) -> List[LeadTimeMetrics]:
+
+        team_repos_with_workflow_deployments_configured: List[TeamRepos] = (
+            self._deployments_service.get_filtered_team_repos_with_workflow_configured_deployments(
+                team_repos
+            )
+        )
+
+        repo_ids = [
+            tr.org_repo_id for tr in team_repos_with_workflow_deployments_configured
+        ]
+
+        return self._get_lead_time_rollup_metrics(
+            repo_ids, interval, pr_filter, has_non_null_mtd=True
+        )
+
+    def _get_lead_time_rollup_metrics_for_repos_using_pr_deployments(
+        self,
+        team_repos: List[TeamRepos],
+        interval: Interval,
+        pr_filter: PRFilter = None,
+    ) -> List[LeadTimeMetrics]:
+        repo_ids = [tr.org_repo_id for tr in team_repos]
+
+        lead_time_metrics = self._get_lead_time_rollup_metrics(
+            repo_ids, interval, pr_filter
+        )
+
+        for lead_time_metric in lead_time_metrics:
+            lead_time_metric.merge_to_deploy = 0
+
+        return lead_time_metrics
+
+    def _get_lead_time_rollup_metrics(
+        self,
+        repo_ids: List[str],
+        interval: Interval,
+        pr_filter: PRFilter = None,
+        has_non_null_mtd=False,
+    ) -> List[LeadTimeMetrics]:
+        """
+        Weekly lead time metrics, with the week start as merged_at. Whole weeks are
+        read from the rollups, the partial weeks at the interval ends are summed up
+        from their prs.
+        """
+        if not repo_ids:
+            return []
+
+        weeks_interval, partial_intervals = split_interval_on_whole_weeks(interval)
+
+        rollups: List[PullRequestLeadTimeRollup] = []
+        excluded_rollups: List[PullRequestLeadTimeRollup] = []
+        if weeks_interval:
+            rollups += self._code_repo_service.get_lead_time_rollups(
+                repo_ids, weeks_interval, pr_filter, has_non_null_mtd
+            )
+            if pr_filter and pr_filter.excluded_pr_ids:
+                excluded_rollups = self._code_repo_service.get_lead_time_rollups_for_prs_merged_in_interval(
+                    repo_ids,
+                    weeks_interval,
+                    replace(pr_filter, excluded_pr_ids=None),
+                    has_non_null_mtd,
+                    pr_ids=pr_filter.excluded_pr_ids,
+                )
+
+        for partial_interval in partial_intervals:
+            rollups += self._code_repo_service.get_lead_time_rollups_for_prs_merged_in_interval(
+                repo_ids, partial_interval, pr_filter, has_non_null_mtd
+            )
+
+        return self._get_lead_time_metrics_from_rollups(rollups, excluded_rollups)
+
+    def _get_lead_time_metrics_from_rollups(
+        self,
+        rollups: List[PullRequestLeadTimeRollup],
+        excluded_rollups: List[PullRequestLeadTimeRollup],
+    ) -> List[LeadTimeMetrics]:
+        week_start_to_totals_map: Dict[datetime, Dict[str, int]] = defaultdict(
+            lambda: defaultdict(int)
+        )
+        for rollup, sign in [(rollup, 1) for rollup in rollups] + [
+            (rollup, -1) for rollup in excluded_rollups
+        ]:
+            totals = week_start_to_totals_map[rollup.week_start.astimezone(pytz.UTC)]
+            for field in ["pr_count"] + LEAD_TIME_ROLLUP_FIELDS:
+                totals[field] += sign * (getattr(rollup, field) or 0)
+
+        lead_time_metrics = []
+        for week_start, totals in week_start_to_totals_map.items():
+            pr_count = totals["pr_count"]
+            if pr_count <= 0:
+                continue
+            lead_time_metrics.append(
+                LeadTimeMetrics(
+                    **{
+                        field: totals[field] / pr_count
+                        for field in LEAD_TIME_ROLLUP_FIELDS
+                    },
+                    pr_count=pr_count,
+                    merged_at=week_start,
+                )
+            )
+
+        return lead_time_metrics
+
     def _get_lead_time_prs_for_repos_using_workflow_deployments(
         self,
         team_repos: List[TeamRepos],
@@ -9,6 +9,7 @@ from mhq.service.code.models.org_repo import RawTeamOrgRepo
 from mhq.store.models.code import OrgRepo
 from mhq.store.models.core import Team
 from mhq.store.repos.code import CodeRepoService, TeamRepos
+from mhq.service.analytics_cache import get_analytics_cache
 
 
 class RepositoryService:
@@ -46,6 +47,8 @@ class RepositoryService:
         self._update_team_repos(team, updated_repos, raw_org_repos)
         self.set_unused_repos_as_inactive(team.org_id)
         self._update_team_incident_services(team, updated_repos)
+        # Org repos are shared by the org's teams
+        get_analytics_cache().invalidate_org(str(team.org_id))
 
         return updated_repos
 
@@ -182,7 +185,11 @@ class RepositoryService:
                 f"Team Repo Mappings does not exist for team: {str(team.id)} and repos {team_repos_mappings_not_in_db}"
             )
 
-        return self._code_repo_service.patch_team_repos_mapping(team, team_repos)
+        patched_team_repos = self._code_repo_service.patch_team_repos_mapping(
+            team, team_repos
+        )
+        get_analytics_cache().invalidate_team(str(team.id))
+        return patched_team_repos
 
     def _update_team_incident_services(self, team: Team, org_repos: List[OrgRepo]):
 
@@ -1 +1,6 @@
-from .etl_handler import sync_code_repos
+from .etl_handler import (
+    get_code_repos_to_sync,
+    get_code_sync_concurrency,
+    sync_code_repo,
+    sync_code_repos,
+)
@@ -1,8 +1,13 @@
+import math
 from datetime import timedelta
-from typing import List
+from typing import List, Optional
 
 from mhq.store.models.code.enums import PullRequestEventType
 from mhq.service.code.sync.models import PRPerformance
+from mhq.service.code.sync.pr_metrics_batch import (
+    PRMetricsColumns,
+    compute_pr_metrics,
+)
 from mhq.store.models.code import (
     PullRequest,
     PullRequestEvent,
@@ -58,6 +63,56 @@ class CodeETLAnalyticsService:
 
         return pr
 
+    def create_pr_metrics_batch(
+        self,
+        prs: List[PullRequest],
+        prs_events: List[List[PullRequestEvent]],
+        prs_commits: List[List[PullRequestCommit]],
+    ) -> List[PullRequest]:
+        """
+        Same as create_pr_metrics for a page of PRs, with the events and commits of
+        prs[i] at prs_events[i] and prs_commits[i]. Metrics of all the PRs are
+        computed in one vectorised pass.
+        """
+        indexes = [
+            index for index, pr in enumerate(prs) if pr.state != PullRequestState.OPEN
+        ]
+        if not indexes:
+            return prs
+
+        columns = PRMetricsColumns.from_models(
+            [prs[index] for index in indexes],
+            [prs_events[index] for index in indexes],
+            [prs_commits[index] for index in indexes],
+        )
+        metrics = compute_pr_metrics(columns)
+
+        reviewers: List[List[str]] = [[] for _ in indexes]
+        for row, actor in zip(
+            metrics.reviewer_pr.tolist(), metrics.reviewer_actor.tolist()
+        ):
+            reviewers[row].append(columns.actors[actor])
+
+        for row, index in enumerate(indexes):
+            pr = prs[index]
+            pr.first_response_time = self._get_metric(metrics.first_response_time[row])
+            pr.rework_time = self._get_metric(metrics.rework_time[row])
+            pr.merge_time = self._get_metric(metrics.merge_time[row])
+            pr.cycle_time = self._get_metric(metrics.cycle_time[row])
+            pr.reviewers = reviewers[row]
+            if metrics.has_commits[row]:
+                pr.rework_cycles = int(metrics.rework_cycles[row])
+                pr.first_commit_to_open = float(metrics.first_commit_to_open[row])
+
+        return prs
+
+    @staticmethod
+    def _get_metric(value: float) -> Optional[float]:
+        # -1 is the unset marker of get_pr_performance, a real -1s delta included
+        if math.isnan(value) or value == -1:
+            return None
+        return float(value)
+
     @staticmethod
     def get_pr_performance(pr: PullRequest, pr_events: [PullRequestEvent]):
 
@@ -1,8 +1,15 @@
+from os import getenv
+
 from mhq.service.code.sync.etl_gitlab_handler import get_gitlab_etl_handler
 from mhq.service.code.sync.etl_github_handler import get_github_etl_handler
+from mhq.service.code.sync.etl_github_graphql_handler import (
+    get_github_graphql_etl_handler,
+)
 from mhq.service.code.sync.etl_provider_handler import CodeProviderETLHandler
 from mhq.store.models.code import CodeProvider
 
+GITHUB_GRAPHQL_INGESTION_ENGINE = "graphql"
+
 
 class CodeETLFactory:
     def __init__(self, org_id: str):
@@ -10,6 +17,11 @@ class CodeETLFactory:
 
     def __call__(self, provider: str) -> CodeProviderETLHandler:
         if provider == CodeProvider.GITHUB.value:
+            if (
+                getenv("GITHUB_PR_INGESTION_ENGINE", "").lower()
+                == GITHUB_GRAPHQL_INGESTION_ENGINE
+            ):
+                return get_github_graphql_etl_handler(self.org_id)
             return get_github_etl_handler(self.org_id)
 
         if provider == CodeProvider.GITLAB.value:
@@ -0,0 +1,156 @@
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import pytz
+
+from mhq.exapi.github import GithubApiService
+from mhq.exapi.github_graphql import GithubGraphQLApiService
+from mhq.exapi.models.github_graphql import GithubGraphQLPullRequest
+from mhq.service.code.sync.etl_code_analytics import CodeETLAnalyticsService
+from mhq.service.code.sync.etl_github_handler import (
+    PR_PROCESSING_CHUNK_SIZE,
+    GithubETLHandler,
+)
+from mhq.service.code.sync.pr_chunks import chunk_prs_by_updated_at
+from mhq.service.code.sync.pr_preload import ExistingPRsPreload
+from mhq.service.code.sync.revert_prs_github_sync import (
+    RevertPRsGitHubSyncHandler,
+    get_revert_prs_github_sync_handler,
+)
+from mhq.store.models import UserIdentityProvider
+from mhq.store.models.code import (
+    OrgRepo,
+    PullRequest,
+    PullRequestCommit,
+    PullRequestEvent,
+    PullRequestEventType,
+    PullRequestState,
+)
+from mhq.store.repos.code import CodeRepoService
+from mhq.store.repos.core import CoreRepoService
+from mhq.utils.github import get_custom_github_domain
+from mhq.utils.log import LOG
+
+
+class GithubGraphQLETLHandler(GithubETLHandler):
+    """
+    GitHub ETL handler which ingests pull requests over the GraphQL api.
+
+    Pull requests, reviews, ready for review events and commits of a batch of pull
+    requests come from a single query, instead of a timeline and commits call per
+    pull request. Repo metadata and PAT validation still use the REST api.
+    Only review and ready for review events are ingested, which are the events used
+    for pull request metrics.
+    """
+
+    def __init__(
+        self,
+        org_id: str,
+        github_api_service: GithubApiService,
+        github_graphql_api_service: GithubGraphQLApiService,
+        code_repo_service: CodeRepoService,
+        code_etl_analytics_service: CodeETLAnalyticsService,
+        github_revert_pr_sync_handler: RevertPRsGitHubSyncHandler,
+    ):
+        super().__init__(
+            org_id,
+            github_api_service,
+            code_repo_service,
+            code_etl_analytics_service,
+            github_revert_pr_sync_handler,
+        )
+        self._graphql_api: GithubGraphQLApiService = github_graphql_api_service
+
+    def get_repo_pull_requests_data_chunks(
+        self, org_repo: OrgRepo, bookmark: datetime
+    ) -> Iterator[
+        Tuple[List[PullRequest], List[PullRequestCommit], List[PullRequestEvent]]
+    ]:
+        """
+        This method yields pull requests, their Commits and Events of a repo in chunks of ascending updated_at.
+        :param org_repo: OrgRepo object to get pull requests for
+        :param bookmark: Bookmark date to get all pull requests after this date
+        :return: Iterator of pull requests, their commits and events
+        """
+        prs_to_process: Dict[int, GithubGraphQLPullRequest] = {}
+        cursor: Optional[str] = None
+        while True:
+            prs, cursor = self._graphql_api.get_pull_requests_page(
+                org_repo.org_name, org_repo.name, cursor
+            )
+            for pr in prs:
+                if pr.updated_at.replace(tzinfo=pytz.UTC) <= bookmark:
+                    continue
+                state_changed_at = pr.merged_at if pr.merged_at else pr.closed_at
+                if (
+                    pr.state.upper() != PullRequestState.OPEN.value
+                    and state_changed_at.replace(tzinfo=pytz.UTC) < bookmark
+                ):
+                    continue
+                prs_to_process.setdefault(pr.number, pr)
+
+            if (
+                not prs
+                or not cursor
+                or prs[-1].updated_at.replace(tzinfo=pytz.UTC) <= bookmark
+            ):
+                break
+
+        if not prs_to_process:
+            LOG.info(f"[GitHub Sync] No pull requests to process in {org_repo.name}")
+            return
+
+        for prs_chunk in chunk_prs_by_updated_at(
+            list(prs_to_process.values()), PR_PROCESSING_CHUNK_SIZE
+        ):
+            yield self._process_prs_chunk(str(org_repo.id), prs_chunk)
+
+    def process_pr(
+        self,
+        repo_id: str,
+        pr: GithubGraphQLPullRequest,
+        existing_prs: ExistingPRsPreload,
+    ) -> Tuple[PullRequest, List[PullRequestEvent], List[PullRequestCommit]]:
+        pr_model: Optional[PullRequest] = existing_prs.get_pr_model(pr.number)
+        pr_event_model_list: List[PullRequestEvent] = existing_prs.get_pr_events(
+            pr_model
+        )
+        pr_commits_model_list: List[PullRequestCommit] = []
+
+        reviews = [
+            review
+            for review in pr.timeline_events
+            if (review.type == PullRequestEventType.REVIEW)
+        ]
+        pr_model: PullRequest = self._to_pr_model(pr, pr_model, repo_id, len(reviews))
+        pr_events_model_list: List[PullRequestEvent] = self._to_pr_events(
+            pr.timeline_events, pr_model, pr_event_model_list
+        )
+        if pr.merged_at:
+            pr_commits_model_list = self._to_pr_commits(pr.commit_dicts, pr_model)
+
+        return pr_model, pr_events_model_list, pr_commits_model_list
+
+
+def get_github_graphql_etl_handler(org_id: str) -> GithubGraphQLETLHandler:
+    def _get_access_token():
+        core_repo_service = CoreRepoService()
+        access_token = core_repo_service.get_access_token(
+            org_id, UserIdentityProvider.GITHUB
+        )
+        if not access_token:
+            LOG.error(
+                f"Access token not found for org {org_id} and provider {UserIdentityProvider.GITHUB.value}"
+            )
+        return access_token
+
+    access_token = _get_access_token()
+    custom_domain = get_custom_github_domain(org_id)
+    return GithubGraphQLETLHandler(
+        org_id,
+        GithubApiService(access_token, custom_domain),
+        GithubGraphQLApiService(access_token, custom_domain),
+        CodeRepoService(),
+        CodeETLAnalyticsService(),
+        get_revert_prs_github_sync_handler(),
+    )
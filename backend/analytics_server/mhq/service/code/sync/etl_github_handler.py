@@ -1,6 +1,6 @@
 import uuid
 from datetime import datetime
-from typing import List, Dict, Optional, Tuple, Set
+from typing import List, Dict, Iterator, Optional, Set, Tuple, Union
 
 import pytz
 from mhq.utils.github import get_custom_github_domain
@@ -11,8 +11,14 @@ from github.Repository import Repository as GithubRepository
 from mhq.exapi.github import GithubApiService
 from mhq.service.code.sync.etl_code_analytics import CodeETLAnalyticsService
 from mhq.service.code.sync.etl_provider_handler import CodeProviderETLHandler
+from mhq.service.code.sync.pr_chunks import chunk_sorted_prs_by_updated_at
+from mhq.service.code.sync.pr_preload import (
+    ExistingPRsPreload,
+    preload_existing_prs,
+)
 from mhq.service.code.sync.revert_prs_github_sync import (
     RevertPRsGitHubSyncHandler,
+    get_github_reverted_pr_number,
     get_revert_prs_github_sync_handler,
 )
 from mhq.exapi.models.github_timeline import GithubPullRequestTimelineEvents
@@ -89,14 +95,19 @@ class GithubETLHandler(CodeProviderETLHandler):
             if repo_idempotency_key_org_repo_map.get(str(github_repo.id))
         ]
 
-    def get_repo_pull_requests_data(
+    def get_repo_pull_requests_data_chunks(
         self, org_repo: OrgRepo, bookmark: datetime
-    ) -> Tuple[List[PullRequest], List[PullRequestCommit], List[PullRequestEvent]]:
+    ) -> Iterator[
+        Tuple[List[PullRequest], List[PullRequestCommit], List[PullRequestEvent]]
+    ]:
         """
-        This method returns all pull requests, their Commits and Events of a repo.
+        This method yields pull requests, their Commits and Events of a repo in chunks of ascending updated_at.
+        The PR listing is read newest first up to the bookmark, keeping only the numbers of the PRs to process.
+        Its pages are then read again oldest first and processed as they arrive, timeline events and commits
+        are fetched per chunk.
         :param org_repo: OrgRepo object to get pull requests for
         :param bookmark: Bookmark date to get all pull requests after this date
-        :return: Pull requests, their commits and events
+        :return: Iterator of pull requests, their commits and events
         """
         github_repo: GithubRepository = self._api.get_repo(
             org_repo.org_name, org_repo.name
@@ -104,7 +115,34 @@ class GithubETLHandler(CodeProviderETLHandler):
         github_pull_requests: GithubPaginatedList = self._api.get_pull_requests(
             github_repo
         )
-        prs_to_process = []
+        pr_number_to_updated_at, last_page = self._get_prs_to_process(
+            github_pull_requests, bookmark
+        )
+        if not pr_number_to_updated_at:
+            LOG.info(f"[GitHub Sync] No pull requests to process in {org_repo.name}")
+            return
+
+        for prs_chunk in chunk_sorted_prs_by_updated_at(
+            self._get_prs_oldest_first(
+                github_repo,
+                github_pull_requests,
+                bookmark,
+                pr_number_to_updated_at,
+                last_page,
+            ),
+            PR_PROCESSING_CHUNK_SIZE,
+        ):
+            yield self._process_prs_chunk(str(org_repo.id), prs_chunk)
+
+    def _get_prs_to_process(
+        self, github_pull_requests: GithubPaginatedList, bookmark: datetime
+    ) -> Tuple[Dict[int, datetime], int]:
+        """
+        Reads the PR listing newest first up to the bookmark.
+        :return: updated_at of the PRs to process by their number, and the last page read
+        """
+        pr_number_to_updated_at: Dict[int, datetime] = {}
+        last_page = 0
         for page in range(
             0, github_pull_requests.totalCount // PR_PROCESSING_CHUNK_SIZE + 1, 1
         ):
@@ -112,60 +150,125 @@ class GithubETLHandler(CodeProviderETLHandler):
             if not prs:
                 break
 
-            if prs[-1].updated_at.replace(tzinfo=pytz.UTC) <= bookmark:
-                prs_to_process += [
-                    pr
-                    for pr in prs
-                    if pr.updated_at.replace(tzinfo=pytz.UTC) > bookmark
-                ]
+            last_page = page
+            for pr in prs:
+                if self._is_pr_to_process(pr, bookmark):
+                    # PRs updated while listing show up again on a later page, keep the newest
+                    pr_number_to_updated_at.setdefault(pr.number, _get_updated_at(pr))
+
+            if _get_updated_at(prs[-1]) <= bookmark:
                 break
 
-            prs_to_process += prs
+        return pr_number_to_updated_at, last_page
 
-        filtered_prs: List = []
-        for pr in prs_to_process:
-            state_changed_at = pr.merged_at if pr.merged_at else pr.closed_at
-            if (
-                pr.state.upper() != PullRequestState.OPEN.value
-                and state_changed_at.replace(tzinfo=pytz.UTC) < bookmark
+    def _get_prs_oldest_first(
+        self,
+        github_repo: GithubRepository,
+        github_pull_requests: GithubPaginatedList,
+        bookmark: datetime,
+        pr_number_to_updated_at: Dict[int, datetime],
+        last_page: int,
+    ) -> Iterator[GithubPullRequest]:
+        """
+        Yields the PRs to process in ascending updated_at, reading the listing pages
+        oldest first. PRs updated since the listing move to its first page, which
+        shifts older PRs into pages already read. Those are fetched one by one once
+        a page newer than them comes up, PRs updated in the meantime are left to
+        the first page.
+        """
+        unseen_prs = sorted(
+            (updated_at, number)
+            for number, updated_at in pr_number_to_updated_at.items()
+        )
+        seen_pr_numbers: Set[int] = set()
+        unseen_index = 0
+
+        def _get_shifted_prs(before: datetime) -> List[GithubPullRequest]:
+            nonlocal unseen_index
+            shifted_prs: List[GithubPullRequest] = []
+            while (
+                unseen_index < len(unseen_prs) and unseen_prs[unseen_index][0] < before
             ):
+                updated_at, number = unseen_prs[unseen_index]
+                unseen_index += 1
+                if number in seen_pr_numbers:
+                    continue
+                pr = self._api.get_pull_request(github_repo, number)
+                if _get_updated_at(pr) == updated_at:
+                    seen_pr_numbers.add(number)
+                    shifted_prs.append(pr)
+            return shifted_prs
+
+        for page in range(last_page, -1, -1):
+            prs = [
+                pr
+                for pr in reversed(github_pull_requests.get_page(page))
+                if pr.number not in seen_pr_numbers
+                and self._is_pr_to_process(pr, bookmark)
+            ]
+            if not prs:
                 continue
-            if pr not in filtered_prs:
-                filtered_prs.append(pr)
 
-        filtered_prs = filtered_prs[::-1]
+            yield from _get_shifted_prs(_get_updated_at(prs[0]))
+            for pr in prs:
+                seen_pr_numbers.add(pr.number)
+                yield pr
 
-        if not filtered_prs:
-            print("Nothing to process 🎉")
-            return [], [], []
+        # PRs the pages missed, eg. updated again after the first page was read
+        missed_prs = [
+            self._api.get_pull_request(github_repo, number)
+            for _, number in unseen_prs
+            if number not in seen_pr_numbers
+        ]
+        yield from sorted(missed_prs, key=_get_updated_at)
 
+    @staticmethod
+    def _is_pr_to_process(pr: GithubPullRequest, bookmark: datetime) -> bool:
+        if _get_updated_at(pr) <= bookmark:
+            return False
+        state_changed_at = pr.merged_at if pr.merged_at else pr.closed_at
+        return (
+            pr.state.upper() == PullRequestState.OPEN.value
+            or state_changed_at.replace(tzinfo=pytz.UTC) >= bookmark
+        )
+
+    def _process_prs_chunk(
+        self, repo_id: str, prs_chunk: List[GithubPullRequest]
+    ) -> Tuple[List[PullRequest], List[PullRequestCommit], List[PullRequestEvent]]:
         pull_requests: List[PullRequest] = []
         pr_commits: List[PullRequestCommit] = []
         pr_events: List[PullRequestEvent] = []
-        prs_added: Set[int] = set()
-
-        for github_pr in filtered_prs:
-            if github_pr.number in prs_added:
-                continue
 
+        existing_prs = preload_existing_prs(
+            self.code_repo_service,
+            repo_id,
+            [github_pr.number for github_pr in prs_chunk],
+        )
+        prs_events: List[List[PullRequestEvent]] = []
+        prs_commits: List[List[PullRequestCommit]] = []
+        for github_pr in prs_chunk:
             pr_model, event_models, pr_commit_models = self.process_pr(
-                str(org_repo.id), github_pr
+                repo_id, github_pr, existing_prs
             )
             pull_requests.append(pr_model)
+            prs_events.append(event_models)
+            prs_commits.append(pr_commit_models)
             pr_events += event_models
             pr_commits += pr_commit_models
-            prs_added.add(github_pr.number)
 
+        pull_requests = self.code_etl_analytics_service.create_pr_metrics_batch(
+            pull_requests,
+            [self._github_bot_filter(event_models) for event_models in prs_events],
+            prs_commits,
+        )
         return pull_requests, pr_commits, pr_events
 
     def process_pr(
-        self, repo_id: str, pr: GithubPullRequest
+        self, repo_id: str, pr: GithubPullRequest, existing_prs: ExistingPRsPreload
     ) -> Tuple[PullRequest, List[PullRequestEvent], List[PullRequestCommit]]:
-        pr_model: Optional[PullRequest] = self.code_repo_service.get_repo_pr_by_number(
-            repo_id, pr.number
-        )
-        pr_event_model_list: List[PullRequestEvent] = (
-            self.code_repo_service.get_pr_events(pr_model)
+        pr_model: Optional[PullRequest] = existing_prs.get_pr_model(pr.number)
+        pr_event_model_list: List[PullRequestEvent] = existing_prs.get_pr_events(
+            pr_model
         )
         pr_commits_model_list: List = []
 
@@ -190,11 +293,6 @@ class GithubETLHandler(CodeProviderETLHandler):
             pr_commits_model_list: List[PullRequestCommit] = self._to_pr_commits(
                 commits, pr_model
             )
-        non_bot_pr_events_model_list = self._github_bot_filter(pr_events_model_list)
-        pr_model = self.code_etl_analytics_service.create_pr_metrics(
-            pr_model, non_bot_pr_events_model_list, pr_commits_model_list
-        )
-
         return pr_model, pr_events_model_list, pr_commits_model_list
 
     def get_revert_prs_mapping(
@@ -267,6 +365,7 @@ class GithubETLHandler(CodeProviderETLHandler):
             ),
             provider=UserIdentityProvider.GITHUB.value,
             merge_commit_sha=merge_commit_sha,
+            reverted_pr_ref=get_github_reverted_pr_number(pr.head.ref),
         )
 
     @staticmethod
@@ -295,17 +394,41 @@ class GithubETLHandler(CodeProviderETLHandler):
     ) -> List[PullRequestEvent]:
         pr_events: List[PullRequestEvent] = []
         pr_event_id_map = {event.idempotency_key: event.id for event in pr_events_model}
+        # The REST timeline keys ready for review events by their event id, the
+        # GraphQL api by their node id. Stored ready for review events keyed by the
+        # other api are matched on creation time, and keep their key.
+        timeline_event_ids = {str(event.id) for event in timeline_events}
+        unmatched_ready_for_review_events_map: Dict[
+            Tuple[str, datetime], PullRequestEvent
+        ] = {
+            _get_pr_event_match_key(event.type, event.created_at): event
+            for event in pr_events_model
+            if _is_ready_for_review_event(event.type)
+            and event.idempotency_key not in timeline_event_ids
+            and event.created_at
+        }
 
         for event in timeline_events:
             username = event.user
+            idempotency_key = str(event.id)
+            if (
+                _is_ready_for_review_event(event.type)
+                and idempotency_key not in pr_event_id_map
+                and event.timestamp
+            ):
+                stored_event = unmatched_ready_for_review_events_map.pop(
+                    _get_pr_event_match_key(event.type, event.timestamp), None
+                )
+                if stored_event:
+                    idempotency_key = stored_event.idempotency_key
             pr_events.append(
                 PullRequestEvent(
-                    id=pr_event_id_map.get(str(event.id), uuid.uuid4()),
+                    id=pr_event_id_map.get(idempotency_key, uuid.uuid4()),
                     pull_request_id=str(pr_model.id),
                     type=event.type.value,
                     data=event.raw_data,
                     created_at=event.timestamp,
-                    idempotency_key=str(event.id),
+                    idempotency_key=idempotency_key,
                     org_repo_id=pr_model.repo_id,
                     actor_username=username,
                 )
@@ -370,6 +493,29 @@ class GithubETLHandler(CodeProviderETLHandler):
         return filtered_events
 
 
+def _get_updated_at(pr: GithubPullRequest) -> datetime:
+    return pr.updated_at.replace(tzinfo=pytz.UTC)
+
+
+def _is_ready_for_review_event(event_type: Union[PullRequestEventType, str]) -> bool:
+    return (
+        _get_event_type_value(event_type) == PullRequestEventType.READY_FOR_REVIEW.value
+    )
+
+
+def _get_pr_event_match_key(
+    event_type: Union[PullRequestEventType, str], created_at: datetime
+) -> Tuple[str, datetime]:
+    return _get_event_type_value(event_type), created_at.astimezone(pytz.UTC)
+
+
+def _get_event_type_value(event_type: Union[PullRequestEventType, str]) -> str:
+    # Events read back from the db carry the enum, new ones carry its value
+    if isinstance(event_type, PullRequestEventType):
+        return event_type.value
+    return event_type
+
+
 def get_github_etl_handler(org_id: str) -> GithubETLHandler:
     def _get_access_token():
         core_repo_service = CoreRepoService()
@@ -1,10 +1,11 @@
 import asyncio
 from datetime import datetime
-from typing import List, Dict, Optional, Tuple, Set, Any
+from typing import List, Dict, Iterator, Optional, Tuple, Any
 from uuid import uuid4
 from mhq.utils.diffparser import parse_gitlab_diffs
 from mhq.exapi.models.gitlab import (
     GitlabCommit,
+    GitlabMergeRequestDetails,
     GitlabNote,
     GitlabNoteType,
     GitlabPR,
@@ -15,11 +16,17 @@ from mhq.store.models.code.enums import PullRequestEventState
 from mhq.utils.string import uuid4_str
 from mhq.service.code.sync.revert_pr_gitlab_sync import (
     RevertPRsGitlabSyncHandler,
+    get_gitlab_reverted_merge_commit_hash,
     get_revert_prs_gitlab_sync_handler,
 )
 from mhq.exapi.gitlab import GitlabApiService
 from mhq.service.code.sync.etl_code_analytics import CodeETLAnalyticsService
 from mhq.service.code.sync.etl_provider_handler import CodeProviderETLHandler
+from mhq.service.code.sync.pr_chunks import chunk_sorted_prs_by_updated_at
+from mhq.service.code.sync.pr_preload import (
+    ExistingPRsPreload,
+    preload_existing_prs,
+)
 from mhq.store.models import UserIdentityProvider
 from mhq.store.models.code import (
     OrgRepo,
@@ -122,62 +129,142 @@ class GitlabETLHandler(CodeProviderETLHandler):
         )
         return org_repo
 
-    def get_repo_pull_requests_data(
+    def get_repo_pull_requests_data_chunks(
         self, org_repo: OrgRepo, bookmark: datetime
-    ) -> Tuple[List[PullRequest], List[PullRequestCommit], List[PullRequestEvent]]:
+    ) -> Iterator[
+        Tuple[List[PullRequest], List[PullRequestCommit], List[PullRequestEvent]]
+    ]:
         """
-        This method returns all pull requests, their Commits and Events of a repo.
+        This method yields pull requests, their Commits and Events of a repo in chunks of ascending updated_at.
         :param org_repo: OrgRepo object to get pull requests for
         :param bookmark: Bookmark date to get all pull requests after this date
-        :return: Pull requests, their commits and events
+        :return: Iterator of pull requests, their commits and events
         """
         gitlab_repo: GitlabRepo = self._api.get_project(org_repo.idempotency_key)
-        prs_to_process: List[Dict] = asyncio.run(
-            self._api.get_project_merge_requests(gitlab_repo.idempotency_key, bookmark)
+        pr_number_to_updated_at: Dict[str, datetime] = asyncio.run(
+            self._get_merge_requests_to_process(gitlab_repo.idempotency_key, bookmark)
         )
-        filtered_prs: List[Dict] = []
-        for pr in prs_to_process:
-            if pr not in filtered_prs:
-                filtered_prs.append(pr)
 
-        filtered_prs = filtered_prs[::-1]
-        if not filtered_prs:
-            print("Nothing to process 🎉")
-            return [], [], []
+        if not pr_number_to_updated_at:
+            LOG.info(f"[GitLab Sync] No merge requests to process in {org_repo.name}")
+            return
+
+        for prs_chunk in chunk_sorted_prs_by_updated_at(
+            self._get_merge_requests_oldest_first(
+                gitlab_repo.idempotency_key, pr_number_to_updated_at
+            ),
+            PR_PROCESSING_CHUNK_SIZE,
+        ):
+            yield self._process_prs_chunk(
+                str(org_repo.id), str(org_repo.idempotency_key), prs_chunk
+            )
 
+    async def _get_merge_requests_to_process(
+        self, project_id: str, bookmark: datetime
+    ) -> Dict[str, datetime]:
+        """
+        Reads the merge request listing, keeping only the updated_at of each merge request.
+        :return: updated_at of the merge requests to process by their internal id
+        """
+        pr_number_to_updated_at: Dict[str, datetime] = {}
+        async for page_merge_requests in self._api.iter_project_merge_requests(
+            project_id, bookmark
+        ):
+            for merge_request in page_merge_requests:
+                gitlab_pr = GitlabPR(merge_request)
+                # Pages arrive out of order, keep the latest updated_at of a repeated MR
+                updated_at = pr_number_to_updated_at.get(gitlab_pr.number)
+                if not updated_at or updated_at < gitlab_pr.updated_at:
+                    pr_number_to_updated_at[gitlab_pr.number] = gitlab_pr.updated_at
+        return pr_number_to_updated_at
+
+    def _get_merge_requests_oldest_first(
+        self, project_id: str, pr_number_to_updated_at: Dict[str, datetime]
+    ) -> Iterator[GitlabPR]:
+        """
+        Yields the merge requests in ascending updated_at, fetching them by internal id
+        a chunk at a time. Merge requests updated since the listing are held back and
+        yielded last, so the bookmark never moves past merge requests still to come.
+        """
+        pr_numbers = sorted(
+            pr_number_to_updated_at,
+            key=lambda number: (pr_number_to_updated_at[number], number),
+        )
+        updated_prs: List[GitlabPR] = []
+        for index in range(0, len(pr_numbers), PR_PROCESSING_CHUNK_SIZE):
+            gitlab_prs = sorted(
+                map(
+                    GitlabPR,
+                    self._api.get_project_merge_requests_by_internal_ids(
+                        project_id, pr_numbers[index : index + PR_PROCESSING_CHUNK_SIZE]
+                    ),
+                ),
+                key=lambda gitlab_pr: (gitlab_pr.updated_at, gitlab_pr.number),
+            )
+            for gitlab_pr in gitlab_prs:
+                if gitlab_pr.updated_at == pr_number_to_updated_at[gitlab_pr.number]:
+                    yield gitlab_pr
+                else:
+                    updated_prs.append(gitlab_pr)
+
+        yield from sorted(updated_prs, key=lambda gitlab_pr: gitlab_pr.updated_at)
+
+    def _process_prs_chunk(
+        self, repo_id: str, repo_idempotency_key: str, prs_chunk: List[GitlabPR]
+    ) -> Tuple[List[PullRequest], List[PullRequestCommit], List[PullRequestEvent]]:
         pull_requests: List[PullRequest] = []
         pr_commits: List[PullRequestCommit] = []
         pr_events: List[PullRequestEvent] = []
-        prs_added: Set[int] = set()
-
-        for gitlab_pr in filtered_prs:
-            gitlab_pr = GitlabPR(gitlab_pr)
-            if gitlab_pr.number in prs_added:
-                continue
 
+        existing_prs = preload_existing_prs(
+            self.code_repo_service,
+            repo_id,
+            [gitlab_pr.number for gitlab_pr in prs_chunk],
+        )
+        merge_requests_details: Dict[str, GitlabMergeRequestDetails] = asyncio.run(
+            self._api.get_merge_requests_details(
+                repo_idempotency_key,
+                [str(gitlab_pr.number) for gitlab_pr in prs_chunk],
+                {
+                    str(gitlab_pr.number)
+                    for gitlab_pr in prs_chunk
+                    if self.process_pr_state(gitlab_pr) == PullRequestState.MERGED
+                },
+            )
+        )
+        prs_events: List[List[PullRequestEvent]] = []
+        prs_commits: List[List[PullRequestCommit]] = []
+        for gitlab_pr in prs_chunk:
             pr_model, event_models, pr_commit_models = self.process_pr(
-                str(org_repo.id), str(org_repo.idempotency_key), gitlab_pr
+                repo_id,
+                gitlab_pr,
+                existing_prs,
+                merge_requests_details[str(gitlab_pr.number)],
             )
             pull_requests.append(pr_model)
+            prs_events.append(event_models)
+            prs_commits.append(pr_commit_models)
             pr_events += event_models
             pr_commits += pr_commit_models
-            prs_added.add(gitlab_pr.number)
 
+        pull_requests = self.code_etl_analytics_service.create_pr_metrics_batch(
+            pull_requests, prs_events, prs_commits
+        )
         return pull_requests, pr_commits, pr_events
 
     def process_pr(
-        self, repo_id: str, repo_idempotency_key: str, pr: GitlabPR
+        self,
+        repo_id: str,
+        pr: GitlabPR,
+        existing_prs: ExistingPRsPreload,
+        merge_request_details: GitlabMergeRequestDetails,
     ) -> Tuple[PullRequest, List[PullRequestEvent], List[PullRequestCommit]]:
-        pr_model: Optional[PullRequest] = self.code_repo_service.get_repo_pr_by_number(
-            repo_id, pr.number
-        )
-        pr_event_model_list: List[PullRequestEvent] = (
-            self.code_repo_service.get_pr_events(pr_model)
+        pr_model: Optional[PullRequest] = existing_prs.get_pr_model(pr.number)
+        pr_event_model_list: List[PullRequestEvent] = existing_prs.get_pr_events(
+            pr_model
         )
         pr_commits_model_list: List = []
-        reviews: List[GitlabNote] = self._api.get_merge_request_notes(
-            repo_idempotency_key, pr.number
-        )
+        reviews: List[GitlabNote] = merge_request_details.notes
 
         pr_model: PullRequest = GitlabETLHandler._to_pr_model(pr, pr_model, repo_id)
         pr_events_models: List[PullRequestEvent] = GitlabETLHandler._to_pr_events(
@@ -185,15 +272,12 @@ class GitlabETLHandler(CodeProviderETLHandler):
         )
 
         if pr_model.state == PullRequestState.MERGED:
-            commits = self._api.get_merge_request_commits(
-                repo_idempotency_key, pr.number
-            )
             pr_commits_model_list: List[PullRequestCommit] = self._to_pr_commits(
-                commits, pr_model
+                merge_request_details.commits, pr_model
             )
 
             additions, deletions, files_changed = self.process_pr_code_stats(
-                repo_idempotency_key, pr_model
+                merge_request_details.diffs
             )
             commits_count = len(pr_commits_model_list)
 
@@ -208,20 +292,11 @@ class GitlabETLHandler(CodeProviderETLHandler):
                 "user_profile": dict(username=pr_model.author),
             }
 
-        pr_model = self.code_etl_analytics_service.create_pr_metrics(
-            pr_model, pr_events_models, pr_commits_model_list
-        )
-
         return pr_model, pr_events_models, pr_commits_model_list
 
-    def process_pr_code_stats(
-        self,
-        repo_idempotency_key: str,
-        pr_model: PullRequest,
-    ) -> Tuple[int, int, int]:
-        pr_number = pr_model.number
-        response = self._api.get_merge_request_diff(repo_idempotency_key, pr_number)
-        diffs = list(map(lambda x: x.get("diff"), response))
+    @staticmethod
+    def process_pr_code_stats(merge_request_diffs: List[Dict]) -> Tuple[int, int, int]:
+        diffs = list(map(lambda x: x.get("diff"), merge_request_diffs))
 
         additions, deletions, files_changed = parse_gitlab_diffs(diffs)
         return additions, deletions, files_changed
@@ -270,6 +345,7 @@ class GitlabETLHandler(CodeProviderETLHandler):
             reviewers=pr.reviewers,
             provider=UserIdentityProvider.GITLAB.value,
             merge_commit_sha=pr.merge_commit_sha,
+            reverted_pr_ref=get_gitlab_reverted_merge_commit_hash(pr.head_branch),
         )
 
     @staticmethod
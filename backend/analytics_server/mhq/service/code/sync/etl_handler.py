@@ -1,5 +1,7 @@
+import threading
 from datetime import datetime
-from typing import List
+from os import getenv
+from typing import Callable, List, Optional, Set, Tuple
 
 import pytz
 
@@ -21,9 +23,12 @@ from mhq.service.merge_to_deploy_broker import (
     get_merge_to_deploy_broker_utils_service,
     MergeToDeployBrokerUtils,
 )
-from mhq.store.models.code import OrgRepo, PullRequest
+from mhq.store.models.code import OrgRepo, PullRequest, PullRequestState
 from mhq.store.repos.code import CodeRepoService
+from mhq.store.repos.incidents import IncidentsRepoService
+from mhq.utils.concurrency import run_in_app_context_pool
 from mhq.utils.log import LOG
+from mhq.utils.time import get_given_weeks_monday, get_start_of_day
 from mhq.service.settings.models import DefaultSyncDaysSetting
 from mhq.service.bookmark import BookmarkService, BookmarkType, get_bookmark_service
 
@@ -32,30 +37,101 @@ class CodeETLHandler:
     def __init__(
         self,
         code_repo_service: CodeRepoService,
+        incidents_repo_service: IncidentsRepoService,
         etl_service: CodeProviderETLHandler,
         mtd_broker: MergeToDeployBrokerUtils,
         bookmark_service: BookmarkService,
         settings_service: SettingsService,
+        etl_service_factory: Optional[Callable[[], CodeProviderETLHandler]] = None,
+        max_workers: int = 1,
     ):
         self.code_repo_service = code_repo_service
+        self.incidents_repo_service = incidents_repo_service
         self.etl_service = etl_service
         self.mtd_broker = mtd_broker
         self.bookmark_service = bookmark_service
         self.settings_service = settings_service
+        self.etl_service_factory = etl_service_factory
+        self.max_workers = max_workers if etl_service_factory else 1
+        self._worker_state = threading.local()
+        # The creating thread keeps using etl_service, pool threads build their own
+        self._worker_state.etl_service = etl_service
 
-    def sync_org_repos(self, org_id: str, provider: CodeProvider):
+    def get_org_repos_to_sync(
+        self, org_id: str, provider: CodeProvider
+    ) -> List[OrgRepo]:
+        """
+        Refreshes the org's active repos of the provider from the provider api.
+        Returns no repos if the provider's PAT is invalid.
+        """
         if not self.etl_service.check_pat_validity():
             LOG.error("Invalid PAT for code provider")
-            return
-        org_repos: List[OrgRepo] = self._sync_org_repos(org_id, provider)
-        for org_repo in org_repos:
-            try:
-                self._sync_repo_pull_requests_data(org_repo)
-            except Exception as e:
-                LOG.error(
-                    f"Error syncing pull requests for repo {org_repo.name}: {str(e)}"
-                )
-                continue
+            return []
+        return self._sync_org_repos(org_id, provider)
+
+    def sync_repo(self, repo_id: str) -> None:
+        org_repo: Optional[OrgRepo] = self.code_repo_service.get_repo_by_id(repo_id)
+        if not org_repo:
+            raise Exception(f"Repo {repo_id} not found")
+        self._sync_repo_pull_requests_data(org_repo)
+
+    def sync_repos(self, org_id: str, repo_ids: List[str]) -> None:
+        """
+        Syncs the repos over a pool of up to max_workers threads. A failing repo
+        does not stop the others, the failures are raised once every repo is done.
+        """
+        # Settings are created lazily, resolve them once before fanning out so
+        # concurrent workers never race to create the same default setting.
+        self._get_default_sync_days(org_id)
+        failed_repo_ids = [
+            repo_id
+            for repo_id, synced in zip(
+                repo_ids,
+                run_in_app_context_pool(
+                    self._sync_repo_pull_requests_data_in_worker,
+                    repo_ids,
+                    self.max_workers,
+                ),
+            )
+            if not synced
+        ]
+        if failed_repo_ids:
+            raise Exception(f"Error syncing repos {', '.join(failed_repo_ids)}")
+
+    def _sync_repo_pull_requests_data_in_worker(self, repo_id: str) -> bool:
+        """
+        Syncs a single repo from a pool worker. ORM objects and provider api
+        clients are not shared across threads, so the repo is reloaded in the
+        worker's own session and each worker thread owns its own etl service.
+        """
+        org_repo: Optional[OrgRepo] = None
+        try:
+            org_repo = self.code_repo_service.get_repo_by_id(repo_id)
+            if not org_repo:
+                raise Exception(f"Repo {repo_id} not found")
+            self._sync_repo_pull_requests_data(org_repo, self._get_worker_etl_service())
+            return True
+        except Exception as e:
+            repo_name = org_repo.name if org_repo else repo_id
+            LOG.error(f"Error syncing pull requests for repo {repo_name}: {str(e)}")
+            return False
+
+    def _get_worker_etl_service(self) -> CodeProviderETLHandler:
+        etl_service = getattr(self._worker_state, "etl_service", None)
+        if not etl_service:
+            etl_service = self.etl_service_factory()
+            self._worker_state.etl_service = etl_service
+        return etl_service
+
+    def _get_default_sync_days(self, org_id: str) -> int:
+        default_sync_days_setting: DefaultSyncDaysSetting = (
+            self.settings_service.get_or_set_default_settings(
+                setting_type=SettingType.DEFAULT_SYNC_DAYS_SETTING,
+                entity_type=EntityType.ORG,
+                entity_id=org_id,
+            ).specific_settings
+        )
+        return default_sync_days_setting.default_sync_days
 
     def _sync_org_repos(self, org_id: str, provider: CodeProvider) -> List[OrgRepo]:
         try:
@@ -69,84 +145,157 @@ class CodeETLHandler:
             LOG.error(f"Error syncing org repos for org {org_id}: {str(e)}")
             raise e
 
-    def _sync_repo_pull_requests_data(self, org_repo: OrgRepo) -> None:
+    def _sync_repo_pull_requests_data(
+        self,
+        org_repo: OrgRepo,
+        etl_service: Optional[CodeProviderETLHandler] = None,
+    ) -> None:
+        etl_service = etl_service or self.etl_service
+        merge_days: Set[datetime] = set()
         try:
-            default_sync_days_setting: DefaultSyncDaysSetting = (
-                self.settings_service.get_or_set_default_settings(
-                    setting_type=SettingType.DEFAULT_SYNC_DAYS_SETTING,
-                    entity_type=EntityType.ORG,
-                    entity_id=str(org_repo.org_id),
-                ).specific_settings
-            )
-
-            default_sync_days = default_sync_days_setting.default_sync_days
+            default_sync_days = self._get_default_sync_days(str(org_repo.org_id))
             bookmark: datetime = self.bookmark_service.get_bookmark(
                 str(org_repo.id),
                 BookmarkType.ORG_REPO_BOOKMARK,
                 org_repo.provider,
                 default_sync_days,
             )
-            (
+            has_synced_prs = False
+            for (
                 pull_requests,
                 pull_request_commits,
                 pull_request_events,
-            ) = self.etl_service.get_repo_pull_requests_data(org_repo, bookmark)
-            self.code_repo_service.save_pull_requests_data(
-                pull_requests, pull_request_commits, pull_request_events
-            )
-            if not pull_requests:
+            ) in etl_service.get_repo_pull_requests_data_chunks(org_repo, bookmark):
+                if not pull_requests:
+                    continue
+
+                has_synced_prs = True
+                self.code_repo_service.save_pull_requests_data(
+                    pull_requests, pull_request_commits, pull_request_events
+                )
+                merge_days.update(_get_merge_days(pull_requests))
+                # Chunks come in ascending updated_at, a crash resumes after the last saved chunk
+                bookmark = max(pr.updated_at for pr in pull_requests).astimezone(
+                    tz=pytz.UTC
+                )
                 self.bookmark_service.update_bookmark(
                     str(org_repo.id),
                     BookmarkType.ORG_REPO_BOOKMARK,
                     org_repo.provider,
                     bookmark,
                 )
-                return
+                self.mtd_broker.pushback_merge_to_deploy_bookmark(
+                    org_repo, pull_requests
+                )
+                self.__sync_revert_prs_mapping(org_repo, pull_requests, etl_service)
 
-            pull_requests.sort(key=lambda x: x.updated_at)
-            bookmark = pull_requests[-1].updated_at.astimezone(tz=pytz.UTC)
-            self.bookmark_service.update_bookmark(
-                str(org_repo.id),
-                BookmarkType.ORG_REPO_BOOKMARK,
-                org_repo.provider,
-                bookmark,
-            )
-            self.mtd_broker.pushback_merge_to_deploy_bookmark(org_repo, pull_requests)
-            self.__sync_revert_prs_mapping(org_repo, pull_requests)
+            if not has_synced_prs:
+                self.bookmark_service.update_bookmark(
+                    str(org_repo.id),
+                    BookmarkType.ORG_REPO_BOOKMARK,
+                    org_repo.provider,
+                    bookmark,
+                )
         except Exception as e:
             LOG.error(f"Error syncing pull requests for repo {org_repo.name}: {str(e)}")
             raise e
+        finally:
+            # Saved chunks are behind the bookmark, a retry would not refresh them
+            self._refresh_repo_rollups(org_repo, merge_days)
+
+    def _refresh_repo_rollups(self, org_repo: OrgRepo, merge_days: Set[datetime]):
+        """
+        Refreshes the rollups of the days and weeks the synced prs were merged in,
+        once per repo sync instead of in every chunk's transaction.
+        """
+        if not merge_days:
+            return
+
+        repo_id = str(org_repo.id)
+        self.code_repo_service.refresh_repo_lead_time_rollups(
+            repo_id, {get_given_weeks_monday(day) for day in merge_days}
+        )
+        self.code_repo_service.refresh_repo_deployment_rollups(repo_id, merge_days)
+        # Merged PRs are deployments of teams deploying on merge
+        self.incidents_repo_service.save_team_incident_rollups_stale_for_repo(
+            repo_id, min(merge_days)
+        )
 
     def __sync_revert_prs_mapping(
-        self, org_repo: OrgRepo, prs: List[PullRequest]
+        self,
+        org_repo: OrgRepo,
+        prs: List[PullRequest],
+        etl_service: CodeProviderETLHandler,
     ) -> None:
         try:
-            revert_prs_mapping = self.etl_service.get_revert_prs_mapping(prs)
+            revert_prs_mapping = etl_service.get_revert_prs_mapping(prs)
             self.code_repo_service.save_revert_pr_mappings(revert_prs_mapping)
         except Exception as e:
             LOG.error(f"Error syncing revert PRs for repo {org_repo.name}: {str(e)}")
             raise e
 
 
-def sync_code_repos(org_id: str):
+def _get_merge_days(prs: List[PullRequest]) -> Set[datetime]:
+    return {
+        get_start_of_day(pr.state_changed_at.astimezone(tz=pytz.UTC))
+        for pr in prs
+        if pr.state == PullRequestState.MERGED and pr.state_changed_at
+    }
+
+
+def get_code_sync_concurrency(provider: str) -> int:
+    """
+    Number of repos synced in parallel by a single sync task of a provider, read
+    from <PROVIDER>_SYNC_CONCURRENCY (eg. GITHUB_SYNC_CONCURRENCY). Defaults to one
+    sync task per repo. Every worker holds a db connection, so keep this below the
+    db pool size.
+    """
+    concurrency = getenv(f"{provider.upper()}_SYNC_CONCURRENCY")
+    return max(int(concurrency), 1) if concurrency else 1
+
+
+def _get_code_etl_handler(
+    org_id: str, provider: str, etl_factory: Optional[CodeETLFactory] = None
+) -> CodeETLHandler:
+    etl_factory = etl_factory or CodeETLFactory(org_id)
+    return CodeETLHandler(
+        CodeRepoService(),
+        IncidentsRepoService(),
+        etl_factory(provider),
+        get_merge_to_deploy_broker_utils_service(),
+        get_bookmark_service(),
+        get_settings_service(),
+        etl_service_factory=lambda: etl_factory(provider),
+        max_workers=get_code_sync_concurrency(provider),
+    )
+
+
+def get_code_repos_to_sync(org_id: str) -> List[Tuple[str, str]]:
+    """
+    Refreshes the org's repos of every code provider.
+
+    :return: (provider, repo id) of every repo whose pull requests need a sync
+    """
     code_providers: List[str] = get_code_integration_service().get_org_providers(org_id)
-    if not code_providers:
-        LOG.info(f"No code integrations found for org {org_id}")
-        return
     etl_factory = CodeETLFactory(org_id)
 
+    repos_to_sync: List[Tuple[str, str]] = []
     for provider in code_providers:
         try:
-            code_etl_handler = CodeETLHandler(
-                CodeRepoService(),
-                etl_factory(provider),
-                get_merge_to_deploy_broker_utils_service(),
-                get_bookmark_service(),
-                get_settings_service(),
+            code_etl_handler = _get_code_etl_handler(org_id, provider, etl_factory)
+            org_repos = code_etl_handler.get_org_repos_to_sync(
+                org_id, CodeProvider(provider)
             )
-            code_etl_handler.sync_org_repos(org_id, CodeProvider(provider))
-            LOG.info(f"Synced org repos for provider {provider}")
+            repos_to_sync.extend((provider, str(org_repo.id)) for org_repo in org_repos)
         except Exception as e:
             LOG.error(f"Error syncing org repos for provider {provider}: {str(e)}")
             continue
-    LOG.info(f"Synced all org repos for org {org_id}")
+    return repos_to_sync
+
+
+def sync_code_repo(org_id: str, provider: str, repo_id: str):
+    _get_code_etl_handler(org_id, provider).sync_repo(repo_id)
+
+
+def sync_code_repos(org_id: str, provider: str, repo_ids: List[str]):
+    _get_code_etl_handler(org_id, provider).sync_repos(org_id, repo_ids)
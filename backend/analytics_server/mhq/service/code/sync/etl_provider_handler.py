@@ -1,6 +1,6 @@
 from abc import ABC, abstractmethod
 from datetime import datetime
-from typing import List, Tuple
+from typing import Iterator, List, Tuple
 
 from mhq.store.models.code import (
     OrgRepo,
@@ -28,6 +28,20 @@ class CodeProviderETLHandler(ABC):
         """
 
     @abstractmethod
+    def get_repo_pull_requests_data_chunks(
+        self, org_repo: OrgRepo, bookmark: datetime
+    ) -> Iterator[
+        Tuple[List[PullRequest], List[PullRequestCommit], List[PullRequestEvent]]
+    ]:
+        """
+        This method yields the pull requests of a repo updated after the bookmark date, with their Commits and Events,
+        one chunk at a time. Chunks come in ascending updated_at order, so the bookmark can be moved to the last
+        pull request of a chunk once it is saved.
+        :param org_repo: OrgRepo object to get pull requests for
+        :param bookmark: Bookmark object to get all pull requests after this date
+        :return: Iterator of pull requests, their commits and events
+        """
+
     def get_repo_pull_requests_data(
         self, org_repo: OrgRepo, bookmark: datetime
     ) -> Tuple[List[PullRequest], List[PullRequestCommit], List[PullRequestEvent]]:
@@ -35,8 +49,21 @@ class CodeProviderETLHandler(ABC):
         This method returns all pull requests, their Commits and Events of a repo. After the bookmark date.
         :param org_repo: OrgRepo object to get pull requests for
         :param bookmark: Bookmark object to get all pull requests after this date
-        :return: Pull requests sorted by state_changed_at date, their commits and events
+        :return: Pull requests sorted by updated_at date, their commits and events
         """
+        pull_requests: List[PullRequest] = []
+        pr_commits: List[PullRequestCommit] = []
+        pr_events: List[PullRequestEvent] = []
+        for (
+            chunk_prs,
+            chunk_commits,
+            chunk_events,
+        ) in self.get_repo_pull_requests_data_chunks(org_repo, bookmark):
+            pull_requests += chunk_prs
+            pr_commits += chunk_commits
+            pr_events += chunk_events
+
+        return pull_requests, pr_commits, pr_events
 
     @abstractmethod
     def get_revert_prs_mapping(
@@ -0,0 +1,39 @@
+from datetime import datetime
+from typing import Callable, Iterable, Iterator, List, TypeVar
+
+T = TypeVar("T")
+
+
+def chunk_prs_by_updated_at(
+    prs: List[T],
+    chunk_size: int,
+    get_updated_at: Callable[[T], datetime] = lambda pr: pr.updated_at,
+) -> Iterator[List[T]]:
+    """
+    Yields the pull requests in ascending updated_at order, chunk_size at a time.
+    Pull requests sharing an updated_at are kept in one chunk, so a bookmark at the
+    last pull request of a committed chunk never skips pull requests of the next one.
+    """
+    return chunk_sorted_prs_by_updated_at(
+        sorted(prs, key=get_updated_at), chunk_size, get_updated_at
+    )
+
+
+def chunk_sorted_prs_by_updated_at(
+    prs: Iterable[T],
+    chunk_size: int,
+    get_updated_at: Callable[[T], datetime] = lambda pr: pr.updated_at,
+) -> Iterator[List[T]]:
+    """
+    Same as chunk_prs_by_updated_at, for pull requests which already arrive in
+    ascending updated_at order. Chunks are yielded as the pull requests stream in.
+    """
+    chunk: List[T] = []
+    for pr in prs:
+        if len(chunk) >= chunk_size and get_updated_at(pr) != get_updated_at(chunk[-1]):
+            yield chunk
+            chunk = []
+        chunk.append(pr)
+
+    if chunk:
+        yield chunk
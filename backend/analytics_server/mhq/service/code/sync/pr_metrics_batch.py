@@ -0,0 +1,325 @@
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from mhq.store.models.code import (
+    PullRequest,
+    PullRequestCommit,
+    PullRequestEvent,
+    PullRequestEventState,
+    PullRequestState,
+)
+from mhq.store.models.code.enums import PullRequestEventType
+from mhq.utils.string import is_bot_name
+
+EVENT_TYPE_OTHER = 0
+EVENT_TYPE_REVIEW = 1
+EVENT_TYPE_READY_FOR_REVIEW = 2
+
+_EVENT_TYPES = {
+    PullRequestEventType.REVIEW.value: EVENT_TYPE_REVIEW,
+    PullRequestEventType.READY_FOR_REVIEW.value: EVENT_TYPE_READY_FOR_REVIEW,
+}
+
+MICROSECONDS_PER_SECOND = 1_000_000
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_NAIVE_EPOCH = datetime(1970, 1, 1)
+_ONE_MICROSECOND = timedelta(microseconds=1)
+
+
+def _to_microseconds(dt: Optional[datetime]) -> int:
+    # Integer microseconds keep differences exact, like timedelta.total_seconds()
+    if dt is None:
+        return 0
+    return (dt - (_EPOCH if dt.tzinfo else _NAIVE_EPOCH)) // _ONE_MICROSECOND
+
+
+@dataclass
+class PRMetricsColumns:
+    """
+    Closed and merged PRs of a batch with their non bot events and commits, laid
+    out column wise. Times are microseconds since epoch, actors are indexes into
+    actors and events and commits point to their PR by its row index.
+    """
+
+    pr_created_at: np.ndarray
+    pr_state_changed_at: np.ndarray
+    pr_is_merged: np.ndarray
+    pr_author: np.ndarray
+    event_pr: np.ndarray
+    event_created_at: np.ndarray
+    event_type: np.ndarray
+    event_is_approval: np.ndarray
+    event_actor: np.ndarray
+    commit_pr: np.ndarray
+    commit_created_at: np.ndarray
+    actors: List[str]
+
+    @property
+    def pr_count(self) -> int:
+        return len(self.pr_created_at)
+
+    @classmethod
+    def from_models(
+        cls,
+        prs: List[PullRequest],
+        prs_events: List[List[PullRequestEvent]],
+        prs_commits: List[List[PullRequestCommit]],
+    ) -> "PRMetricsColumns":
+        actor_ids: Dict[str, int] = {}
+        is_bot: Dict[str, bool] = {}
+
+        def get_actor_id(username: str) -> int:
+            return actor_ids.setdefault(username, len(actor_ids))
+
+        event_rows, commit_rows = [], []
+        for pr_index, (pr_events, pr_commits) in enumerate(
+            zip(prs_events, prs_commits)
+        ):
+            for event in pr_events:
+                username = event.actor_username
+                if username is None:
+                    continue
+                if username not in is_bot:
+                    is_bot[username] = is_bot_name(username)
+                if is_bot[username]:
+                    continue
+
+                event_type = _EVENT_TYPES.get(event.type, EVENT_TYPE_OTHER)
+                event_rows.append(
+                    (
+                        pr_index,
+                        _to_microseconds(event.created_at),
+                        event_type,
+                        event_type == EVENT_TYPE_REVIEW
+                        and event.data.get("state")
+                        == PullRequestEventState.APPROVED.value,
+                        get_actor_id(username),
+                    )
+                )
+            commit_rows.extend(
+                (pr_index, _to_microseconds(commit.created_at)) for commit in pr_commits
+            )
+
+        event_columns = list(zip(*event_rows)) or [()] * 5
+        commit_columns = list(zip(*commit_rows)) or [()] * 2
+        return cls(
+            pr_created_at=np.array(
+                [_to_microseconds(pr.created_at) for pr in prs], dtype=np.int64
+            ),
+            pr_state_changed_at=np.array(
+                [_to_microseconds(pr.state_changed_at) for pr in prs], dtype=np.int64
+            ),
+            pr_is_merged=np.array(
+                [pr.state == PullRequestState.MERGED for pr in prs], dtype=bool
+            ),
+            pr_author=np.array(
+                [get_actor_id(pr.author) if pr.author else -1 for pr in prs],
+                dtype=np.int64,
+            ),
+            event_pr=np.array(event_columns[0], dtype=np.int64),
+            event_created_at=np.array(event_columns[1], dtype=np.int64),
+            event_type=np.array(event_columns[2], dtype=np.int8),
+            event_is_approval=np.array(event_columns[3], dtype=bool),
+            event_actor=np.array(event_columns[4], dtype=np.int64),
+            commit_pr=np.array(commit_columns[0], dtype=np.int64),
+            commit_created_at=np.array(commit_columns[1], dtype=np.int64),
+            actors=list(actor_ids),
+        )
+
+
+@dataclass
+class PRMetricsBatch:
+    """
+    Metrics per PR row, in seconds. NaN marks a metric that does not apply.
+    rework_cycles and first_commit_to_open are only set for rows with commits.
+    Reviewers are (PR row, actor) pairs.
+    """
+
+    first_response_time: np.ndarray
+    rework_time: np.ndarray
+    merge_time: np.ndarray
+    cycle_time: np.ndarray
+    has_commits: np.ndarray
+    rework_cycles: np.ndarray
+    first_commit_to_open: np.ndarray
+    reviewer_pr: np.ndarray
+    reviewer_actor: np.ndarray
+
+
+def _get_first_positions(
+    pr_count: int, event_pr: np.ndarray, mask: np.ndarray
+) -> np.ndarray:
+    """
+    Position of every PR's first masked event, -1 for PRs without one.
+    Events have to be sorted by PR and then by time.
+    """
+    positions = np.flatnonzero(mask)
+    first_positions = np.full(pr_count, -1, dtype=np.int64)
+    prs, first_indexes = np.unique(event_pr[positions], return_index=True)
+    first_positions[prs] = positions[first_indexes]
+    return first_positions
+
+
+def _take(values: np.ndarray, positions: np.ndarray) -> np.ndarray:
+    # Rows at -1 pick an arbitrary value, callers mask them out
+    if not len(values):
+        return np.zeros(len(positions), dtype=values.dtype)
+    return values[positions]
+
+
+def _to_seconds(microseconds: np.ndarray) -> np.ndarray:
+    return microseconds / MICROSECONDS_PER_SECOND
+
+
+def compute_pr_metrics(columns: PRMetricsColumns) -> PRMetricsBatch:
+    """
+    Computes the metrics of CodeETLAnalyticsService.create_pr_metrics for every PR
+    of the batch at once. Events are sorted once by PR and time, the same stable
+    order the per PR computation sorts them in.
+    """
+    pr_count = columns.pr_count
+    order = np.lexsort((columns.event_created_at, columns.event_pr))
+    event_pr = columns.event_pr[order]
+    event_created_at = columns.event_created_at[order]
+    event_type = columns.event_type[order]
+    event_is_approval = columns.event_is_approval[order]
+    event_actor = columns.event_actor[order]
+
+    is_review = event_type == EVENT_TYPE_REVIEW
+    first_review = _get_first_positions(pr_count, event_pr, is_review)
+    first_approval = _get_first_positions(
+        pr_count, event_pr, is_review & event_is_approval
+    )
+    first_ready_for_review = _get_first_positions(
+        pr_count, event_pr, event_type == EVENT_TYPE_READY_FOR_REVIEW
+    )
+    has_review = first_review >= 0
+    has_approval = first_approval >= 0
+
+    review_at = _take(event_created_at, first_review)
+    approval_at = _take(event_created_at, first_approval)
+    ready_for_review_at = np.where(
+        first_ready_for_review >= 0,
+        _take(event_created_at, first_ready_for_review),
+        columns.pr_created_at,
+    )
+
+    first_response_time = np.where(
+        has_review, _to_seconds(review_at - ready_for_review_at), np.nan
+    )
+    rework_time = np.where(
+        has_approval,
+        np.where(
+            _take(event_is_approval, first_review),
+            0,
+            _to_seconds(approval_at - review_at),
+        ),
+        np.nan,
+    )
+    approval_to_merge = columns.pr_state_changed_at - approval_at
+    # Approvals after merging leave the merge time unset
+    merge_time = np.where(
+        columns.pr_is_merged & has_approval & (approval_to_merge >= 0),
+        _to_seconds(approval_to_merge),
+        np.nan,
+    )
+    cycle_time = np.where(
+        columns.pr_is_merged,
+        _to_seconds(columns.pr_state_changed_at - ready_for_review_at),
+        np.nan,
+    )
+
+    is_by_reviewer = event_actor != _take(columns.pr_author, event_pr)
+    actor_count = max(len(columns.actors), 1)
+    reviewer_pairs = np.unique(
+        event_pr[is_by_reviewer] * actor_count + event_actor[is_by_reviewer]
+    )
+
+    commit_count = np.bincount(columns.commit_pr, minlength=pr_count)
+    first_commit_at = np.full(pr_count, np.iinfo(np.int64).max, dtype=np.int64)
+    np.minimum.at(first_commit_at, columns.commit_pr, columns.commit_created_at)
+    has_commits = commit_count > 0
+
+    return PRMetricsBatch(
+        first_response_time=first_response_time,
+        rework_time=rework_time,
+        merge_time=merge_time,
+        cycle_time=cycle_time,
+        has_commits=has_commits,
+        rework_cycles=_get_rework_cycles(
+            columns,
+            event_pr,
+            event_created_at,
+            is_review & ~event_is_approval & is_by_reviewer,
+            first_approval,
+        ),
+        first_commit_to_open=np.where(
+            has_commits,
+            _to_seconds(columns.pr_created_at - first_commit_at),
+            np.nan,
+        ),
+        reviewer_pr=reviewer_pairs // actor_count,
+        reviewer_actor=reviewer_pairs % actor_count,
+    )
+
+
+def _get_rework_cycles(
+    columns: PRMetricsColumns,
+    event_pr: np.ndarray,
+    event_created_at: np.ndarray,
+    is_blocking_review: np.ndarray,
+    first_approval: np.ndarray,
+) -> np.ndarray:
+    """
+    Counts blocking review to commit transitions between the first blocking review
+    and the first approval of each PR. Reviews come after commits made at the same
+    time, as in CodeETLAnalyticsService.get_rework_cycles.
+    """
+    pr_count = columns.pr_count
+    first_blocking_review = _get_first_positions(pr_count, event_pr, is_blocking_review)
+    has_window = (
+        (first_blocking_review >= 0)
+        & (first_approval >= 0)
+        & (first_blocking_review < first_approval)
+    )
+    window_start = (
+        _take(event_created_at, first_blocking_review) - MICROSECONDS_PER_SECOND
+    )
+    window_end = _take(event_created_at, first_approval)
+
+    def in_window(pr_rows: np.ndarray, created_at: np.ndarray) -> np.ndarray:
+        return (
+            has_window[pr_rows]
+            & (created_at > window_start[pr_rows])
+            & (created_at < window_end[pr_rows])
+        )
+
+    commits_in_window = in_window(columns.commit_pr, columns.commit_created_at)
+    reviews_in_window = is_blocking_review & in_window(event_pr, event_created_at)
+
+    item_pr = np.concatenate(
+        (columns.commit_pr[commits_in_window], event_pr[reviews_in_window])
+    )
+    item_created_at = np.concatenate(
+        (
+            columns.commit_created_at[commits_in_window],
+            event_created_at[reviews_in_window],
+        )
+    )
+    item_is_review = np.concatenate(
+        (
+            np.zeros(np.count_nonzero(commits_in_window), dtype=bool),
+            np.ones(np.count_nonzero(reviews_in_window), dtype=bool),
+        )
+    )
+    order = np.lexsort((item_is_review, item_created_at, item_pr))
+    item_pr = item_pr[order]
+    item_is_review = item_is_review[order]
+
+    is_rework = (
+        item_is_review[:-1] & ~item_is_review[1:] & (item_pr[:-1] == item_pr[1:])
+    )
+    return np.bincount(item_pr[1:][is_rework], minlength=pr_count)
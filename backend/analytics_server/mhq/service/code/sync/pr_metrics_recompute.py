@@ -0,0 +1,275 @@
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from os import getenv
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from mhq.service.analytics_cache import AnalyticsCache, get_analytics_cache
+from mhq.service.code.sync.etl_code_analytics import CodeETLAnalyticsService
+from mhq.service.code.sync.etl_github_handler import GithubETLHandler
+from mhq.store.models.code import (
+    Bookmark,
+    CodeBookmarkType,
+    CodeProvider,
+    OrgRepo,
+    PullRequest,
+    PullRequestCommit,
+    PullRequestEvent,
+)
+from mhq.store.models.code.enums import PullRequestEventType
+from mhq.store.repos.code import CodeRepoService
+from mhq.utils.log import LOG
+
+PR_METRICS_RECOMPUTE_CHUNK_SIZE = int(getenv("PR_METRICS_RECOMPUTE_CHUNK_SIZE", 500))
+PR_METRICS_RECOMPUTE_PROCESSES = int(getenv("PR_METRICS_RECOMPUTE_PROCESSES", 4))
+
+METRIC_COLUMNS = [
+    "first_response_time",
+    "rework_time",
+    "merge_time",
+    "cycle_time",
+    "reviewers",
+    "rework_cycles",
+    "first_commit_to_open",
+]
+
+# Plain column values of a chunk, cheap to pickle over to the pool's processes
+PRMetricsChunk = Tuple[List[Dict], List[List[Dict]], List[List[Dict]]]
+
+
+@dataclass
+class PRMetricsRecomputeProgress:
+    repo_id: str
+    repo_name: str
+    total_prs: int
+    recomputed_prs: int = 0
+
+
+def compute_chunk_pr_metrics(chunk: PRMetricsChunk) -> List[Dict]:
+    """
+    Runs the ETL metrics over a chunk of stored prs and returns the metric columns
+    of every pr, keyed by its id.
+    """
+    pr_rows, prs_event_rows, prs_commit_rows = chunk
+    prs = CodeETLAnalyticsService().create_pr_metrics_batch(
+        [PullRequest(**row) for row in pr_rows],
+        [[PullRequestEvent(**row) for row in rows] for rows in prs_event_rows],
+        [[PullRequestCommit(**row) for row in rows] for rows in prs_commit_rows],
+    )
+    return [
+        dict(id=pr.id, **{column: getattr(pr, column) for column in METRIC_COLUMNS})
+        for pr in prs
+    ]
+
+
+class PRMetricsRecomputeService:
+    """
+    Recomputes the metric columns of stored prs from their stored events and
+    commits, without calling the code providers.
+
+    Prs of a repo are read in id order and chunks are computed across a process
+    pool. While a repo is in progress the id of the last written pr is kept as its
+    recompute bookmark, so an interrupted run picks up from there. The bookmark is
+    dropped once the repo is done, so the next run recomputes it in full. Cached
+    analytics of the repo's org are invalidated once a repo is done.
+    """
+
+    def __init__(
+        self,
+        code_repo_service: CodeRepoService,
+        chunk_size: int = PR_METRICS_RECOMPUTE_CHUNK_SIZE,
+        processes: int = PR_METRICS_RECOMPUTE_PROCESSES,
+        executor_factory: Callable[[int], Executor] = ProcessPoolExecutor,
+        analytics_cache: Optional[AnalyticsCache] = None,
+    ):
+        self.code_repo_service = code_repo_service
+        self.chunk_size = chunk_size
+        self.processes = processes
+        self._executor_factory = executor_factory
+        self._analytics_cache = analytics_cache
+
+    def recompute_repos(
+        self,
+        org_repos: List[OrgRepo],
+        restart: bool = False,
+        on_progress: Optional[Callable[[PRMetricsRecomputeProgress], None]] = None,
+    ) -> List[PRMetricsRecomputeProgress]:
+        """
+        :param org_repos: Repos to recompute the pr metrics of
+        :param restart: Drop the bookmarks of interrupted runs and start from the first pr
+        :param on_progress: Called after every written chunk
+        :return: Progress of every repo once done
+        """
+        on_progress = on_progress or _log_progress
+        if self.processes <= 1:
+            return [
+                self.recompute_repo(org_repo, None, restart, on_progress)
+                for org_repo in org_repos
+            ]
+
+        with self._executor_factory(self.processes) as executor:
+            return [
+                self.recompute_repo(org_repo, executor, restart, on_progress)
+                for org_repo in org_repos
+            ]
+
+    def recompute_repo(
+        self,
+        org_repo: OrgRepo,
+        executor: Optional[Executor],
+        restart: bool,
+        on_progress: Callable[[PRMetricsRecomputeProgress], None],
+    ) -> PRMetricsRecomputeProgress:
+        repo_id = str(org_repo.id)
+        if restart:
+            self.code_repo_service.delete_org_repo_bookmark(
+                repo_id, CodeBookmarkType.PR_METRICS_RECOMPUTE
+            )
+
+        bookmark = self.code_repo_service.get_org_repo_bookmark(
+            repo_id, CodeBookmarkType.PR_METRICS_RECOMPUTE
+        )
+        after_pr_id = bookmark.bookmark if bookmark else None
+        progress = PRMetricsRecomputeProgress(
+            repo_id=repo_id,
+            repo_name=org_repo.name,
+            total_prs=self.code_repo_service.get_repo_closed_prs_count_after_id(
+                repo_id, after_pr_id
+            ),
+        )
+
+        # Chunks are written in the order they were read, so the bookmark never
+        # moves past a chunk that is still being computed
+        pending: Deque[Tuple[str, Future]] = deque()
+        while True:
+            prs = self.code_repo_service.get_repo_closed_prs_after_id(
+                repo_id, after_pr_id, self.chunk_size
+            )
+            if not prs:
+                break
+
+            after_pr_id = str(prs[-1].id)
+            chunk = self._get_chunk(prs)
+            if executor:
+                pending.append(
+                    (after_pr_id, executor.submit(compute_chunk_pr_metrics, chunk))
+                )
+            else:
+                self._save_chunk(progress, after_pr_id, compute_chunk_pr_metrics(chunk))
+                on_progress(progress)
+
+            while len(pending) > self.processes:
+                self._save_pending_chunk(progress, pending, on_progress)
+
+        while pending:
+            self._save_pending_chunk(progress, pending, on_progress)
+
+        self.code_repo_service.delete_org_repo_bookmark(
+            repo_id, CodeBookmarkType.PR_METRICS_RECOMPUTE
+        )
+        if self._analytics_cache and progress.recomputed_prs:
+            self._analytics_cache.invalidate_org(str(org_repo.org_id))
+        return progress
+
+    def _save_pending_chunk(
+        self,
+        progress: PRMetricsRecomputeProgress,
+        pending: Deque[Tuple[str, Future]],
+        on_progress: Callable[[PRMetricsRecomputeProgress], None],
+    ):
+        last_pr_id, future = pending.popleft()
+        self._save_chunk(progress, last_pr_id, future.result())
+        on_progress(progress)
+
+    def _save_chunk(
+        self,
+        progress: PRMetricsRecomputeProgress,
+        last_pr_id: str,
+        prs_metrics: List[Dict],
+    ):
+        self.code_repo_service.update_pr_metrics(prs_metrics)
+        self.code_repo_service.update_org_repo_bookmark(
+            Bookmark(
+                repo_id=progress.repo_id,
+                type=CodeBookmarkType.PR_METRICS_RECOMPUTE.value,
+                bookmark=last_pr_id,
+            )
+        )
+        progress.recomputed_prs += len(prs_metrics)
+
+    def _get_chunk(self, prs: List[PullRequest]) -> PRMetricsChunk:
+        pr_ids = [str(pr.id) for pr in prs]
+        events_by_pr_id: Dict[str, List[PullRequestEvent]] = {
+            pr_id: [] for pr_id in pr_ids
+        }
+        for event in self.code_repo_service.get_pr_events_with_data_by_pr_ids(pr_ids):
+            events_by_pr_id[str(event.pull_request_id)].append(event)
+
+        commits_by_pr_id: Dict[str, List[PullRequestCommit]] = {
+            pr_id: [] for pr_id in pr_ids
+        }
+        for commit in self.code_repo_service.get_pr_commits_by_pr_ids(pr_ids):
+            commits_by_pr_id[str(commit.pull_request_id)].append(commit)
+
+        prs_event_rows, prs_commit_rows = [], []
+        for pr in prs:
+            pr_events = events_by_pr_id[str(pr.id)]
+            # Same event filtering the sync applies before computing the metrics
+            if pr.provider == CodeProvider.GITHUB.value:
+                pr_events = GithubETLHandler._github_bot_filter(pr_events)
+            prs_event_rows.append([_get_event_row(event) for event in pr_events])
+            prs_commit_rows.append(
+                [
+                    dict(hash=commit.hash, created_at=commit.created_at)
+                    for commit in commits_by_pr_id[str(pr.id)]
+                ]
+            )
+
+        return [_get_pr_row(pr) for pr in prs], prs_event_rows, prs_commit_rows
+
+
+def _get_pr_row(pr: PullRequest) -> Dict:
+    return dict(
+        id=pr.id,
+        author=pr.author,
+        state=pr.state,
+        created_at=pr.created_at,
+        state_changed_at=pr.state_changed_at,
+        requested_reviews=pr.requested_reviews or [],
+        reviewers=pr.reviewers or [],
+        rework_cycles=pr.rework_cycles,
+        first_commit_to_open=pr.first_commit_to_open,
+    )
+
+
+def _get_event_row(event: PullRequestEvent) -> Dict:
+    event_type = event.type
+    # Events read back from the db carry the enum, the sync builds them with values
+    if isinstance(event_type, PullRequestEventType):
+        event_type = event_type.value
+    return dict(
+        id=event.id,
+        type=event_type,
+        data=dict(state=(event.data or {}).get("state")),
+        created_at=event.created_at,
+        actor_username=event.actor_username,
+    )
+
+
+def _log_progress(progress: PRMetricsRecomputeProgress):
+    LOG.info(
+        f"[PR Metrics Recompute] {progress.repo_name}: "
+        f"{progress.recomputed_prs}/{progress.total_prs} prs recomputed"
+    )
+
+
+def get_pr_metrics_recompute_service(
+    chunk_size: int = PR_METRICS_RECOMPUTE_CHUNK_SIZE,
+    processes: int = PR_METRICS_RECOMPUTE_PROCESSES,
+) -> PRMetricsRecomputeService:
+    return PRMetricsRecomputeService(
+        CodeRepoService(),
+        chunk_size,
+        processes,
+        analytics_cache=get_analytics_cache(),
+    )
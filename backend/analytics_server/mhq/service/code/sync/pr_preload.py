@@ -0,0 +1,45 @@
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from mhq.store.models.code import PullRequest, PullRequestEvent
+from mhq.store.repos.code import CodeRepoService
+
+
+class ExistingPRsPreload:
+    """
+    Pull requests already stored for a batch of pull request numbers, with their
+    events. Loaded with two queries per batch so processing a pull request does
+    not need its own lookups.
+    """
+
+    def __init__(
+        self,
+        pr_models: List[PullRequest],
+        pr_event_models: List[PullRequestEvent],
+    ):
+        self._pr_model_by_number: Dict[str, PullRequest] = {
+            pr_model.number: pr_model for pr_model in pr_models
+        }
+        self._pr_events_by_pr_id: Dict[str, List[PullRequestEvent]] = defaultdict(list)
+        for pr_event in pr_event_models:
+            self._pr_events_by_pr_id[str(pr_event.pull_request_id)].append(pr_event)
+
+    def get_pr_model(self, pr_number) -> Optional[PullRequest]:
+        return self._pr_model_by_number.get(str(pr_number))
+
+    def get_pr_events(self, pr_model: Optional[PullRequest]) -> List[PullRequestEvent]:
+        if not pr_model:
+            return []
+        return self._pr_events_by_pr_id.get(str(pr_model.id), [])
+
+
+def preload_existing_prs(
+    code_repo_service: CodeRepoService, repo_id: str, pr_numbers: List
+) -> ExistingPRsPreload:
+    pr_models = code_repo_service.get_repo_prs_by_numbers(
+        repo_id, [str(pr_number) for pr_number in pr_numbers]
+    )
+    pr_event_models = code_repo_service.get_pr_events_by_pr_ids(
+        [str(pr_model.id) for pr_model in pr_models]
+    )
+    return ExistingPRsPreload(pr_models, pr_event_models)
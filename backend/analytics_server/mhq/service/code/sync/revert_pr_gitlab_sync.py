@@ -8,6 +8,26 @@ from mhq.store.models.code.enums import (
 from mhq.store.models.code.pull_requests import PullRequest, PullRequestRevertPRMapping
 from mhq.store.repos.code import CodeRepoService
 
+GITLAB_REVERT_BRANCH_PATTERN = re.compile(r"^revert-([a-fA-F0-9]{8})$")
+MERGE_COMMIT_SHA_PREFIX_LENGTH = 8
+
+
+def get_gitlab_reverted_merge_commit_hash(head_branch: Optional[str]) -> Optional[str]:
+    """
+    Function to match the regex pattern "revert-[merge_commit_hash]" and
+    return the lower cased merge_commit hash prefix for Gitlab, which is 8
+    characters long.
+    """
+    if not head_branch:
+        return None
+
+    matches = GITLAB_REVERT_BRANCH_PATTERN.findall(head_branch)
+
+    if matches:
+        return matches[-1].lower()
+    else:
+        return None
+
 
 class RevertPRsGitlabSyncHandler:
     def __init__(self, code_repo_service: CodeRepoService):
@@ -47,41 +67,43 @@ class RevertPRsGitlabSyncHandler:
         """
         This function takes a list of PRs and for each PR it tries to
         find if that pr has been reverted and by which PR. It is done
-        by taking repo_id and the merge commit hash and searching for
-        the string 'revert-[merge-commit-hash]' in the head branch.
+        by taking repo_id and the merge commit hash prefix and looking up
+        the PRs whose reverted_pr_ref, parsed from 'revert-[merge-commit-hash]'
+        head branches at ingest, is that prefix.
         """
 
         repo_ids: Set[str] = set()
         repo_id_to_pr_merge_hash_to_revert_pr_id_map: Dict[str, Dict[str, str]] = {}
-        pr_merge_hash_match_strings: List[str] = []
+        pr_merge_hashes: List[str] = []
 
         for pr in prs:
-            if pr.state != PullRequestState.MERGED:
+            if pr.state != PullRequestState.MERGED or not pr.merge_commit_sha:
                 continue
 
-            pr_merge_hash_match_strings.append(f"revert-{pr.merge_commit_sha[:8]}")
+            merge_commit_hash = self._get_merge_commit_sha_prefix(pr.merge_commit_sha)
+            pr_merge_hashes.append(merge_commit_hash)
             repo_ids.add(str(pr.repo_id))
 
             if str(pr.repo_id) not in repo_id_to_pr_merge_hash_to_revert_pr_id_map:
                 repo_id_to_pr_merge_hash_to_revert_pr_id_map[str(pr.repo_id)] = {}
 
             repo_id_to_pr_merge_hash_to_revert_pr_id_map[str(pr.repo_id)][
-                str(pr.merge_commit_sha[:8])
+                merge_commit_hash
             ] = pr.id
 
-        if len(pr_merge_hash_match_strings) == 0:
+        if len(pr_merge_hashes) == 0:
             return []
 
         revert_prs: List[PullRequest] = (
-            self.code_repo_service.get_prs_by_head_branch_match_strings(
-                list(repo_ids), pr_merge_hash_match_strings
+            self.code_repo_service.get_revert_prs_by_reverted_pr_refs(
+                list(repo_ids), pr_merge_hashes
             )
         )
 
         revert_pr_mappings: List[PullRequestRevertPRMapping] = []
 
         for rev_pr in revert_prs:
-            merge_commit_hash = self.get_revert_merge_commit_hash(rev_pr.head_branch)
+            merge_commit_hash = rev_pr.reverted_pr_ref
             if merge_commit_hash is None:
                 continue
 
@@ -154,7 +176,7 @@ class RevertPRsGitlabSyncHandler:
             if repo_key_exists is None:
                 continue
 
-            commit_hash = rev_pr.merge_commit_sha[:8]
+            commit_hash = self._get_merge_commit_sha_prefix(rev_pr.merge_commit_sha)
             original_pr_id = repo_id_to_pr_merge_hash_to_revert_pr_id_map[
                 str(rev_pr.repo_id)
             ].get(commit_hash)
@@ -173,19 +195,11 @@ class RevertPRsGitlabSyncHandler:
         return revert_pr_mappings
 
     def get_revert_merge_commit_hash(self, head_branch: str) -> Optional[str]:
-        """
-        Function to match the regex pattern "revert-pr-[merge_commit_hash]" and
-        return the merge_commit hash for Gitlab. The commit hash will be at least
-        8 characters and at most 40 characters long
-        """
-        pattern = r"^revert-([a-fA-F0-9]{8})$"
-
-        matches = re.findall(pattern, head_branch)
+        return get_gitlab_reverted_merge_commit_hash(head_branch)
 
-        if matches:
-            return matches[-1]
-        else:
-            return None
+    @staticmethod
+    def _get_merge_commit_sha_prefix(merge_commit_sha: str) -> str:
+        return merge_commit_sha[:MERGE_COMMIT_SHA_PREFIX_LENGTH].lower()
 
 
 def get_revert_prs_gitlab_sync_handler() -> RevertPRsGitlabSyncHandler:
@@ -1,5 +1,6 @@
 from typing import List, Optional
 from mhq.store.models.core.teams import Team
+from mhq.service.analytics_cache import get_analytics_cache
 from mhq.store.repos.core import CoreRepoService
 
 
@@ -11,7 +12,9 @@ class TeamService:
         return self._core_repo_service.get_team(team_id)
 
     def delete_team(self, team_id: str) -> Optional[Team]:
-        return self._core_repo_service.delete_team(team_id)
+        team = self._core_repo_service.delete_team(team_id)
+        get_analytics_cache().invalidate_team(team_id)
+        return team
 
     def create_team(self, org_id: str, name: str, member_ids: List[str] = None) -> Team:
         return self._core_repo_service.create_team(org_id, name, member_ids or [])
@@ -28,7 +31,9 @@ class TeamService:
         if member_ids is not None:
             team.member_ids = member_ids
 
-        return self._core_repo_service.update_team(team)
+        updated_team = self._core_repo_service.update_team(team)
+        get_analytics_cache().invalidate_team(team_id)
+        return updated_team
 
 
 def get_team_service():
@@ -1 +1,6 @@
+from .branch_graph import (
+    BranchFlowGraph,
+    BranchFlowGraphStore,
+    get_branch_flow_graph_store,
+)
 from .deployment_pr_mapper import DeploymentPRMapperService
@@ -1,12 +1,10 @@
 from collections import defaultdict
 from datetime import datetime
-from typing import List, Dict, Tuple
+from typing import List, Dict, Optional, Set, Tuple
 
-from mhq.utils.dict import (
-    get_average_of_dict_values,
-    get_key_to_count_map_from_key_to_list_map,
-)
+from mhq.utils.dict import get_average_of_dict_values
 
+from .branch_graph import BranchFlowGraphStore, get_branch_flow_graph_store
 from .deployment_service import DeploymentsService, get_deployments_service
 from mhq.store.models.code.filter import PRFilter
 from mhq.store.models.code.pull_requests import PullRequest
@@ -18,7 +16,11 @@ from mhq.service.deployments.models.models import (
 )
 
 from mhq.store.repos.code import CodeRepoService
-from mhq.utils.time import Interval, generate_expanded_buckets
+from mhq.utils.time import (
+    Interval,
+    generate_expanded_count_buckets,
+    get_start_of_day,
+)
 
 
 class DeploymentAnalyticsService:
@@ -26,9 +28,11 @@ class DeploymentAnalyticsService:
         self,
         deployments_service: DeploymentsService,
         code_repo_service: CodeRepoService,
+        branch_flow_graph_store: BranchFlowGraphStore,
     ):
         self.deployments_service = deployments_service
         self.code_repo_service = code_repo_service
+        self.branch_flow_graph_store = branch_flow_graph_store
 
     def get_team_all_deployments_in_interval_with_related_prs(
         self,
@@ -49,41 +53,89 @@ class DeploymentAnalyticsService:
             )
         )
 
-        team_repos: List[TeamRepos] = self._get_team_repos_by_team_id(team_id)
-        repo_ids: List[str] = [str(team_repo.org_repo_id) for team_repo in team_repos]
-
-        pull_requests: List[PullRequest] = (
-            self.code_repo_service.get_prs_merged_in_interval(
-                repo_ids, interval, pr_filter
+        deployments_pr_map, unmapped_deployments = (
+            self.deployments_service.get_mapped_prs_for_deployments(
+                deployments, pr_filter
             )
         )
-
-        repo_id_branch_to_pr_list_map: Dict[Tuple[str, str], List[PullRequest]] = (
-            self._map_prs_to_repo_id_and_base_branch(pull_requests)
-        )
-        repo_id_branch_to_deployments_map: Dict[Tuple[str, str], List[Deployment]] = (
-            self._map_deployments_to_repo_id_and_head_branch(deployments)
-        )
+        if unmapped_deployments:
+            deployments_pr_map.update(
+                self._get_unmapped_deployments_pr_map(
+                    team_id,
+                    interval,
+                    pr_filter,
+                    unmapped_deployments,
+                    deployments_pr_map,
+                )
+            )
 
         repo_id_to_deployments_with_pr_map: Dict[
             str, Dict[Deployment, List[PullRequest]]
         ] = defaultdict(dict)
-
-        for (
-            repo_id,
-            base_branch,
-        ), deployments in repo_id_branch_to_deployments_map.items():
-            relevant_prs: List[PullRequest] = repo_id_branch_to_pr_list_map.get(
-                (repo_id, base_branch), []
-            )
-            deployments_pr_map: Dict[Deployment, List[PullRequest]] = (
-                self._map_prs_to_deployments(relevant_prs, deployments)
+        for deployment in deployments:
+            repo_id_to_deployments_with_pr_map[str(deployment.repo_id)][deployment] = (
+                deployments_pr_map.get(deployment, [])
             )
 
-            repo_id_to_deployments_with_pr_map[repo_id].update(deployments_pr_map)
-
         return repo_id_to_deployments_with_pr_map
 
+    def _get_unmapped_deployments_pr_map(
+        self,
+        team_id: str,
+        interval: Interval,
+        pr_filter: PRFilter,
+        deployments: List[Deployment],
+        mapped_deployments_pr_map: Dict[Deployment, List[PullRequest]],
+    ) -> Dict[Deployment, List[PullRequest]]:
+        """
+        Maps prs merged in the interval to the deployments the merge to deploy broker
+        has not processed yet, skipping prs it already mapped to other deployments of
+        the same workflow. A deployment gets the prs that reached its branch since the
+        previous deployment of its workflow.
+        """
+        team_repos: List[TeamRepos] = self._get_team_repos_by_team_id(team_id)
+        repo_ids: List[str] = [str(team_repo.org_repo_id) for team_repo in team_repos]
+
+        workflow_to_mapped_pr_ids_map: Dict[Optional[str], Set[str]] = defaultdict(set)
+        for deployment, prs in mapped_deployments_pr_map.items():
+            workflow_to_mapped_pr_ids_map[
+                deployment.meta.get("repo_workflow_id")
+            ].update(str(pr.id) for pr in prs)
+        pr_id_to_pr_map: Dict[str, PullRequest] = {
+            str(pr.id): pr
+            for pr in self.code_repo_service.get_prs_merged_in_interval(
+                repo_ids, interval, pr_filter
+            )
+        }
+
+        deployments_pr_map: Dict[Deployment, List[PullRequest]] = {}
+        for (
+            repo_id,
+            head_branch,
+            repo_workflow_id,
+        ), workflow_deployments in self._map_deployments_to_repo_branch_and_workflow(
+            deployments
+        ).items():
+            branch_graph = self.branch_flow_graph_store.get_graph(repo_id)
+            mapped_pr_ids = workflow_to_mapped_pr_ids_map.get(repo_workflow_id, set())
+            previous_conducted_at = None
+            for deployment in sorted(
+                workflow_deployments, key=lambda d: d.conducted_at
+            ):
+                pr_ids = branch_graph.get_prs_reachable(
+                    head_branch,
+                    deployment.conducted_at,
+                    merged_after=previous_conducted_at,
+                )
+                deployments_pr_map[deployment] = [
+                    pr_id_to_pr_map[pr_id]
+                    for pr_id in pr_ids
+                    if pr_id in pr_id_to_pr_map and pr_id not in mapped_pr_ids
+                ]
+                previous_conducted_at = deployment.conducted_at
+
+        return deployments_pr_map
+
     def get_team_deployment_frequency_metrics(
         self,
         team_id: str,
@@ -92,14 +144,14 @@ class DeploymentAnalyticsService:
         workflow_filter: WorkflowFilter,
     ) -> DeploymentFrequencyMetrics:
 
-        team_successful_deployments = (
-            self.deployments_service.get_team_successful_deployments_in_interval(
+        team_day_to_deployment_count_map = (
+            self.deployments_service.get_team_successful_deployment_day_counts(
                 team_id, interval, pr_filter, workflow_filter
             )
         )
 
-        return self._get_deployment_frequency_metrics(
-            team_successful_deployments, interval
+        return self._get_deployment_frequency_metrics_from_day_counts(
+            team_day_to_deployment_count_map, interval
         )
 
     def get_weekly_deployment_frequency_trends(
@@ -110,120 +162,59 @@ class DeploymentAnalyticsService:
         workflow_filter: WorkflowFilter,
     ) -> Dict[datetime, int]:
 
-        team_successful_deployments = (
-            self.deployments_service.get_team_successful_deployments_in_interval(
+        team_day_to_deployment_count_map = (
+            self.deployments_service.get_team_successful_deployment_day_counts(
                 team_id, interval, pr_filter, workflow_filter
             )
         )
 
-        team_weekly_deployments = generate_expanded_buckets(
-            team_successful_deployments, interval, "conducted_at", "weekly"
+        return generate_expanded_count_buckets(
+            team_day_to_deployment_count_map, interval, "weekly"
         )
 
-        return get_key_to_count_map_from_key_to_list_map(team_weekly_deployments)
-
-    def _map_prs_to_repo_id_and_base_branch(
-        self, pull_requests: List[PullRequest]
-    ) -> Dict[Tuple[str, str], List[PullRequest]]:
-        repo_id_branch_pr_map: Dict[Tuple[str, str], List[PullRequest]] = defaultdict(
-            list
-        )
-        for pr in pull_requests:
-            repo_id = str(pr.repo_id)
-            base_branch = pr.base_branch
-            repo_id_branch_pr_map[(repo_id, base_branch)].append(pr)
-        return repo_id_branch_pr_map
-
-    def _map_deployments_to_repo_id_and_head_branch(
+    def _map_deployments_to_repo_branch_and_workflow(
         self, deployments: List[Deployment]
-    ) -> Dict[Tuple[str, str], List[Deployment]]:
-        repo_id_branch_deployments_map: Dict[Tuple[str, str], List[Deployment]] = (
-            defaultdict(list)
-        )
+    ) -> Dict[Tuple[str, str, Optional[str]], List[Deployment]]:
+        repo_branch_workflow_deployments_map: Dict[
+            Tuple[str, str, Optional[str]], List[Deployment]
+        ] = defaultdict(list)
         for deployment in deployments:
             repo_id = str(deployment.repo_id)
             head_branch = deployment.head_branch
-            repo_id_branch_deployments_map[(repo_id, head_branch)].append(deployment)
-        return repo_id_branch_deployments_map
-
-    def _map_prs_to_deployments(
-        self, pull_requests: List[PullRequest], deployments: List[Deployment]
-    ) -> Dict[Deployment, List[PullRequest]]:
-        """
-        Maps the pull requests to the deployments they were included in.
-        This method takes a sorted list of pull requests and a sorted list of deployments and returns a dictionary
-        """
-        pr_count = 0
-        deployment_count = 0
-        deployment_pr_map = defaultdict(
-            list, {deployment: [] for deployment in deployments}
-        )
-
-        while pr_count < len(pull_requests) and deployment_count < len(deployments):
-            pr = pull_requests[pr_count]
-            deployment = deployments[deployment_count]
-
-            # Check if the PR was merged before or at the same time as the deployment
-            if pr.state_changed_at <= deployment.conducted_at:
-                deployment_pr_map[deployment].append(pr)
-                pr_count += 1
-            else:
-                deployment_count += 1
-
-        return deployment_pr_map
+            repo_workflow_id = deployment.meta.get("repo_workflow_id")
+            repo_branch_workflow_deployments_map[
+                (repo_id, head_branch, repo_workflow_id)
+            ].append(deployment)
+        return repo_branch_workflow_deployments_map
 
     def _get_team_repos_by_team_id(self, team_id: str) -> List[TeamRepos]:
         return self.code_repo_service.get_active_team_repos_by_team_id(team_id)
 
-    def _get_deployment_frequency_from_date_to_deployment_map(
-        self, date_to_deployment_map: Dict[datetime, List[Deployment]]
-    ) -> int:
-        """
-        This method takes a dict of datetime representing (day/week/month) to Deployments and returns avg deployment frequency
-        """
-
-        date_to_deployment_count_map: Dict[datetime, int] = (
-            get_key_to_count_map_from_key_to_list_map(date_to_deployment_map)
-        )
-
-        return get_average_of_dict_values(date_to_deployment_count_map)
-
     def _get_deployment_frequency_metrics(
         self, successful_deployments: List[Deployment], interval: Interval
     ) -> DeploymentFrequencyMetrics:
-
-        successful_deployments = list(
-            filter(
-                lambda x: interval.from_time <= x.conducted_at <= interval.to_time,
-                successful_deployments,
-            )
+        return self._get_deployment_frequency_metrics_from_day_counts(
+            self._get_day_to_deployment_count_map(successful_deployments, interval),
+            interval,
         )
 
-        team_daily_deployments = generate_expanded_buckets(
-            successful_deployments, interval, "conducted_at", "daily"
-        )
-        team_weekly_deployments = generate_expanded_buckets(
-            successful_deployments, interval, "conducted_at", "weekly"
-        )
-        team_monthly_deployments = generate_expanded_buckets(
-            successful_deployments, interval, "conducted_at", "monthly"
-        )
+    def _get_deployment_frequency_metrics_from_day_counts(
+        self, day_to_deployment_count_map: Dict[datetime, int], interval: Interval
+    ) -> DeploymentFrequencyMetrics:
 
-        daily_deployment_frequency = (
-            self._get_deployment_frequency_from_date_to_deployment_map(
-                team_daily_deployments
+        daily_deployment_frequency = get_average_of_dict_values(
+            generate_expanded_count_buckets(
+                day_to_deployment_count_map, interval, "daily"
             )
         )
-
-        weekly_deployment_frequency = (
-            self._get_deployment_frequency_from_date_to_deployment_map(
-                team_weekly_deployments
+        weekly_deployment_frequency = get_average_of_dict_values(
+            generate_expanded_count_buckets(
+                day_to_deployment_count_map, interval, "weekly"
             )
         )
-
-        monthly_deployment_frequency = (
-            self._get_deployment_frequency_from_date_to_deployment_map(
-                team_monthly_deployments
+        monthly_deployment_frequency = get_average_of_dict_values(
+            generate_expanded_count_buckets(
+                day_to_deployment_count_map, interval, "monthly"
             )
         )
 
@@ -235,7 +226,7 @@ class DeploymentAnalyticsService:
         )
 
         return DeploymentFrequencyMetrics(
-            len(successful_deployments),
+            sum(day_to_deployment_count_map.values()),
             daily_deployment_frequency,
             weekly_deployment_frequency,
             monthly_deployment_frequency,
@@ -244,19 +235,22 @@ class DeploymentAnalyticsService:
     def _get_weekly_deployment_frequency_trends(
         self, successful_deployments: List[Deployment], interval: Interval
     ) -> Dict[datetime, int]:
-
-        successful_deployments = list(
-            filter(
-                lambda x: interval.from_time <= x.conducted_at <= interval.to_time,
-                successful_deployments,
-            )
+        return generate_expanded_count_buckets(
+            self._get_day_to_deployment_count_map(successful_deployments, interval),
+            interval,
+            "weekly",
         )
 
-        team_weekly_deployments = generate_expanded_buckets(
-            successful_deployments, interval, "conducted_at", "weekly"
-        )
-
-        return get_key_to_count_map_from_key_to_list_map(team_weekly_deployments)
+    def _get_day_to_deployment_count_map(
+        self, successful_deployments: List[Deployment], interval: Interval
+    ) -> Dict[datetime, int]:
+        day_to_deployment_count_map: Dict[datetime, int] = defaultdict(int)
+        for deployment in successful_deployments:
+            if interval.from_time <= deployment.conducted_at <= interval.to_time:
+                day_to_deployment_count_map[
+                    get_start_of_day(deployment.conducted_at)
+                ] += 1
+        return day_to_deployment_count_map
 
     def _adjust_frequency_for_granularity(
         self, frequency: int, daily_frequency: int, days_in_granularity: int
@@ -267,4 +261,6 @@ class DeploymentAnalyticsService:
 
 
 def get_deployment_analytics_service() -> DeploymentAnalyticsService:
-    return DeploymentAnalyticsService(get_deployments_service(), CodeRepoService())
+    return DeploymentAnalyticsService(
+        get_deployments_service(), CodeRepoService(), get_branch_flow_graph_store()
+    )
@@ -0,0 +1,296 @@
+import threading
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, defaultdict, deque
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from os import getenv
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from mhq.store.models.code.enums import PullRequestState
+from mhq.store.models.code.pull_requests import PullRequest
+from mhq.store.repos.code import CodeRepoService
+from mhq.utils.time import time_now
+
+# Rows committed late can carry an updated_in_db_at older than the last refresh
+REFRESH_OVERLAP = timedelta(minutes=5)
+BRANCH_FLOW_GRAPH_MAX_REPOS = int(getenv("BRANCH_FLOW_GRAPH_MAX_REPOS", 100))
+# Merged PRs kept across the graphs of a process, roughly 0.5KB each
+BRANCH_FLOW_GRAPH_MAX_PRS = int(getenv("BRANCH_FLOW_GRAPH_MAX_PRS", 200000))
+BRANCH_FLOW_GRAPH_REFRESH_INTERVAL_SECONDS = int(
+    getenv("BRANCH_FLOW_GRAPH_REFRESH_INTERVAL_SECONDS", 60)
+)
+
+
+@dataclass(frozen=True)
+class BranchFlowEdge:
+    merged_at: datetime
+    pr_id: str
+    base_branch: str
+    head_branch: str
+
+
+class _EdgeIndex:
+    """PR ids of a branch's edges, sorted by merge time."""
+
+    def __init__(self):
+        self.merge_times: List[datetime] = []
+        self.pr_ids: List[str] = []
+
+    def add(self, merged_at: datetime, pr_id: str):
+        index = bisect_right(self.merge_times, merged_at)
+        self.merge_times.insert(index, merged_at)
+        self.pr_ids.insert(index, pr_id)
+
+    def remove(self, merged_at: datetime, pr_id: str):
+        start = bisect_left(self.merge_times, merged_at)
+        end = bisect_right(self.merge_times, merged_at)
+        for index in range(start, end):
+            if self.pr_ids[index] == pr_id:
+                self.merge_times.pop(index)
+                self.pr_ids.pop(index)
+                return
+
+    def get_index_range(
+        self, merged_after: Optional[datetime], merged_before: datetime
+    ) -> range:
+        start = bisect_right(self.merge_times, merged_after) if merged_after else 0
+        return range(start, bisect_right(self.merge_times, merged_before))
+
+
+class BranchFlowGraph:
+    """
+    Merged PRs of a repo as edges from their base branch to their head branch.
+
+    Edges of a branch are kept sorted by merge time, so traversals only look at
+    the edges merged within the queried window instead of every PR of the repo.
+    """
+
+    def __init__(self):
+        self._edges: Dict[str, BranchFlowEdge] = {}
+        self._edges_by_base_branch: Dict[str, _EdgeIndex] = defaultdict(_EdgeIndex)
+        self._edges_by_head_branch: Dict[str, _EdgeIndex] = defaultdict(_EdgeIndex)
+        # PR ids each workflow has deployed, keyed by repo workflow id
+        self._deployed_pr_ids: Dict[str, Set[str]] = defaultdict(set)
+
+    def __len__(self):
+        return len(self._edges)
+
+    def add_prs(self, prs: Iterable[PullRequest]):
+        """
+        Adds merged PRs and updates the ones already in the graph. PRs that are no
+        longer merged are dropped.
+        """
+        for pr in prs:
+            pr_id = str(pr.id)
+            self._remove_edge(pr_id)
+            if pr.state != PullRequestState.MERGED or not pr.state_changed_at:
+                continue
+
+            edge = BranchFlowEdge(
+                pr.state_changed_at, pr_id, pr.base_branch, pr.head_branch
+            )
+            self._edges[pr_id] = edge
+            self._edges_by_base_branch[edge.base_branch].add(edge.merged_at, pr_id)
+            self._edges_by_head_branch[edge.head_branch].add(edge.merged_at, pr_id)
+
+    def _remove_edge(self, pr_id: str):
+        edge = self._edges.pop(pr_id, None)
+        if not edge:
+            return
+
+        self._edges_by_base_branch[edge.base_branch].remove(edge.merged_at, pr_id)
+        self._edges_by_head_branch[edge.head_branch].remove(edge.merged_at, pr_id)
+
+    def mark_deployed(self, pr_ids: Iterable[str], repo_workflow_id: str):
+        self._deployed_pr_ids[str(repo_workflow_id)].update(map(str, pr_ids))
+
+    def is_deployed(self, pr_id: str, repo_workflow_id: str) -> bool:
+        return str(pr_id) in self._deployed_pr_ids.get(str(repo_workflow_id), ())
+
+    def get_prs_reachable(
+        self,
+        root_branch: str,
+        merged_before: datetime,
+        merged_after: Optional[datetime] = None,
+        undeployed_by: Optional[str] = None,
+    ) -> List[str]:
+        """
+        Ids of PRs merged in (merged_after, merged_before] that reach the root branch.
+
+        A PR merged into a branch is picked only if it was merged before that branch
+        itself was last merged towards the root, so changes that landed on a branch
+        after it moved on are left out. Pass a repo workflow id as undeployed_by to
+        walk only the PRs that workflow has not deployed yet.
+        """
+        deployed_pr_ids: Set[str] = (
+            self._deployed_pr_ids.get(str(undeployed_by), set())
+            if undeployed_by
+            else set()
+        )
+        last_change_for_branch = {root_branch: merged_before}
+        pr_ids = []
+        visited = {root_branch}
+        branches = deque([root_branch])
+        while branches:
+            branch = branches.popleft()
+            for edge in self._get_edges_merged_in(
+                branch,
+                merged_after,
+                last_change_for_branch[branch],
+                deployed_pr_ids,
+            ):
+                pr_ids.append(edge.pr_id)
+                if edge.head_branch in visited:
+                    continue
+
+                visited.add(edge.head_branch)
+                last_change_for_branch[edge.head_branch] = self._get_last_merge_time(
+                    edge.head_branch, merged_after, merged_before, deployed_pr_ids
+                )
+                branches.append(edge.head_branch)
+        return pr_ids
+
+    def _get_edges_merged_in(
+        self,
+        base_branch: str,
+        merged_after: Optional[datetime],
+        merged_before: datetime,
+        deployed_pr_ids: Set[str],
+    ) -> Iterable[BranchFlowEdge]:
+        edges = self._edges_by_base_branch.get(base_branch)
+        if not edges:
+            return
+
+        for index in edges.get_index_range(merged_after, merged_before):
+            pr_id = edges.pr_ids[index]
+            if pr_id not in deployed_pr_ids:
+                yield self._edges[pr_id]
+
+    def _get_last_merge_time(
+        self,
+        head_branch: str,
+        merged_after: Optional[datetime],
+        merged_before: datetime,
+        deployed_pr_ids: Set[str],
+    ) -> Optional[datetime]:
+        edges = self._edges_by_head_branch.get(head_branch)
+        if not edges:
+            return None
+
+        for index in reversed(edges.get_index_range(merged_after, merged_before)):
+            if edges.pr_ids[index] not in deployed_pr_ids:
+                return edges.merge_times[index]
+        return None
+
+
+class BranchFlowGraphStore:
+    """
+    Process wide branch flow graphs, one per repo.
+
+    A graph is loaded on first use and caught up with the PRs synced and the
+    deployment mappings saved since its last refresh on later uses, at most once
+    every refresh interval, so callers never rebuild it from scratch.
+
+    Every process, eg. each sync worker, holds its own graphs. Only the graphs of
+    the most recently used repos are kept, up to max_repos repos and max_prs merged
+    PRs in total. A graph larger than max_prs on its own is handed to the caller
+    and dropped, so it is loaded again on the next use.
+    """
+
+    def __init__(
+        self,
+        code_repo_service: CodeRepoService,
+        max_repos: int = BRANCH_FLOW_GRAPH_MAX_REPOS,
+        max_prs: int = BRANCH_FLOW_GRAPH_MAX_PRS,
+        refresh_interval: timedelta = timedelta(
+            seconds=BRANCH_FLOW_GRAPH_REFRESH_INTERVAL_SECONDS
+        ),
+    ):
+        self.code_repo_service = code_repo_service
+        self.max_repos = max_repos
+        self.max_prs = max_prs
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._repo_locks: Dict[str, threading.Lock] = defaultdict(threading.Lock)
+        self._graphs: "OrderedDict[str, Tuple[BranchFlowGraph, datetime]]" = (
+            OrderedDict()
+        )
+
+    def get_graph(self, repo_id: str, force_refresh: bool = False) -> BranchFlowGraph:
+        """
+        Callers mutating the graph, eg. marking PRs deployed, should hold the repo's
+        merge to deploy lock and invalidate the graph if they fail to persist it.
+        Pass force_refresh to catch up with the db regardless of the refresh interval.
+        """
+        repo_id = str(repo_id)
+        with self._lock:
+            repo_lock = self._repo_locks[repo_id]
+
+        with repo_lock:
+            refreshed_at = time_now()
+            with self._lock:
+                graph, last_refreshed_at = self._graphs.get(repo_id, (None, None))
+                if graph is not None:
+                    self._graphs.move_to_end(repo_id)
+            if graph is None:
+                graph = BranchFlowGraph()
+            elif (
+                not force_refresh
+                and refreshed_at - last_refreshed_at < self.refresh_interval
+            ):
+                return graph
+
+            updated_after = (
+                last_refreshed_at - REFRESH_OVERLAP if last_refreshed_at else None
+            )
+            graph.add_prs(
+                self.code_repo_service.get_repo_prs_updated_after(
+                    repo_id, updated_after
+                )
+            )
+            for (
+                repo_workflow_id,
+                pr_id,
+            ) in self.code_repo_service.get_repo_deployed_pr_ids_created_after(
+                repo_id, updated_after
+            ):
+                graph.mark_deployed([pr_id], repo_workflow_id)
+            self._save_graph(repo_id, graph, refreshed_at)
+            return graph
+
+    def _save_graph(self, repo_id: str, graph: BranchFlowGraph, refreshed_at: datetime):
+        with self._lock:
+            self._graphs[repo_id] = (graph, refreshed_at)
+            self._graphs.move_to_end(repo_id)
+            while self._graphs and (
+                len(self._graphs) > self.max_repos
+                or self._get_pr_count() > self.max_prs
+            ):
+                evicted_repo_id, _ = self._graphs.popitem(last=False)
+                # Only idle locks are dropped, at worst a racing caller loads the
+                # repo twice
+                if not self._repo_locks[evicted_repo_id].locked():
+                    del self._repo_locks[evicted_repo_id]
+
+    def _get_pr_count(self) -> int:
+        return sum(len(graph) for graph, _ in self._graphs.values())
+
+    def invalidate(self, repo_id: str):
+        repo_id = str(repo_id)
+        with self._lock:
+            repo_lock = self._repo_locks[repo_id]
+        with repo_lock:
+            with self._lock:
+                self._graphs.pop(repo_id, None)
+
+
+_branch_flow_graph_store: Optional[BranchFlowGraphStore] = None
+_branch_flow_graph_store_lock = threading.Lock()
+
+
+def get_branch_flow_graph_store() -> BranchFlowGraphStore:
+    global _branch_flow_graph_store
+    with _branch_flow_graph_store_lock:
+        if not _branch_flow_graph_store:
+            _branch_flow_graph_store = BranchFlowGraphStore(CodeRepoService())
+        return _branch_flow_graph_store
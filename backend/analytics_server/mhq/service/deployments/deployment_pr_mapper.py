@@ -1,79 +1,68 @@
-from collections import defaultdict
 from datetime import datetime
-from queue import Queue
-from typing import List
-from mhq.store.models.code.enums import PullRequestState
+from typing import Dict, List, Optional, Tuple
 
 from mhq.store.models.code.pull_requests import PullRequest
+from mhq.store.models.code.workflows.workflows import RepoWorkflowRuns
+from mhq.service.deployments.branch_graph import BranchFlowGraph
 from mhq.service.deployments.models.models import Deployment
 
 
-class DeploymentPRGraph:
-    def __init__(self):
-        self._nodes = set()
-        self._adj_list = defaultdict(list)
-        self._last_change_deployed_for_branch = {}
-
-    def add_edge(self, base_branch, head_branch, pr: PullRequest):
-        self._nodes.add(base_branch)
-
-        self._adj_list[base_branch].append((head_branch, pr))
-        if head_branch not in self._last_change_deployed_for_branch:
-            self._last_change_deployed_for_branch[head_branch] = pr.state_changed_at
-
-        self._last_change_deployed_for_branch[head_branch] = max(
-            self._last_change_deployed_for_branch[head_branch], pr.state_changed_at
-        )
-
-    def get_edges(self, base_branch: str):
-        return self._adj_list[base_branch]
-
-    def get_all_prs_for_root(self, base_branch) -> List[PullRequest]:
-        if base_branch not in self._nodes:
-            return []
-
-        prs = set()
-        q = Queue()
-        visited = defaultdict(bool)
-        q.put(base_branch)
-
-        while not q.empty():
-            front = q.get()
-            if visited[front]:
-                continue
-
-            visited[front] = True
-            for edge in self.get_edges(front):
-                branch, pr = edge
-                if self._is_pr_merged_post_last_change(pr=pr, base_branch=front):
-                    continue
-
-                q.put(branch)
-                prs.add(pr)
-
-        return list(prs)
-
-    def _is_pr_merged_post_last_change(self, pr: PullRequest, base_branch: str):
-        return pr.state_changed_at > self._last_change_deployed_for_branch[base_branch]
-
-    def set_root_deployment_time(self, root_branch, deployment_time: datetime):
-        self._last_change_deployed_for_branch[root_branch] = deployment_time
-
-
 class DeploymentPRMapperService:
     def get_all_prs_deployed(
-        self, prs: List[PullRequest], deployment: Deployment
+        self,
+        prs: List[PullRequest],
+        deployment: Deployment,
+        merged_after: Optional[datetime] = None,
     ) -> List[PullRequest]:
-
-        branch_graph = DeploymentPRGraph()
-        branch_graph.set_root_deployment_time(
-            deployment.head_branch, deployment.conducted_at
-        )
-
-        for pr in prs:
-            if pr.state != PullRequestState.MERGED:
-                continue
-
-            branch_graph.add_edge(pr.base_branch, pr.head_branch, pr)
-
-        return branch_graph.get_all_prs_for_root(deployment.head_branch)
+        """
+        PRs reaching the deployment's branch, merged after the previous deployment
+        of its workflow when merged_after is given.
+        """
+        branch_graph = BranchFlowGraph()
+        branch_graph.add_prs(prs)
+        pr_id_to_pr_map = {str(pr.id): pr for pr in prs}
+
+        return [
+            pr_id_to_pr_map[pr_id]
+            for pr_id in branch_graph.get_prs_reachable(
+                deployment.head_branch, deployment.conducted_at, merged_after
+            )
+        ]
+
+    def get_prs_deployed_by_deployments(
+        self,
+        branch_graph: BranchFlowGraph,
+        deployments: List[RepoWorkflowRuns],
+        last_conducted_at_by_workflow: Optional[Dict[Tuple[str, str], datetime]] = None,
+    ) -> List[Tuple[RepoWorkflowRuns, List[str]]]:
+        """
+        Maps PRs of the graph to the first deployment of each workflow that shipped
+        them, in conducted_at order, and marks them deployed by that workflow in the
+        graph. Only PRs merged after the previous deployment of the same workflow and
+        branch are walked.
+
+        Gives the same result as calling get_all_prs_deployed for every deployment,
+        each time with the merged PRs up to that deployment which no earlier
+        deployment of the same workflow shipped, merged after the previous one.
+
+        Pass last_conducted_at_by_workflow to carry the previous deployments over
+        from an earlier batch, it is updated with the deployments of this one.
+        """
+        if last_conducted_at_by_workflow is None:
+            last_conducted_at_by_workflow = {}
+
+        prs_deployed_by_deployments = []
+        for deployment in sorted(deployments, key=lambda d: d.conducted_at):
+            repo_workflow_id = str(deployment.repo_workflow_id)
+            workflow_branch = (repo_workflow_id, deployment.head_branch)
+            deployed_pr_ids = branch_graph.get_prs_reachable(
+                deployment.head_branch,
+                deployment.conducted_at,
+                merged_after=last_conducted_at_by_workflow.get(workflow_branch),
+                undeployed_by=repo_workflow_id,
+            )
+            branch_graph.mark_deployed(deployed_pr_ids, repo_workflow_id)
+            prs_deployed_by_deployments.append((deployment, deployed_pr_ids))
+            last_conducted_at_by_workflow[workflow_branch] = deployment.conducted_at
+
+        return prs_deployed_by_deployments
@@ -1,9 +1,12 @@
-from typing import List, Tuple
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Tuple
 from mhq.store.models.code.workflows import RepoWorkflowType, RepoWorkflow
 
 from .factory import get_deployments_factory
 from .deployments_factory_service import DeploymentsFactoryService
 from mhq.store.models.code.filter import PRFilter
+from mhq.store.models.code.pull_requests import PullRequest
 from mhq.store.models.code.repository import TeamRepos
 from mhq.store.models.code.workflows.filter import WorkflowFilter
 from mhq.service.deployments.models.models import Deployment, DeploymentType
@@ -57,6 +60,40 @@ class DeploymentsService:
 
         return sorted_deployments
 
+    def get_team_successful_deployment_day_counts(
+        self,
+        team_id: str,
+        interval: Interval,
+        pr_filter: PRFilter = None,
+        workflow_filter: WorkflowFilter = None,
+    ) -> Dict[datetime, int]:
+        """
+        Successful deployment counts by UTC day, without loading the deployments.
+        """
+        team_repos = self._get_team_repos_by_team_id(team_id)
+        (
+            team_repos_using_workflow_deployments,
+            team_repos_using_pr_deployments,
+        ) = self.get_filtered_team_repos_by_deployment_config(team_repos)
+
+        day_counts_using_workflow = self.workflow_based_deployments_service.get_repos_successful_deployment_day_counts(
+            self._get_repo_ids_from_team_repos(team_repos_using_workflow_deployments),
+            interval,
+            workflow_filter,
+        )
+        day_counts_using_pr = self.pr_based_deployments_service.get_repos_successful_deployment_day_counts(
+            self._get_repo_ids_from_team_repos(team_repos_using_pr_deployments),
+            interval,
+            pr_filter,
+        )
+
+        day_to_count_map: Dict[datetime, int] = defaultdict(int)
+        for day_counts in [day_counts_using_workflow, day_counts_using_pr]:
+            for day, count in day_counts.items():
+                day_to_count_map[day] += count
+
+        return dict(day_to_count_map)
+
     def get_filtered_team_repos_with_workflow_configured_deployments(
         self, team_repos: List[TeamRepos]
     ) -> List[TeamRepos]:
@@ -124,6 +161,31 @@ class DeploymentsService:
 
         return sorted_deployments
 
+    def get_mapped_prs_for_deployments(
+        self, deployments: List[Deployment], pr_filter: PRFilter = None
+    ) -> Tuple[Dict[Deployment, List[PullRequest]], List[Deployment]]:
+        """
+        Prs persisted by the merge to deploy broker for the workflow deployments it
+        has processed, along with the deployments that still need their prs mapped.
+        """
+        workflow_deployments = [
+            deployment
+            for deployment in deployments
+            if deployment.deployment_type == DeploymentType.WORKFLOW
+        ]
+        deployments_pr_map, unmapped_workflow_deployments = (
+            self.workflow_based_deployments_service.get_mapped_prs_for_deployments(
+                workflow_deployments, pr_filter
+            )
+        )
+        unmapped_deployments = [
+            deployment
+            for deployment in deployments
+            if deployment.deployment_type != DeploymentType.WORKFLOW
+        ] + unmapped_workflow_deployments
+
+        return deployments_pr_map, self._sort_deployments_by_date(unmapped_deployments)
+
     def _get_team_repos_by_team_id(self, team_id: str) -> List[TeamRepos]:
         return self.code_repo_service.get_active_team_repos_by_team_id(team_id)
 
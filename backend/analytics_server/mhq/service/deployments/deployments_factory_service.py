@@ -1,7 +1,13 @@
 from abc import ABC, abstractmethod
-from typing import List, Tuple
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Tuple
 from urllib.parse import unquote
+
+import pytz
+
 from mhq.store.models.code.pull_requests import PullRequest
+from mhq.store.models.code.rollups import DeploymentDailyRollup
 from uuid import UUID
 from werkzeug.exceptions import BadRequest
 
@@ -15,6 +21,12 @@ class DeploymentsFactoryService(ABC):
     ) -> List[Deployment]:
         pass
 
+    @abstractmethod
+    def get_repos_successful_deployment_day_counts(
+        self, repo_ids, interval, specific_filter
+    ) -> Dict[datetime, int]:
+        pass
+
     @abstractmethod
     def get_repos_all_deployments_in_interval(
         self, repo_ids, interval, specific_filter
@@ -31,6 +43,23 @@ class DeploymentsFactoryService(ABC):
     def get_deployment_by_entity_id(self, entity_id: str) -> Deployment:
         pass
 
+    @classmethod
+    def get_day_counts_from_rollups(
+        cls,
+        rollups: List[DeploymentDailyRollup],
+        excluded_rollups: List[DeploymentDailyRollup] = None,
+    ) -> Dict[datetime, int]:
+        """
+        Sums up the rollups by UTC day, less the excluded ones.
+        """
+        day_to_count_map: Dict[datetime, int] = defaultdict(int)
+        for rollup in rollups:
+            day_to_count_map[rollup.day.astimezone(pytz.UTC)] += rollup.deployment_count
+        for rollup in excluded_rollups or []:
+            day_to_count_map[rollup.day.astimezone(pytz.UTC)] -= rollup.deployment_count
+
+        return {day: count for day, count in day_to_count_map.items() if count > 0}
+
     @classmethod
     def get_deployment_type_and_entity_id_from_deployment_id(
         cls, id_str: str
@@ -2,7 +2,7 @@ from .models.adapter import DeploymentsAdaptorFactory
 from mhq.service.deployments.models.models import DeploymentType
 from mhq.store.repos.code import CodeRepoService
 from mhq.store.repos.workflows import WorkflowRepoService
-from .deployment_pr_mapper import DeploymentPRMapperService
+from .branch_graph import get_branch_flow_graph_store
 from .deployments_factory_service import DeploymentsFactoryService
 from .pr_deployments_service import PRDeploymentsService
 from .workflow_deployments_service import WorkflowDeploymentsService
@@ -21,7 +21,7 @@ def get_deployments_factory(
             WorkflowRepoService(),
             CodeRepoService(),
             DeploymentsAdaptorFactory(DeploymentType.WORKFLOW).get_adaptor(),
-            DeploymentPRMapperService(),
+            get_branch_flow_graph_store(),
         )
     else:
         raise ValueError(f"Unknown deployment type: {deployment_type}")
@@ -1,11 +1,14 @@
-from typing import List
+from dataclasses import replace
+from datetime import datetime
+from typing import Dict, List
 from .models.adapter import DeploymentsAdaptor
 from mhq.store.models.code.filter import PRFilter
 from mhq.store.models.code.pull_requests import PullRequest
 from mhq.service.deployments.models.models import Deployment
 
 from mhq.store.repos.code import CodeRepoService
-from mhq.utils.time import Interval
+from mhq.store.models.code.rollups import DeploymentDailyRollup
+from mhq.utils.time import Interval, split_interval_on_whole_days
 
 from .deployments_factory_service import DeploymentsFactoryService
 
@@ -30,6 +33,46 @@ class PRDeploymentsService(DeploymentsFactoryService):
 
         return self.deployments_adapter.adapt_many(pull_requests)
 
+    def get_repos_successful_deployment_day_counts(
+        self, repo_ids: List[str], interval: Interval, pr_filter: PRFilter
+    ) -> Dict[datetime, int]:
+        """
+        Merged pr counts by UTC day. Whole days are read from the rollups, the
+        partial days at the interval ends are counted from their prs.
+        """
+        if not repo_ids:
+            return {}
+
+        if pr_filter and not pr_filter.can_use_rollups:
+            return self.get_day_counts_from_rollups(
+                self.code_repo_service.get_deployment_rollups_for_prs_merged_in_interval(
+                    repo_ids, interval, pr_filter
+                )
+            )
+
+        days_interval, partial_intervals = split_interval_on_whole_days(interval)
+
+        rollups: List[DeploymentDailyRollup] = []
+        excluded_rollups: List[DeploymentDailyRollup] = []
+        if days_interval:
+            rollups += self.code_repo_service.get_deployment_rollups(
+                repo_ids, days_interval, pr_filter
+            )
+            if pr_filter and pr_filter.excluded_pr_ids:
+                excluded_rollups = self.code_repo_service.get_deployment_rollups_for_prs_merged_in_interval(
+                    repo_ids,
+                    days_interval,
+                    replace(pr_filter, excluded_pr_ids=None),
+                    pr_ids=pr_filter.excluded_pr_ids,
+                )
+
+        for partial_interval in partial_intervals:
+            rollups += self.code_repo_service.get_deployment_rollups_for_prs_merged_in_interval(
+                repo_ids, partial_interval, pr_filter
+            )
+
+        return self.get_day_counts_from_rollups(rollups, excluded_rollups)
+
     def get_repos_all_deployments_in_interval(
         self, repo_ids: List[str], interval: Interval, prs_filter: PRFilter
     ) -> List[Deployment]:
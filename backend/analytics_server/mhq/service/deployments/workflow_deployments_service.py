@@ -1,15 +1,20 @@
-from typing import List, Tuple
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Tuple
 from .models.adapter import DeploymentsAdaptor
+from mhq.store.models.code.filter import PRFilter
 from mhq.store.models.code.pull_requests import PullRequest
+from mhq.store.models.code.repository import BookmarkMergeToDeployBroker
 from mhq.store.models.code.workflows.filter import WorkflowFilter
 from mhq.store.models.code.workflows.workflows import RepoWorkflow, RepoWorkflowRuns
-from mhq.service.deployments.models.models import Deployment
+from mhq.service.deployments.models.models import Deployment, DeploymentStatus
 from mhq.store.repos.code import CodeRepoService
 
 from mhq.store.repos.workflows import WorkflowRepoService
-from mhq.utils.time import Interval
+from mhq.store.models.code.rollups import DeploymentDailyRollup
+from mhq.utils.time import Interval, split_interval_on_whole_days
 
-from .deployment_pr_mapper import DeploymentPRMapperService
+from .branch_graph import BranchFlowGraphStore
 from .deployments_factory_service import DeploymentsFactoryService
 
 
@@ -19,12 +24,12 @@ class WorkflowDeploymentsService(DeploymentsFactoryService):
         workflow_repo_service: WorkflowRepoService,
         code_repo_service: CodeRepoService,
         deployments_adapter: DeploymentsAdaptor,
-        deployment_pr_mapping_service: DeploymentPRMapperService,
+        branch_flow_graph_store: BranchFlowGraphStore,
     ):
         self.workflow_repo_service = workflow_repo_service
         self.code_repo_service = code_repo_service
         self.deployments_adapter = deployments_adapter
-        self.deployment_pr_mapping_service = deployment_pr_mapping_service
+        self.branch_flow_graph_store = branch_flow_graph_store
 
     def get_repos_successful_deployments_in_interval(
         self, repo_ids: List[str], interval: Interval, workflow_filter: WorkflowFilter
@@ -36,6 +41,33 @@ class WorkflowDeploymentsService(DeploymentsFactoryService):
         )
         return self.deployments_adapter.adapt_many(repo_workflow_runs)
 
+    def get_repos_successful_deployment_day_counts(
+        self, repo_ids: List[str], interval: Interval, workflow_filter: WorkflowFilter
+    ) -> Dict[datetime, int]:
+        """
+        Successful run counts by UTC day. Whole days are read from the rollups, the
+        partial days at the interval ends are counted from their runs.
+        """
+        if not repo_ids:
+            return {}
+
+        days_interval, partial_intervals = split_interval_on_whole_days(interval)
+
+        rollups: List[DeploymentDailyRollup] = []
+        if days_interval:
+            rollups += self.workflow_repo_service.get_deployment_rollups(
+                repo_ids, days_interval, workflow_filter
+            )
+
+        for partial_interval in partial_intervals:
+            rollups += (
+                self.workflow_repo_service.get_deployment_rollups_for_runs_in_interval(
+                    repo_ids, partial_interval, workflow_filter
+                )
+            )
+
+        return self.get_day_counts_from_rollups(rollups)
+
     def get_repos_all_deployments_in_interval(
         self,
         repo_ids: List[str],
@@ -52,23 +84,77 @@ class WorkflowDeploymentsService(DeploymentsFactoryService):
     def get_pull_requests_related_to_deployment(
         self, deployment: Deployment
     ) -> List[PullRequest]:
+        deployments_pr_map, _ = self.get_mapped_prs_for_deployments([deployment])
+        if deployment in deployments_pr_map:
+            return deployments_pr_map[deployment]
+
         previous_deployment = self._get_previous_deployment_for_given_deployment(
             deployment
         )
-        interval = Interval(previous_deployment.conducted_at, deployment.conducted_at)
-        pr_base_branch: str = deployment.head_branch
-        pull_requests: List[PullRequest] = (
-            self.code_repo_service.get_prs_merged_in_interval(
-                [deployment.repo_id], interval, base_branches=[pr_base_branch]
-            )
+        pr_ids: List[str] = self.branch_flow_graph_store.get_graph(
+            deployment.repo_id
+        ).get_prs_reachable(
+            deployment.head_branch,
+            deployment.conducted_at,
+            merged_after=previous_deployment.conducted_at,
         )
-        relevant_prs: List[PullRequest] = (
-            self.deployment_pr_mapping_service.get_all_prs_deployed(
-                pull_requests, deployment
-            )
+        if not pr_ids:
+            return []
+
+        return sorted(
+            self.code_repo_service.get_prs_by_ids(pr_ids),
+            key=lambda pr: pr.state_changed_at,
         )
 
-        return relevant_prs
+    def get_mapped_prs_for_deployments(
+        self, deployments: List[Deployment], pr_filter: PRFilter = None
+    ) -> Tuple[Dict[Deployment, List[PullRequest]], List[Deployment]]:
+        """
+        Splits the deployments into the ones the merge to deploy broker has processed,
+        mapped to the prs it persisted for them, and the ones it is yet to process.
+        Only successful runs up to the broker's bookmark are mapped, except the ones it
+        processed before it persisted their prs. The broker maps prs per workflow, so
+        runs of every workflow of the repo get the prs they shipped.
+        """
+        repo_ids = list({str(deployment.repo_id) for deployment in deployments})
+        repo_id_to_bookmark_map: Dict[str, BookmarkMergeToDeployBroker] = {
+            str(bookmark.repo_id): bookmark
+            for bookmark in self.code_repo_service.get_merge_to_deploy_broker_bookmarks(
+                repo_ids
+            )
+            if bookmark.bookmark
+        }
+
+        mapped_deployments: List[Deployment] = []
+        unmapped_deployments: List[Deployment] = []
+        for deployment in deployments:
+            bookmark = repo_id_to_bookmark_map.get(str(deployment.repo_id))
+            mapped_from = bookmark.deployment_prs_mapped_from_date if bookmark else None
+            if (
+                bookmark
+                and deployment.status == DeploymentStatus.SUCCESS
+                and deployment.conducted_at <= bookmark.bookmark_date
+                and (not mapped_from or deployment.conducted_at > mapped_from)
+            ):
+                mapped_deployments.append(deployment)
+            else:
+                unmapped_deployments.append(deployment)
+
+        if not mapped_deployments:
+            return {}, unmapped_deployments
+
+        run_id_to_prs_map: Dict[str, List[PullRequest]] = defaultdict(list)
+        for run_id, pr in self.code_repo_service.get_prs_deployed_by_workflow_runs(
+            [str(deployment.entity_id) for deployment in mapped_deployments],
+            pr_filter,
+        ):
+            run_id_to_prs_map[run_id].append(pr)
+
+        deployments_pr_map: Dict[Deployment, List[PullRequest]] = {
+            deployment: run_id_to_prs_map.get(str(deployment.entity_id), [])
+            for deployment in mapped_deployments
+        }
+        return deployments_pr_map, unmapped_deployments
 
     def get_deployment_by_entity_id(self, entity_id: str) -> Deployment:
         repo_workflow_run: Tuple[RepoWorkflow, RepoWorkflowRuns] = (
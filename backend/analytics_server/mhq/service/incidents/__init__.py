@@ -1 +1,5 @@
-from .sync import sync_org_incidents
+from .sync import (
+    get_incident_services_to_sync,
+    sync_incident_service,
+)
+from .rollups import refresh_org_incident_rollups
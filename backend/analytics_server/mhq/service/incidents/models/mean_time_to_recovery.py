@@ -32,3 +32,15 @@ class ChangeFailureRateMetrics:
     @property
     def total_deployments_count(self):
         return len(self.total_deployments)
+
+
+@dataclass
+class ChangeFailureRateCounts:
+    failed_deployments_count: int = 0
+    total_deployments_count: int = 0
+
+    @property
+    def change_failure_rate(self):
+        if not self.total_deployments_count:
+            return 0
+        return self.failed_deployments_count / self.total_deployments_count * 100
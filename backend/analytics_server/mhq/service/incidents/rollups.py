@@ -0,0 +1,341 @@
+from datetime import datetime, timedelta
+from os import getenv
+from typing import Dict, List, Optional
+
+from mhq.service.code.pr_filter import apply_pr_filter
+from mhq.service.deployments.deployment_service import (
+    DeploymentsService,
+    get_deployments_service,
+)
+from mhq.service.incidents.incidents import IncidentService, get_incident_service
+from mhq.service.incidents.models.mean_time_to_recovery import (
+    ChangeFailureRateCounts,
+    ChangeFailureRateMetrics,
+    MeanTimeToRecoveryMetrics,
+)
+from mhq.store.models.code.filter import PRFilter
+from mhq.store.models.code.workflows.filter import WorkflowFilter
+from mhq.store.models.incidents import TeamIncidentRollup, TeamIncidentRollupState
+from mhq.store.models.settings import EntityType, SettingType
+from mhq.store.repos.incidents import IncidentsRepoService
+from mhq.utils.log import LOG
+from mhq.utils.time import (
+    Interval,
+    fill_missing_week_buckets,
+    generate_expanded_buckets,
+    get_given_weeks_monday,
+    split_interval_on_whole_weeks,
+    time_now,
+)
+
+INCIDENT_ROLLUPS_HISTORY_DAYS = int(getenv("INCIDENT_ROLLUPS_HISTORY_DAYS", 365))
+
+
+class IncidentRollupsService:
+    """
+    Weekly mean time to recovery and change failure rate trends of teams, read
+    from rollups refreshed after each sync. Requests the rollups can not answer
+    are computed live.
+    """
+
+    def __init__(
+        self,
+        incidents_repo_service: IncidentsRepoService,
+        incident_service: IncidentService,
+        deployments_service: DeploymentsService,
+    ):
+        self._incidents_repo_service = incidents_repo_service
+        self._incident_service = incident_service
+        self._deployments_service = deployments_service
+
+    def get_team_mean_time_to_recovery_trends(
+        self, team_id: str, interval: Interval, pr_filter: PRFilter
+    ) -> Dict[datetime, MeanTimeToRecoveryMetrics]:
+        whole_weeks_interval = self._get_rollups_interval(team_id, interval, pr_filter)
+        if not whole_weeks_interval:
+            return self._incident_service.get_team_mean_time_to_recovery_trends(
+                team_id, interval, pr_filter
+            )
+
+        weekly_mean_time_to_recovery: Dict[datetime, MeanTimeToRecoveryMetrics] = {
+            week: MeanTimeToRecoveryMetrics()
+            for week in generate_expanded_buckets([], interval, "resolved_date")
+        }
+        for rollup in self._incidents_repo_service.get_team_incident_rollups(
+            team_id, whole_weeks_interval
+        ):
+            if rollup.resolved_incident_count:
+                weekly_mean_time_to_recovery[rollup.week_start] = (
+                    MeanTimeToRecoveryMetrics(
+                        rollup.recovery_time / rollup.resolved_incident_count,
+                        rollup.resolved_incident_count,
+                    )
+                )
+
+        _, partial_intervals = split_interval_on_whole_weeks(interval)
+        for partial_interval in partial_intervals:
+            weekly_mean_time_to_recovery.update(
+                self._incident_service.get_team_mean_time_to_recovery_trends(
+                    team_id, partial_interval, pr_filter
+                )
+            )
+
+        return weekly_mean_time_to_recovery
+
+    def get_team_weekly_change_failure_rate(
+        self,
+        team_id: str,
+        interval: Interval,
+        pr_filter: PRFilter,
+        workflow_filter: WorkflowFilter = None,
+    ) -> Dict[datetime, ChangeFailureRateCounts]:
+        whole_weeks_interval = None
+        if not self._has_workflow_filters(workflow_filter):
+            whole_weeks_interval = self._get_rollups_interval(
+                team_id, interval, pr_filter
+            )
+        if not whole_weeks_interval:
+            return self._get_live_weekly_change_failure_rate(
+                team_id, interval, pr_filter, workflow_filter
+            )
+
+        week_to_rollup: Dict[datetime, TeamIncidentRollup] = {
+            rollup.week_start: rollup
+            for rollup in self._incidents_repo_service.get_team_incident_rollups(
+                team_id, whole_weeks_interval
+            )
+        }
+        deployment_weeks = sorted(
+            week for week, rollup in week_to_rollup.items() if rollup.deployment_count
+        )
+        if not deployment_weeks:
+            return self._get_live_weekly_change_failure_rate(
+                team_id, interval, pr_filter, workflow_filter
+            )
+
+        # A deployment fails on incidents up to the next deployment, which the live
+        # path looks for within the interval only. Rollups agree with it for every
+        # deployment followed by another one in the interval, the rest is counted
+        # live: from the week of the last deployment on, and the leading partial
+        # week up to the first week with a deployment.
+        first_deployment_week, last_deployment_week = (
+            deployment_weeks[0],
+            deployment_weeks[-1],
+        )
+        week_to_change_failure_rate: Dict[datetime, ChangeFailureRateCounts] = {
+            week: ChangeFailureRateCounts(
+                rollup.failed_deployment_count, rollup.deployment_count
+            )
+            for week, rollup in week_to_rollup.items()
+            if week < last_deployment_week
+        }
+        if interval.from_time < whole_weeks_interval.from_time:
+            leading_week_to_change_failure_rate = (
+                self._get_live_weekly_change_failure_rate(
+                    team_id,
+                    Interval(
+                        interval.from_time, first_deployment_week + timedelta(weeks=1)
+                    ),
+                    pr_filter,
+                    workflow_filter,
+                )
+            )
+            week_to_change_failure_rate.update(
+                {
+                    week: change_failure_rate
+                    for week, change_failure_rate in leading_week_to_change_failure_rate.items()
+                    if week < whole_weeks_interval.from_time
+                }
+            )
+        week_to_change_failure_rate.update(
+            self._get_live_weekly_change_failure_rate(
+                team_id,
+                Interval(last_deployment_week, interval.to_time),
+                pr_filter,
+                workflow_filter,
+            )
+        )
+
+        return fill_missing_week_buckets(
+            week_to_change_failure_rate, interval, ChangeFailureRateCounts
+        )
+
+    def refresh_org_incident_rollups(self, org_id: str):
+        for (
+            team_id,
+            state,
+            needs_full_refresh,
+        ) in self._incidents_repo_service.get_teams_with_stale_incident_rollups(org_id):
+            try:
+                self.refresh_team_incident_rollups(team_id, state, needs_full_refresh)
+            except Exception as e:
+                LOG.error(
+                    f"Error refreshing incident rollups of team {team_id}: {str(e)}"
+                )
+
+    def refresh_team_incident_rollups(
+        self,
+        team_id: str,
+        state: Optional[TeamIncidentRollupState],
+        needs_full_refresh: bool,
+    ):
+        """
+        Recounts the team's rollups from its oldest stale week, or the whole history
+        on a full refresh. An incident fails the last deployment before it, however
+        long ago that was, so the recount starts at the week of the team's last
+        deployment before the stale week.
+        """
+        refreshed_at = time_now()
+        rollups_from = get_given_weeks_monday(
+            refreshed_at - timedelta(days=INCIDENT_ROLLUPS_HISTORY_DAYS)
+        )
+        from_time = rollups_from
+        if not needs_full_refresh and state and state.rollups_from:
+            rollups_from = state.rollups_from
+            from_time = rollups_from
+            if state.stale_from:
+                stale_week = get_given_weeks_monday(state.stale_from)
+                last_deployment_week = (
+                    self._incidents_repo_service.get_team_last_deployment_rollup_week(
+                        team_id, stale_week
+                    )
+                )
+                from_time = max(last_deployment_week or stale_week, rollups_from)
+
+        rollups = self._get_team_incident_rollups(
+            team_id, Interval(from_time, refreshed_at)
+        )
+        self._incidents_repo_service.save_team_incident_rollups(
+            team_id,
+            rollups,
+            from_time,
+            rollups_from,
+            refreshed_at,
+            state.updated_at if state else None,
+        )
+
+    def _get_team_incident_rollups(
+        self, team_id: str, interval: Interval
+    ) -> List[TeamIncidentRollup]:
+        pr_filter = self._get_team_default_pr_filter(team_id)
+        week_to_rollup: Dict[datetime, TeamIncidentRollup] = {}
+
+        def _get_rollup(week_start: datetime) -> TeamIncidentRollup:
+            if week_start not in week_to_rollup:
+                week_to_rollup[week_start] = TeamIncidentRollup(
+                    team_id=team_id,
+                    week_start=week_start,
+                    resolved_incident_count=0,
+                    recovery_time=0,
+                    failed_deployment_count=0,
+                    deployment_count=0,
+                )
+            return week_to_rollup[week_start]
+
+        for incident in self._incident_service.get_resolved_team_incidents(
+            team_id, interval, pr_filter
+        ):
+            rollup = _get_rollup(get_given_weeks_monday(incident.resolved_date))
+            rollup.resolved_incident_count += 1
+            rollup.recovery_time += int(
+                (incident.resolved_date - incident.creation_date).total_seconds()
+            )
+
+        deployments = self._deployments_service.get_team_all_deployments_in_interval(
+            team_id, interval, pr_filter
+        )
+        incidents = self._incident_service.get_team_incidents(
+            team_id, interval, pr_filter
+        )
+        for (
+            deployment,
+            deployment_incidents,
+        ) in self._incident_service.get_deployment_incidents_map(
+            deployments, incidents
+        ).items():
+            rollup = _get_rollup(get_given_weeks_monday(deployment.conducted_at))
+            rollup.deployment_count += 1
+            if deployment_incidents:
+                rollup.failed_deployment_count += 1
+
+        return list(week_to_rollup.values())
+
+    def _get_live_weekly_change_failure_rate(
+        self,
+        team_id: str,
+        interval: Interval,
+        pr_filter: PRFilter,
+        workflow_filter: WorkflowFilter = None,
+    ) -> Dict[datetime, ChangeFailureRateCounts]:
+        deployments = self._deployments_service.get_team_all_deployments_in_interval(
+            team_id, interval, pr_filter, workflow_filter
+        )
+        incidents = self._incident_service.get_team_incidents(
+            team_id, interval, pr_filter
+        )
+        week_to_change_failure_rate: Dict[datetime, ChangeFailureRateMetrics] = (
+            self._incident_service.get_weekly_change_failure_rate(
+                interval, deployments, incidents
+            )
+        )
+        return {
+            week: ChangeFailureRateCounts(
+                change_failure_rate.failed_deployments_count,
+                change_failure_rate.total_deployments_count,
+            )
+            for week, change_failure_rate in week_to_change_failure_rate.items()
+        }
+
+    def _get_rollups_interval(
+        self, team_id: str, interval: Interval, pr_filter: PRFilter
+    ) -> Optional[Interval]:
+        """
+        The whole weeks of the interval to read from the rollups, if they hold
+        them for the request.
+        """
+        if self._has_request_pr_filters(pr_filter):
+            return None
+
+        whole_weeks_interval, _ = split_interval_on_whole_weeks(interval)
+        if not whole_weeks_interval:
+            return None
+
+        state = self._incidents_repo_service.get_fresh_team_incident_rollup_state(
+            team_id
+        )
+        if not state or whole_weeks_interval.from_time < state.rollups_from:
+            return None
+
+        return whole_weeks_interval
+
+    def _get_team_default_pr_filter(self, team_id: str) -> PRFilter:
+        return apply_pr_filter(
+            {}, EntityType.TEAM, team_id, [SettingType.EXCLUDED_PRS_SETTING]
+        )
+
+    def _has_request_pr_filters(self, pr_filter: PRFilter = None) -> bool:
+        # Rollups are counted with the team's excluded prs setting only
+        if not pr_filter:
+            return False
+        return bool(
+            pr_filter.authors
+            or pr_filter.base_branches
+            or pr_filter.repo_filters
+            or pr_filter.max_cycle_time
+            or pr_filter.incident_pr_filters
+        )
+
+    def _has_workflow_filters(self, workflow_filter: WorkflowFilter = None) -> bool:
+        if not workflow_filter:
+            return False
+        return bool(workflow_filter.head_branches or workflow_filter.repo_filters)
+
+
+def get_incident_rollups_service() -> IncidentRollupsService:
+    return IncidentRollupsService(
+        IncidentsRepoService(), get_incident_service(), get_deployments_service()
+    )
+
+
+def refresh_org_incident_rollups(org_id: str):
+    get_incident_rollups_service().refresh_org_incident_rollups(org_id)
@@ -1 +1,4 @@
-from .etl_handler import sync_org_incidents
+from .etl_handler import (
+    get_incident_services_to_sync,
+    sync_incident_service,
+)
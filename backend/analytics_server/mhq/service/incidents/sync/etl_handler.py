@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import List
+from typing import List, Optional, Tuple
 
 from mhq.store.models.settings.configuration_settings import (
     SettingType,
@@ -37,26 +37,24 @@ class IncidentsETLHandler:
         self.settings_service = settings_service
         self.bookmark_service = bookmark_service
 
-    def sync_org_incident_services(self, org_id: str):
-        try:
-            incident_services = self.incident_repo_service.get_org_incident_services(
-                org_id
-            )
-            updated_services = self.etl_service.get_updated_incident_services(
-                incident_services
-            )
-            self.incident_repo_service.update_org_incident_services(updated_services)
-            for service in updated_services:
-                try:
-                    self._sync_service_incidents(service)
-                except Exception as e:
-                    LOG.error(
-                        f"Error syncing incidents for service {service.key}: {str(e)}"
-                    )
-                    continue
-        except Exception as e:
-            LOG.error(f"Error syncing incident services for org {org_id}: {str(e)}")
-            return
+    def get_incident_services_to_sync(self, org_id: str) -> List[OrgIncidentService]:
+        """
+        Refreshes the org's incident services of the provider from the provider api.
+        """
+        incident_services = self.incident_repo_service.get_org_incident_services(org_id)
+        updated_services = self.etl_service.get_updated_incident_services(
+            incident_services
+        )
+        self.incident_repo_service.update_org_incident_services(updated_services)
+        return updated_services
+
+    def sync_incident_service(self, service_id: str):
+        services = self.incident_repo_service.get_org_incident_services_by_ids(
+            [service_id]
+        )
+        if not services:
+            raise Exception(f"Incident service {service_id} not found")
+        self._sync_service_incidents(services[0])
 
     def _sync_service_incidents(self, service: OrgIncidentService):
         try:
@@ -94,29 +92,47 @@ class IncidentsETLHandler:
             return
 
 
-def sync_org_incidents(org_id: str):
+def _get_incidents_etl_handler(
+    org_id: str, provider: str, etl_factory: Optional[IncidentsETLFactory] = None
+) -> IncidentsETLHandler:
+    etl_factory = etl_factory or IncidentsETLFactory(org_id)
+    return IncidentsETLHandler(
+        IncidentProvider(provider),
+        IncidentsRepoService(),
+        etl_factory(provider),
+        get_settings_service(),
+        get_bookmark_service(),
+    )
+
+
+def get_incident_services_to_sync(
+    org_id: str,
+) -> List[Tuple[str, OrgIncidentService]]:
+    """
+    Refreshes the org's incident services of every incident provider.
+
+    :return: (provider, incident service) of every service whose incidents need a sync
+    """
     incident_providers: List[str] = (
         get_incidents_integration_service().get_org_providers(org_id)
     )
-    if not incident_providers:
-        LOG.info(f"No incident providers found for org {org_id}")
-        return
     etl_factory = IncidentsETLFactory(org_id)
 
+    services_to_sync: List[Tuple[str, OrgIncidentService]] = []
     for provider in incident_providers:
         try:
-            incident_provider = IncidentProvider(provider)
-            incidents_etl_handler = IncidentsETLHandler(
-                incident_provider,
-                IncidentsRepoService(),
-                etl_factory(provider),
-                get_settings_service(),
-                get_bookmark_service(),
+            incidents_etl_handler = _get_incidents_etl_handler(
+                org_id, provider, etl_factory
             )
-            incidents_etl_handler.sync_org_incident_services(org_id)
+            services = incidents_etl_handler.get_incident_services_to_sync(org_id)
+            services_to_sync.extend((provider, service) for service in services)
         except Exception as e:
             LOG.error(
-                f"Error syncing incidents for provider {provider}, org {org_id}: {str(e)}"
+                f"Error syncing incident services for provider {provider}, org {org_id}: {str(e)}"
             )
             continue
-    LOG.info(f"Synced incidents for org {org_id}")
+    return services_to_sync
+
+
+def sync_incident_service(org_id: str, provider: str, service_id: str):
+    _get_incidents_etl_handler(org_id, provider).sync_incident_service(service_id)
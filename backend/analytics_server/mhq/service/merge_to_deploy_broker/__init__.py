@@ -1,2 +1,6 @@
-from .mtd_handler import process_merge_to_deploy_cache
+from .mtd_handler import (
+    get_merge_to_deploy_lock_key,
+    get_repos_to_process_merge_to_deploy,
+    process_repo_merge_to_deploy_cache,
+)
 from .utils import get_merge_to_deploy_broker_utils_service, MergeToDeployBrokerUtils
@@ -1,9 +1,18 @@
+from os import getenv
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, List, Optional, Set, Tuple
 
-from mhq.service.deployments import DeploymentPRMapperService
+import pytz
+
+from mhq.service.deployments import (
+    BranchFlowGraph,
+    BranchFlowGraphStore,
+    DeploymentPRMapperService,
+    get_branch_flow_graph_store,
+)
 from mhq.service.bookmark import BookmarkService, BookmarkType, get_bookmark_service
 from mhq.store.models.code import (
+    DeploymentPullRequest,
     PullRequest,
     OrgRepo,
     RepoWorkflow,
@@ -12,9 +21,16 @@ from mhq.store.models.code import (
 )
 from mhq.store.repos.code import CodeRepoService
 from mhq.store.repos.workflows import WorkflowRepoService
-from mhq.utils.lock import RedisLockService, get_redis_lock_service
+from mhq.utils.time import get_given_weeks_monday
 
 DEPLOYMENTS_TO_PROCESS = 500
+MERGE_TO_DEPLOY_SWEEP_ENABLED = (
+    getenv("MERGE_TO_DEPLOY_SWEEP_ENABLED", "true").lower() == "true"
+)
+
+
+def get_merge_to_deploy_lock_key(repo_id: str) -> str:
+    return "{org_repo}:" + f"{str(repo_id)}:merge_to_deploy_broker"
 
 
 class MergeToDeployCacheHandler:
@@ -24,33 +40,37 @@ class MergeToDeployCacheHandler:
         code_repo_service: CodeRepoService,
         workflow_repo_service: WorkflowRepoService,
         deployment_pr_mapper_service: DeploymentPRMapperService,
-        redis_lock_service: RedisLockService,
         bookmark_service: BookmarkService,
+        branch_flow_graph_store: BranchFlowGraphStore,
+        sweep: bool = MERGE_TO_DEPLOY_SWEEP_ENABLED,
     ):
         self.org_id = org_id
         self.code_repo_service = code_repo_service
         self.workflow_repo_service = workflow_repo_service
         self.deployment_pr_mapper_service = deployment_pr_mapper_service
-        self.redis_lock_service = redis_lock_service
         self.bookmark_service = bookmark_service
+        self.branch_flow_graph_store = branch_flow_graph_store
+        self.sweep = sweep
 
-    def process_org_mtd(self):
-        org_repos: List[OrgRepo] = self.code_repo_service.get_active_org_repos(
-            self.org_id
-        )
-        for org_repo in org_repos:
-            try:
-                with self.redis_lock_service.acquire_lock(
-                    "{org_repo}:" + f"{str(org_repo.id)}:merge_to_deploy_broker"
-                ):
-                    self._process_deployments_for_merge_to_deploy_caching(
-                        str(org_repo.id)
-                    )
-            except Exception as e:
-                print(f"Error syncing workflow for repo {str(org_repo.id)}: {str(e)}")
-                continue
+    def process_repo_mtd(self, repo_id: str):
+        """
+        Caches merge to deploy for the repo's prs. Callers hold the repo's
+        merge to deploy lock, see get_merge_to_deploy_lock_key.
+        """
+        updated_weeks: Set[datetime] = set()
+        try:
+            self._process_deployments_for_merge_to_deploy_caching(
+                repo_id, updated_weeks
+            )
+        finally:
+            # Lead time rollups of the weeks of the prs whose merge to deploy got set
+            self.code_repo_service.refresh_repo_lead_time_rollups(
+                repo_id, updated_weeks
+            )
 
-    def _process_deployments_for_merge_to_deploy_caching(self, repo_id: str):
+    def _process_deployments_for_merge_to_deploy_caching(
+        self, repo_id: str, updated_weeks: Set[datetime]
+    ):
         org_repo: OrgRepo = self.code_repo_service.get_repo_by_id(repo_id)
         if not org_repo:
             Exception(f"Repo with {repo_id} not found")
@@ -65,6 +85,12 @@ class MergeToDeployCacheHandler:
             repo_id, BookmarkType.MERGE_TO_DEPLOY_BOOKMARK, org_repo.provider
         )
 
+        if self.sweep:
+            self._sweep_deployments_for_merge_to_deploy_caching(
+                org_repo, bookmark, updated_weeks
+            )
+            return
+
         repo_workflow_runs: List[RepoWorkflowRuns] = (
             self.workflow_repo_service.get_repo_workflow_runs_conducted_after_time(
                 repo_id, bookmark, DEPLOYMENTS_TO_PROCESS
@@ -74,10 +100,21 @@ class MergeToDeployCacheHandler:
         if not repo_workflow_runs:
             return
 
+        last_conducted_at_by_workflow: Dict[Tuple[str, str], Optional[datetime]] = {}
         for repo_workflow_run in repo_workflow_runs:
+            self._add_previous_deployments(
+                [repo_workflow_run], last_conducted_at_by_workflow
+            )
+            workflow_branch = _get_workflow_branch(repo_workflow_run)
             try:
                 self._cache_prs_merge_to_deploy_for_repo_workflow_run(
-                    repo_id, repo_workflow_run
+                    repo_id,
+                    repo_workflow_run,
+                    last_conducted_at_by_workflow.get(workflow_branch),
+                    updated_weeks,
+                )
+                last_conducted_at_by_workflow[workflow_branch] = (
+                    repo_workflow_run.conducted_at
                 )
                 conducted_at: datetime = repo_workflow_run.conducted_at
                 self.bookmark_service.update_bookmark(
@@ -89,38 +126,225 @@ class MergeToDeployCacheHandler:
             except Exception as e:
                 raise Exception(f"Error caching prs for repo {repo_id}: {str(e)}")
 
+    def _sweep_deployments_for_merge_to_deploy_caching(
+        self,
+        org_repo: OrgRepo,
+        bookmark: Optional[datetime],
+        updated_weeks: Set[datetime],
+    ):
+        """
+        Processes every workflow run after the bookmark, a batch at a time, against
+        the repo's branch flow graph. Each batch loads its runs and deployed prs once
+        and writes all merge to deploy values in one bulk update, instead of querying
+        and writing per run.
+        """
+        repo_id = str(org_repo.id)
+        # The code sync of this job may have just saved prs the graph has not seen
+        branch_graph = self.branch_flow_graph_store.get_graph(
+            repo_id, force_refresh=True
+        )
+        last_conducted_at_by_workflow: Dict[Tuple[str, str], Optional[datetime]] = {}
+        while True:
+            repo_workflow_runs: List[RepoWorkflowRuns] = (
+                self.workflow_repo_service.get_repo_workflow_runs_conducted_after_time(
+                    repo_id, bookmark, DEPLOYMENTS_TO_PROCESS
+                )
+            )
+            if not repo_workflow_runs:
+                return
+
+            try:
+                self._cache_prs_merge_to_deploy_for_repo_workflow_runs(
+                    repo_id,
+                    branch_graph,
+                    repo_workflow_runs,
+                    last_conducted_at_by_workflow,
+                    updated_weeks,
+                )
+            except Exception as e:
+                # The graph already has these prs marked deployed
+                self.branch_flow_graph_store.invalidate(repo_id)
+                raise Exception(f"Error caching prs for repo {repo_id}: {str(e)}")
+
+            last_conducted_at: datetime = repo_workflow_runs[-1].conducted_at
+            self.bookmark_service.update_bookmark(
+                repo_id,
+                BookmarkType.MERGE_TO_DEPLOY_BOOKMARK,
+                org_repo.provider,
+                last_conducted_at,
+            )
+            # Runs at the bookmark are fetched again, stop once a batch makes no progress
+            if (
+                len(repo_workflow_runs) < DEPLOYMENTS_TO_PROCESS
+                or last_conducted_at == bookmark
+            ):
+                return
+            bookmark = last_conducted_at
+
+    def _cache_prs_merge_to_deploy_for_repo_workflow_runs(
+        self,
+        repo_id: str,
+        branch_graph: BranchFlowGraph,
+        repo_workflow_runs: List[RepoWorkflowRuns],
+        last_conducted_at_by_workflow: Dict[Tuple[str, str], Optional[datetime]],
+        updated_weeks: Set[datetime],
+    ):
+        successful_runs = [
+            repo_workflow_run
+            for repo_workflow_run in repo_workflow_runs
+            if repo_workflow_run.status == RepoWorkflowRunsStatus.SUCCESS
+        ]
+        if not successful_runs:
+            return
+
+        self._add_previous_deployments(successful_runs, last_conducted_at_by_workflow)
+
+        prs_deployed_by_runs = (
+            self.deployment_pr_mapper_service.get_prs_deployed_by_deployments(
+                branch_graph, successful_runs, last_conducted_at_by_workflow
+            )
+        )
+        deployed_pr_ids = list(
+            {pr_id for _, pr_ids in prs_deployed_by_runs for pr_id in pr_ids}
+        )
+        if not deployed_pr_ids:
+            return
+
+        pr_id_to_pr_map: Dict[str, PullRequest] = {
+            str(pr.id): pr
+            for pr in self.code_repo_service.get_prs_by_ids(deployed_pr_ids)
+        }
+        prs_to_update: List[PullRequest] = []
+        deployment_pull_requests: List[DeploymentPullRequest] = []
+        for repo_workflow_run, pr_ids in prs_deployed_by_runs:
+            for pr_id in pr_ids:
+                pr = pr_id_to_pr_map.get(pr_id)
+                if not pr:
+                    continue
+
+                deployment_pull_requests.append(
+                    self._get_deployment_pull_request(repo_id, repo_workflow_run, pr)
+                )
+                # Runs come in conducted_at order, the first workflow to ship a pr sets it
+                if pr.merge_to_deploy is None:
+                    pr.merge_to_deploy = self._get_merge_to_deploy(
+                        repo_workflow_run, pr
+                    )
+                    prs_to_update.append(pr)
+
+        self.code_repo_service.save_deployment_pull_requests(deployment_pull_requests)
+        self.code_repo_service.update_prs(prs_to_update)
+        updated_weeks.update(_get_merge_weeks(prs_to_update))
+
+    def _add_previous_deployments(
+        self,
+        repo_workflow_runs: List[RepoWorkflowRuns],
+        last_conducted_at_by_workflow: Dict[Tuple[str, str], Optional[datetime]],
+    ):
+        """
+        Adds the last successful run before the given ones for each workflow and branch
+        not seen yet, so mapping starts from the deployments already processed instead
+        of walking every pr merged before them.
+        """
+        for repo_workflow_run in sorted(
+            repo_workflow_runs, key=lambda run: run.conducted_at
+        ):
+            workflow_branch = _get_workflow_branch(repo_workflow_run)
+            if workflow_branch in last_conducted_at_by_workflow:
+                continue
+
+            previous_run: Optional[RepoWorkflowRuns] = (
+                self.workflow_repo_service.get_previous_successful_workflow_run(
+                    repo_workflow_run
+                )
+            )
+            last_conducted_at_by_workflow[workflow_branch] = (
+                previous_run.conducted_at if previous_run else None
+            )
+
     def _cache_prs_merge_to_deploy_for_repo_workflow_run(
-        self, repo_id: str, repo_workflow_run: RepoWorkflowRuns
+        self,
+        repo_id: str,
+        repo_workflow_run: RepoWorkflowRuns,
+        previous_conducted_at: Optional[datetime],
+        updated_weeks: Set[datetime],
     ):
         if repo_workflow_run.status != RepoWorkflowRunsStatus.SUCCESS:
             return
 
-        conducted_at: datetime = repo_workflow_run.conducted_at
         relevant_prs: List[PullRequest] = (
-            self.code_repo_service.get_prs_in_repo_merged_before_given_date_with_merge_to_deploy_as_null(
-                repo_id, conducted_at
+            self.code_repo_service.get_prs_in_repo_merged_before_given_date_not_deployed_by_workflow(
+                repo_id,
+                str(repo_workflow_run.repo_workflow_id),
+                repo_workflow_run.conducted_at,
             )
         )
-        prs_to_update: List[PullRequest] = (
+        deployed_prs: List[PullRequest] = (
             self.deployment_pr_mapper_service.get_all_prs_deployed(
-                relevant_prs, repo_workflow_run
+                relevant_prs, repo_workflow_run, previous_conducted_at
             )
         )
 
-        for pr in prs_to_update:
-            pr.merge_to_deploy = int(
-                (conducted_at - pr.state_changed_at).total_seconds()
-            )
+        prs_to_update: List[PullRequest] = []
+        for pr in deployed_prs:
+            if pr.merge_to_deploy is None:
+                pr.merge_to_deploy = self._get_merge_to_deploy(repo_workflow_run, pr)
+                prs_to_update.append(pr)
+        self.code_repo_service.save_deployment_pull_requests(
+            [
+                self._get_deployment_pull_request(repo_id, repo_workflow_run, pr)
+                for pr in deployed_prs
+            ]
+        )
         self.code_repo_service.update_prs(prs_to_update)
+        updated_weeks.update(_get_merge_weeks(prs_to_update))
+
+    def _get_merge_to_deploy(
+        self, repo_workflow_run: RepoWorkflowRuns, pr: PullRequest
+    ) -> int:
+        return int(
+            (repo_workflow_run.conducted_at - pr.state_changed_at).total_seconds()
+        )
+
+    def _get_deployment_pull_request(
+        self, repo_id: str, repo_workflow_run: RepoWorkflowRuns, pr: PullRequest
+    ) -> DeploymentPullRequest:
+        # Saved before merge to deploy is cached, so a failed run is remapped on retry
+        return DeploymentPullRequest(
+            repo_workflow_run_id=repo_workflow_run.id,
+            pull_request_id=pr.id,
+            repo_id=repo_id,
+            repo_workflow_id=repo_workflow_run.repo_workflow_id,
+        )
+
+
+def _get_workflow_branch(repo_workflow_run: RepoWorkflowRuns) -> Tuple[str, str]:
+    return str(repo_workflow_run.repo_workflow_id), repo_workflow_run.head_branch
+
+
+def _get_merge_weeks(prs: List[PullRequest]) -> Set[datetime]:
+    return {
+        get_given_weeks_monday(pr.state_changed_at.astimezone(tz=pytz.UTC))
+        for pr in prs
+    }
 
 
-def process_merge_to_deploy_cache(org_id: str):
-    merge_to_deploy_cache_handler = MergeToDeployCacheHandler(
+def _get_merge_to_deploy_cache_handler(org_id: str) -> MergeToDeployCacheHandler:
+    return MergeToDeployCacheHandler(
         org_id,
         CodeRepoService(),
         WorkflowRepoService(),
         DeploymentPRMapperService(),
-        get_redis_lock_service(),
         get_bookmark_service(),
+        get_branch_flow_graph_store(),
     )
-    merge_to_deploy_cache_handler.process_org_mtd()
+
+
+def get_repos_to_process_merge_to_deploy(org_id: str) -> List[str]:
+    return [
+        str(org_repo.id) for org_repo in CodeRepoService().get_active_org_repos(org_id)
+    ]
+
+
+def process_repo_merge_to_deploy_cache(org_id: str, repo_id: str):
+    _get_merge_to_deploy_cache_handler(org_id).process_repo_mtd(repo_id)
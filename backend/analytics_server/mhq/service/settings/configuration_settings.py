@@ -16,6 +16,7 @@ from mhq.store.models.incidents import IncidentSource, IncidentType
 from mhq.store.models.settings import SettingType, Settings, EntityType
 from mhq.store.repos.settings import SettingsRepoService
 from mhq.utils.time import time_now
+from mhq.service.analytics_cache import get_analytics_cache
 from mhq.service.bookmark.bookmark import get_bookmark_service
 
 
@@ -359,6 +360,7 @@ class SettingsService:
         self._handle_settings_update_side_effect(
             setting_type, saved_config_setting, existing_setting
         )
+        self._invalidate_analytics_cache(entity_type, entity_id)
 
         return saved_config_setting
 
@@ -370,14 +372,21 @@ class SettingsService:
         entity_id: str,
     ) -> ConfigurationSettings:
 
-        return self._adapt_config_setting_from_db_setting(
-            self._settings_repo.delete_setting(
-                setting_type=setting_type,
-                entity_id=entity_id,
-                entity_type=entity_type,
-                deleted_by=deleted_by,
-            )
+        deleted_setting = self._settings_repo.delete_setting(
+            setting_type=setting_type,
+            entity_id=entity_id,
+            entity_type=entity_type,
+            deleted_by=deleted_by,
         )
+        self._invalidate_analytics_cache(entity_type, entity_id)
+
+        return self._adapt_config_setting_from_db_setting(deleted_setting)
+
+    def _invalidate_analytics_cache(self, entity_type: EntityType, entity_id: str):
+        if entity_type == EntityType.TEAM:
+            get_analytics_cache().invalidate_team(entity_id)
+        elif entity_type == EntityType.ORG:
+            get_analytics_cache().invalidate_org(entity_id)
 
     def get_settings_map(
         self,
@@ -0,0 +1,12 @@
+from .models import SyncJob, SyncJobStatus, SyncStageProgress, SyncTask
+from .queue import (
+    SYNC_JOB_QUEUE_BACKEND,
+    SYNC_TASK_VISIBILITY_TIMEOUT_SECONDS,
+    InMemorySyncJobQueue,
+    RedisSyncJobQueue,
+    SyncJobQueue,
+    get_sync_job_queue,
+)
+from .stages import SyncStage, get_sync_stages
+from .sync_job_service import SyncJobService, get_sync_job_service
+from .worker import SyncWorker, get_sync_worker, start_in_process_sync_worker
@@ -0,0 +1,222 @@
+import json
+from dataclasses import dataclass, field
+from datetime import datetime
+from enum import Enum
+from typing import Any, Dict, List, Optional
+
+
+class SyncJobStatus(Enum):
+    QUEUED = "QUEUED"
+    RUNNING = "RUNNING"
+    COMPLETED = "COMPLETED"
+    FAILED = "FAILED"
+
+    @property
+    def is_finished(self) -> bool:
+        return self in (SyncJobStatus.COMPLETED, SyncJobStatus.FAILED)
+
+
+def _to_iso(dt: Optional[datetime]) -> Optional[str]:
+    return dt.isoformat() if dt else None
+
+
+def _from_iso(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
+def get_stage_field(stage_name: str, name: str) -> str:
+    return f"stage:{stage_name}:{name}"
+
+
+@dataclass
+class SyncStageProgress:
+    name: str
+    status: SyncJobStatus = SyncJobStatus.QUEUED
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    depends_on: List[str] = field(default_factory=list)
+    total_tasks: int = 0
+    completed_tasks: int = 0
+    failed_tasks: int = 0
+    task_milliseconds: int = 0
+    error: Optional[str] = None
+
+    @property
+    def duration_seconds(self) -> Optional[float]:
+        """
+        Wall clock time from planning the stage to its last task finishing,
+        including the time tasks waited on upstream stages.
+        """
+        if not self.started_at or not self.finished_at:
+            return None
+        return (self.finished_at - self.started_at).total_seconds()
+
+    @property
+    def task_seconds(self) -> float:
+        """
+        Time spent running the stage's tasks, summed across workers.
+        """
+        return self.task_milliseconds / 1000
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "status": self.status.value,
+            "started_at": _to_iso(self.started_at),
+            "finished_at": _to_iso(self.finished_at),
+            "duration_seconds": self.duration_seconds,
+            "task_seconds": self.task_seconds,
+            "depends_on": self.depends_on,
+            "total_tasks": self.total_tasks,
+            "completed_tasks": self.completed_tasks,
+            "failed_tasks": self.failed_tasks,
+            "error": self.error,
+        }
+
+    @classmethod
+    def from_fields(cls, name: str, fields: Dict[str, str]) -> "SyncStageProgress":
+        def _get(field_name: str) -> Optional[str]:
+            return fields.get(get_stage_field(name, field_name))
+
+        return cls(
+            name=name,
+            status=SyncJobStatus(_get("status") or SyncJobStatus.QUEUED.value),
+            started_at=_from_iso(_get("started_at")),
+            finished_at=_from_iso(_get("finished_at")),
+            depends_on=json.loads(_get("depends_on") or "[]"),
+            total_tasks=int(_get("total_tasks") or 0),
+            completed_tasks=int(_get("completed_tasks") or 0),
+            failed_tasks=int(_get("failed_tasks") or 0),
+            task_milliseconds=int(_get("task_milliseconds") or 0),
+            error=_get("error") or None,
+        )
+
+
+@dataclass
+class SyncJob:
+    """
+    Status of a sync job. Jobs are stored as a flat mapping of fields, so workers
+    can update stages and task counters of the same job concurrently.
+    """
+
+    id: str
+    org_id: str
+    created_at: datetime
+    status: SyncJobStatus = SyncJobStatus.QUEUED
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    stages: List[SyncStageProgress] = field(default_factory=list)
+
+    def get_stage(self, name: str) -> SyncStageProgress:
+        for stage in self.stages:
+            if stage.name == name:
+                return stage
+        raise KeyError(name)
+
+    @property
+    def critical_path(self) -> List[str]:
+        """
+        Chain of stages that bounded the job's duration: the stage that finished
+        last, preceded by whichever of its upstream stages finished last, and so on.
+        """
+        finished_stages = {
+            stage.name: stage for stage in self.stages if stage.finished_at
+        }
+        if not finished_stages:
+            return []
+
+        path: List[str] = []
+        stage: Optional[SyncStageProgress] = max(
+            finished_stages.values(), key=lambda stage: stage.finished_at
+        )
+        while stage:
+            path.append(stage.name)
+            upstream_stages = [
+                finished_stages[name]
+                for name in stage.depends_on
+                if name in finished_stages
+            ]
+            stage = (
+                max(upstream_stages, key=lambda stage: stage.finished_at)
+                if upstream_stages
+                else None
+            )
+        return list(reversed(path))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "org_id": self.org_id,
+            "status": self.status.value,
+            "created_at": _to_iso(self.created_at),
+            "started_at": _to_iso(self.started_at),
+            "finished_at": _to_iso(self.finished_at),
+            "stages": [stage.to_dict() for stage in self.stages],
+            "critical_path": self.critical_path,
+        }
+
+    def to_fields(self) -> Dict[str, str]:
+        fields = {
+            "org_id": self.org_id,
+            "created_at": _to_iso(self.created_at),
+            "status": self.status.value,
+            "stages": json.dumps([stage.name for stage in self.stages]),
+        }
+        for stage in self.stages:
+            fields[get_stage_field(stage.name, "status")] = stage.status.value
+            fields[get_stage_field(stage.name, "depends_on")] = json.dumps(
+                stage.depends_on
+            )
+        return fields
+
+    @classmethod
+    def from_fields(cls, job_id: str, fields: Dict[str, str]) -> "SyncJob":
+        return cls(
+            id=job_id,
+            org_id=fields["org_id"],
+            created_at=_from_iso(fields["created_at"]),
+            status=SyncJobStatus(fields["status"]),
+            started_at=_from_iso(fields.get("started_at")),
+            finished_at=_from_iso(fields.get("finished_at")),
+            stages=[
+                SyncStageProgress.from_fields(name, fields)
+                for name in json.loads(fields["stages"])
+            ],
+        )
+
+
+@dataclass
+class SyncTask:
+    """
+    Unit of work of a sync job. A task without params plans its stage, i.e. lists
+    the per repo (or per workflow, per incident service) tasks the stage runs.
+    """
+
+    id: str
+    job_id: str
+    stage: str
+    params: Optional[Dict[str, str]] = None
+
+    @property
+    def is_planning(self) -> bool:
+        return self.params is None
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {
+                "id": self.id,
+                "job_id": self.job_id,
+                "stage": self.stage,
+                "params": self.params,
+            }
+        )
+
+    @classmethod
+    def from_json(cls, data: str) -> "SyncTask":
+        task = json.loads(data)
+        return cls(
+            id=task["id"],
+            job_id=task["job_id"],
+            stage=task["stage"],
+            params=task["params"],
+        )
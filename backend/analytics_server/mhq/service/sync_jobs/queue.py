@@ -0,0 +1,536 @@
+import json
+import queue
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from os import getenv
+from typing import Callable, Dict, List, Optional, Tuple
+
+from redis import Redis
+
+from mhq.service.sync_jobs.models import SyncJob, SyncTask
+from mhq.utils.lock import get_redis_lock_service
+
+SYNC_JOB_QUEUE_BACKEND = getenv("SYNC_JOB_QUEUE_BACKEND", "redis")
+SYNC_JOB_RETENTION_SECONDS = int(getenv("SYNC_JOB_RETENTION_SECONDS", 7 * 24 * 3600))
+# A crashed worker must not block new syncs of the org forever
+SYNC_JOB_ACTIVE_TTL_SECONDS = int(getenv("SYNC_JOB_ACTIVE_TTL_SECONDS", 6 * 3600))
+# A popped task goes back to the queue once its worker stops extending its lease
+SYNC_TASK_VISIBILITY_TIMEOUT_SECONDS = int(
+    getenv("SYNC_TASK_VISIBILITY_TIMEOUT_SECONDS", 300)
+)
+
+REDIS_KEY_PREFIX = "{sync_jobs}"
+
+
+class SyncJobQueue(ABC):
+    """
+    Queue of sync tasks along with the status records of their jobs and the
+    dependencies between their tasks.
+    """
+
+    @abstractmethod
+    def save_job(self, job: SyncJob):
+        pass
+
+    @abstractmethod
+    def get_job(self, job_id: str) -> Optional[SyncJob]:
+        pass
+
+    @abstractmethod
+    def set_job_fields(self, job_id: str, fields: Dict[str, str]):
+        pass
+
+    @abstractmethod
+    def increment_job_field(self, job_id: str, field: str, amount: int = 1) -> int:
+        """
+        Atomically increments a counter field of the job.
+
+        :return: The incremented value
+        """
+
+    @abstractmethod
+    def save_task(self, task: SyncTask, pending: int):
+        """
+        Stores the task along with the number of things it waits for before it
+        can be queued.
+        """
+
+    @abstractmethod
+    def get_task(self, job_id: str, task_id: str) -> Optional[SyncTask]:
+        pass
+
+    @abstractmethod
+    def increment_task_pending(self, job_id: str, task_id: str, amount: int) -> int:
+        """
+        :return: The task's pending count after the increment
+        """
+
+    @abstractmethod
+    def add_task_dependent(self, job_id: str, task_id: str, dependent_id: str) -> bool:
+        """
+        Registers dependent_id to be handed out by finish_task(task_id).
+        Atomic with respect to finish_task, a dependent added after the task
+        finished is not handed out.
+
+        :return: True if the task already finished
+        """
+
+    @abstractmethod
+    def finish_task(self, job_id: str, task_id: str) -> List[str]:
+        """
+        Marks the task finished.
+
+        :return: Ids of the tasks registered as its dependents so far
+        """
+
+    @abstractmethod
+    def set_stage_task_ids_by_key(
+        self, job_id: str, stage: str, task_ids_by_key: Dict[str, List[str]]
+    ):
+        pass
+
+    @abstractmethod
+    def get_stage_task_ids_by_key(
+        self, job_id: str, stage: str
+    ) -> Dict[str, List[str]]:
+        pass
+
+    @abstractmethod
+    def push(self, task: SyncTask):
+        pass
+
+    @abstractmethod
+    def pop(
+        self, timeout: float, worker_id: Optional[str] = None
+    ) -> Optional[SyncTask]:
+        """
+        Blocks for up to timeout seconds for the next task. A popped task is
+        handed to exactly one worker.
+
+        With a worker id the task stays in the worker's processing list until
+        acked. If the worker's lease runs out before that, eg. because it crashed,
+        requeue_expired_tasks hands the task to another worker.
+        """
+
+    @abstractmethod
+    def ack(self, worker_id: str):
+        """
+        Drops the task the worker popped last from its processing list.
+        """
+
+    @abstractmethod
+    def extend_lease(self, worker_id: str):
+        """
+        Keeps the worker's popped task from being requeued for another visibility
+        timeout.
+        """
+
+    @abstractmethod
+    def requeue_expired_tasks(self) -> int:
+        """
+        Queues the tasks of workers whose lease ran out again.
+
+        :return: Number of tasks queued again
+        """
+
+    @abstractmethod
+    def is_task_finished(self, job_id: str, task_id: str) -> bool:
+        pass
+
+    @abstractmethod
+    def get_active_job_id(self, org_id: str) -> Optional[str]:
+        pass
+
+    @abstractmethod
+    def set_active_job_id(self, org_id: str, job_id: str) -> bool:
+        """
+        Marks the job as the active one of the org, unless the org already has one.
+
+        :return: True if the job was marked active
+        """
+
+    @abstractmethod
+    def clear_active_job_id(self, org_id: str, job_id: str):
+        """
+        Clears the active job of the org if it still is job_id.
+        """
+
+
+def _decode(value) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+# Moves a worker's processing list back to the head of the queue if its lease is
+# still expired, so a worker extending its lease concurrently keeps its task
+_REQUEUE_EXPIRED_TASKS_SCRIPT = """
+local deadline = redis.call("ZSCORE", KEYS[1], ARGV[1])
+if not deadline or tonumber(deadline) > tonumber(ARGV[2]) then
+    return 0
+end
+local requeued = 0
+while redis.call("LMOVE", KEYS[2], KEYS[3], "RIGHT", "RIGHT") do
+    requeued = requeued + 1
+end
+redis.call("ZREM", KEYS[1], ARGV[1])
+return requeued
+"""
+
+
+class RedisSyncJobQueue(SyncJobQueue):
+    """
+    Tasks are pushed to the left of the queue list and popped from the right with
+    BLMOVE into a per worker processing list, so a task outlives the worker which
+    popped it. Workers hold a lease in a sorted set, scored by its deadline.
+    """
+
+    def __init__(
+        self,
+        redis: Redis,
+        visibility_timeout: float = SYNC_TASK_VISIBILITY_TIMEOUT_SECONDS,
+    ):
+        self._redis = redis
+        self._visibility_timeout = visibility_timeout
+        self._requeue_expired_tasks = redis.register_script(
+            _REQUEUE_EXPIRED_TASKS_SCRIPT
+        )
+
+    def save_job(self, job: SyncJob):
+        pipeline = self._redis.pipeline()
+        pipeline.hset(self._job_key(job.id), mapping=job.to_fields())
+        pipeline.expire(self._job_key(job.id), SYNC_JOB_RETENTION_SECONDS)
+        pipeline.execute()
+
+    def get_job(self, job_id: str) -> Optional[SyncJob]:
+        fields = self._redis.hgetall(self._job_key(job_id))
+        if not fields:
+            return None
+        return SyncJob.from_fields(
+            job_id, {_decode(key): _decode(value) for key, value in fields.items()}
+        )
+
+    def set_job_fields(self, job_id: str, fields: Dict[str, str]):
+        self._redis.hset(self._job_key(job_id), mapping=fields)
+
+    def increment_job_field(self, job_id: str, field: str, amount: int = 1) -> int:
+        return int(self._redis.hincrby(self._job_key(job_id), field, amount))
+
+    def save_task(self, task: SyncTask, pending: int):
+        tasks_key = self._tasks_key(task.job_id)
+        pipeline = self._redis.pipeline()
+        pipeline.hset(
+            tasks_key,
+            mapping={task.id: task.to_json(), f"{task.id}:pending": pending},
+        )
+        pipeline.expire(tasks_key, SYNC_JOB_RETENTION_SECONDS)
+        pipeline.execute()
+
+    def get_task(self, job_id: str, task_id: str) -> Optional[SyncTask]:
+        data = self._redis.hget(self._tasks_key(job_id), task_id)
+        return SyncTask.from_json(_decode(data)) if data else None
+
+    def increment_task_pending(self, job_id: str, task_id: str, amount: int) -> int:
+        return int(
+            self._redis.hincrby(self._tasks_key(job_id), f"{task_id}:pending", amount)
+        )
+
+    def add_task_dependent(self, job_id: str, task_id: str, dependent_id: str) -> bool:
+        dependents_key = self._dependents_key(job_id, task_id)
+        pipeline = self._redis.pipeline(transaction=True)
+        pipeline.rpush(dependents_key, dependent_id)
+        pipeline.expire(dependents_key, SYNC_JOB_RETENTION_SECONDS)
+        pipeline.hget(self._tasks_key(job_id), f"{task_id}:finished")
+        _, _, finished = pipeline.execute()
+        return bool(finished)
+
+    def finish_task(self, job_id: str, task_id: str) -> List[str]:
+        pipeline = self._redis.pipeline(transaction=True)
+        pipeline.hset(self._tasks_key(job_id), f"{task_id}:finished", "1")
+        pipeline.lrange(self._dependents_key(job_id, task_id), 0, -1)
+        _, dependent_ids = pipeline.execute()
+        return [_decode(dependent_id) for dependent_id in dependent_ids]
+
+    def set_stage_task_ids_by_key(
+        self, job_id: str, stage: str, task_ids_by_key: Dict[str, List[str]]
+    ):
+        self._redis.hset(
+            self._tasks_key(job_id),
+            f"stage:{stage}:task_ids_by_key",
+            json.dumps(task_ids_by_key),
+        )
+
+    def get_stage_task_ids_by_key(
+        self, job_id: str, stage: str
+    ) -> Dict[str, List[str]]:
+        data = self._redis.hget(
+            self._tasks_key(job_id), f"stage:{stage}:task_ids_by_key"
+        )
+        return json.loads(_decode(data)) if data else {}
+
+    def push(self, task: SyncTask):
+        self._redis.lpush(self._queue_key(), task.to_json())
+
+    def pop(
+        self, timeout: float, worker_id: Optional[str] = None
+    ) -> Optional[SyncTask]:
+        if not worker_id:
+            item = self._redis.brpop([self._queue_key()], timeout=timeout)
+            return SyncTask.from_json(_decode(item[1])) if item else None
+
+        # The lease is taken before blocking, a worker dying right after the move
+        # still has its task requeued
+        self._set_lease(worker_id, timeout + self._visibility_timeout)
+        data = self._redis.blmove(
+            self._queue_key(),
+            self._processing_key(worker_id),
+            timeout,
+            "RIGHT",
+            "LEFT",
+        )
+        if not data:
+            self._redis.zrem(self._leases_key(), worker_id)
+            return None
+        return SyncTask.from_json(_decode(data))
+
+    def ack(self, worker_id: str):
+        pipeline = self._redis.pipeline(transaction=True)
+        pipeline.delete(self._processing_key(worker_id))
+        pipeline.zrem(self._leases_key(), worker_id)
+        pipeline.execute()
+
+    def extend_lease(self, worker_id: str):
+        self._set_lease(worker_id, self._visibility_timeout, only_existing=True)
+
+    def requeue_expired_tasks(self) -> int:
+        now = time.time()
+        requeued = 0
+        for worker_id in self._redis.zrangebyscore(self._leases_key(), 0, now):
+            worker_id = _decode(worker_id)
+            requeued += int(
+                self._requeue_expired_tasks(
+                    keys=[
+                        self._leases_key(),
+                        self._processing_key(worker_id),
+                        self._queue_key(),
+                    ],
+                    args=[worker_id, now],
+                )
+            )
+        return requeued
+
+    def is_task_finished(self, job_id: str, task_id: str) -> bool:
+        return bool(self._redis.hexists(self._tasks_key(job_id), f"{task_id}:finished"))
+
+    def _set_lease(self, worker_id: str, duration: float, only_existing: bool = False):
+        self._redis.zadd(
+            self._leases_key(),
+            {worker_id: time.time() + duration},
+            xx=only_existing,
+        )
+
+    def get_active_job_id(self, org_id: str) -> Optional[str]:
+        job_id = self._redis.get(self._active_job_key(org_id))
+        return _decode(job_id) if job_id else None
+
+    def set_active_job_id(self, org_id: str, job_id: str) -> bool:
+        return bool(
+            self._redis.set(
+                self._active_job_key(org_id),
+                job_id,
+                nx=True,
+                ex=SYNC_JOB_ACTIVE_TTL_SECONDS,
+            )
+        )
+
+    def clear_active_job_id(self, org_id: str, job_id: str):
+        if self.get_active_job_id(org_id) == job_id:
+            self._redis.delete(self._active_job_key(org_id))
+
+    @staticmethod
+    def _queue_key() -> str:
+        return f"{REDIS_KEY_PREFIX}:queue"
+
+    @staticmethod
+    def _processing_key(worker_id: str) -> str:
+        return f"{REDIS_KEY_PREFIX}:worker:{worker_id}:processing"
+
+    @staticmethod
+    def _leases_key() -> str:
+        return f"{REDIS_KEY_PREFIX}:leases"
+
+    @staticmethod
+    def _job_key(job_id: str) -> str:
+        return f"{REDIS_KEY_PREFIX}:job:{job_id}"
+
+    @staticmethod
+    def _active_job_key(org_id: str) -> str:
+        return f"{REDIS_KEY_PREFIX}:org:{org_id}:active_job"
+
+    @staticmethod
+    def _tasks_key(job_id: str) -> str:
+        return f"{REDIS_KEY_PREFIX}:job:{job_id}:tasks"
+
+    @staticmethod
+    def _dependents_key(job_id: str, task_id: str) -> str:
+        return f"{REDIS_KEY_PREFIX}:job:{job_id}:dependents:{task_id}"
+
+
+class InMemorySyncJobQueue(SyncJobQueue):
+    """
+    Process local queue, used by tests and single process setups without Redis.
+    """
+
+    def __init__(
+        self,
+        visibility_timeout: float = SYNC_TASK_VISIBILITY_TIMEOUT_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._queue: "queue.Queue[str]" = queue.Queue()
+        self._visibility_timeout = visibility_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._processing: Dict[str, str] = {}
+        self._lease_deadlines: Dict[str, float] = {}
+        self._jobs: Dict[str, Dict[str, str]] = defaultdict(dict)
+        self._active_job_ids: Dict[str, str] = {}
+        self._tasks: Dict[str, Dict[str, str]] = defaultdict(dict)
+        self._dependents: Dict[Tuple[str, str], List[str]] = defaultdict(list)
+
+    def save_job(self, job: SyncJob):
+        with self._lock:
+            self._jobs[job.id].update(job.to_fields())
+
+    def get_job(self, job_id: str) -> Optional[SyncJob]:
+        with self._lock:
+            fields = dict(self._jobs.get(job_id, {}))
+        return SyncJob.from_fields(job_id, fields) if fields else None
+
+    def set_job_fields(self, job_id: str, fields: Dict[str, str]):
+        with self._lock:
+            self._jobs[job_id].update(fields)
+
+    def increment_job_field(self, job_id: str, field: str, amount: int = 1) -> int:
+        with self._lock:
+            value = int(self._jobs[job_id].get(field, 0)) + amount
+            self._jobs[job_id][field] = str(value)
+            return value
+
+    def save_task(self, task: SyncTask, pending: int):
+        with self._lock:
+            self._tasks[task.job_id][task.id] = task.to_json()
+            self._tasks[task.job_id][f"{task.id}:pending"] = str(pending)
+
+    def get_task(self, job_id: str, task_id: str) -> Optional[SyncTask]:
+        with self._lock:
+            data = self._tasks[job_id].get(task_id)
+        return SyncTask.from_json(data) if data else None
+
+    def increment_task_pending(self, job_id: str, task_id: str, amount: int) -> int:
+        with self._lock:
+            field = f"{task_id}:pending"
+            value = int(self._tasks[job_id].get(field, 0)) + amount
+            self._tasks[job_id][field] = str(value)
+            return value
+
+    def add_task_dependent(self, job_id: str, task_id: str, dependent_id: str) -> bool:
+        with self._lock:
+            self._dependents[(job_id, task_id)].append(dependent_id)
+            return f"{task_id}:finished" in self._tasks[job_id]
+
+    def finish_task(self, job_id: str, task_id: str) -> List[str]:
+        with self._lock:
+            self._tasks[job_id][f"{task_id}:finished"] = "1"
+            return list(self._dependents[(job_id, task_id)])
+
+    def set_stage_task_ids_by_key(
+        self, job_id: str, stage: str, task_ids_by_key: Dict[str, List[str]]
+    ):
+        with self._lock:
+            self._tasks[job_id][f"stage:{stage}:task_ids_by_key"] = json.dumps(
+                task_ids_by_key
+            )
+
+    def get_stage_task_ids_by_key(
+        self, job_id: str, stage: str
+    ) -> Dict[str, List[str]]:
+        with self._lock:
+            data = self._tasks[job_id].get(f"stage:{stage}:task_ids_by_key")
+        return json.loads(data) if data else {}
+
+    def push(self, task: SyncTask):
+        self._queue.put(task.to_json())
+
+    def pop(
+        self, timeout: float, worker_id: Optional[str] = None
+    ) -> Optional[SyncTask]:
+        try:
+            data = self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+        if worker_id:
+            with self._lock:
+                self._processing[worker_id] = data
+                self._lease_deadlines[worker_id] = (
+                    self._clock() + self._visibility_timeout
+                )
+        return SyncTask.from_json(data)
+
+    def ack(self, worker_id: str):
+        with self._lock:
+            self._processing.pop(worker_id, None)
+            self._lease_deadlines.pop(worker_id, None)
+
+    def extend_lease(self, worker_id: str):
+        with self._lock:
+            if worker_id in self._lease_deadlines:
+                self._lease_deadlines[worker_id] = (
+                    self._clock() + self._visibility_timeout
+                )
+
+    def requeue_expired_tasks(self) -> int:
+        now = self._clock()
+        with self._lock:
+            expired_worker_ids = [
+                worker_id
+                for worker_id, deadline in self._lease_deadlines.items()
+                if deadline <= now
+            ]
+            for worker_id in expired_worker_ids:
+                del self._lease_deadlines[worker_id]
+                self._queue.put(self._processing.pop(worker_id))
+        return len(expired_worker_ids)
+
+    def is_task_finished(self, job_id: str, task_id: str) -> bool:
+        with self._lock:
+            return f"{task_id}:finished" in self._tasks[job_id]
+
+    def get_active_job_id(self, org_id: str) -> Optional[str]:
+        with self._lock:
+            return self._active_job_ids.get(org_id)
+
+    def set_active_job_id(self, org_id: str, job_id: str) -> bool:
+        with self._lock:
+            if org_id in self._active_job_ids:
+                return False
+            self._active_job_ids[org_id] = job_id
+            return True
+
+    def clear_active_job_id(self, org_id: str, job_id: str):
+        with self._lock:
+            if self._active_job_ids.get(org_id) == job_id:
+                del self._active_job_ids[org_id]
+
+
+_queue: Optional[SyncJobQueue] = None
+
+
+def get_sync_job_queue() -> SyncJobQueue:
+    global _queue
+    if not _queue:
+        if SYNC_JOB_QUEUE_BACKEND == "memory":
+            _queue = InMemorySyncJobQueue()
+        else:
+            _queue = RedisSyncJobQueue(get_redis_lock_service().redis)
+    return _queue
@@ -0,0 +1,213 @@
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Tuple
+
+from mhq.service.code import (
+    get_code_repos_to_sync,
+    get_code_sync_concurrency,
+    sync_code_repo,
+    sync_code_repos,
+)
+from mhq.service.incidents import (
+    get_incident_services_to_sync,
+    refresh_org_incident_rollups,
+    sync_incident_service,
+)
+from mhq.service.merge_to_deploy_broker import (
+    get_merge_to_deploy_lock_key,
+    get_repos_to_process_merge_to_deploy,
+    process_repo_merge_to_deploy_cache,
+)
+from mhq.service.workflows import get_repo_workflows_to_sync, sync_repo_workflow
+from mhq.store.models.incidents import IncidentSource
+
+TaskParams = Dict[str, str]
+
+# Dependency key of tasks waiting for every task of their upstream stages
+ALL_TASKS_DEPENDENCY_KEY = "*"
+
+
+# Separates the repos of a task syncing several repos
+REPO_IDS_SEPARATOR = ","
+
+
+def _get_repo_ids(params: TaskParams) -> List[str]:
+    if params.get("repo_ids"):
+        return params["repo_ids"].split(REPO_IDS_SEPARATOR)
+    return [params["repo_id"]] if params.get("repo_id") else []
+
+
+@dataclass(frozen=True)
+class SyncStage:
+    """
+    A stage of the org sync, split into independent tasks.
+
+    plan lists the params of every task of the stage for an org, run runs a single
+    task, and get_lock_key names the lock held while a task runs, so the same repo
+    is never synced by two workers at once.
+
+    A task of the stage waits for the tasks of the depends_on stages which share
+    one of its dependency keys, i.e. the tasks of the same repos. Tasks without a
+    key do not wait on any task, tasks keyed ALL_TASKS_DEPENDENCY_KEY wait on all
+    of them.
+    """
+
+    name: str
+    plan: Callable[[str], List[TaskParams]]
+    run: Callable[[str, TaskParams], None]
+    get_lock_key: Callable[[TaskParams], str]
+    depends_on: Tuple[str, ...] = ()
+    get_dependency_keys: Callable[[TaskParams], List[str]] = _get_repo_ids
+
+
+def _plan_code_sync(org_id: str) -> List[TaskParams]:
+    """
+    Plans a task per repo, so repos are synced in parallel by the workers. Repos
+    of a provider with a <PROVIDER>_SYNC_CONCURRENCY go to a single task instead,
+    which syncs them over a pool bounded by that concurrency.
+    """
+    provider_repo_ids: Dict[str, List[str]] = defaultdict(list)
+    for provider, repo_id in get_code_repos_to_sync(org_id):
+        provider_repo_ids[provider].append(repo_id)
+
+    tasks_params: List[TaskParams] = []
+    for provider, repo_ids in provider_repo_ids.items():
+        if get_code_sync_concurrency(provider) > 1:
+            tasks_params.append(
+                {
+                    "org_id": org_id,
+                    "provider": provider,
+                    "repo_ids": REPO_IDS_SEPARATOR.join(repo_ids),
+                }
+            )
+            continue
+        tasks_params.extend(
+            {"provider": provider, "repo_id": repo_id} for repo_id in repo_ids
+        )
+    return tasks_params
+
+
+def _run_code_sync(org_id: str, params: TaskParams):
+    if params.get("repo_ids"):
+        sync_code_repos(org_id, params["provider"], _get_repo_ids(params))
+        return
+    sync_code_repo(org_id, params["provider"], params["repo_id"])
+
+
+def _plan_workflow_sync(org_id: str) -> List[TaskParams]:
+    return [
+        {"repo_id": repo_id, "repo_workflow_id": repo_workflow_id}
+        for repo_id, repo_workflow_id in get_repo_workflows_to_sync(org_id)
+    ]
+
+
+def _run_workflow_sync(org_id: str, params: TaskParams):
+    sync_repo_workflow(org_id, params["repo_workflow_id"])
+
+
+def _plan_merge_to_deploy(org_id: str) -> List[TaskParams]:
+    return [
+        {"repo_id": repo_id} for repo_id in get_repos_to_process_merge_to_deploy(org_id)
+    ]
+
+
+def _run_merge_to_deploy(org_id: str, params: TaskParams):
+    process_repo_merge_to_deploy_cache(org_id, params["repo_id"])
+
+
+def _plan_incident_sync(org_id: str) -> List[TaskParams]:
+    tasks_params: List[TaskParams] = []
+    for provider, service in get_incident_services_to_sync(org_id):
+        params = {"provider": provider, "service_id": str(service.id)}
+        if service.source_type == IncidentSource.GIT_REPO:
+            # Git incidents are read from the repo's synced pull requests
+            params["repo_id"] = service.key
+        tasks_params.append(params)
+    return tasks_params
+
+
+def _run_incident_sync(org_id: str, params: TaskParams):
+    sync_incident_service(org_id, params["provider"], params["service_id"])
+
+
+def _plan_incident_rollups_refresh(org_id: str) -> List[TaskParams]:
+    return [{"org_id": org_id}]
+
+
+def _run_incident_rollups_refresh(org_id: str, params: TaskParams):
+    refresh_org_incident_rollups(org_id)
+
+
+def _get_code_sync_lock_key(params: TaskParams) -> str:
+    if params.get("repo_ids"):
+        return "{org_repo}:" + f"{params['org_id']}:{params['provider']}:code_sync"
+    return "{org_repo}:" + f"{params['repo_id']}:code_sync"
+
+
+def _get_workflow_sync_lock_key(params: TaskParams) -> str:
+    return (
+        "{org_repo}:"
+        + f"{params['repo_id']}:workflow_sync:{params['repo_workflow_id']}"
+    )
+
+
+def _get_merge_to_deploy_lock_key(params: TaskParams) -> str:
+    return get_merge_to_deploy_lock_key(params["repo_id"])
+
+
+def _get_incident_sync_lock_key(params: TaskParams) -> str:
+    return "{org_incident_service}:" + f"{params['service_id']}:incident_sync"
+
+
+def _get_incident_rollups_refresh_lock_key(params: TaskParams) -> str:
+    return "{team_incident_rollups}:" + f"{params['org_id']}:refresh"
+
+
+def get_sync_stages() -> List[SyncStage]:
+    """
+    Stages of an org sync. Code and workflow sync run side by side, merge to
+    deploy caching of a repo starts once its pull requests and workflow runs are
+    synced, and git incidents of a repo once its pull requests are synced. Incident
+    rollups are refreshed once everything else is done.
+    """
+    return [
+        SyncStage(
+            "sync_code_repos",
+            _plan_code_sync,
+            _run_code_sync,
+            _get_code_sync_lock_key,
+        ),
+        SyncStage(
+            "sync_org_workflows",
+            _plan_workflow_sync,
+            _run_workflow_sync,
+            _get_workflow_sync_lock_key,
+        ),
+        SyncStage(
+            "process_merge_to_deploy_cache",
+            _plan_merge_to_deploy,
+            _run_merge_to_deploy,
+            _get_merge_to_deploy_lock_key,
+            depends_on=("sync_code_repos", "sync_org_workflows"),
+        ),
+        SyncStage(
+            "sync_org_incidents",
+            _plan_incident_sync,
+            _run_incident_sync,
+            _get_incident_sync_lock_key,
+            depends_on=("sync_code_repos",),
+        ),
+        SyncStage(
+            "refresh_incident_rollups",
+            _plan_incident_rollups_refresh,
+            _run_incident_rollups_refresh,
+            _get_incident_rollups_refresh_lock_key,
+            depends_on=(
+                "sync_code_repos",
+                "sync_org_workflows",
+                "process_merge_to_deploy_cache",
+                "sync_org_incidents",
+            ),
+            get_dependency_keys=lambda params: [ALL_TASKS_DEPENDENCY_KEY],
+        ),
+    ]
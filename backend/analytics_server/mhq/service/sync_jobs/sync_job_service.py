@@ -0,0 +1,343 @@
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Callable, ContextManager, Dict, List, Optional
+
+from mhq.service.analytics_cache import AnalyticsCache, get_analytics_cache
+from mhq.service.sync_jobs.models import (
+    SyncJob,
+    SyncJobStatus,
+    SyncStageProgress,
+    SyncTask,
+    get_stage_field,
+)
+from mhq.service.sync_jobs.queue import (
+    SYNC_JOB_QUEUE_BACKEND,
+    SyncJobQueue,
+    get_sync_job_queue,
+)
+from mhq.service.sync_jobs.stages import (
+    ALL_TASKS_DEPENDENCY_KEY,
+    SyncStage,
+    get_sync_stages,
+)
+from mhq.utils.lock import get_redis_lock_service
+from mhq.utils.log import LOG
+from mhq.utils.string import uuid4_str
+from mhq.utils.time import time_now
+
+
+def _get_planning_task_id(stage_name: str) -> str:
+    return f"{stage_name}:plan"
+
+
+class SyncJobService:
+    """
+    Splits org syncs into per repo, per workflow and per incident service tasks,
+    and runs them as a dependency graph.
+
+    Every stage starts with a planning task which queues the stage's tasks. It
+    runs once the planning tasks of the stages it depends on are done, so their
+    tasks are known. Each planned task then waits only for the upstream tasks of
+    the same repo; whichever worker finishes the last of them queues the task.
+    Any number of workers can share the queue.
+    """
+
+    def __init__(
+        self,
+        job_queue: SyncJobQueue,
+        acquire_lock: Callable[[str], ContextManager],
+        stages: Optional[List[SyncStage]] = None,
+        clock: Callable[[], datetime] = time_now,
+        analytics_cache: Optional[AnalyticsCache] = None,
+    ):
+        self._queue = job_queue
+        self._acquire_lock = acquire_lock
+        self._stages: List[SyncStage] = (
+            stages if stages is not None else get_sync_stages()
+        )
+        self._stages_by_name: Dict[str, SyncStage] = {
+            stage.name: stage for stage in self._stages
+        }
+        self._clock = clock
+        self._analytics_cache = analytics_cache
+
+    def enqueue_org_sync(self, org_id: str) -> SyncJob:
+        """
+        Queues a sync of the org. While a sync of the org is queued or running,
+        that job is returned instead of queueing another one.
+        """
+        active_job = self._get_active_job(org_id)
+        if active_job:
+            return active_job
+
+        job = SyncJob(
+            id=uuid4_str(),
+            org_id=org_id,
+            created_at=self._clock(),
+            stages=[
+                SyncStageProgress(name=stage.name, depends_on=list(stage.depends_on))
+                for stage in self._stages
+            ],
+        )
+        self._queue.save_job(job)
+        if not self._queue.set_active_job_id(org_id, job.id):
+            # Another request queued a sync of the org in the meantime
+            return self._get_active_job(org_id) or job
+
+        LOG.info(f"[Sync Jobs] Queued sync job {job.id} for org {org_id}")
+        if not self._stages:
+            self._finish_job(job.id)
+            return self._queue.get_job(job.id)
+
+        # A stage is unfinished until its planning task and all its tasks are done
+        fields = {"status": SyncJobStatus.RUNNING.value, "started_at": self._now()}
+        fields["unfinished_tasks"] = str(len(self._stages))
+        for stage in self._stages:
+            fields[get_stage_field(stage.name, "unfinished_tasks")] = "1"
+        self._queue.set_job_fields(job.id, fields)
+
+        for stage in self._stages:
+            self._schedule(
+                SyncTask(
+                    id=_get_planning_task_id(stage.name),
+                    job_id=job.id,
+                    stage=stage.name,
+                ),
+                [_get_planning_task_id(name) for name in stage.depends_on],
+            )
+        return self._queue.get_job(job.id)
+
+    def get_job(self, job_id: str) -> Optional[SyncJob]:
+        return self._queue.get_job(job_id)
+
+    def run_task(self, task: SyncTask):
+        job = self._queue.get_job(task.job_id)
+        stage = self._stages_by_name.get(task.stage)
+        if not job or job.status.is_finished or not stage:
+            LOG.warning(
+                f"[Sync Jobs] Dropping {task.stage} task of sync job {task.job_id}"
+            )
+            return
+
+        if self._queue.is_task_finished(job.id, task.id):
+            # Requeued after its worker stopped between finishing and acking it
+            LOG.warning(
+                f"[Sync Jobs] Skipping finished {task.stage} task of sync job {job.id}"
+            )
+            return
+
+        if task.is_planning:
+            self._plan_stage(job, stage)
+        else:
+            self._run_stage_task(job, stage, task.params)
+        self._finish_task(job.id, task)
+
+    def _schedule(self, task: SyncTask, upstream_task_ids: List[str]):
+        """
+        Queues the task once every upstream task is done. The pending count starts
+        one above the number of upstream tasks, so the task can not be queued by
+        an upstream task finishing while its dependencies are being registered.
+        """
+        self._queue.save_task(task, pending=len(upstream_task_ids) + 1)
+        finished_upstream_tasks = sum(
+            self._queue.add_task_dependent(task.job_id, upstream_task_id, task.id)
+            for upstream_task_id in upstream_task_ids
+        )
+        pending = self._queue.increment_task_pending(
+            task.job_id, task.id, -(finished_upstream_tasks + 1)
+        )
+        if pending == 0:
+            self._queue.push(task)
+
+    def _finish_task(self, job_id: str, task: SyncTask):
+        for dependent_id in self._queue.finish_task(job_id, task.id):
+            pending = self._queue.increment_task_pending(job_id, dependent_id, -1)
+            if pending == 0:
+                self._queue.push(self._queue.get_task(job_id, dependent_id))
+
+        unfinished_stage_tasks = self._increment_stage_field(
+            job_id, task.stage, "unfinished_tasks", -1
+        )
+        if unfinished_stage_tasks == 0:
+            self._finish_stage(job_id, task.stage)
+
+        if self._queue.increment_job_field(job_id, "unfinished_tasks", -1) == 0:
+            self._finish_job(job_id)
+
+    def _plan_stage(self, job: SyncJob, stage: SyncStage):
+        self._set_stage_fields(
+            job.id,
+            stage.name,
+            {"status": SyncJobStatus.RUNNING.value, "started_at": self._now()},
+        )
+        started_at = time.perf_counter()
+        try:
+            tasks_params = stage.plan(job.org_id)
+        except Exception as e:
+            LOG.error(
+                f"[Sync Jobs] Error planning {stage.name} for org {job.org_id}: {str(e)}"
+            )
+            self._set_stage_fields(job.id, stage.name, {"error": str(e)})
+            tasks_params = []
+        self._record_task_time(job.id, stage.name, started_at)
+
+        tasks = [
+            SyncTask(
+                id=f"{stage.name}:{index}",
+                job_id=job.id,
+                stage=stage.name,
+                params=params,
+            )
+            for index, params in enumerate(tasks_params)
+        ]
+        task_ids_by_key: Dict[str, List[str]] = defaultdict(list)
+        for task in tasks:
+            for dependency_key in stage.get_dependency_keys(task.params):
+                task_ids_by_key[dependency_key].append(task.id)
+            task_ids_by_key[ALL_TASKS_DEPENDENCY_KEY].append(task.id)
+
+        # Counters have to account for the tasks before any of them can finish
+        self._queue.set_stage_task_ids_by_key(job.id, stage.name, task_ids_by_key)
+        self._set_stage_fields(job.id, stage.name, {"total_tasks": str(len(tasks))})
+        self._increment_stage_field(job.id, stage.name, "unfinished_tasks", len(tasks))
+        self._queue.increment_job_field(job.id, "unfinished_tasks", len(tasks))
+
+        upstream_task_ids_by_key = self._get_upstream_task_ids_by_key(job.id, stage)
+        LOG.info(
+            f"[Sync Jobs] Scheduling {len(tasks)} {stage.name} tasks of sync job {job.id}"
+        )
+        for task in tasks:
+            upstream_task_ids = {
+                upstream_task_id
+                for dependency_key in stage.get_dependency_keys(task.params)
+                for upstream_task_id in upstream_task_ids_by_key.get(dependency_key, [])
+            }
+            self._schedule(task, sorted(upstream_task_ids))
+
+    def _get_upstream_task_ids_by_key(
+        self, job_id: str, stage: SyncStage
+    ) -> Dict[str, List[str]]:
+        if not stage.depends_on:
+            return {}
+
+        upstream_task_ids_by_key: Dict[str, List[str]] = defaultdict(list)
+        for upstream_stage_name in stage.depends_on:
+            task_ids_by_key = self._queue.get_stage_task_ids_by_key(
+                job_id, upstream_stage_name
+            )
+            for key, task_ids in task_ids_by_key.items():
+                upstream_task_ids_by_key[key].extend(task_ids)
+        return upstream_task_ids_by_key
+
+    def _run_stage_task(self, job: SyncJob, stage: SyncStage, params: Dict[str, str]):
+        error: Optional[str] = None
+        started_at = time.perf_counter()
+        try:
+            with self._acquire_lock(stage.get_lock_key(params)):
+                stage.run(job.org_id, params)
+        except Exception as e:
+            LOG.error(
+                f"[Sync Jobs] Error running {stage.name} task {params} of sync job {job.id}: {str(e)}"
+            )
+            error = str(e)
+        self._record_task_time(job.id, stage.name, started_at)
+
+        if error:
+            self._increment_stage_field(job.id, stage.name, "failed_tasks")
+            self._set_stage_fields(job.id, stage.name, {"error": error})
+        else:
+            self._increment_stage_field(job.id, stage.name, "completed_tasks")
+
+    def _record_task_time(self, job_id: str, stage_name: str, started_at: float):
+        milliseconds = int((time.perf_counter() - started_at) * 1000)
+        self._increment_stage_field(
+            job_id, stage_name, "task_milliseconds", milliseconds
+        )
+
+    def _finish_stage(self, job_id: str, stage_name: str):
+        job = self._queue.get_job(job_id)
+        stage = job.get_stage(stage_name)
+        status = (
+            SyncJobStatus.FAILED
+            if stage.failed_tasks or stage.error
+            else SyncJobStatus.COMPLETED
+        )
+        self._set_stage_fields(
+            job_id,
+            stage_name,
+            {"status": status.value, "finished_at": self._now()},
+        )
+        LOG.info(
+            f"[Sync Jobs] {stage_name} of sync job {job_id} finished as {status.value}"
+        )
+
+    def _finish_job(self, job_id: str):
+        job = self._queue.get_job(job_id)
+        status = (
+            SyncJobStatus.FAILED
+            if any(stage.status == SyncJobStatus.FAILED for stage in job.stages)
+            else SyncJobStatus.COMPLETED
+        )
+        self._queue.set_job_fields(
+            job_id, {"status": status.value, "finished_at": self._now()}
+        )
+        self._queue.clear_active_job_id(job.org_id, job_id)
+        if self._analytics_cache:
+            self._analytics_cache.invalidate_org(job.org_id)
+        job = self._queue.get_job(job_id)
+        LOG.info(
+            f"[Sync Jobs] Sync job {job_id} finished as {status.value}, "
+            f"critical path: {' -> '.join(job.critical_path)}"
+        )
+
+    def _set_stage_fields(self, job_id: str, stage_name: str, fields: Dict[str, str]):
+        self._queue.set_job_fields(
+            job_id,
+            {
+                get_stage_field(stage_name, name): value
+                for name, value in fields.items()
+            },
+        )
+
+    def _increment_stage_field(
+        self, job_id: str, stage_name: str, name: str, amount: int = 1
+    ) -> int:
+        return self._queue.increment_job_field(
+            job_id, get_stage_field(stage_name, name), amount
+        )
+
+    def _get_active_job(self, org_id: str) -> Optional[SyncJob]:
+        active_job_id = self._queue.get_active_job_id(org_id)
+        if not active_job_id:
+            return None
+
+        job = self._queue.get_job(active_job_id)
+        if job and not job.status.is_finished:
+            return job
+
+        self._queue.clear_active_job_id(org_id, active_job_id)
+        return None
+
+    def _now(self) -> str:
+        return self._clock().isoformat()
+
+
+_local_locks: Dict[str, threading.Lock] = defaultdict(threading.Lock)
+
+
+def _acquire_local_lock(key: str) -> threading.Lock:
+    return _local_locks[key]
+
+
+def get_sync_job_service() -> SyncJobService:
+    # The in memory queue has a single process, locks of that process are enough
+    acquire_lock = (
+        _acquire_local_lock
+        if SYNC_JOB_QUEUE_BACKEND == "memory"
+        else get_redis_lock_service().acquire_lock
+    )
+    return SyncJobService(
+        get_sync_job_queue(), acquire_lock, analytics_cache=get_analytics_cache()
+    )
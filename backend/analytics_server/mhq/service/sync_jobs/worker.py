@@ -0,0 +1,140 @@
+import os
+import socket
+import threading
+from contextlib import contextmanager
+from os import getenv
+from typing import Iterator, Optional
+
+from flask import Flask
+
+from mhq.exapi.response_cache import get_exapi_response_cache
+from mhq.exapi.transport import log_http_transport_stats
+from mhq.service.sync_jobs.models import SyncTask
+from mhq.service.sync_jobs.queue import (
+    SYNC_TASK_VISIBILITY_TIMEOUT_SECONDS,
+    SyncJobQueue,
+    get_sync_job_queue,
+)
+from mhq.service.sync_jobs.sync_job_service import (
+    SyncJobService,
+    get_sync_job_service,
+)
+from mhq.utils.log import LOG
+from mhq.utils.string import uuid4_str
+
+SYNC_WORKER_POLL_TIMEOUT_SECONDS = int(getenv("SYNC_WORKER_POLL_TIMEOUT_SECONDS", 5))
+# Backoff after a worker error, eg. Redis or the db being unreachable, doubled
+# on every consecutive error
+SYNC_WORKER_ERROR_BACKOFF_SECONDS = 1
+SYNC_WORKER_MAX_ERROR_BACKOFF_SECONDS = 60
+
+
+class SyncWorker:
+    """
+    Pulls sync tasks off the queue and runs them one at a time. Throughput scales
+    with the number of worker processes sharing the queue.
+
+    A task is acked only once it ran, and its lease is extended while it runs.
+    Before polling, workers requeue the tasks of workers whose lease ran out, so
+    a task of a crashed worker is picked up by another one.
+    """
+
+    def __init__(
+        self,
+        job_queue: SyncJobQueue,
+        job_service: SyncJobService,
+        poll_timeout: float = SYNC_WORKER_POLL_TIMEOUT_SECONDS,
+        visibility_timeout: float = SYNC_TASK_VISIBILITY_TIMEOUT_SECONDS,
+        worker_id: Optional[str] = None,
+    ):
+        self._queue = job_queue
+        self._job_service = job_service
+        self._poll_timeout = poll_timeout
+        self._visibility_timeout = visibility_timeout
+        self.worker_id = (
+            worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid4_str()}"
+        )
+
+    def run_once(self, timeout: Optional[float] = None) -> Optional[SyncTask]:
+        requeued = self._queue.requeue_expired_tasks()
+        if requeued:
+            LOG.warning(f"[Sync Jobs] Requeued {requeued} tasks of stopped workers")
+
+        task = self._queue.pop(
+            self._poll_timeout if timeout is None else timeout, self.worker_id
+        )
+        if not task:
+            return None
+
+        with self._hold_lease():
+            self._job_service.run_task(task)
+        self._queue.ack(self.worker_id)
+        return task
+
+    @contextmanager
+    def _hold_lease(self) -> Iterator[None]:
+        done = threading.Event()
+
+        def _extend_lease():
+            while not done.wait(self._visibility_timeout / 3):
+                try:
+                    self._queue.extend_lease(self.worker_id)
+                except Exception as e:
+                    LOG.error(f"[Sync Jobs] Error extending task lease: {str(e)}")
+
+        thread = threading.Thread(
+            target=_extend_lease, name="mhq-sync-lease", daemon=True
+        )
+        thread.start()
+        try:
+            yield
+        finally:
+            done.set()
+            thread.join()
+
+    def run_forever(self, app: Flask, stop_event: threading.Event):
+        has_unlogged_stats = False
+        error_backoff = SYNC_WORKER_ERROR_BACKOFF_SECONDS
+        while not stop_event.is_set():
+            try:
+                # Every task gets a fresh app context, and with it a fresh db session
+                with app.app_context():
+                    task = self.run_once()
+            except Exception as e:
+                LOG.error(
+                    f"[Sync Jobs] Sync worker error: {str(e)}, "
+                    f"retrying in {error_backoff}s"
+                )
+                stop_event.wait(error_backoff)
+                error_backoff = min(
+                    error_backoff * 2, SYNC_WORKER_MAX_ERROR_BACKOFF_SECONDS
+                )
+                continue
+
+            error_backoff = SYNC_WORKER_ERROR_BACKOFF_SECONDS
+            if task:
+                has_unlogged_stats = True
+            elif has_unlogged_stats:
+                # The queue ran dry, report what this worker did since it last was idle
+                get_exapi_response_cache().log_stats()
+                log_http_transport_stats()
+                has_unlogged_stats = False
+
+
+def get_sync_worker() -> SyncWorker:
+    return SyncWorker(get_sync_job_queue(), get_sync_job_service())
+
+
+def start_in_process_sync_worker(app: Flask) -> threading.Thread:
+    """
+    Runs a sync worker on a daemon thread of the current process. Meant for the
+    in memory queue, which worker processes can not reach.
+    """
+    thread = threading.Thread(
+        target=get_sync_worker().run_forever,
+        args=(app, threading.Event()),
+        name="mhq-sync-worker",
+        daemon=True,
+    )
+    thread.start()
+    return thread
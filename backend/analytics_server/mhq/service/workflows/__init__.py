@@ -1 +1 @@
-from .sync import sync_org_workflows
+from .sync import get_repo_workflows_to_sync, sync_repo_workflow
@@ -1 +1,4 @@
-from .etl_handler import sync_org_workflows
+from .etl_handler import (
+    get_repo_workflows_to_sync,
+    sync_repo_workflow,
+)
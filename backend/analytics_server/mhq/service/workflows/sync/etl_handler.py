@@ -1,6 +1,6 @@
 from os import getenv
 from datetime import datetime
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 
 from mhq.service.settings.configuration_settings import (
     SettingsService,
@@ -47,19 +47,27 @@ class WorkflowETLHandler:
         self.settings_service = settings_service
         self.bookmark_service = bookmark_service
 
-    def sync_org_workflows(self, org_id: str):
-        active_repo_workflows: List[Tuple[OrgRepo, RepoWorkflow]] = (
-            self._get_active_repo_workflows(org_id)
-        )
+    def get_repo_workflows_to_sync(self, org_id: str) -> List[Tuple[str, str]]:
+        """
+        :return: (repo id, repo workflow id) of every active workflow of the org
+        """
+        return [
+            (str(org_repo.id), str(repo_workflow.id))
+            for org_repo, repo_workflow in self._get_active_repo_workflows(org_id)
+        ]
 
-        for org_repo, repo_workflow in active_repo_workflows:
-            try:
-                self._sync_repo_workflow(org_repo, repo_workflow)
-            except Exception as e:
-                LOG.error(
-                    f"Error syncing workflow for repo {repo_workflow.org_repo_id}: {str(e)}"
-                )
-                continue
+    def sync_repo_workflow(self, repo_workflow_id: str):
+        repo_workflow: Optional[RepoWorkflow] = (
+            self.workflow_repo_service.get_repo_workflow_by_id(repo_workflow_id)
+        )
+        if not repo_workflow:
+            raise Exception(f"Repo workflow {repo_workflow_id} not found")
+        org_repo: Optional[OrgRepo] = self.code_repo_service.get_repo_by_id(
+            str(repo_workflow.org_repo_id)
+        )
+        if not org_repo:
+            raise Exception(f"Repo {repo_workflow.org_repo_id} not found")
+        self._sync_repo_workflow(org_repo, repo_workflow)
 
     def _get_active_repo_workflows(
         self, org_id: str
@@ -132,21 +140,19 @@ class WorkflowETLHandler:
             return
 
 
-def sync_org_workflows(org_id: str):
-    workflow_providers: List[str] = (
-        get_workflows_integrations_service().get_org_providers(org_id)
-    )
-    if not workflow_providers:
-        LOG.info(f"No workflow integrations found for org {org_id}")
-        return
-    code_repo_service = CodeRepoService()
-    workflow_repo_service = WorkflowRepoService()
-    etl_factory = WorkflowETLFactory(org_id)
-    workflow_etl_handler = WorkflowETLHandler(
-        code_repo_service,
-        workflow_repo_service,
-        etl_factory,
+def _get_workflow_etl_handler(org_id: str) -> WorkflowETLHandler:
+    return WorkflowETLHandler(
+        CodeRepoService(),
+        WorkflowRepoService(),
+        WorkflowETLFactory(org_id),
         get_settings_service(),
         get_bookmark_service(),
     )
-    workflow_etl_handler.sync_org_workflows(org_id)
+
+
+def get_repo_workflows_to_sync(org_id: str) -> List[Tuple[str, str]]:
+    return _get_workflow_etl_handler(org_id).get_repo_workflows_to_sync(org_id)
+
+
+def sync_repo_workflow(org_id: str, repo_workflow_id: str):
+    _get_workflow_etl_handler(org_id).sync_repo_workflow(repo_workflow_id)
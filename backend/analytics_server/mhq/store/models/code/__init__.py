@@ -5,6 +5,7 @@ from .enums import (
     PullRequestEventState,
     PullRequestEventType,
     PullRequestRevertPRMappingActorType,
+    RawPayloadEntityType,
 )
 from .filter import PRFilter
 from .pull_requests import (
@@ -13,6 +14,7 @@ from .pull_requests import (
     PullRequestCommit,
     PullRequestRevertPRMapping,
 )
+from .raw_payloads import RawPayloadArchive
 from .repository import (
     OrgRepo,
     TeamRepos,
@@ -20,10 +22,12 @@ from .repository import (
     Bookmark,
     BookmarkMergeToDeployBroker,
 )
+from .rollups import DeploymentDailyRollup, PullRequestLeadTimeRollup
 from .workflows import (
     RepoWorkflow,
     RepoWorkflowRuns,
     RepoWorkflowRunsBookmark,
+    DeploymentPullRequest,
     RepoWorkflowType,
     RepoWorkflowProviders,
     RepoWorkflowRunsStatus,
@@ -8,6 +8,7 @@ class CodeProvider(Enum):
 
 class CodeBookmarkType(Enum):
     PR = "PR"
+    PR_METRICS_RECOMPUTE = "PR_METRICS_RECOMPUTE"
 
 
 class TeamReposDeploymentType(Enum):
@@ -54,3 +55,10 @@ class PullRequestEventType(Enum):
 class PullRequestRevertPRMappingActorType(Enum):
     SYSTEM = "SYSTEM"
     USER = "USER"
+
+
+class RawPayloadEntityType(Enum):
+    PULL_REQUEST = "PullRequest"
+    PULL_REQUEST_EVENT = "PullRequestEvent"
+    PULL_REQUEST_COMMIT = "PullRequestCommit"
+    REPO_WORKFLOW_RUN = "RepoWorkflowRuns"
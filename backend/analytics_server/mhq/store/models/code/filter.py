@@ -106,3 +106,11 @@ class PRFilter:
             for x in self.__dict__.keys()
             if getattr(self, x) is not None and conditions[x] is not None
         ]
+
+    @property
+    def can_use_rollups(self) -> bool:
+        """
+        Rollups can answer the repo, base branch and excluded pr filters, other
+        filters need the prs themselves.
+        """
+        return not (self.authors or self.max_cycle_time or self.incident_pr_filters)
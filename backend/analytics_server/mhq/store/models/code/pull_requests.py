@@ -37,6 +37,8 @@ class PullRequest(db.Model):
     first_commit_to_open = db.Column(db.Integer)
     merge_to_deploy = db.Column(db.Integer)
     merge_commit_sha = db.Column(db.String)
+    # Number (GitHub) or merge commit sha prefix (GitLab) of the reverted pr
+    reverted_pr_ref = db.Column(db.String)
     created_in_db_at = db.Column(db.DateTime(timezone=True), server_default=func.now())
     updated_in_db_at = db.Column(
         db.DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
@@ -0,0 +1,21 @@
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import JSONB
+
+from mhq.store import db
+
+
+class RawPayloadArchive(db.Model):
+    """
+    Full provider payload of a pr, pr event, pr commit or workflow run whose own
+    payload column only keeps the fields the app reads.
+    """
+
+    __tablename__ = "RawPayloadArchive"
+
+    entity_type = db.Column(db.String, primary_key=True)
+    entity_id = db.Column(db.String, primary_key=True)
+    payload = db.Column(JSONB)
+    created_at = db.Column(db.DateTime(timezone=True), server_default=func.now())
+    updated_at = db.Column(
+        db.DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
@@ -94,6 +94,8 @@ class BookmarkMergeToDeployBroker(db.Model):
 
     repo_id = db.Column(UUID(as_uuid=True), primary_key=True)
     bookmark = db.Column(db.String)
+    # Runs up to here were processed before deployment prs were persisted
+    deployment_prs_mapped_from = db.Column(db.String)
     created_at = db.Column(db.DateTime(timezone=True), server_default=func.now())
     updated_at = db.Column(
         db.DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
@@ -104,3 +106,11 @@ class BookmarkMergeToDeployBroker(db.Model):
         if not self.bookmark:
             return None
         return datetime.fromisoformat(self.bookmark).astimezone(tz=pytz.UTC)
+
+    @property
+    def deployment_prs_mapped_from_date(self):
+        if not self.deployment_prs_mapped_from:
+            return None
+        return datetime.fromisoformat(self.deployment_prs_mapped_from).astimezone(
+            tz=pytz.UTC
+        )
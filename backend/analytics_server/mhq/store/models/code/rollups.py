@@ -0,0 +1,49 @@
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import UUID
+
+from mhq.store import db
+
+
+class PullRequestLeadTimeRollup(db.Model):
+    """
+    Lead time components of the merged prs of a repo's base branch in a week,
+    summed up along with the pr count. Prs with and without a merge to deploy are
+    kept apart, as workflow deployed repos only count the deployed ones.
+    """
+
+    __tablename__ = "PullRequestLeadTimeRollup"
+
+    repo_id = db.Column(UUID(as_uuid=True), primary_key=True)
+    base_branch = db.Column(db.String, primary_key=True)
+    week_start = db.Column(db.DateTime(timezone=True), primary_key=True)
+    has_merge_to_deploy = db.Column(db.Boolean, primary_key=True)
+    pr_count = db.Column(db.Integer)
+    first_commit_to_open = db.Column(db.BigInteger)
+    first_response_time = db.Column(db.BigInteger)
+    rework_time = db.Column(db.BigInteger)
+    merge_time = db.Column(db.BigInteger)
+    merge_to_deploy = db.Column(db.BigInteger)
+    updated_at = db.Column(
+        db.DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
+
+
+class DeploymentDailyRollup(db.Model):
+    """
+    Successful deployments of a head branch in a UTC day. Workflow deployments are
+    counted per repo workflow, pr merge deployments per repo and base branch.
+    """
+
+    __tablename__ = "DeploymentDailyRollup"
+
+    deployment_type = db.Column(db.String, primary_key=True)
+    # Repo workflow id of workflow deployments, repo id of pr merge deployments
+    source_id = db.Column(UUID(as_uuid=True), primary_key=True)
+    # Empty for workflow runs with no head branch
+    head_branch = db.Column(db.String, primary_key=True)
+    day = db.Column(db.DateTime(timezone=True), primary_key=True)
+    repo_id = db.Column(UUID(as_uuid=True))
+    deployment_count = db.Column(db.Integer)
+    updated_at = db.Column(
+        db.DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
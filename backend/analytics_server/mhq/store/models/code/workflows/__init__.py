@@ -1,3 +1,8 @@
 from .enums import RepoWorkflowType, RepoWorkflowProviders, RepoWorkflowRunsStatus
 from .filter import WorkflowFilter
-from .workflows import RepoWorkflow, RepoWorkflowRuns, RepoWorkflowRunsBookmark
+from .workflows import (
+    RepoWorkflow,
+    RepoWorkflowRuns,
+    RepoWorkflowRunsBookmark,
+    DeploymentPullRequest,
+)
@@ -60,3 +60,22 @@ class RepoWorkflowRunsBookmark(db.Model):
     updated_at = db.Column(
         db.DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
     )
+
+
+class DeploymentPullRequest(db.Model):
+    """
+    Pull requests shipped by a workflow run, written by the merge to deploy broker.
+    A pr maps to the first successful run of each workflow that deployed it.
+    """
+
+    __tablename__ = "DeploymentPullRequest"
+
+    repo_workflow_run_id = db.Column(
+        UUID(as_uuid=True), db.ForeignKey("RepoWorkflowRuns.id"), primary_key=True
+    )
+    pull_request_id = db.Column(
+        UUID(as_uuid=True), db.ForeignKey("PullRequest.id"), primary_key=True
+    )
+    repo_id = db.Column(UUID(as_uuid=True), db.ForeignKey("OrgRepo.id"))
+    repo_workflow_id = db.Column(UUID(as_uuid=True), db.ForeignKey("RepoWorkflow.id"))
+    created_at = db.Column(db.DateTime(timezone=True), server_default=func.now())
@@ -1,3 +1,4 @@
 from .organization import Organization
 from .teams import Team
 from .users import Users
+from .analytics_cache import AnalyticsCacheVersion
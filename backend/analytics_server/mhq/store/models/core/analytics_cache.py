@@ -0,0 +1,18 @@
+from sqlalchemy import func
+
+from mhq.store import db
+
+
+class AnalyticsCacheVersion(db.Model):
+    """
+    Data version of an org or a team. Cached analytics responses are keyed on it,
+    so bumping it retires them in every process.
+    """
+
+    __tablename__ = "AnalyticsCacheVersion"
+
+    namespace = db.Column(db.String, primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(
+        db.DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
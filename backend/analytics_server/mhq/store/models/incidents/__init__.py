@@ -13,3 +13,4 @@ from .incidents import (
     IncidentsBookmark,
 )
 from .services import OrgIncidentService, TeamIncidentService
+from .rollups import TeamIncidentRollup, TeamIncidentRollupState
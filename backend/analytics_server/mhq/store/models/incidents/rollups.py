@@ -0,0 +1,41 @@
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import UUID
+
+from mhq.store import db
+
+
+class TeamIncidentRollup(db.Model):
+    """
+    Recovery time of the incidents a team resolved in a week, and the team's
+    deployments of the week along with the ones followed by an incident. Counted
+    with the team's settings and no request filters.
+    """
+
+    __tablename__ = "TeamIncidentRollup"
+
+    team_id = db.Column(UUID(as_uuid=True), primary_key=True)
+    week_start = db.Column(db.DateTime(timezone=True), primary_key=True)
+    resolved_incident_count = db.Column(db.Integer)
+    recovery_time = db.Column(db.BigInteger)
+    failed_deployment_count = db.Column(db.Integer)
+    deployment_count = db.Column(db.Integer)
+    updated_at = db.Column(
+        db.DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
+
+
+class TeamIncidentRollupState(db.Model):
+    """
+    How far a team's incident rollups can be trusted. Rollups start at rollups_from,
+    and data written since the last refresh makes them stale from stale_from on.
+    """
+
+    __tablename__ = "TeamIncidentRollupState"
+
+    team_id = db.Column(UUID(as_uuid=True), primary_key=True)
+    rollups_from = db.Column(db.DateTime(timezone=True))
+    stale_from = db.Column(db.DateTime(timezone=True))
+    refreshed_at = db.Column(db.DateTime(timezone=True))
+    updated_at = db.Column(
+        db.DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
@@ -1,2 +1,3 @@
 from .enums import UserIdentityProvider
 from .integrations import Integration, UserIdentity
+from .response_cache import ExapiResponseCache
@@ -0,0 +1,18 @@
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import JSONB
+
+from mhq.store import db
+
+
+class ExapiResponseCache(db.Model):
+    __tablename__ = "ExapiResponseCache"
+
+    key = db.Column(db.String, primary_key=True)
+    url = db.Column(db.String)
+    endpoint = db.Column(db.String)
+    etag = db.Column(db.String)
+    last_modified = db.Column(db.String)
+    headers = db.Column(JSONB)
+    body = db.Column(db.LargeBinary)
+    created_at = db.Column(db.DateTime(timezone=True), server_default=func.now())
+    accessed_at = db.Column(db.DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,93 @@
+from enum import Enum
+from os import getenv
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import inspect
+
+from mhq.store import db
+from mhq.store.models.code import RawPayloadArchive, RawPayloadEntityType
+
+
+class RawPayloadStorageMode(Enum):
+    # Payload columns keep only the whitelisted fields, the rest goes to the archive
+    COMPACT = "compact"
+    # Payload columns keep the full provider payload
+    FULL = "full"
+
+
+RAW_PAYLOAD_STORAGE_MODE = getenv(
+    "RAW_PAYLOAD_STORAGE_MODE", RawPayloadStorageMode.COMPACT.value
+)
+
+# Fields of each payload the app reads. A None value keeps the whole field, a dict
+# keeps only the listed keys of a nested object.
+PAYLOAD_FIELD_WHITELISTS: Dict[RawPayloadEntityType, Dict[str, Any]] = {
+    RawPayloadEntityType.PULL_REQUEST: {},
+    # state drives the review metrics, user and actor types drive the bot filter
+    RawPayloadEntityType.PULL_REQUEST_EVENT: {
+        "state": None,
+        "user": {"login": None, "type": None},
+        "actor": {"login": None, "type": None},
+    },
+    RawPayloadEntityType.PULL_REQUEST_COMMIT: {},
+    RawPayloadEntityType.REPO_WORKFLOW_RUN: {},
+}
+
+
+def compact_payload(
+    payload: Optional[Dict[str, Any]], whitelist: Dict[str, Any]
+) -> Optional[Dict[str, Any]]:
+    if not isinstance(payload, dict):
+        return payload
+
+    compacted = {}
+    for key, nested_whitelist in whitelist.items():
+        if key not in payload:
+            continue
+        value = payload[key]
+        if nested_whitelist is not None and isinstance(value, dict):
+            value = compact_payload(value, nested_whitelist)
+        compacted[key] = value
+    return compacted
+
+
+class RawPayloadPolicy:
+    def __init__(self, mode: RawPayloadStorageMode):
+        self.mode = mode
+
+    def compact(
+        self,
+        entity_type: RawPayloadEntityType,
+        objects: List[db.Model],
+        column: str,
+        id_column: str = "id",
+    ) -> List[RawPayloadArchive]:
+        """
+        Trims the payload column of the objects down to its whitelisted fields and
+        returns archive rows holding the full payloads. Leaves the objects as they
+        are in full mode.
+        """
+        if self.mode != RawPayloadStorageMode.COMPACT:
+            return []
+
+        whitelist = PAYLOAD_FIELD_WHITELISTS[entity_type]
+        archives = []
+        for obj in objects:
+            # Payloads never set or not loaded are left alone, like the upsert does
+            payload = inspect(obj).dict.get(column)
+            if payload is None:
+                continue
+
+            archives.append(
+                RawPayloadArchive(
+                    entity_type=entity_type.value,
+                    entity_id=str(getattr(obj, id_column)),
+                    payload=payload,
+                )
+            )
+            setattr(obj, column, compact_payload(payload, whitelist))
+        return archives
+
+
+def get_raw_payload_policy() -> RawPayloadPolicy:
+    return RawPayloadPolicy(RawPayloadStorageMode(RAW_PAYLOAD_STORAGE_MODE.lower()))
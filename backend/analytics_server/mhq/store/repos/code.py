@@ -1,13 +1,16 @@
-from datetime import datetime
+from collections import defaultdict
+from datetime import datetime, timedelta
 from operator import and_
-from typing import Optional, List
+from typing import Dict, Optional, List, Set, Tuple
 
-from mhq.store.models.code.enums import CodeProvider
-from sqlalchemy import or_
-from sqlalchemy.orm import defer
+from mhq.store.models.code.enums import CodeProvider, TeamReposDeploymentType
+from sqlalchemy import func, literal, literal_column, or_, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import defer, load_only
 from mhq.store.models.core import Team
 
 from mhq.store import db, rollback_on_exc
+from mhq.store.upsert import bulk_upsert
 from mhq.store.models.code import (
     PullRequest,
     PullRequestEvent,
@@ -20,13 +23,20 @@ from mhq.store.models.code import (
     PRFilter,
     BookmarkMergeToDeployBroker,
     CodeBookmarkType,
+    DeploymentPullRequest,
+    RawPayloadArchive,
+    RawPayloadEntityType,
+    PullRequestLeadTimeRollup,
+    DeploymentDailyRollup,
 )
+from mhq.store.raw_payloads import get_raw_payload_policy
 from mhq.utils.time import Interval
 
 
 class CodeRepoService:
     def __init__(self):
         self._db = db
+        self._raw_payload_policy = get_raw_payload_policy()
 
     @rollback_on_exc
     def get_active_org_repos(self, org_id: str) -> List[OrgRepo]:
@@ -119,29 +129,89 @@ class CodeRepoService:
         pull_request_commits: List[PullRequestCommit],
         pull_request_events: List[PullRequestEvent],
     ):
-        [self._db.session.merge(pull_request) for pull_request in pull_requests]
-        [
-            self._db.session.merge(pull_request_commit)
-            for pull_request_commit in pull_request_commits
-        ]
-        [
-            self._db.session.merge(pull_request_event)
-            for pull_request_event in pull_request_events
-        ]
+        raw_payloads = (
+            self._raw_payload_policy.compact(
+                RawPayloadEntityType.PULL_REQUEST, pull_requests, "data"
+            )
+            + self._raw_payload_policy.compact(
+                RawPayloadEntityType.PULL_REQUEST_COMMIT,
+                pull_request_commits,
+                "data",
+                id_column="hash",
+            )
+            + self._raw_payload_policy.compact(
+                RawPayloadEntityType.PULL_REQUEST_EVENT, pull_request_events, "data"
+            )
+        )
+        bulk_upsert(self._db.session, PullRequest, pull_requests)
+        bulk_upsert(self._db.session, PullRequestCommit, pull_request_commits)
+        bulk_upsert(self._db.session, PullRequestEvent, pull_request_events)
+        bulk_upsert(self._db.session, RawPayloadArchive, raw_payloads)
         self._db.session.commit()
 
     @rollback_on_exc
     def update_prs(self, prs: List[PullRequest]):
-        [self._db.session.merge(pr) for pr in prs]
+        bulk_upsert(self._db.session, PullRequest, prs)
+        self._db.session.commit()
+
+    @rollback_on_exc
+    def refresh_repo_lead_time_rollups(self, repo_id: str, week_starts: Set[datetime]):
+        """
+        Recomputes the repo's rollups of the given weeks, each a monday midnight in UTC.
+        """
+        if not week_starts:
+            return
+
+        self._refresh_repo_lead_time_rollups(repo_id, week_starts)
+        self._db.session.commit()
+
+    @rollback_on_exc
+    def refresh_repo_deployment_rollups(self, repo_id: str, days: Set[datetime]):
+        """
+        Recounts the repo's merge deployment rollups of the given days, each a
+        midnight in UTC.
+        """
+        if not days:
+            return
+
+        self._refresh_repo_deployment_rollups(repo_id, days)
         self._db.session.commit()
 
     @rollback_on_exc
     def save_revert_pr_mappings(
         self, revert_pr_mappings: List[PullRequestRevertPRMapping]
     ):
-        [self._db.session.merge(revert_pr_map) for revert_pr_map in revert_pr_mappings]
+        bulk_upsert(self._db.session, PullRequestRevertPRMapping, revert_pr_mappings)
+        self._db.session.commit()
+
+    @rollback_on_exc
+    def save_deployment_pull_requests(
+        self, deployment_pull_requests: List[DeploymentPullRequest]
+    ):
+        bulk_upsert(self._db.session, DeploymentPullRequest, deployment_pull_requests)
         self._db.session.commit()
 
+    @rollback_on_exc
+    def get_raw_payloads(
+        self, entity_type: RawPayloadEntityType, entity_ids: List[str]
+    ) -> Dict[str, Dict]:
+        """
+        Full provider payloads archived for the given prs, pr events or pr commits,
+        keyed by entity id. Entities saved in full mode have none.
+        """
+        if not entity_ids:
+            return {}
+
+        archives = (
+            self._db.session.query(RawPayloadArchive)
+            .filter(
+                RawPayloadArchive.entity_type == entity_type.value,
+                RawPayloadArchive.entity_id.in_([str(id) for id in entity_ids]),
+            )
+            .all()
+        )
+        return {archive.entity_id: archive.payload for archive in archives}
+
     @rollback_on_exc
     def get_org_repo_bookmark(self, org_repo_id: str, bookmark_type: CodeBookmarkType):
         return (
@@ -160,12 +230,23 @@ class CodeRepoService:
         self._db.session.merge(bookmark)
         self._db.session.commit()
 
+    @rollback_on_exc
+    def delete_org_repo_bookmark(
+        self, org_repo_id: str, bookmark_type: CodeBookmarkType
+    ):
+        self._db.session.query(Bookmark).filter(
+            Bookmark.repo_id == org_repo_id, Bookmark.type == bookmark_type.value
+        ).delete()
+        self._db.session.commit()
+
     @rollback_on_exc
     def get_all_org_repo_bookmarks(self, org_id: str) -> List[Bookmark]:
         return (
             self._db.session.query(Bookmark)
             .join(OrgRepo, OrgRepo.id == Bookmark.repo_id)
-            .filter(OrgRepo.org_id == org_id)
+            .filter(
+                OrgRepo.org_id == org_id, Bookmark.type == CodeBookmarkType.PR.value
+            )
             .all()
         )
 
@@ -196,6 +277,37 @@ class CodeRepoService:
             .one_or_none()
         )
 
+    @rollback_on_exc
+    def get_repo_prs_by_numbers(
+        self, repo_id: str, pr_numbers: List[str]
+    ) -> List[PullRequest]:
+        if not pr_numbers:
+            return []
+
+        return (
+            self._db.session.query(PullRequest)
+            .options(defer(PullRequest.data))
+            .filter(
+                and_(
+                    PullRequest.repo_id == repo_id,
+                    PullRequest.number.in_([str(number) for number in pr_numbers]),
+                )
+            )
+            .all()
+        )
+
+    @rollback_on_exc
+    def get_pr_events_by_pr_ids(self, pr_ids: List[str]) -> List[PullRequestEvent]:
+        if not pr_ids:
+            return []
+
+        return (
+            self._db.session.query(PullRequestEvent)
+            .options(defer(PullRequestEvent.data))
+            .filter(PullRequestEvent.pull_request_id.in_(pr_ids))
+            .all()
+        )
+
     @rollback_on_exc
     def get_pr_events(self, pr_model: PullRequest):
         if not pr_model:
@@ -219,8 +331,8 @@ class CodeRepoService:
         return query.all()
 
     @rollback_on_exc
-    def get_prs_by_head_branch_match_strings(
-        self, repo_ids: List[str], match_strings: List[str]
+    def get_revert_prs_by_reverted_pr_refs(
+        self, repo_ids: List[str], reverted_pr_refs: List[str]
     ) -> List[PullRequest]:
         query = (
             self._db.session.query(PullRequest)
@@ -228,12 +340,7 @@ class CodeRepoService:
             .filter(
                 and_(
                     PullRequest.repo_id.in_(repo_ids),
-                    or_(
-                        *[
-                            PullRequest.head_branch.ilike(f"{match_string}%")
-                            for match_string in match_strings
-                        ]
-                    ),
+                    PullRequest.reverted_pr_ref.in_(reverted_pr_refs),
                 )
             )
             .order_by(PullRequest.updated_in_db_at.desc())
@@ -307,6 +414,136 @@ class CodeRepoService:
 
         return query.all()
 
+    @rollback_on_exc
+    def get_lead_time_rollups(
+        self,
+        repo_ids: List[str],
+        interval: Interval,
+        pr_filter: PRFilter = None,
+        has_non_null_mtd=False,
+    ) -> List[PullRequestLeadTimeRollup]:
+        """
+        Rollups of the weeks starting in the interval. Only the base branch and repo
+        filters of the pr filter apply, rollups hold no pr ids or authors.
+        """
+        query = self._db.session.query(PullRequestLeadTimeRollup).filter(
+            PullRequestLeadTimeRollup.repo_id.in_(repo_ids),
+            PullRequestLeadTimeRollup.week_start.between(
+                interval.from_time, interval.to_time
+            ),
+        )
+        query = self._filter_rollups(
+            query,
+            pr_filter,
+            PullRequestLeadTimeRollup.repo_id,
+            PullRequestLeadTimeRollup.base_branch,
+        )
+
+        if has_non_null_mtd:
+            query = query.filter(
+                PullRequestLeadTimeRollup.has_merge_to_deploy.is_(True)
+            )
+
+        return query.all()
+
+    @rollback_on_exc
+    def get_lead_time_rollups_for_prs_merged_in_interval(
+        self,
+        repo_ids: List[str],
+        interval: Interval,
+        pr_filter: PRFilter = None,
+        has_non_null_mtd=False,
+        pr_ids: List[str] = None,
+    ) -> List[PullRequestLeadTimeRollup]:
+        """
+        Rollups summed up on the fly from the prs merged in the interval, for
+        intervals that do not cover whole weeks.
+        """
+        query = self._get_lead_time_rollups_query()
+
+        query = self._filter_prs_by_repo_ids(query, repo_ids)
+        query = self._filter_prs_merged_in_interval(query, interval)
+        query = self._filter_prs(query, pr_filter)
+
+        if has_non_null_mtd:
+            query = query.filter(PullRequest.merge_to_deploy.is_not(None))
+        if pr_ids is not None:
+            query = query.filter(PullRequest.id.in_(pr_ids))
+
+        return [PullRequestLeadTimeRollup(**row._asdict()) for row in query.all()]
+
+    @rollback_on_exc
+    def get_deployment_rollups(
+        self, repo_ids: List[str], interval: Interval, pr_filter: PRFilter = None
+    ) -> List[DeploymentDailyRollup]:
+        """
+        Merged pr counts of the days starting in the interval. Only the base branch
+        and repo filters of the pr filter apply, like the lead time rollups.
+        """
+        query = self._db.session.query(DeploymentDailyRollup).filter(
+            DeploymentDailyRollup.deployment_type
+            == TeamReposDeploymentType.PR_MERGE.value,
+            DeploymentDailyRollup.repo_id.in_(repo_ids),
+            DeploymentDailyRollup.day.between(interval.from_time, interval.to_time),
+        )
+        query = self._filter_rollups(
+            query,
+            pr_filter,
+            DeploymentDailyRollup.repo_id,
+            DeploymentDailyRollup.head_branch,
+        )
+
+        return query.all()
+
+    @rollback_on_exc
+    def get_deployment_rollups_for_prs_merged_in_interval(
+        self,
+        repo_ids: List[str],
+        interval: Interval,
+        pr_filter: PRFilter = None,
+        pr_ids: List[str] = None,
+    ) -> List[DeploymentDailyRollup]:
+        """
+        Rollups counted on the fly from the prs merged in the interval, for
+        intervals that do not cover whole days or filters the rollups cannot answer.
+        """
+        query = self._get_deployment_rollups_query()
+
+        query = self._filter_prs_by_repo_ids(query, repo_ids)
+        query = self._filter_prs_merged_in_interval(query, interval)
+        query = self._filter_prs(query, pr_filter)
+
+        if pr_ids is not None:
+            query = query.filter(PullRequest.id.in_(pr_ids))
+
+        return [DeploymentDailyRollup(**row._asdict()) for row in query.all()]
+
+    @rollback_on_exc
+    def get_prs_deployed_by_workflow_runs(
+        self, repo_workflow_run_ids: List[str], pr_filter: PRFilter = None
+    ) -> List[Tuple[str, PullRequest]]:
+        """
+        Pull requests the merge to deploy broker mapped to the given workflow runs,
+        as (repo workflow run id, pull request) pairs.
+        """
+        query = (
+            self._db.session.query(
+                DeploymentPullRequest.repo_workflow_run_id, PullRequest
+            )
+            .options(defer(PullRequest.data))
+            .join(PullRequest, PullRequest.id == DeploymentPullRequest.pull_request_id)
+            .filter(
+                DeploymentPullRequest.repo_workflow_run_id.in_(repo_workflow_run_ids)
+            )
+        )
+        query = self._filter_prs(query, pr_filter)
+        query = query.order_by(PullRequest.state_changed_at.asc())
+
+        return [
+            (str(repo_workflow_run_id), pull_request)
+            for repo_workflow_run_id, pull_request in query.all()
+        ]
+
     @rollback_on_exc
     def get_prs_merged_in_interval_by_numbers(
         self,
@@ -409,6 +646,16 @@ class CodeRepoService:
             .one_or_none()
         )
 
+    @rollback_on_exc
+    def get_merge_to_deploy_broker_bookmarks(
+        self, repo_ids: List[str]
+    ) -> List[BookmarkMergeToDeployBroker]:
+        return (
+            self._db.session.query(BookmarkMergeToDeployBroker)
+            .filter(BookmarkMergeToDeployBroker.repo_id.in_(repo_ids))
+            .all()
+        )
+
     @rollback_on_exc
     def get_all_org_merge_to_deploy_broker_bookmarks(
         self, org_id: str
@@ -436,9 +683,143 @@ class CodeRepoService:
         self._db.session.commit()
 
     @rollback_on_exc
-    def get_prs_in_repo_merged_before_given_date_with_merge_to_deploy_as_null(
-        self, repo_id: str, to_time: datetime
-    ):
+    def get_repo_prs_updated_after(
+        self, repo_id: str, updated_after: Optional[datetime] = None
+    ) -> List[PullRequest]:
+        """
+        Merged prs of the repo with just the columns needed to place them in the
+        branch flow graph, optionally only the ones written after the given time.
+        """
+        query = (
+            self._db.session.query(PullRequest)
+            .options(
+                load_only(
+                    PullRequest.id,
+                    PullRequest.state,
+                    PullRequest.base_branch,
+                    PullRequest.head_branch,
+                    PullRequest.state_changed_at,
+                )
+            )
+            .filter(
+                PullRequest.repo_id == repo_id,
+                PullRequest.state == PullRequestState.MERGED,
+            )
+        )
+        if updated_after:
+            query = query.filter(PullRequest.updated_in_db_at >= updated_after)
+
+        return query.all()
+
+    @rollback_on_exc
+    def get_repo_deployed_pr_ids_created_after(
+        self, repo_id: str, created_after: Optional[datetime] = None
+    ) -> List[Tuple[str, str]]:
+        """
+        (repo workflow id, pull request id) of the repo's deployment mappings,
+        optionally only the ones saved after the given time.
+        """
+        query = self._db.session.query(
+            DeploymentPullRequest.repo_workflow_id,
+            DeploymentPullRequest.pull_request_id,
+        ).filter(DeploymentPullRequest.repo_id == repo_id)
+        if created_after:
+            query = query.filter(DeploymentPullRequest.created_at >= created_after)
+
+        return [
+            (str(repo_workflow_id), str(pull_request_id))
+            for repo_workflow_id, pull_request_id in query.all()
+        ]
+
+    @rollback_on_exc
+    def get_repo_closed_prs_after_id(
+        self, repo_id: str, after_pr_id: Optional[str], limit: int
+    ) -> List[PullRequest]:
+        """
+        Page of the repo's closed and merged prs in id order, after the given pr id.
+        """
+        query = (
+            self._db.session.query(PullRequest)
+            .options(defer(PullRequest.data))
+            .filter(
+                PullRequest.repo_id == repo_id,
+                PullRequest.state != PullRequestState.OPEN,
+            )
+        )
+        if after_pr_id:
+            query = query.filter(PullRequest.id > after_pr_id)
+
+        return query.order_by(PullRequest.id).limit(limit).all()
+
+    @rollback_on_exc
+    def get_repo_closed_prs_count_after_id(
+        self, repo_id: str, after_pr_id: Optional[str]
+    ) -> int:
+        query = self._db.session.query(func.count(PullRequest.id)).filter(
+            PullRequest.repo_id == repo_id,
+            PullRequest.state != PullRequestState.OPEN,
+        )
+        if after_pr_id:
+            query = query.filter(PullRequest.id > after_pr_id)
+
+        return query.scalar()
+
+    @rollback_on_exc
+    def get_pr_events_with_data_by_pr_ids(
+        self, pr_ids: List[str]
+    ) -> List[PullRequestEvent]:
+        if not pr_ids:
+            return []
+
+        return (
+            self._db.session.query(PullRequestEvent)
+            .filter(PullRequestEvent.pull_request_id.in_(pr_ids))
+            .all()
+        )
+
+    @rollback_on_exc
+    def get_pr_commits_by_pr_ids(self, pr_ids: List[str]) -> List[PullRequestCommit]:
+        if not pr_ids:
+            return []
+
+        return (
+            self._db.session.query(PullRequestCommit)
+            .options(
+                load_only(
+                    PullRequestCommit.hash,
+                    PullRequestCommit.pull_request_id,
+                    PullRequestCommit.created_at,
+                )
+            )
+            .filter(PullRequestCommit.pull_request_id.in_(pr_ids))
+            .all()
+        )
+
+    @rollback_on_exc
+    def update_pr_metrics(self, prs_metrics: List[Dict]):
+        """
+        Updates just the given columns of existing prs, each dict holds a pr id and
+        the metric columns to set.
+        """
+        if not prs_metrics:
+            return
+
+        self._db.session.execute(update(PullRequest), prs_metrics)
+        self._refresh_lead_time_rollups([metrics["id"] for metrics in prs_metrics])
+        self._db.session.commit()
+
+    @rollback_on_exc
+    def get_prs_in_repo_merged_before_given_date_not_deployed_by_workflow(
+        self, repo_id: str, repo_workflow_id: str, to_time: datetime
+    ) -> List[PullRequest]:
+        deployed_by_workflow = (
+            self._db.session.query(DeploymentPullRequest.pull_request_id)
+            .filter(
+                DeploymentPullRequest.pull_request_id == PullRequest.id,
+                DeploymentPullRequest.repo_workflow_id == repo_workflow_id,
+            )
+            .exists()
+        )
         return (
             self._db.session.query(PullRequest)
             .options(defer(PullRequest.data))
@@ -446,7 +827,7 @@ class CodeRepoService:
                 PullRequest.repo_id == repo_id,
                 PullRequest.state == PullRequestState.MERGED,
                 PullRequest.state_changed_at <= to_time,
-                PullRequest.merge_to_deploy.is_(None),
+                ~deployed_by_workflow,
             )
             .all()
         )
@@ -472,24 +853,196 @@ class CodeRepoService:
     def get_reverted_prs_by_merge_commit_hash(
         self, repo_ids: List[str], merge_commit_hashes: List[str]
     ) -> List[PullRequest]:
+        """
+        Prs whose merge commit sha starts with one of the given 8 character hashes.
+        """
         query = (
             self._db.session.query(PullRequest)
             .options(defer(PullRequest.data))
             .filter(
                 and_(
                     PullRequest.repo_id.in_(repo_ids),
-                    or_(
-                        *[
-                            PullRequest.merge_commit_sha.ilike(f"{merge_hash}%")
-                            for merge_hash in merge_commit_hashes
-                        ]
-                    ),
+                    # Matches the repo_id, left(merge_commit_sha, 8) index
+                    func.left(PullRequest.merge_commit_sha, 8).in_(merge_commit_hashes),
                 )
             )
         )
 
         return query.all()
 
+    def _get_lead_time_rollup_week_start(self):
+        # Monday midnight in UTC, same as the weekly trend buckets
+        return func.timezone(
+            "UTC",
+            func.date_trunc("week", func.timezone("UTC", PullRequest.state_changed_at)),
+        )
+
+    def _get_lead_time_rollups_query(self):
+        has_merge_to_deploy = PullRequest.merge_to_deploy.is_not(None)
+        return (
+            self._db.session.query(
+                PullRequest.repo_id.label("repo_id"),
+                PullRequest.base_branch.label("base_branch"),
+                self._get_lead_time_rollup_week_start().label("week_start"),
+                has_merge_to_deploy.label("has_merge_to_deploy"),
+                func.count(PullRequest.id).label("pr_count"),
+                func.sum(
+                    func.greatest(func.coalesce(PullRequest.first_commit_to_open, 0), 0)
+                ).label("first_commit_to_open"),
+                func.sum(func.coalesce(PullRequest.first_response_time, 0)).label(
+                    "first_response_time"
+                ),
+                func.sum(func.coalesce(PullRequest.rework_time, 0)).label(
+                    "rework_time"
+                ),
+                func.sum(func.coalesce(PullRequest.merge_time, 0)).label("merge_time"),
+                func.sum(func.coalesce(PullRequest.merge_to_deploy, 0)).label(
+                    "merge_to_deploy"
+                ),
+            ).filter(PullRequest.state == PullRequestState.MERGED)
+            # By output column, the week expressions carry their own bind params
+            .group_by(
+                PullRequest.repo_id,
+                PullRequest.base_branch,
+                literal_column("week_start"),
+                literal_column("has_merge_to_deploy"),
+            )
+        )
+
+    def _refresh_lead_time_rollups(self, pr_ids: List[str]):
+        """
+        Recomputes the rollups of the repo weeks the given prs were merged in,
+        within the caller's transaction.
+        """
+        if not pr_ids:
+            return
+
+        week_start = self._get_lead_time_rollup_week_start()
+        repo_weeks = (
+            self._db.session.query(PullRequest.repo_id, week_start)
+            .filter(
+                PullRequest.id.in_(pr_ids),
+                PullRequest.state == PullRequestState.MERGED,
+            )
+            .distinct()
+            .all()
+        )
+
+        week_starts_by_repo_id: Dict[str, Set[datetime]] = defaultdict(set)
+        for repo_id, repo_week_start in repo_weeks:
+            week_starts_by_repo_id[repo_id].add(repo_week_start)
+
+        for repo_id, week_starts in week_starts_by_repo_id.items():
+            self._refresh_repo_lead_time_rollups(repo_id, week_starts)
+
+    def _refresh_repo_lead_time_rollups(self, repo_id: str, week_starts: Set[datetime]):
+        self._db.session.query(PullRequestLeadTimeRollup).filter(
+            PullRequestLeadTimeRollup.repo_id == repo_id,
+            PullRequestLeadTimeRollup.week_start.in_(week_starts),
+        ).delete(synchronize_session=False)
+
+        rollups_query = self._get_lead_time_rollups_query().filter(
+            PullRequest.repo_id == repo_id,
+            PullRequest.base_branch.is_not(None),
+            or_(
+                PullRequest.state_changed_at.between(
+                    week_start, week_start + timedelta(weeks=1, microseconds=-1)
+                )
+                for week_start in week_starts
+            ),
+        )
+        columns = [column["name"] for column in rollups_query.column_descriptions]
+        self._db.session.execute(
+            insert(PullRequestLeadTimeRollup).from_select(
+                columns, rollups_query.statement
+            )
+        )
+
+    def _get_deployment_rollup_day(self):
+        # Midnight in UTC, same as the daily deployment frequency buckets
+        return func.timezone(
+            "UTC",
+            func.date_trunc("day", func.timezone("UTC", PullRequest.state_changed_at)),
+        )
+
+    def _get_deployment_rollups_query(self):
+        return (
+            self._db.session.query(
+                literal(TeamReposDeploymentType.PR_MERGE.value).label(
+                    "deployment_type"
+                ),
+                PullRequest.repo_id.label("source_id"),
+                PullRequest.base_branch.label("head_branch"),
+                self._get_deployment_rollup_day().label("day"),
+                PullRequest.repo_id.label("repo_id"),
+                func.count(PullRequest.id).label("deployment_count"),
+            ).filter(
+                PullRequest.state == PullRequestState.MERGED,
+                PullRequest.base_branch.is_not(None),
+            )
+            # By output column, the day expressions carry their own bind params
+            .group_by(
+                PullRequest.repo_id,
+                PullRequest.base_branch,
+                literal_column("day"),
+            )
+        )
+
+    def _refresh_repo_deployment_rollups(self, repo_id: str, days: Set[datetime]):
+        self._db.session.query(DeploymentDailyRollup).filter(
+            DeploymentDailyRollup.deployment_type
+            == TeamReposDeploymentType.PR_MERGE.value,
+            DeploymentDailyRollup.source_id == repo_id,
+            DeploymentDailyRollup.day.in_(days),
+        ).delete(synchronize_session=False)
+
+        rollups_query = self._get_deployment_rollups_query().filter(
+            PullRequest.repo_id == repo_id,
+            or_(
+                PullRequest.state_changed_at.between(
+                    day, day + timedelta(days=1, microseconds=-1)
+                )
+                for day in days
+            ),
+        )
+        columns = [column["name"] for column in rollups_query.column_descriptions]
+        self._db.session.execute(
+            insert(DeploymentDailyRollup).from_select(columns, rollups_query.statement)
+        )
+
+    def _filter_rollups(
+        self, query, pr_filter: PRFilter, repo_id_column, base_branch_column
+    ):
+        if not pr_filter:
+            return query
+
+        if pr_filter.base_branches:
+            query = query.filter(
+                or_(
+                    base_branch_column.op("~")(term) for term in pr_filter.base_branches
+                )
+            )
+
+        if pr_filter.repo_filters:
+            # Same as PRFilter.RepoFilter, on the rollup columns
+            conditions = []
+            for repo_id, repo_filters in pr_filter.repo_filters.items():
+                if not repo_filters:
+                    continue
+                condition = repo_id_column == repo_id
+                base_branches = repo_filters.get("base_branches")
+                if base_branches:
+                    condition = condition & or_(
+                        base_branch_column.op("~")(term)
+                        for term in base_branches
+                        if term is not None
+                    )
+                conditions.append(condition)
+            if conditions:
+                query = query.filter(or_(*conditions))
+
+        return query
+
     def _filter_prs_by_repo_ids(self, query, repo_ids: List[str]):
         return query.filter(PullRequest.repo_id.in_(repo_ids))
 
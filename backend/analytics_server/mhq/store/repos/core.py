@@ -1,10 +1,11 @@
-from typing import Optional, List
+from typing import Dict, Optional, List
 
-from sqlalchemy import and_
+from sqlalchemy import and_, func
+from sqlalchemy.dialects.postgresql import insert
 
 from mhq.store import db, rollback_on_exc
 from mhq.store.models import UserIdentityProvider, Integration
-from mhq.store.models.core import Organization, Team, Users
+from mhq.store.models.core import AnalyticsCacheVersion, Organization, Team, Users
 from mhq.utils.cryptography import get_crypto_service
 
 
@@ -108,3 +109,33 @@ class CoreRepoService:
         if not user_identity or not user_identity.access_token_enc_chunks:
             return None
         return self._crypto.decrypt_chunks(user_identity.access_token_enc_chunks)
+
+
+class AnalyticsCacheVersionRepoService:
+    def __init__(self):
+        self._db = db
+
+    @rollback_on_exc
+    def get_versions(self, namespaces: List[str]) -> Dict[str, int]:
+        versions = (
+            self._db.session.query(
+                AnalyticsCacheVersion.namespace, AnalyticsCacheVersion.version
+            )
+            .filter(AnalyticsCacheVersion.namespace.in_(namespaces))
+            .all()
+        )
+        return dict(versions)
+
+    @rollback_on_exc
+    def bump_version(self, namespace: str):
+        statement = insert(AnalyticsCacheVersion).values(namespace=namespace, version=1)
+        self._db.session.execute(
+            statement.on_conflict_do_update(
+                index_elements=[AnalyticsCacheVersion.namespace],
+                set_={
+                    "version": AnalyticsCacheVersion.version + 1,
+                    "updated_at": func.now(),
+                },
+            )
+        )
+        self._db.session.commit()
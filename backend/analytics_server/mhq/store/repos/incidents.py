@@ -1,10 +1,15 @@
-from typing import List
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
 
-from sqlalchemy import and_
+from sqlalchemy import and_, case, exists, func, or_
+from sqlalchemy.dialects.postgresql import insert
+from mhq.store.models.code.repository import TeamRepos
 from mhq.store.models.core.teams import Team
 from mhq.store.models.incidents.enums import IncidentSource
+from mhq.store.models.settings import EntityType, Settings
 
 from mhq.store import db, rollback_on_exc
+from mhq.store.upsert import bulk_upsert
 from mhq.store.models.incidents import (
     Incident,
     IncidentFilter,
@@ -16,6 +21,8 @@ from mhq.store.models.incidents import (
     OrgIncidentService,
     IncidentsBookmark,
     IncidentBookmarkType,
+    TeamIncidentRollup,
+    TeamIncidentRollupState,
 )
 from mhq.utils.time import Interval
 
@@ -76,12 +83,14 @@ class IncidentsRepoService:
     def add_team_incident_services(self, services: List[TeamIncidentService]):
         for service in services:
             self._db.session.merge(service)
+        self._reset_team_incident_rollups({service.team_id for service in services})
         self._db.session.commit()
 
     @rollback_on_exc
     def delete_team_incident_services(self, services: List[TeamIncidentService]):
         for service in services:
             self._db.session.delete(service)
+        self._reset_team_incident_rollups({service.team_id for service in services})
         self._db.session.commit()
 
     @rollback_on_exc
@@ -136,6 +145,9 @@ class IncidentsRepoService:
             self._db.session.merge(incident_service_map)
             for incident_service_map in incident_org_incident_service_map
         ]
+        self._mark_team_incident_rollups_stale_for_incidents(
+            incidents, incident_org_incident_service_map
+        )
         self._db.session.commit()
 
     @rollback_on_exc
@@ -181,6 +193,275 @@ class IncidentsRepoService:
             .one_or_none()
         )
 
+    @rollback_on_exc
+    def get_team_incident_rollups(
+        self, team_id: str, interval: Interval
+    ) -> List[TeamIncidentRollup]:
+        return (
+            self._db.session.query(TeamIncidentRollup)
+            .filter(
+                TeamIncidentRollup.team_id == team_id,
+                TeamIncidentRollup.week_start.between(
+                    interval.from_time, interval.to_time
+                ),
+            )
+            .order_by(TeamIncidentRollup.week_start.asc())
+            .all()
+        )
+
+    @rollback_on_exc
+    def get_team_last_deployment_rollup_week(
+        self, team_id: str, before: datetime
+    ) -> Optional[datetime]:
+        """
+        Start of the team's last rollup week before the given time with deployments.
+        """
+        return (
+            self._db.session.query(func.max(TeamIncidentRollup.week_start))
+            .filter(
+                TeamIncidentRollup.team_id == team_id,
+                TeamIncidentRollup.week_start < before,
+                TeamIncidentRollup.deployment_count > 0,
+            )
+            .scalar()
+        )
+
+    @rollback_on_exc
+    def get_fresh_team_incident_rollup_state(
+        self, team_id: str
+    ) -> Optional[TeamIncidentRollupState]:
+        """
+        The team's rollup state, if the rollups are up to date with its data and
+        settings.
+        """
+        return (
+            self._db.session.query(TeamIncidentRollupState)
+            .filter(
+                TeamIncidentRollupState.team_id == team_id,
+                TeamIncidentRollupState.refreshed_at.is_not(None),
+                TeamIncidentRollupState.stale_from.is_(None),
+                ~self._get_team_config_changed_since_refresh_query(),
+            )
+            .one_or_none()
+        )
+
+    @rollback_on_exc
+    def get_teams_with_stale_incident_rollups(
+        self, org_id: str
+    ) -> List[Tuple[str, Optional[TeamIncidentRollupState], bool]]:
+        """
+        Teams of the org whose rollups need a refresh, as (team id, rollup state,
+        needs full refresh) tuples. Teams never refreshed or whose repos, incident
+        services or settings changed since need a full refresh.
+        """
+        needs_full_refresh = or_(
+            TeamIncidentRollupState.refreshed_at.is_(None),
+            self._get_team_config_changed_since_refresh_query(),
+        )
+        rows = (
+            self._db.session.query(Team.id, TeamIncidentRollupState, needs_full_refresh)
+            .outerjoin(
+                TeamIncidentRollupState, TeamIncidentRollupState.team_id == Team.id
+            )
+            .filter(
+                Team.org_id == org_id,
+                Team.is_deleted.is_(False),
+                or_(
+                    TeamIncidentRollupState.team_id.is_(None),
+                    TeamIncidentRollupState.stale_from.is_not(None),
+                    needs_full_refresh,
+                ),
+            )
+            .all()
+        )
+        return [
+            (str(team_id), state, state is None or bool(full_refresh))
+            for team_id, state, full_refresh in rows
+        ]
+
+    @rollback_on_exc
+    def save_team_incident_rollups(
+        self,
+        team_id: str,
+        rollups: List[TeamIncidentRollup],
+        from_time: datetime,
+        rollups_from: datetime,
+        refreshed_at: datetime,
+        state_updated_at: Optional[datetime] = None,
+    ):
+        """
+        Replaces the team's rollups from the week of from_time on. The state is
+        marked fresh only if no write made it stale again since it was read, as of
+        state_updated_at.
+        """
+        self._db.session.query(TeamIncidentRollup).filter(
+            TeamIncidentRollup.team_id == team_id,
+            TeamIncidentRollup.week_start >= from_time,
+        ).delete(synchronize_session=False)
+        bulk_upsert(self._db.session, TeamIncidentRollup, rollups)
+
+        statement = insert(TeamIncidentRollupState).values(
+            team_id=team_id,
+            rollups_from=rollups_from,
+            refreshed_at=refreshed_at,
+        )
+        self._db.session.execute(
+            statement.on_conflict_do_update(
+                index_elements=[TeamIncidentRollupState.team_id],
+                set_={
+                    "rollups_from": statement.excluded.rollups_from,
+                    "refreshed_at": statement.excluded.refreshed_at,
+                    "stale_from": case(
+                        (
+                            TeamIncidentRollupState.updated_at.is_not_distinct_from(
+                                state_updated_at
+                            ),
+                            None,
+                        ),
+                        else_=TeamIncidentRollupState.stale_from,
+                    ),
+                    "updated_at": func.now(),
+                },
+            )
+        )
+        self._db.session.commit()
+
+    @rollback_on_exc
+    def save_team_incident_rollups_stale_for_repo(
+        self, repo_id: str, stale_from: datetime
+    ):
+        self.mark_team_incident_rollups_stale_for_repos({repo_id: stale_from})
+        self._db.session.commit()
+
+    def mark_team_incident_rollups_stale_for_repos(
+        self, repo_id_to_stale_from: Dict[str, datetime]
+    ):
+        """
+        Marks the rollups of the teams of the repos stale from the given times on,
+        within the caller's transaction.
+        """
+        if not repo_id_to_stale_from:
+            return
+
+        team_repos = (
+            self._db.session.query(TeamRepos.team_id, TeamRepos.org_repo_id)
+            .filter(
+                TeamRepos.org_repo_id.in_(list(repo_id_to_stale_from.keys())),
+                TeamRepos.is_active.is_(True),
+            )
+            .all()
+        )
+
+        team_id_to_stale_from: Dict[str, datetime] = {}
+        for team_id, repo_id in team_repos:
+            stale_from = repo_id_to_stale_from[str(repo_id)]
+            if team_id in team_id_to_stale_from:
+                stale_from = min(stale_from, team_id_to_stale_from[team_id])
+            team_id_to_stale_from[team_id] = stale_from
+
+        self._mark_team_incident_rollups_stale(team_id_to_stale_from)
+
+    def _mark_team_incident_rollups_stale_for_incidents(
+        self,
+        incidents: List[Incident],
+        incident_org_incident_service_map: List[IncidentOrgIncidentServiceMap],
+    ):
+        incident_id_to_stale_from: Dict[str, datetime] = {}
+        for incident in incidents:
+            dates = [
+                date
+                for date in [incident.creation_date, incident.resolved_date]
+                if date
+            ]
+            if dates:
+                incident_id_to_stale_from[str(incident.id)] = min(dates)
+
+        service_id_to_stale_from: Dict[str, datetime] = {}
+        for incident_service_map in incident_org_incident_service_map:
+            stale_from = incident_id_to_stale_from.get(
+                str(incident_service_map.incident_id)
+            )
+            if not stale_from:
+                continue
+            service_id = str(incident_service_map.service_id)
+            if service_id in service_id_to_stale_from:
+                stale_from = min(stale_from, service_id_to_stale_from[service_id])
+            service_id_to_stale_from[service_id] = stale_from
+
+        if not service_id_to_stale_from:
+            return
+
+        team_services = (
+            self._db.session.query(
+                TeamIncidentService.team_id, TeamIncidentService.service_id
+            )
+            .filter(
+                TeamIncidentService.service_id.in_(
+                    list(service_id_to_stale_from.keys())
+                )
+            )
+            .all()
+        )
+
+        team_id_to_stale_from: Dict[str, datetime] = {}
+        for team_id, service_id in team_services:
+            stale_from = service_id_to_stale_from[str(service_id)]
+            if team_id in team_id_to_stale_from:
+                stale_from = min(stale_from, team_id_to_stale_from[team_id])
+            team_id_to_stale_from[team_id] = stale_from
+
+        self._mark_team_incident_rollups_stale(team_id_to_stale_from)
+
+    def _mark_team_incident_rollups_stale(
+        self, team_id_to_stale_from: Dict[str, datetime]
+    ):
+        for team_id, stale_from in team_id_to_stale_from.items():
+            statement = insert(TeamIncidentRollupState).values(
+                team_id=team_id, stale_from=stale_from
+            )
+            self._db.session.execute(
+                statement.on_conflict_do_update(
+                    index_elements=[TeamIncidentRollupState.team_id],
+                    set_={
+                        # least skips nulls, so a fresh state takes the new time
+                        "stale_from": func.least(
+                            TeamIncidentRollupState.stale_from,
+                            statement.excluded.stale_from,
+                        ),
+                        "updated_at": func.now(),
+                    },
+                )
+            )
+
+    def _reset_team_incident_rollups(self, team_ids):
+        for team_id in team_ids:
+            statement = insert(TeamIncidentRollupState).values(team_id=team_id)
+            self._db.session.execute(
+                statement.on_conflict_do_update(
+                    index_elements=[TeamIncidentRollupState.team_id],
+                    set_={"refreshed_at": None, "updated_at": func.now()},
+                )
+            )
+
+    def _get_team_config_changed_since_refresh_query(self):
+        team_id = TeamIncidentRollupState.team_id
+        refreshed_at = TeamIncidentRollupState.refreshed_at
+        return or_(
+            exists().where(
+                Settings.entity_type == EntityType.TEAM,
+                Settings.entity_id == team_id,
+                Settings.updated_at > refreshed_at,
+            ),
+            exists().where(
+                TeamRepos.team_id == team_id,
+                TeamRepos.updated_at > refreshed_at,
+            ),
+            exists().where(
+                TeamIncidentService.team_id == team_id,
+                TeamIncidentService.updated_at > refreshed_at,
+            ),
+        )
+
     def _get_team_incidents_query(
         self, team_id: str, incident_filter: IncidentFilter = None
     ):
@@ -1,2 +1,66 @@
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Iterator, Optional
+
+from sqlalchemy.orm import Session
+
+from mhq.store import db
+from mhq.store.models.integrations import ExapiResponseCache
+from mhq.utils.log import LOG
+
+
 class IntegrationsRepoService:
     pass
+
+
+class ExapiResponseCacheRepoService:
+    """
+    Reads and writes cached responses in sessions of their own, each on its own
+    connection and transaction. Caching a response mid sync never commits or rolls
+    back the sync's work on the shared db session.
+    """
+
+    def __init__(self):
+        self._db = db
+
+    @contextmanager
+    def _session(self) -> Iterator[Session]:
+        try:
+            with Session(self._db.engine, expire_on_commit=False) as session:
+                with session.begin():
+                    yield session
+        except Exception as e:
+            LOG.error(f"Error in exapi response cache - {str(e)}")
+            raise
+
+    def get_cached_response(self, key: str) -> Optional[ExapiResponseCache]:
+        with self._session() as session:
+            return session.get(ExapiResponseCache, key)
+
+    def save_cached_response(self, cached_response: ExapiResponseCache):
+        with self._session() as session:
+            session.merge(cached_response)
+
+    def update_accessed_at(self, key: str, accessed_at: datetime):
+        with self._session() as session:
+            session.query(ExapiResponseCache).filter(
+                ExapiResponseCache.key == key
+            ).update({ExapiResponseCache.accessed_at: accessed_at})
+
+    def delete_cached_responses_accessed_before(self, accessed_before: datetime):
+        with self._session() as session:
+            session.query(ExapiResponseCache).filter(
+                ExapiResponseCache.accessed_at < accessed_before
+            ).delete()
+
+    def delete_least_recently_accessed_responses(self, max_entries: int):
+        with self._session() as session:
+            lru_keys = (
+                session.query(ExapiResponseCache.key)
+                .order_by(ExapiResponseCache.accessed_at.desc())
+                .offset(max_entries)
+                .subquery()
+            )
+            session.query(ExapiResponseCache).filter(
+                ExapiResponseCache.key.in_(lru_keys.select())
+            ).delete(synchronize_session=False)
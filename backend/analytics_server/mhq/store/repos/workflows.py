@@ -1,10 +1,13 @@
-from datetime import datetime
-from typing import List, Tuple
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
 
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import defer
-from sqlalchemy import and_
+from sqlalchemy import and_, func, literal, literal_column, or_
 
 from mhq.store import db, rollback_on_exc
+from mhq.store.upsert import bulk_upsert
 from mhq.store.models.code.workflows.enums import (
     RepoWorkflowRunsStatus,
     RepoWorkflowType,
@@ -16,13 +19,23 @@ from mhq.store.models.code.workflows.workflows import (
     RepoWorkflowRuns,
     RepoWorkflowRunsBookmark,
 )
+from mhq.store.models.code.enums import TeamReposDeploymentType
 from mhq.store.models.code.repository import OrgRepo
+from mhq.store.models.code import (
+    DeploymentDailyRollup,
+    RawPayloadArchive,
+    RawPayloadEntityType,
+)
+from mhq.store.raw_payloads import get_raw_payload_policy
+from mhq.store.repos.incidents import IncidentsRepoService
 from mhq.utils.time import Interval
 
 
 class WorkflowRepoService:
     def __init__(self):
         self._db = db
+        self._raw_payload_policy = get_raw_payload_policy()
+        self._incidents_repo_service = IncidentsRepoService()
 
     @rollback_on_exc
     def get_active_repo_workflows_by_repo_ids_and_providers(
@@ -55,10 +68,23 @@ class WorkflowRepoService:
 
     @rollback_on_exc
     def save_repo_workflow_runs(self, repo_workflow_runs: List[RepoWorkflowRuns]):
-        [
-            self._db.session.merge(repo_workflow_run)
-            for repo_workflow_run in repo_workflow_runs
-        ]
+        raw_payloads = self._raw_payload_policy.compact(
+            RawPayloadEntityType.REPO_WORKFLOW_RUN, repo_workflow_runs, "meta"
+        )
+        run_ids = [run.id for run in repo_workflow_runs if run.id]
+        # Days the runs were counted in before the upsert, in case they moved
+        workflow_days = self._get_repo_workflow_run_days(run_ids)
+        bulk_upsert(self._db.session, RepoWorkflowRuns, repo_workflow_runs)
+        bulk_upsert(self._db.session, RawPayloadArchive, raw_payloads)
+        workflow_days += self._get_repo_workflow_run_days(
+            [run.id for run in repo_workflow_runs]
+        )
+        self._refresh_deployment_rollups(workflow_days)
+        self._incidents_repo_service.mark_team_incident_rollups_stale_for_repos(
+            self._get_repo_id_to_earliest_run_time(
+                [run.id for run in repo_workflow_runs]
+            )
+        )
         self._db.session.commit()
 
     @rollback_on_exc
@@ -118,6 +144,14 @@ class WorkflowRepoService:
             .all()
         )
 
+    @rollback_on_exc
+    def get_repo_workflow_by_id(self, repo_workflow_id: str) -> Optional[RepoWorkflow]:
+        return (
+            self._db.session.query(RepoWorkflow)
+            .filter(RepoWorkflow.id == repo_workflow_id)
+            .one_or_none()
+        )
+
     @rollback_on_exc
     def get_repo_workflows_by_repo_id(self, repo_id: str) -> List[RepoWorkflow]:
         return (
@@ -179,6 +213,45 @@ class WorkflowRepoService:
 
         return query.all()
 
+    @rollback_on_exc
+    def get_deployment_rollups(
+        self, repo_ids: List[str], interval: Interval, workflow_filter: WorkflowFilter
+    ) -> List[DeploymentDailyRollup]:
+        """
+        Successful run counts of the active repo workflows, for the days starting in
+        the interval.
+        """
+        query = (
+            self._db.session.query(DeploymentDailyRollup)
+            .join(RepoWorkflow, RepoWorkflow.id == DeploymentDailyRollup.source_id)
+            .filter(
+                DeploymentDailyRollup.deployment_type
+                == TeamReposDeploymentType.WORKFLOW.value,
+                DeploymentDailyRollup.repo_id.in_(repo_ids),
+                DeploymentDailyRollup.day.between(interval.from_time, interval.to_time),
+            )
+        )
+        query = self._filter_active_repo_workflows(query)
+        query = self._filter_deployment_rollups(query, workflow_filter)
+
+        return query.all()
+
+    @rollback_on_exc
+    def get_deployment_rollups_for_runs_in_interval(
+        self, repo_ids: List[str], interval: Interval, workflow_filter: WorkflowFilter
+    ) -> List[DeploymentDailyRollup]:
+        """
+        Rollups counted on the fly from the successful runs in the interval, for
+        intervals that do not cover whole days.
+        """
+        query = self._get_deployment_rollups_query()
+        query = self._filter_active_repo_workflows(query)
+        query = self._filter_repo_workflows_by_repo_ids(query, repo_ids)
+        query = self._filter_repo_workflow_runs_in_interval(query, interval)
+        query = self._filter_workflows(query, workflow_filter)
+
+        return [DeploymentDailyRollup(**row._asdict()) for row in query.all()]
+
     @rollback_on_exc
     def get_repo_workflow_run_by_id(
         self, repo_workflow_run_id: str
@@ -208,6 +281,23 @@ class WorkflowRepoService:
             .first()
         )
 
+    @rollback_on_exc
+    def get_previous_successful_workflow_run(
+        self, workflow_run: RepoWorkflowRuns
+    ) -> Optional[RepoWorkflowRuns]:
+        return (
+            self._db.session.query(RepoWorkflowRuns)
+            .options(defer(RepoWorkflowRuns.meta))
+            .filter(
+                RepoWorkflowRuns.repo_workflow_id == workflow_run.repo_workflow_id,
+                RepoWorkflowRuns.conducted_at < workflow_run.conducted_at,
+                RepoWorkflowRuns.head_branch == workflow_run.head_branch,
+                RepoWorkflowRuns.status == RepoWorkflowRunsStatus.SUCCESS,
+            )
+            .order_by(RepoWorkflowRuns.conducted_at.desc())
+            .first()
+        )
+
     @rollback_on_exc
     def get_repo_workflow_runs_conducted_after_time(
         self, repo_id: str, from_time: datetime = None, limit_value: int = 500
@@ -230,6 +320,137 @@ class WorkflowRepoService:
 
         return query.limit(limit_value).all()
 
+    def _get_deployment_rollup_day(self):
+        # Midnight in UTC, same as the daily deployment frequency buckets
+        return func.timezone(
+            "UTC",
+            func.date_trunc("day", func.timezone("UTC", RepoWorkflowRuns.conducted_at)),
+        )
+
+    def _get_deployment_rollups_query(self):
+        # Inlined empty string, so the select and group by render the same
+        head_branch = func.coalesce(RepoWorkflowRuns.head_branch, literal_column("''"))
+        return (
+            self._db.session.query(
+                literal(TeamReposDeploymentType.WORKFLOW.value).label(
+                    "deployment_type"
+                ),
+                RepoWorkflowRuns.repo_workflow_id.label("source_id"),
+                head_branch.label("head_branch"),
+                self._get_deployment_rollup_day().label("day"),
+                RepoWorkflow.org_repo_id.label("repo_id"),
+                func.count(RepoWorkflowRuns.id).label("deployment_count"),
+            )
+            .join(RepoWorkflow, RepoWorkflow.id == RepoWorkflowRuns.repo_workflow_id)
+            .filter(RepoWorkflowRuns.status == RepoWorkflowRunsStatus.SUCCESS)
+            # By output column, the day expressions carry their own bind params
+            .group_by(
+                RepoWorkflowRuns.repo_workflow_id,
+                head_branch,
+                literal_column("day"),
+                RepoWorkflow.org_repo_id,
+            )
+        )
+
+    def _get_repo_workflow_run_days(
+        self, run_ids: List[str]
+    ) -> List[Tuple[str, datetime]]:
+        if not run_ids:
+            return []
+
+        return (
+            self._db.session.query(
+                RepoWorkflowRuns.repo_workflow_id, self._get_deployment_rollup_day()
+            )
+            .filter(RepoWorkflowRuns.id.in_(run_ids))
+            .distinct()
+            .all()
+        )
+
+    def _get_repo_id_to_earliest_run_time(
+        self, run_ids: List[str]
+    ) -> Dict[str, datetime]:
+        if not run_ids:
+            return {}
+
+        rows = (
+            self._db.session.query(
+                RepoWorkflow.org_repo_id, func.min(RepoWorkflowRuns.conducted_at)
+            )
+            .join(RepoWorkflow, RepoWorkflow.id == RepoWorkflowRuns.repo_workflow_id)
+            .filter(RepoWorkflowRuns.id.in_(run_ids))
+            .group_by(RepoWorkflow.org_repo_id)
+            .all()
+        )
+        return {
+            str(repo_id): conducted_at for repo_id, conducted_at in rows if conducted_at
+        }
+
+    def _refresh_deployment_rollups(self, workflow_days: List[Tuple[str, datetime]]):
+        """
+        Recounts the rollups of the given repo workflow days, within the caller's
+        transaction.
+        """
+        days_by_repo_workflow_id: Dict[str, Set[datetime]] = defaultdict(set)
+        for repo_workflow_id, day in workflow_days:
+            days_by_repo_workflow_id[repo_workflow_id].add(day)
+
+        for repo_workflow_id, days in days_by_repo_workflow_id.items():
+            self._db.session.query(DeploymentDailyRollup).filter(
+                DeploymentDailyRollup.deployment_type
+                == TeamReposDeploymentType.WORKFLOW.value,
+                DeploymentDailyRollup.source_id == repo_workflow_id,
+                DeploymentDailyRollup.day.in_(days),
+            ).delete(synchronize_session=False)
+
+            rollups_query = self._get_deployment_rollups_query().filter(
+                RepoWorkflowRuns.repo_workflow_id == repo_workflow_id,
+                or_(
+                    RepoWorkflowRuns.conducted_at.between(
+                        day, day + timedelta(days=1, microseconds=-1)
+                    )
+                    for day in days
+                ),
+            )
+            columns = [column["name"] for column in rollups_query.column_descriptions]
+            self._db.session.execute(
+                insert(DeploymentDailyRollup).from_select(
+                    columns, rollups_query.statement
+                )
+            )
+
+    def _filter_deployment_rollups(self, query, workflow_filter: WorkflowFilter):
+        if not workflow_filter:
+            return query
+
+        # Runs with no head branch never match a branch pattern
+        head_branch = func.nullif(DeploymentDailyRollup.head_branch, "")
+
+        if workflow_filter.head_branches:
+            query = query.filter(
+                or_(head_branch.op("~")(term) for term in workflow_filter.head_branches)
+            )
+
+        if workflow_filter.repo_filters:
+            # Same as RepoWorkflowFilter, on the rollup columns
+            conditions = []
+            for repo_id, repo_filters in workflow_filter.repo_filters.items():
+                if not repo_filters:
+                    continue
+                condition = DeploymentDailyRollup.repo_id == repo_id
+                head_branches = repo_filters.get("head_branches")
+                if head_branches:
+                    condition = condition & or_(
+                        head_branch.op("~")(term)
+                        for term in head_branches
+                        if term is not None
+                    )
+                conditions.append(condition)
+            if conditions:
+                query = query.filter(or_(*conditions))
+
+        return query
+
     def _filter_active_repo_workflows(self, query):
         return query.filter(
             RepoWorkflow.is_active.is_(True),
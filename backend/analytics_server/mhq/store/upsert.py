@@ -0,0 +1,107 @@
+from collections import defaultdict
+from typing import Any, Dict, FrozenSet, List, Tuple, Type
+
+from sqlalchemy import inspect
+from sqlalchemy.dialects.postgresql import Insert, insert
+from sqlalchemy.orm import Session
+
+from mhq.store import db
+
+UPSERT_BATCH_SIZE = 1000
+# Postgres caps the number of bind parameters in a single statement
+MAX_BIND_PARAMS = 32767
+
+
+def _get_row(obj: db.Model) -> Dict[str, Any]:
+    """
+    Column values set on the object. Like session.merge, attributes that were never
+    set (or deferred and not loaded) are left out, so they keep their stored value.
+    """
+    state = inspect(obj)
+    row = {}
+    for column_attr in state.mapper.column_attrs:
+        if column_attr.key in state.dict:
+            row[column_attr.columns[0].key] = state.dict[column_attr.key]
+    return row
+
+
+def _get_primary_key(model: Type[db.Model], row: Dict[str, Any]) -> Tuple:
+    return tuple(row.get(column.key) for column in inspect(model).primary_key)
+
+
+def _dedupe_by_primary_key(
+    model: Type[db.Model], objects: List[db.Model]
+) -> List[Dict[str, Any]]:
+    # A statement can not upsert the same row twice, later objects win like repeated merges
+    rows_by_key: Dict[Tuple, Dict[str, Any]] = {}
+    for obj in objects:
+        row = _get_row(obj)
+        key = _get_primary_key(model, row)
+        if None in key:
+            rows_by_key[(id(obj),)] = row
+            continue
+        rows_by_key[key] = {**rows_by_key.get(key, {}), **row}
+    return list(rows_by_key.values())
+
+
+def _get_upsert_statement(model: Type[db.Model], columns: FrozenSet[str]) -> Insert:
+    table = model.__table__
+    primary_key_columns = [column.key for column in inspect(model).primary_key]
+    statement = insert(table)
+
+    update_values = {
+        column: statement.excluded[column]
+        for column in columns
+        if column not in primary_key_columns
+    }
+    for column in table.columns:
+        # onupdate defaults are not applied to the update half of an upsert
+        if (
+            column.key not in columns
+            and column.onupdate is not None
+            and column.onupdate.is_clause_element
+        ):
+            update_values[column.key] = column.onupdate.arg
+
+    if not update_values:
+        return statement.on_conflict_do_nothing(index_elements=primary_key_columns)
+
+    return statement.on_conflict_do_update(
+        index_elements=primary_key_columns, set_=update_values
+    )
+
+
+def get_upsert_batches(
+    model: Type[db.Model], objects: List[db.Model], batch_size: int = UPSERT_BATCH_SIZE
+) -> List[Tuple[Insert, List[Dict[str, Any]]]]:
+    """
+    Groups the objects into INSERT ... ON CONFLICT DO UPDATE statements keyed on the
+    primary key. Objects are grouped by the set of columns they set, so columns an
+    object does not set are neither inserted nor overwritten.
+    """
+    rows_by_columns: Dict[FrozenSet[str], List[Dict[str, Any]]] = defaultdict(list)
+    for row in _dedupe_by_primary_key(model, objects):
+        rows_by_columns[frozenset(row)].append(row)
+
+    batches = []
+    for columns, rows in rows_by_columns.items():
+        statement = _get_upsert_statement(model, columns)
+        rows_per_batch = max(min(batch_size, MAX_BIND_PARAMS // len(columns)), 1)
+        for start in range(0, len(rows), rows_per_batch):
+            end = start + rows_per_batch
+            batches.append((statement, rows[start:end]))
+    return batches
+
+
+def bulk_upsert(
+    session: Session,
+    model: Type[db.Model],
+    objects: List[db.Model],
+    batch_size: int = UPSERT_BATCH_SIZE,
+):
+    """
+    Upserts the objects in batches within the session's transaction.
+    Commits are left to the caller.
+    """
+    for statement, rows in get_upsert_batches(model, objects, batch_size):
+        session.execute(statement, rows)
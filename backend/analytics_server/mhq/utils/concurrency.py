@@ -0,0 +1,38 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Sequence, TypeVar
+
+from flask import current_app, has_app_context
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def run_in_app_context_pool(
+    func: Callable[[T], R], items: Sequence[T], max_workers: int
+) -> List[R]:
+    """
+    Runs func over items using a bounded pool of worker threads.
+
+    Every worker call runs inside a fresh copy of the current flask app context,
+    so each one gets its own db session which is removed once the call returns.
+    With max_workers <= 1, or without an app context, items are processed
+    serially in the calling thread.
+
+    :param func: callable invoked once per item
+    :param items: items to process
+    :param max_workers: upper bound on the number of concurrent workers
+    :return: results of func in the same order as items
+    """
+    if max_workers <= 1 or len(items) <= 1 or not has_app_context():
+        return [func(item) for item in items]
+
+    app = current_app._get_current_object()
+
+    def _run(item: T) -> R:
+        with app.app_context():
+            return func(item)
+
+    with ThreadPoolExecutor(
+        max_workers=min(max_workers, len(items)), thread_name_prefix="mhq-worker"
+    ) as executor:
+        return list(executor.map(_run, items))
@@ -1,5 +1,5 @@
 from datetime import datetime, timedelta
-from typing import Callable, List, Dict, Any, Optional
+from typing import Callable, List, Dict, Any, Optional, Tuple
 from collections import defaultdict
 
 import pytz
@@ -122,6 +122,57 @@ def get_given_weeks_sunday(dt: datetime):
     return get_end_of_day(sunday_midnight)
 
 
+def split_interval_on_whole_weeks(
+    interval: Interval,
+) -> Tuple[Optional[Interval], List[Interval]]:
+    """
+    Splits an interval into the whole Monday to Sunday weeks it covers and the
+    partial weeks left at either end. The parts do not overlap.
+    """
+    return _split_interval_on_whole_periods(
+        interval, get_given_weeks_monday, timedelta(weeks=1)
+    )
+
+
+def split_interval_on_whole_days(
+    interval: Interval,
+) -> Tuple[Optional[Interval], List[Interval]]:
+    """
+    Splits an interval into the whole UTC days it covers and the partial days left
+    at either end. The parts do not overlap.
+    """
+    return _split_interval_on_whole_periods(
+        interval, get_start_of_day, timedelta(days=1)
+    )
+
+
+def _split_interval_on_whole_periods(
+    interval: Interval,
+    get_period_start: Callable[[datetime], datetime],
+    period: timedelta,
+) -> Tuple[Optional[Interval], List[Interval]]:
+    from_time = interval.from_time.astimezone(pytz.UTC)
+    to_time = interval.to_time.astimezone(pytz.UTC)
+    last_moment = timedelta(microseconds=1)
+
+    periods_start = get_period_start(from_time)
+    if periods_start < from_time:
+        periods_start += period
+
+    whole_periods = max((to_time + last_moment - periods_start) // period, 0)
+    if not whole_periods:
+        return None, [interval]
+
+    periods_end = periods_start + whole_periods * period
+    partial_intervals = []
+    if from_time < periods_start:
+        partial_intervals.append(Interval(from_time, periods_start - last_moment))
+    if periods_end <= to_time:
+        partial_intervals.append(Interval(periods_end, to_time))
+
+    return Interval(periods_start, periods_end - last_moment), partial_intervals
+
+
 def get_time_delta_based_on_granularity(date: datetime, granularity: str) -> timedelta:
     """
     Takes a date and a granularity.
@@ -183,56 +234,68 @@ def generate_expanded_buckets(
     The series is expanded beyond the input interval based on the datetime_attribute.
     Granularity options: 'daily', 'weekly', 'monthly'.
     """
-    from_time = interval.from_time
-    to_time = interval.to_time
-
-    def generate_empty_buckets(
-        from_time: datetime, to_time: datetime, granularity: str
-    ) -> Dict[datetime, List[Any]]:
-        buckets_map: Dict[datetime, List[Any]] = defaultdict(list)
-        expanded_interval = get_expanded_interval_based_on_granularity(
-            Interval(from_time, to_time), granularity
-        )
-        curr_date = expanded_interval.from_time
-        while curr_date <= expanded_interval.to_time:
-            delta = get_time_delta_based_on_granularity(curr_date, granularity)
-            buckets_map[get_start_of_day(curr_date)] = []
-            curr_date += delta
-
-        return buckets_map
-
     for obj in lst:
         if not isinstance(getattr(obj, datetime_attribute), datetime):
             raise ValueError(
                 f"Type of datetime_attribute {type(getattr(obj, datetime_attribute))} is not datetime"
             )
 
-    buckets_map: Dict[datetime, List[Any]] = generate_empty_buckets(
-        from_time, to_time, granularity
-    )
+    buckets_map: Dict[datetime, List[Any]] = defaultdict(list)
+    for bucket_key in _generate_empty_bucket_keys(interval, granularity):
+        buckets_map[bucket_key] = []
 
     for obj in lst:
-        date_value = getattr(obj, datetime_attribute)
-        if granularity == "daily":
-            bucket_key = get_start_of_day(date_value)
-        elif granularity == "weekly":
-            # Adjust the date to the start of the week (Monday)
-            bucket_key = get_start_of_day(
-                date_value - timedelta(days=date_value.weekday())
-            )
-        elif granularity == "monthly":
-            # Adjust the date to the start of the month
-            bucket_key = get_start_of_day(date_value.replace(day=1))
-        else:
-            raise ValueError(
-                "Invalid granularity. Choose 'daily', 'weekly', or 'monthly'."
-            )
-
+        bucket_key = _get_bucket_key(getattr(obj, datetime_attribute), granularity)
         buckets_map[bucket_key].append(obj)
 
     return buckets_map
 
 
+def generate_expanded_count_buckets(
+    date_to_count_map: Dict[datetime, int],
+    interval: Interval,
+    granularity: str = "weekly",
+) -> Dict[datetime, int]:
+    """
+    Same buckets as generate_expanded_buckets, for counts already grouped by a
+    finer granularity, like daily counts summed up into weeks.
+    """
+    buckets_map: Dict[datetime, int] = defaultdict(int)
+    for bucket_key in _generate_empty_bucket_keys(interval, granularity):
+        buckets_map[bucket_key] = 0
+
+    for date_value, count in date_to_count_map.items():
+        buckets_map[_get_bucket_key(date_value, granularity)] += count
+
+    return buckets_map
+
+
+def _generate_empty_bucket_keys(interval: Interval, granularity: str) -> List[datetime]:
+    expanded_interval = get_expanded_interval_based_on_granularity(
+        interval, granularity
+    )
+    bucket_keys = []
+    curr_date = expanded_interval.from_time
+    while curr_date <= expanded_interval.to_time:
+        delta = get_time_delta_based_on_granularity(curr_date, granularity)
+        bucket_keys.append(get_start_of_day(curr_date))
+        curr_date += delta
+
+    return bucket_keys
+
+
+def _get_bucket_key(date_value: datetime, granularity: str) -> datetime:
+    if granularity == "daily":
+        return get_start_of_day(date_value)
+    if granularity == "weekly":
+        # Adjust the date to the start of the week (Monday)
+        return get_start_of_day(date_value - timedelta(days=date_value.weekday()))
+    if granularity == "monthly":
+        # Adjust the date to the start of the month
+        return get_start_of_day(date_value.replace(day=1))
+    raise ValueError("Invalid granularity. Choose 'daily', 'weekly', or 'monthly'.")
+
+
 def sort_dict_by_datetime_keys(input_dict):
     sorted_items = sorted(input_dict.items())
     sorted_dict = dict(sorted_items)
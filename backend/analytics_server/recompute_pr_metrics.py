@@ -0,0 +1,71 @@
+"""
+Recomputes pr metrics from the prs, events and commits already stored, without
+syncing from the code providers. Run it after changing the metric logic:
+    python recompute_pr_metrics.py --restart
+
+Without --restart an interrupted run resumes from the last chunk it wrote.
+"""
+
+import argparse
+
+from flask import Flask
+
+from env import load_app_env
+
+load_app_env()
+
+from mhq.store import configure_db_with_app  # noqa: E402
+from mhq.service.code.sync.pr_metrics_recompute import (  # noqa: E402
+    PR_METRICS_RECOMPUTE_CHUNK_SIZE,
+    PR_METRICS_RECOMPUTE_PROCESSES,
+    get_pr_metrics_recompute_service,
+)
+from mhq.service.query_validator import get_query_validator  # noqa: E402
+from mhq.store.repos.code import CodeRepoService  # noqa: E402
+from mhq.utils.log import LOG  # noqa: E402
+
+app = Flask(__name__)
+
+configure_db_with_app(app)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--repo-id",
+        action="append",
+        help="Repo to recompute, defaults to every active repo of the org",
+    )
+    parser.add_argument(
+        "--restart",
+        action="store_true",
+        help="Start over instead of resuming from the last run",
+    )
+    parser.add_argument(
+        "--chunk-size", type=int, default=PR_METRICS_RECOMPUTE_CHUNK_SIZE
+    )
+    parser.add_argument("--processes", type=int, default=PR_METRICS_RECOMPUTE_PROCESSES)
+    args = parser.parse_args()
+
+    with app.app_context():
+        default_org = get_query_validator().get_default_org()
+        if not default_org:
+            LOG.error("[PR Metrics Recompute] Default org not found")
+            return
+
+        org_repos = CodeRepoService().get_active_org_repos(str(default_org.id))
+        if args.repo_id:
+            org_repos = [repo for repo in org_repos if str(repo.id) in args.repo_id]
+
+        recompute_service = get_pr_metrics_recompute_service(
+            args.chunk_size, args.processes
+        )
+        for progress in recompute_service.recompute_repos(org_repos, args.restart):
+            LOG.info(
+                f"[PR Metrics Recompute] {progress.repo_name}: done, "
+                f"{progress.recomputed_prs} prs recomputed"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,7 @@ load_app_env()
 from mhq.store import configure_db_with_app
 from mhq.api.hello import app as core_api
 from mhq.api.sync import app as sync_api
+from mhq.service.sync_jobs import SYNC_JOB_QUEUE_BACKEND, start_in_process_sync_worker
 
 SYNC_SERVER_PORT = getenv("SYNC_SERVER_PORT")
 
@@ -19,5 +20,8 @@ app.register_blueprint(sync_api)
 
 configure_db_with_app(app)
 
+if SYNC_JOB_QUEUE_BACKEND == "memory":
+    start_in_process_sync_worker(app)
+
 if __name__ == "__main__":
     app.run(port=SYNC_SERVER_PORT)
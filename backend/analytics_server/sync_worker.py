@@ -0,0 +1,36 @@
+import signal
+import threading
+
+from flask import Flask
+
+from env import load_app_env
+
+load_app_env()
+
+from mhq.store import configure_db_with_app  # noqa: E402
+from mhq.service.sync_jobs import get_sync_worker  # noqa: E402
+from mhq.utils.log import LOG  # noqa: E402
+
+app = Flask(__name__)
+
+configure_db_with_app(app)
+
+
+def main():
+    stop_event = threading.Event()
+
+    def _stop(signum, _frame):
+        LOG.info(
+            f"[Sync Jobs] Received signal {signum}, stopping after the current job"
+        )
+        stop_event.set()
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+
+    LOG.info("[Sync Jobs] Sync worker started")
+    get_sync_worker().run_forever(app, stop_event)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,10 +5,12 @@ from mhq.exapi.github import GithubApiService, PAGE_SIZE
 
 
 class DummyGithub:
-    def __init__(self, token, base_url=None, per_page=None):
+    def __init__(self, token, base_url=None, per_page=None, retry=None, pool_size=None):
         self.token = token
         self.base_url = base_url
         self.per_page = per_page
+        self.retry = retry
+        self.pool_size = pool_size
 
 
 class TestGithubApiService(unittest.TestCase):
@@ -22,6 +24,8 @@ class TestGithubApiService(unittest.TestCase):
         self.assertEqual(service._g.token, token)
         self.assertEqual(service._g.base_url, "https://api.github.com")
         self.assertEqual(service._g.per_page, PAGE_SIZE)
+        self.assertIsNotNone(service._g.retry)
+        self.assertGreaterEqual(service._g.pool_size, 1)
 
     @patch("mhq.exapi.github.Github", new=DummyGithub)
     def test_empty_string_domain_uses_default_url(self):
@@ -0,0 +1,109 @@
+from datetime import datetime
+
+import pytest
+
+from mhq.exapi.github import GithubRateLimitExceeded
+from mhq.exapi.github_graphql import GithubGraphQLApiService, PR_BATCH_SIZE
+from tests.factories.models.exapi.github_graphql import (
+    get_github_graphql_commit_node,
+    get_github_graphql_pull_request_connection_response,
+    get_github_graphql_pull_request_node,
+    get_github_graphql_pull_requests_response,
+    get_github_graphql_ready_for_review_node,
+    get_github_graphql_review_node,
+)
+from tests.utilities import FakeHTTPServer
+
+
+def test_graphql_url_for_default_and_custom_domain():
+    assert (
+        GithubGraphQLApiService("token", None).graphql_url
+        == "https://api.github.com/graphql"
+    )
+    assert (
+        GithubGraphQLApiService("token", "https://github.sujai.com").graphql_url
+        == "https://github.sujai.com/api/graphql"
+    )
+
+
+def test_get_pull_requests_page_paginates_nested_reviews_and_adapts_payloads():
+    pr_node = get_github_graphql_pull_request_node(
+        number=7,
+        reviews=[get_github_graphql_review_node(database_id=1, state="COMMENTED")],
+        reviews_end_cursor="reviews-cursor",
+        ready_for_review_events=[get_github_graphql_ready_for_review_node()],
+        commits=[get_github_graphql_commit_node(author_login=None)],
+        requested_reviewers=["reviewer"],
+    )
+
+    def respond(method, path, payload, headers):
+        if "pullRequests" in payload["query"]:
+            assert payload["variables"]["first"] == PR_BATCH_SIZE
+            return 200, get_github_graphql_pull_requests_response([pr_node], "next")
+        assert payload["variables"] == {
+            "owner": "org",
+            "name": "repo",
+            "number": 7,
+            "cursor": "reviews-cursor",
+        }
+        return 200, get_github_graphql_pull_request_connection_response(
+            "reviews", [get_github_graphql_review_node(database_id=2)]
+        )
+
+    with FakeHTTPServer(respond) as server:
+        service = GithubGraphQLApiService("token", server.url)
+        prs, cursor = service.get_pull_requests_page("org", "repo")
+
+    assert len(server.requests) == 2
+    assert all(path == "/api/graphql" for _, path, _ in server.requests)
+    assert cursor == "next"
+    assert len(prs) == 1
+
+    pr = prs[0]
+    assert pr.number == 7
+    assert pr.merged_at == datetime(2022, 6, 29, 11, 53, 15)
+    assert pr.base.ref == "main"
+    assert pr.user.login == "abc"
+    assert pr.commits == 1
+    assert pr.raw_data["merge_commit_sha"] == "123456"
+    assert pr.raw_data["requested_reviewers"] == [{"login": "reviewer"}]
+
+    assert [(event.event_type, event.id) for event in pr.timeline_events] == [
+        ("ready_for_review", "RFRE_123"),
+        ("reviewed", "1"),
+        ("reviewed", "2"),
+    ]
+    assert pr.timeline_events[1].raw_data["state"] == "commented"
+    assert pr.timeline_events[2].raw_data["state"] == "approved"
+    assert pr.timeline_events[2].user == "reviewer"
+
+    assert pr.commit_dicts[0]["sha"] == "123456789098765"
+    assert pr.commit_dicts[0]["author"] is None
+    assert pr.commit_dicts[0]["commit"]["committer"]["date"] == "2022-06-29T08:53:15Z"
+
+
+def test_get_pull_requests_page_skips_pending_reviews():
+    pr_node = get_github_graphql_pull_request_node(
+        reviews=[get_github_graphql_review_node(state="PENDING", submitted_at=None)]
+    )
+
+    with FakeHTTPServer(
+        lambda *_: (200, get_github_graphql_pull_requests_response([pr_node]))
+    ) as server:
+        prs, cursor = GithubGraphQLApiService(
+            "token", server.url
+        ).get_pull_requests_page("org", "repo")
+
+    assert cursor is None
+    assert prs[0].timeline_events == []
+
+
+def test_get_pull_requests_page_raises_on_rate_limit():
+    rate_limited_response = {
+        "errors": [{"type": "RATE_LIMITED", "message": "API rate limit exceeded"}]
+    }
+
+    with FakeHTTPServer(lambda *_: (200, rate_limited_response)) as server:
+        service = GithubGraphQLApiService("token", server.url)
+        with pytest.raises(GithubRateLimitExceeded):
+            service.get_pull_requests_page("org", "repo")
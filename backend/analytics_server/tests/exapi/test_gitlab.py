@@ -0,0 +1,114 @@
+import asyncio
+import threading
+import time
+from datetime import datetime, timedelta
+from urllib.parse import parse_qs, urlparse
+
+from mhq.exapi.gitlab import GitlabApiService
+from mhq.exapi.response_cache import ConditionalRequestCache, DiskResponseCacheStore
+from tests.utilities import FakeHTTPServer
+
+
+class InFlightCounter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def respond(self, method, path, payload, headers):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(0.05)
+        with self._lock:
+            self.in_flight -= 1
+
+        merge_request_iid, resource = path.split("/")[-2:]
+        if resource == "notes":
+            return 200, [{"id": f"{merge_request_iid}1", "author": {"username": "a"}}]
+        if resource == "commits":
+            return 200, [{"id": f"sha{merge_request_iid}"}]
+        return 200, [{"diff": "@@ -1 +1 @@\n-a\n+b\n"}]
+
+
+def test_get_merge_requests_details_fetches_merged_details_with_bounded_concurrency():
+    counter = InFlightCounter()
+
+    with FakeHTTPServer(counter.respond) as server:
+        details = asyncio.run(
+            GitlabApiService("token", server.url).get_merge_requests_details(
+                "1", ["1", "2", "3", "4"], {"1", "3"}, concurrency=2
+            )
+        )
+
+    assert len(server.requests) == 8
+    assert counter.max_in_flight == 2
+    assert [note.idempotency_key for note in details["2"].notes] == ["21"]
+    assert details["2"].commits == []
+    assert details["2"].diffs == []
+    assert [commit.hash for commit in details["3"].commits] == ["sha3"]
+    assert details["3"].diffs == [{"diff": "@@ -1 +1 @@\n-a\n+b\n"}]
+
+
+def test_get_merge_requests_details_revalidates_cached_responses(tmp_path):
+    def respond(method, path, payload, headers):
+        if headers.get("If-None-Match") == '"v1"':
+            return 304, None, {"ETag": '"v1"'}
+        return 200, [{"id": "1", "author": {"username": "a"}}], {"ETag": '"v1"'}
+
+    with FakeHTTPServer(respond) as server:
+        service = GitlabApiService("token", server.url)
+        service._cache = ConditionalRequestCache(
+            DiskResponseCacheStore(str(tmp_path), 10, timedelta(days=1))
+        )
+        for _ in range(2):
+            details = asyncio.run(
+                service.get_merge_requests_details("1", ["1", "2"], set())
+            )
+
+    assert len(server.requests) == 4
+    assert service._cache.get_stats()["gitlab/merge_request_notes"] == dict(
+        hits=2, misses=2, hit_rate=0.5
+    )
+    assert [note.idempotency_key for note in details["2"].notes] == ["1"]
+
+
+def _merge_requests_page(page: int, per_page: int):
+    return [{"iid": (page - 1) * per_page + i} for i in range(per_page)]
+
+
+def _collect_pages(service: GitlabApiService, per_page: int):
+    async def _collect():
+        return [
+            page
+            async for page in service.iter_project_merge_requests(
+                "1", datetime(2024, 1, 1), per_page=per_page
+            )
+        ]
+
+    return asyncio.run(_collect())
+
+
+def test_iter_project_merge_requests_fetches_remaining_pages_from_total_pages():
+    def respond(method, path, payload, headers):
+        page = int(parse_qs(urlparse(path).query)["page"][0])
+        return 200, _merge_requests_page(page, 2), {"X-Total-Pages": "4"}
+
+    with FakeHTTPServer(respond) as server:
+        pages = _collect_pages(GitlabApiService("token", server.url), per_page=2)
+
+    assert len(server.requests) == 4
+    assert pages[0] == _merge_requests_page(1, 2)
+    assert sorted(mr["iid"] for page in pages for mr in page) == list(range(8))
+
+
+def test_iter_project_merge_requests_follows_next_page_without_total_pages():
+    def respond(method, path, payload, headers):
+        page = int(parse_qs(urlparse(path).query)["page"][0])
+        next_page = str(page + 1) if page < 3 else ""
+        return 200, _merge_requests_page(page, 2), {"X-Next-Page": next_page}
+
+    with FakeHTTPServer(respond) as server:
+        pages = _collect_pages(GitlabApiService("token", server.url), per_page=2)
+
+    assert pages == [_merge_requests_page(page, 2) for page in [1, 2, 3]]
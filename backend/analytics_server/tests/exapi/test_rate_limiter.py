@@ -0,0 +1,276 @@
+import requests
+from redis import WatchError
+
+from mhq.exapi.rate_limiter import (
+    BUDGET_TTL_SECONDS,
+    MAX_RATE_LIMIT_RETRIES,
+    SECONDARY_LIMIT_BACKOFF_SECONDS,
+    RateLimitScheduler,
+    RedisRateLimitStateStore,
+)
+from tests.utilities import FakeHTTPServer
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000):
+        self.now = now
+        self.sleeps = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class FakeRedisPipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.writes = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def watch(self, key):
+        self.redis.watched_versions[key] = self.redis.versions.get(key, 0)
+        if self.redis.on_watch:
+            self.redis.on_watch(key)
+
+    def hgetall(self, key):
+        return {
+            field.encode(): value.encode()
+            for field, value in self.redis.hashes.get(key, {}).items()
+        }
+
+    def multi(self):
+        pass
+
+    def hset(self, key, mapping):
+        self.writes.append(("hset", key, mapping))
+
+    def expire(self, key, seconds):
+        self.writes.append(("expire", key, seconds))
+
+    def execute(self):
+        for key, version in self.redis.watched_versions.items():
+            if self.redis.versions.get(key, 0) != version:
+                raise WatchError()
+        for command, key, value in self.writes:
+            if command == "hset":
+                self.redis.hset(key, value)
+            else:
+                self.redis.expiries[key] = value
+
+
+class FakeRedis:
+    def __init__(self):
+        self.hashes = {}
+        self.versions = {}
+        self.expiries = {}
+        self.watched_versions = {}
+        self.on_watch = None
+
+    def pipeline(self):
+        return FakeRedisPipeline(self)
+
+    def hset(self, key, mapping):
+        self.hashes.setdefault(key, {}).update(mapping)
+        self.versions[key] = self.versions.get(key, 0) + 1
+
+
+class BrokenRedis:
+    def pipeline(self):
+        raise ConnectionError("redis is down")
+
+
+def _scheduler(clock: FakeClock, store=None) -> RateLimitScheduler:
+    return RateLimitScheduler(store, clock=clock, sleep=clock.sleep)
+
+
+def test_reserve_does_not_wait_without_rate_limit_headers():
+    scheduler = _scheduler(FakeClock())
+
+    assert scheduler.reserve("token") == 0
+
+
+def test_reserve_does_not_wait_while_quota_is_above_low_watermark():
+    clock = FakeClock()
+    scheduler = _scheduler(clock)
+    scheduler.update(
+        "token",
+        200,
+        {
+            "X-RateLimit-Limit": "5000",
+            "X-RateLimit-Remaining": "4000",
+            "X-RateLimit-Reset": str(int(clock.now) + 3600),
+        },
+    )
+
+    assert [scheduler.reserve("token") for _ in range(10)] == [0] * 10
+
+
+def test_reserve_paces_requests_over_window_when_quota_is_low():
+    clock = FakeClock()
+    scheduler = _scheduler(clock)
+    scheduler.update(
+        "token",
+        200,
+        {
+            "X-RateLimit-Limit": "5000",
+            "X-RateLimit-Remaining": "100",
+            "X-RateLimit-Reset": str(int(clock.now) + 1000),
+        },
+    )
+
+    waits = [scheduler.reserve("token") for _ in range(3)]
+
+    # 100 requests left over 1000 seconds, one request every 10 seconds
+    assert waits[0] == 10
+    assert waits[1] > waits[0]
+    assert waits[2] > waits[1]
+
+
+def test_reserve_waits_for_reset_when_quota_is_exhausted():
+    clock = FakeClock()
+    scheduler = _scheduler(clock)
+    scheduler.update(
+        "token",
+        200,
+        {
+            "RateLimit-Limit": "2000",
+            "RateLimit-Remaining": "0",
+            "RateLimit-Reset": str(int(clock.now) + 120),
+        },
+    )
+
+    assert scheduler.reserve("token") == 120
+
+
+def test_budgets_are_kept_per_token_and_resource():
+    clock = FakeClock()
+    scheduler = _scheduler(clock)
+    scheduler.update(
+        "token",
+        200,
+        {
+            "X-RateLimit-Remaining": "0",
+            "X-RateLimit-Reset": str(int(clock.now) + 120),
+        },
+    )
+
+    assert scheduler.reserve("token") == 120
+    assert scheduler.reserve("other_token") == 0
+    assert scheduler.reserve("token", resource="graphql") == 0
+
+
+def test_update_backs_off_for_retry_after_on_secondary_limit():
+    clock = FakeClock()
+    scheduler = _scheduler(clock)
+
+    backoff = scheduler.update("token", 403, {"Retry-After": "30"})
+
+    assert backoff == 30
+    assert scheduler.reserve("token") == 30
+
+
+def test_update_backs_off_exponentially_without_retry_after():
+    scheduler = _scheduler(FakeClock())
+
+    first_backoff = scheduler.update("token", 429, {})
+    second_backoff = scheduler.update("token", 429, {})
+    scheduler.update("token", 200, {})
+    third_backoff = scheduler.update("token", 429, {})
+
+    assert first_backoff == SECONDARY_LIMIT_BACKOFF_SECONDS
+    assert second_backoff == 2 * SECONDARY_LIMIT_BACKOFF_SECONDS
+    assert third_backoff == SECONDARY_LIMIT_BACKOFF_SECONDS
+
+
+def test_update_ignores_forbidden_responses_that_are_not_rate_limits():
+    scheduler = _scheduler(FakeClock())
+
+    assert scheduler.update("token", 403, {}, "Resource not accessible") is None
+    assert scheduler.update("token", 403, {}, "API rate limit exceeded") is not None
+
+
+def test_request_retries_rate_limited_requests_after_backoff():
+    clock = FakeClock()
+    scheduler = _scheduler(clock)
+    responses = iter(
+        [(429, {"message": "slow down"}, {"Retry-After": "5"}), (200, {"ok": 1})]
+    )
+
+    with FakeHTTPServer(lambda *_: next(responses)) as server:
+        response = scheduler.request("token", lambda: requests.get(server.url))
+
+    assert response.status_code == 200
+    assert response.json() == {"ok": 1}
+    assert len(server.requests) == 2
+    assert clock.sleeps == [5]
+
+
+def test_request_gives_up_after_max_retries():
+    clock = FakeClock()
+    scheduler = _scheduler(clock)
+
+    with FakeHTTPServer(lambda *_: (429, None, {"Retry-After": "1"})) as server:
+        response = scheduler.request("token", lambda: requests.get(server.url))
+
+    assert response.status_code == 429
+    assert len(server.requests) == MAX_RATE_LIMIT_RETRIES + 1
+
+
+def test_redis_state_is_shared_by_schedulers_of_every_process():
+    clock = FakeClock()
+    redis = FakeRedis()
+    scheduler = _scheduler(clock, RedisRateLimitStateStore(redis))
+    other_scheduler = _scheduler(clock, RedisRateLimitStateStore(redis))
+    scheduler.update(
+        "token",
+        200,
+        {
+            "X-RateLimit-Limit": "5000",
+            "X-RateLimit-Remaining": "100",
+            "X-RateLimit-Reset": str(int(clock.now) + 1000),
+        },
+    )
+
+    first_wait = scheduler.reserve("token")
+    second_wait = other_scheduler.reserve("token")
+
+    assert first_wait == 10
+    assert second_wait > first_wait
+    assert other_scheduler.reserve("other_token") == 0
+    assert set(redis.expiries.values()) == {BUDGET_TTL_SECONDS}
+    assert all("token" not in key for key in redis.hashes)
+
+
+def test_redis_state_retries_changes_raced_by_another_process():
+    clock = FakeClock()
+    redis = FakeRedis()
+    scheduler = _scheduler(clock, RedisRateLimitStateStore(redis))
+    scheduler.update("token", 200, {"X-RateLimit-Remaining": "0"})
+    budget_key = next(iter(redis.hashes))
+    raced = []
+
+    def _race(key):
+        if not raced:
+            raced.append(key)
+            redis.hset(key, {"blocked_until": str(clock.now + 30)})
+
+    redis.on_watch = _race
+
+    assert scheduler.reserve("token") == 30
+    assert raced == [budget_key]
+    assert redis.hashes[budget_key]["remaining"] == "-1"
+
+
+def test_requests_go_out_unpaced_when_the_state_store_fails():
+    scheduler = _scheduler(FakeClock(), RedisRateLimitStateStore(BrokenRedis()))
+
+    assert scheduler.reserve("token") == 0
+    assert scheduler.update("token", 403, {"Retry-After": "30"}) == 30
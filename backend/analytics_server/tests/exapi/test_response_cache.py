@@ -0,0 +1,90 @@
+import os
+import time
+from datetime import timedelta
+
+from mhq.exapi.response_cache import (
+    CachedResponse,
+    DiskResponseCacheStore,
+    ConditionalRequestCache,
+)
+from tests.utilities import FakeHTTPServer
+
+ETAG = '"abc123"'
+
+
+def _etag_responder(body):
+    def respond(method, path, payload, headers):
+        if headers.get("If-None-Match") == ETAG:
+            return 304, None, {"ETag": ETAG}
+        return 200, body, {"ETag": ETAG, "X-Total-Pages": "3"}
+
+    return respond
+
+
+def test_conditional_request_serves_cached_body_on_not_modified(tmp_path):
+    body = [{"login": "abc", "contributions": 3}]
+    cache = ConditionalRequestCache(
+        DiskResponseCacheStore(str(tmp_path), 10, timedelta(days=1))
+    )
+
+    with FakeHTTPServer(_etag_responder(body)) as server:
+        url = f"{server.url}/repos/org/repo/contributors"
+        first_response = cache.get(
+            url, "github/repo_contributors", {"Authorization": "Bearer t"}, {"page": 1}
+        )
+        second_response = cache.get(
+            url, "github/repo_contributors", {"Authorization": "Bearer t"}, {"page": 1}
+        )
+
+    assert first_response.status_code == 200
+    assert second_response.status_code == 200
+    assert second_response.json() == body
+    assert second_response.headers["X-Total-Pages"] == "3"
+    assert cache.get_stats() == {
+        "github/repo_contributors": {"hits": 1, "misses": 1, "hit_rate": 0.5}
+    }
+
+
+def test_cache_keys_differ_by_params_and_credentials(tmp_path):
+    cache = ConditionalRequestCache(
+        DiskResponseCacheStore(str(tmp_path), 10, timedelta(days=1))
+    )
+
+    with FakeHTTPServer(_etag_responder({"id": 1})) as server:
+        url = f"{server.url}/projects/1"
+        cache.get(url, "gitlab/project", {"Authorization": "Bearer a"})
+        cache.get(url, "gitlab/project", {"Authorization": "Bearer b"})
+        cache.get(url, "gitlab/project", {"Authorization": "Bearer a"}, {"page": 2})
+
+    assert cache.get_stats()["gitlab/project"]["hits"] == 0
+    assert len(os.listdir(tmp_path)) == 3
+
+
+def test_requests_are_not_conditional_without_a_store():
+    cache = ConditionalRequestCache()
+
+    with FakeHTTPServer(_etag_responder({"id": 1})) as server:
+        cache.get(f"{server.url}/user", "github/user")
+        response = cache.get(f"{server.url}/user", "github/user")
+
+    assert response.json() == {"id": 1}
+    assert cache.get_stats() == {}
+
+
+def test_disk_store_evicts_expired_and_least_recently_used_entries(tmp_path):
+    store = DiskResponseCacheStore(str(tmp_path), 2, timedelta(hours=1))
+    for key in ["expired", "old", "recent", "newest"]:
+        store.set(CachedResponse(key, f"/{key}", "github/repo", ETAG, None, b"{}"))
+
+    now = time.time()
+    os.utime(tmp_path / "expired.json", (now - 7200, now - 7200))
+    os.utime(tmp_path / "old.json", (now - 60, now - 60))
+    os.utime(tmp_path / "recent.json", (now - 30, now - 30))
+    store.touch("old")
+
+    store.evict()
+
+    assert store.get("expired") is None
+    assert store.get("recent") is None
+    assert store.get("old").url == "/old"
+    assert store.get("newest").body == b"{}"
@@ -0,0 +1,152 @@
+import pytest
+import requests
+from github import Github
+
+from mhq.exapi.rate_limiter import RateLimitScheduler
+from mhq.exapi.transport import (
+    DEFAULT_POOL_SIZE,
+    HttpTransport,
+    get_http_pool_size,
+    get_pygithub_retry,
+)
+from tests.utilities import FakeHTTPServer
+
+
+class FakeSleep:
+    def __init__(self):
+        self.sleeps = []
+
+    def __call__(self, seconds):
+        self.sleeps.append(seconds)
+
+
+def test_transport_retries_transient_server_errors_with_jittered_backoff():
+    responses = iter([(503, None), (502, None), (200, {"ok": 1})])
+    sleep = FakeSleep()
+    transport = HttpTransport(max_retries=3, backoff_seconds=1, sleep=sleep)
+
+    with FakeHTTPServer(lambda *_: next(responses)) as server:
+        response = transport.get(server.url, "test/endpoint")
+
+    assert response.status_code == 200
+    assert response.json() == {"ok": 1}
+    assert len(server.requests) == 3
+    assert len(sleep.sleeps) == 2
+    assert 0 <= sleep.sleeps[0] <= 1
+    assert 0 <= sleep.sleeps[1] <= 2
+
+    stats = transport.get_stats()["test/endpoint"]
+    assert stats["calls"] == 3
+    assert stats["retries"] == 2
+    assert stats["max_latency"] >= stats["avg_latency"] > 0
+
+
+def test_transport_returns_last_response_after_max_retries():
+    transport = HttpTransport(max_retries=2, sleep=FakeSleep())
+
+    with FakeHTTPServer(lambda *_: (500, None)) as server:
+        response = transport.get(server.url, "test/endpoint")
+
+    assert response.status_code == 500
+    assert len(server.requests) == 3
+
+
+def test_transport_does_not_retry_client_errors():
+    transport = HttpTransport(sleep=FakeSleep())
+
+    with FakeHTTPServer(lambda *_: (404, {"message": "Not Found"})) as server:
+        response = transport.get(server.url, "test/endpoint")
+
+    assert response.status_code == 404
+    assert len(server.requests) == 1
+
+
+def test_transport_retries_connection_errors_and_reraises():
+    sleep = FakeSleep()
+    transport = HttpTransport(max_retries=2, sleep=sleep)
+
+    with FakeHTTPServer(lambda *_: (200, None)) as server:
+        url = server.url
+
+    with pytest.raises(requests.ConnectionError):
+        transport.get(url, "test/endpoint")
+    assert len(sleep.sleeps) == 2
+
+
+def test_http_pool_size_follows_sync_concurrency(monkeypatch):
+    monkeypatch.delenv("GITHUB_HTTP_POOL_SIZE", raising=False)
+    monkeypatch.delenv("GITHUB_SYNC_CONCURRENCY", raising=False)
+    assert get_http_pool_size("github") == DEFAULT_POOL_SIZE
+
+    monkeypatch.setenv("GITHUB_SYNC_CONCURRENCY", "16")
+    assert get_http_pool_size("github") == 16
+
+    monkeypatch.setenv("GITHUB_HTTP_POOL_SIZE", "4")
+    assert get_http_pool_size("github") == 4
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000):
+        self.now = now
+        self.sleeps = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def _get_pygithub(server_url: str, clock: FakeClock) -> Github:
+    scheduler = RateLimitScheduler(clock=clock, sleep=clock.sleep)
+    return Github(
+        "token", base_url=server_url, retry=get_pygithub_retry("token", scheduler)
+    )
+
+
+def test_pygithub_pages_wait_out_rate_limits_and_retry():
+    pull_request = {"number": 1, "title": "fix", "state": "open"}
+    responses = iter(
+        [
+            (
+                403,
+                {"message": "API rate limit exceeded"},
+                {
+                    "X-RateLimit-Remaining": "0",
+                    "X-RateLimit-Reset": "1030",
+                },
+            ),
+            (429, {"message": "secondary rate limit"}, {"Retry-After": "5"}),
+            (200, [pull_request]),
+        ]
+    )
+    clock = FakeClock()
+
+    with FakeHTTPServer(lambda *_: next(responses)) as server:
+        repo = _get_pygithub(server.url, clock).get_repo("org/repo", lazy=True)
+        pull_requests = repo.get_pulls(state="all").get_page(0)
+
+    assert [pr.number for pr in pull_requests] == [1]
+    assert len(server.requests) == 3
+    assert clock.sleeps == [30, 5]
+
+
+def test_pygithub_hands_back_forbidden_responses_that_are_not_rate_limits():
+    clock = FakeClock()
+
+    with FakeHTTPServer(
+        lambda *_: (
+            403,
+            {"message": "Resource not accessible"},
+            {
+                "X-RateLimit-Remaining": "4000",
+            },
+        )
+    ) as server:
+        repo = _get_pygithub(server.url, clock).get_repo("org/repo", lazy=True)
+        with pytest.raises(Exception, match="Resource not accessible"):
+            repo.get_pulls(state="all").get_page(0)
+
+    assert len(server.requests) == 1
+    assert clock.sleeps == []
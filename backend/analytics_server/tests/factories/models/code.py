@@ -46,6 +46,7 @@ def get_pull_request(
     merge_to_deploy=None,
     url=None,
     merge_commit_sha=None,
+    reverted_pr_ref=None,
 ):
     return PullRequest(
         id=id or uuid4(),
@@ -74,6 +75,7 @@ def get_pull_request(
         meta=meta or {},
         url=url,
         merge_commit_sha=merge_commit_sha,
+        reverted_pr_ref=reverted_pr_ref,
     )
 
 
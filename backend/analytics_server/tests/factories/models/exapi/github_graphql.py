@@ -0,0 +1,122 @@
+from typing import Dict, List, Optional
+
+
+def _connection(nodes: List[Dict], end_cursor: Optional[str] = None) -> Dict:
+    return {
+        "pageInfo": {"hasNextPage": bool(end_cursor), "endCursor": end_cursor},
+        "nodes": nodes,
+    }
+
+
+def get_github_graphql_review_node(
+    database_id: int = 123456,
+    state: str = "APPROVED",
+    submitted_at: Optional[str] = "2022-06-29T10:53:15Z",
+    author_login: str = "reviewer",
+    author_type: str = "User",
+) -> Dict:
+    return {
+        "databaseId": database_id,
+        "state": state,
+        "submittedAt": submitted_at,
+        "body": "",
+        "url": f"https://github.com/review/{database_id}",
+        "author": {"__typename": author_type, "login": author_login},
+    }
+
+
+def get_github_graphql_ready_for_review_node(
+    node_id: str = "RFRE_123",
+    created_at: str = "2022-06-29T09:53:15Z",
+    actor_login: str = "abc",
+) -> Dict:
+    return {
+        "id": node_id,
+        "createdAt": created_at,
+        "actor": {"__typename": "User", "login": actor_login},
+    }
+
+
+def get_github_graphql_commit_node(
+    sha: str = "123456789098765",
+    author_login: Optional[str] = "abc",
+    message: str = "[abc 315] avoid mapping edit state",
+    committed_date: str = "2022-06-29T08:53:15Z",
+) -> Dict:
+    return {
+        "commit": {
+            "oid": sha,
+            "message": message,
+            "url": f"https://github.com/commit/{sha}",
+            "committedDate": committed_date,
+            "committer": {"name": "abc", "email": "abc@midd.com"},
+            "author": {
+                "name": "abc",
+                "email": "abc@midd.com",
+                "date": committed_date,
+                "user": {"login": author_login} if author_login else None,
+            },
+        }
+    }
+
+
+def get_github_graphql_pull_request_node(
+    number: int = 1,
+    state: str = "MERGED",
+    created_at: str = "2022-06-29T07:53:15Z",
+    updated_at: str = "2022-06-29T11:53:15Z",
+    merged_at: Optional[str] = "2022-06-29T11:53:15Z",
+    closed_at: Optional[str] = "2022-06-29T11:53:15Z",
+    base_ref: str = "main",
+    head_ref: str = "feature",
+    author_login: str = "abc",
+    merge_commit_sha: Optional[str] = "123456",
+    reviews: List[Dict] = None,
+    reviews_end_cursor: Optional[str] = None,
+    ready_for_review_events: List[Dict] = None,
+    commits: List[Dict] = None,
+    requested_reviewers: List[str] = None,
+) -> Dict:
+    commits = commits or []
+    return {
+        "number": number,
+        "title": "random_title",
+        "url": f"https://github.com/pull/{number}",
+        "state": state,
+        "createdAt": created_at,
+        "updatedAt": updated_at,
+        "mergedAt": merged_at,
+        "closedAt": closed_at,
+        "baseRefName": base_ref,
+        "headRefName": head_ref,
+        "additions": 1,
+        "deletions": 1,
+        "changedFiles": 1,
+        "author": {"__typename": "User", "login": author_login},
+        "mergeCommit": {"oid": merge_commit_sha} if merge_commit_sha else None,
+        "reviewRequests": {
+            "nodes": [
+                {"requestedReviewer": {"login": login}}
+                for login in requested_reviewers or []
+            ]
+        },
+        "reviews": _connection(reviews or [], reviews_end_cursor),
+        "timelineItems": _connection(ready_for_review_events or []),
+        "commits": {**_connection(commits), "totalCount": len(commits)},
+    }
+
+
+def get_github_graphql_pull_requests_response(
+    pr_nodes: List[Dict], end_cursor: Optional[str] = None
+) -> Dict:
+    return {"data": {"repository": {"pullRequests": _connection(pr_nodes, end_cursor)}}}
+
+
+def get_github_graphql_pull_request_connection_response(
+    connection: str, nodes: List[Dict], end_cursor: Optional[str] = None
+) -> Dict:
+    return {
+        "data": {
+            "repository": {"pullRequest": {connection: _connection(nodes, end_cursor)}}
+        }
+    }
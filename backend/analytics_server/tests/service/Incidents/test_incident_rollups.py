@@ -0,0 +1,354 @@
+from datetime import datetime, timedelta
+
+import pytz
+
+from mhq.service.incidents import rollups
+from mhq.service.incidents.incidents import IncidentService
+from mhq.service.incidents.models.mean_time_to_recovery import (
+    ChangeFailureRateCounts,
+    MeanTimeToRecoveryMetrics,
+)
+from mhq.service.incidents.rollups import IncidentRollupsService
+from mhq.store.models.code import PRFilter
+from mhq.store.models.incidents import TeamIncidentRollup, TeamIncidentRollupState
+from mhq.utils.string import uuid4_str
+from mhq.utils.time import Interval
+from tests.factories.models import get_deployment, get_incident
+
+first_week_2024 = datetime(2024, 1, 1, 0, 0, 0, tzinfo=pytz.UTC)
+second_week_2024 = first_week_2024 + timedelta(weeks=1)
+third_week_2024 = first_week_2024 + timedelta(weeks=2)
+fourth_week_2024 = first_week_2024 + timedelta(weeks=3)
+
+
+class FakeIncidentsRepoService:
+    def __init__(self, rollups=None, state=None):
+        self.rollups = rollups or []
+        self.state = state
+        self.rollup_intervals = []
+        self.saved = None
+
+    def get_fresh_team_incident_rollup_state(self, team_id):
+        return self.state
+
+    def get_team_incident_rollups(self, team_id, interval):
+        self.rollup_intervals.append(interval)
+        return self.rollups
+
+    def get_team_last_deployment_rollup_week(self, team_id, before):
+        return max(
+            (
+                rollup.week_start
+                for rollup in self.rollups
+                if rollup.week_start < before and rollup.deployment_count
+            ),
+            default=None,
+        )
+
+    def save_team_incident_rollups(self, team_id, rollups, from_time, *args):
+        self.saved = (rollups, from_time) + args
+
+
+class FakeIncidentService(IncidentService):
+    def __init__(self, incidents=None, resolved_incidents=None):
+        super().__init__(None, None, None)
+        self.incidents = incidents or []
+        self.resolved_incidents = resolved_incidents or []
+        self.intervals = []
+
+    def get_resolved_team_incidents(self, team_id, interval, pr_filter):
+        self.intervals.append(interval)
+        return self.resolved_incidents
+
+    def get_team_incidents(self, team_id, interval, pr_filter):
+        self.intervals.append(interval)
+        return [
+            incident
+            for incident in self.incidents
+            if interval.from_time <= incident.creation_date <= interval.to_time
+        ]
+
+
+class FakeDeploymentsService:
+    def __init__(self, deployments=None):
+        self.deployments = deployments or []
+        self.intervals = []
+
+    def get_team_all_deployments_in_interval(
+        self, team_id, interval, pr_filter=None, workflow_filter=None
+    ):
+        self.intervals.append(interval)
+        return [
+            deployment
+            for deployment in self.deployments
+            if interval.from_time <= deployment.conducted_at <= interval.to_time
+        ]
+
+
+def _get_state(rollups_from=first_week_2024, stale_from=None):
+    return TeamIncidentRollupState(
+        rollups_from=rollups_from,
+        stale_from=stale_from,
+        updated_at=first_week_2024,
+    )
+
+
+def test_mttr_trends_read_whole_weeks_from_rollups_and_compute_partial_weeks():
+    from_time = first_week_2024 + timedelta(days=3)
+    to_time = third_week_2024 + timedelta(days=8)
+    incidents_repo_service = FakeIncidentsRepoService(
+        [
+            TeamIncidentRollup(
+                week_start=second_week_2024,
+                resolved_incident_count=2,
+                recovery_time=600,
+            )
+        ],
+        _get_state(),
+    )
+    incident_service = FakeIncidentService(
+        resolved_incidents=[
+            get_incident(
+                creation_date=fourth_week_2024,
+                resolved_date=fourth_week_2024 + timedelta(seconds=100),
+            )
+        ]
+    )
+    service = IncidentRollupsService(
+        incidents_repo_service, incident_service, FakeDeploymentsService()
+    )
+
+    assert service.get_team_mean_time_to_recovery_trends(
+        uuid4_str(), Interval(from_time, to_time), PRFilter()
+    ) == {
+        first_week_2024: MeanTimeToRecoveryMetrics(),
+        second_week_2024: MeanTimeToRecoveryMetrics(300, 2),
+        third_week_2024: MeanTimeToRecoveryMetrics(),
+        fourth_week_2024: MeanTimeToRecoveryMetrics(100, 1),
+    }
+    assert incidents_repo_service.rollup_intervals == [
+        Interval(second_week_2024, fourth_week_2024 - timedelta(microseconds=1))
+    ]
+    assert incident_service.intervals == [
+        Interval(from_time, second_week_2024 - timedelta(microseconds=1)),
+        Interval(fourth_week_2024, to_time),
+    ]
+
+
+def test_cfr_trends_read_whole_weeks_from_rollups_up_to_the_last_deployment():
+    interval = Interval(first_week_2024, fourth_week_2024 - timedelta(microseconds=1))
+    incidents_repo_service = FakeIncidentsRepoService(
+        [
+            TeamIncidentRollup(
+                week_start=first_week_2024,
+                failed_deployment_count=1,
+                deployment_count=4,
+            ),
+            TeamIncidentRollup(
+                week_start=second_week_2024,
+                failed_deployment_count=0,
+                deployment_count=2,
+            ),
+        ],
+        _get_state(),
+    )
+    deployments_service = FakeDeploymentsService(
+        [
+            get_deployment(conducted_at=second_week_2024 + timedelta(days=1)),
+            get_deployment(conducted_at=second_week_2024 + timedelta(days=2)),
+        ]
+    )
+    service = IncidentRollupsService(
+        incidents_repo_service, FakeIncidentService(), deployments_service
+    )
+
+    week_to_change_failure_rate = service.get_team_weekly_change_failure_rate(
+        uuid4_str(), interval, PRFilter()
+    )
+
+    assert week_to_change_failure_rate == {
+        first_week_2024: ChangeFailureRateCounts(1, 4),
+        second_week_2024: ChangeFailureRateCounts(0, 2),
+        third_week_2024: ChangeFailureRateCounts(),
+    }
+    assert week_to_change_failure_rate[first_week_2024].change_failure_rate == 25
+    assert deployments_service.intervals == [
+        Interval(second_week_2024, interval.to_time)
+    ]
+
+
+def test_cfr_trends_ignore_incidents_after_the_interval_like_the_live_path():
+    interval = Interval(
+        first_week_2024 + timedelta(days=3), third_week_2024 - timedelta(microseconds=1)
+    )
+    leading_deployment = get_deployment(
+        conducted_at=first_week_2024 + timedelta(days=4)
+    )
+    last_deployment = get_deployment(conducted_at=second_week_2024 + timedelta(days=1))
+    # Rollups count the last deployment failed by an incident after the interval,
+    # the leading deployment fails by an incident after the leading partial week
+    incidents_repo_service = FakeIncidentsRepoService(
+        [
+            TeamIncidentRollup(
+                week_start=second_week_2024,
+                failed_deployment_count=1,
+                deployment_count=1,
+            )
+        ],
+        _get_state(),
+    )
+    incident_service = FakeIncidentService(
+        incidents=[
+            get_incident(creation_date=second_week_2024 + timedelta(hours=12)),
+            get_incident(creation_date=third_week_2024 + timedelta(days=1)),
+        ]
+    )
+    service = IncidentRollupsService(
+        incidents_repo_service,
+        incident_service,
+        FakeDeploymentsService([leading_deployment, last_deployment]),
+    )
+
+    live_change_failure_rate = service._get_live_weekly_change_failure_rate(
+        uuid4_str(), interval, PRFilter()
+    )
+
+    assert (
+        service.get_team_weekly_change_failure_rate(uuid4_str(), interval, PRFilter())
+        == live_change_failure_rate
+        == {
+            first_week_2024: ChangeFailureRateCounts(1, 1),
+            second_week_2024: ChangeFailureRateCounts(0, 1),
+        }
+    )
+
+
+def test_trends_are_computed_live_for_filters_or_weeks_not_in_rollups():
+    interval = Interval(first_week_2024, third_week_2024 - timedelta(microseconds=1))
+    deployment = get_deployment(conducted_at=second_week_2024)
+    incident_service = FakeIncidentService(
+        incidents=[get_incident(creation_date=second_week_2024 + timedelta(hours=1))]
+    )
+    deployments_service = FakeDeploymentsService([deployment])
+    incidents_repo_service = FakeIncidentsRepoService(
+        state=_get_state(rollups_from=second_week_2024)
+    )
+    service = IncidentRollupsService(
+        incidents_repo_service, incident_service, deployments_service
+    )
+
+    expected_change_failure_rate = {
+        first_week_2024: ChangeFailureRateCounts(),
+        second_week_2024: ChangeFailureRateCounts(1, 1),
+    }
+    assert (
+        service.get_team_weekly_change_failure_rate(uuid4_str(), interval, PRFilter())
+        == expected_change_failure_rate
+    )
+    incidents_repo_service.state = _get_state()
+    assert (
+        service.get_team_weekly_change_failure_rate(
+            uuid4_str(), interval, PRFilter(authors=["author"])
+        )
+        == expected_change_failure_rate
+    )
+    assert incidents_repo_service.rollup_intervals == []
+    assert deployments_service.intervals == [interval, interval]
+
+
+def test_refresh_recounts_rollups_from_the_last_deployment_before_the_stale_week(
+    monkeypatch,
+):
+    monkeypatch.setattr(rollups, "apply_pr_filter", lambda *args: PRFilter())
+    state = _get_state(stale_from=third_week_2024 + timedelta(days=2))
+    deployments = [
+        get_deployment(conducted_at=second_week_2024 + timedelta(days=1)),
+        get_deployment(conducted_at=third_week_2024 + timedelta(days=1)),
+        get_deployment(conducted_at=third_week_2024 + timedelta(days=3)),
+    ]
+    incident_service = FakeIncidentService(
+        incidents=[get_incident(creation_date=third_week_2024 + timedelta(days=2))],
+        resolved_incidents=[
+            get_incident(
+                creation_date=third_week_2024 + timedelta(days=2),
+                resolved_date=third_week_2024 + timedelta(days=2, hours=1),
+            )
+        ],
+    )
+    incidents_repo_service = FakeIncidentsRepoService(
+        [TeamIncidentRollup(week_start=second_week_2024, deployment_count=1)]
+    )
+    service = IncidentRollupsService(
+        incidents_repo_service, incident_service, FakeDeploymentsService(deployments)
+    )
+
+    service.refresh_team_incident_rollups(uuid4_str(), state, False)
+
+    saved_rollups, from_time, rollups_from, _, state_updated_at = (
+        incidents_repo_service.saved
+    )
+    assert from_time == second_week_2024
+    assert rollups_from == first_week_2024
+    assert state_updated_at == state.updated_at
+    assert [
+        (
+            rollup.week_start,
+            rollup.resolved_incident_count,
+            rollup.recovery_time,
+            rollup.failed_deployment_count,
+            rollup.deployment_count,
+        )
+        for rollup in saved_rollups
+    ] == [
+        (third_week_2024, 1, 3600, 1, 2),
+        (second_week_2024, 0, 0, 0, 1),
+    ]
+    assert incident_service.intervals[0].from_time == second_week_2024
+
+
+def test_refresh_recounts_a_deployment_weeks_before_an_incident_after_a_quiet_stretch(
+    monkeypatch,
+):
+    monkeypatch.setattr(rollups, "apply_pr_filter", lambda *args: PRFilter())
+    incident_created_at = fourth_week_2024 + timedelta(weeks=2, days=1)
+    state = _get_state(stale_from=incident_created_at)
+    incidents_repo_service = FakeIncidentsRepoService(
+        [
+            TeamIncidentRollup(week_start=first_week_2024, deployment_count=1),
+            TeamIncidentRollup(week_start=second_week_2024, deployment_count=0),
+        ]
+    )
+    service = IncidentRollupsService(
+        incidents_repo_service,
+        FakeIncidentService(
+            incidents=[get_incident(creation_date=incident_created_at)]
+        ),
+        FakeDeploymentsService(
+            [get_deployment(conducted_at=first_week_2024 + timedelta(days=2))]
+        ),
+    )
+
+    service.refresh_team_incident_rollups(uuid4_str(), state, False)
+
+    saved_rollups, from_time, *_ = incidents_repo_service.saved
+    assert from_time == first_week_2024
+    assert [
+        (rollup.week_start, rollup.failed_deployment_count, rollup.deployment_count)
+        for rollup in saved_rollups
+    ] == [(first_week_2024, 1, 1)]
+
+
+def test_refresh_recounts_from_the_stale_week_without_earlier_deployments(
+    monkeypatch,
+):
+    monkeypatch.setattr(rollups, "apply_pr_filter", lambda *args: PRFilter())
+    state = _get_state(stale_from=third_week_2024 + timedelta(days=2))
+    incidents_repo_service = FakeIncidentsRepoService()
+    service = IncidentRollupsService(
+        incidents_repo_service, FakeIncidentService(), FakeDeploymentsService()
+    )
+
+    service.refresh_team_incident_rollups(uuid4_str(), state, False)
+
+    _, from_time, *_ = incidents_repo_service.saved
+    assert from_time == third_week_2024
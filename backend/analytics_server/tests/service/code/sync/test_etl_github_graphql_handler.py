@@ -0,0 +1,108 @@
+from datetime import datetime
+
+import pytz
+
+from mhq.exapi.github_graphql import GithubGraphQLApiService
+from mhq.service.code.sync.etl_code_analytics import CodeETLAnalyticsService
+from mhq.service.code.sync.etl_github_graphql_handler import GithubGraphQLETLHandler
+from mhq.store.models.code import PullRequestEventType, PullRequestState
+from mhq.store.models.code import OrgRepo
+from mhq.utils.string import uuid4_str
+from tests.factories.models.exapi.github_graphql import (
+    get_github_graphql_commit_node,
+    get_github_graphql_pull_request_node,
+    get_github_graphql_pull_requests_response,
+    get_github_graphql_ready_for_review_node,
+    get_github_graphql_review_node,
+)
+from tests.utilities import FakeHTTPServer
+
+ORG_ID = uuid4_str()
+
+
+class FakeCodeRepoService:
+    def get_repo_prs_by_numbers(self, repo_id, pr_numbers):
+        return []
+
+    def get_pr_events_by_pr_ids(self, pr_ids):
+        return []
+
+
+def _get_handler(graphql_url: str) -> GithubGraphQLETLHandler:
+    return GithubGraphQLETLHandler(
+        ORG_ID,
+        None,
+        GithubGraphQLApiService("token", graphql_url),
+        FakeCodeRepoService(),
+        CodeETLAnalyticsService(),
+        None,
+    )
+
+
+def test_get_repo_pull_requests_data_stops_at_bookmark_and_builds_models():
+    org_repo = OrgRepo(id=uuid4_str(), org_name="org", name="repo")
+    bookmark = datetime(2022, 6, 29, tzinfo=pytz.UTC)
+    merged_pr = get_github_graphql_pull_request_node(
+        number=2,
+        reviews=[
+            get_github_graphql_review_node(
+                database_id=11, state="APPROVED", submitted_at="2022-06-29T10:53:15Z"
+            ),
+            get_github_graphql_review_node(
+                database_id=12, author_login="dependabot", author_type="Bot"
+            ),
+        ],
+        ready_for_review_events=[get_github_graphql_ready_for_review_node()],
+        commits=[get_github_graphql_commit_node()],
+    )
+    open_pr = get_github_graphql_pull_request_node(
+        number=3,
+        state="OPEN",
+        updated_at="2022-06-29T12:53:15Z",
+        merged_at=None,
+        closed_at=None,
+        commits=[get_github_graphql_commit_node(sha="abc")],
+    )
+    stale_pr = get_github_graphql_pull_request_node(
+        number=1, updated_at="2022-06-28T12:53:15Z"
+    )
+    pages = {
+        None: get_github_graphql_pull_requests_response([open_pr, merged_pr], "p2"),
+        "p2": get_github_graphql_pull_requests_response([stale_pr], "p3"),
+    }
+
+    with FakeHTTPServer(
+        lambda method, path, payload, headers: (
+            200,
+            pages[payload["variables"]["cursor"]],
+        )
+    ) as server:
+        prs, commits, events = _get_handler(server.url).get_repo_pull_requests_data(
+            org_repo, bookmark
+        )
+
+    assert len(server.requests) == 2
+    assert [pr.number for pr in prs] == ["2", "3"]
+
+    merged_pr_model = prs[0]
+    assert merged_pr_model.state == PullRequestState.MERGED
+    assert merged_pr_model.repo_id == str(org_repo.id)
+    assert merged_pr_model.state_changed_at == datetime(
+        2022, 6, 29, 11, 53, 15, tzinfo=pytz.UTC
+    )
+    assert merged_pr_model.merge_commit_sha == "123456"
+    assert merged_pr_model.meta["code_stats"]["comments"] == 2
+    assert merged_pr_model.first_response_time == 60 * 60
+    assert merged_pr_model.merge_time == 60 * 60
+    assert merged_pr_model.first_commit_to_open == -60 * 60
+
+    assert [(event.type, event.idempotency_key) for event in events] == [
+        (PullRequestEventType.READY_FOR_REVIEW.value, "RFRE_123"),
+        (PullRequestEventType.REVIEW.value, "11"),
+        (PullRequestEventType.REVIEW.value, "12"),
+    ]
+    assert all(event.pull_request_id == str(merged_pr_model.id) for event in events)
+
+    assert [commit.hash for commit in commits] == ["123456789098765"]
+    assert commits[0].author == "abc"
+    assert commits[0].created_at == datetime(2022, 6, 29, 8, 53, 15, tzinfo=pytz.UTC)
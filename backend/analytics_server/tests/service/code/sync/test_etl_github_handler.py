@@ -1,9 +1,12 @@
-from datetime import datetime
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Optional
 
 import pytz
 
+from mhq.service.code.sync import etl_github_handler
 from mhq.service.code.sync.etl_github_handler import GithubETLHandler
-from mhq.store.models.code import PullRequestState
+from mhq.store.models.code import OrgRepo, PullRequestState
 from mhq.utils.string import uuid4_str
 from tests.factories.models import (
     get_pull_request,
@@ -18,6 +21,70 @@ from tests.factories.models.exapi.github import (
 from tests.utilities import compare_objects_as_dicts
 
 ORG_ID = uuid4_str()
+BOOKMARK = datetime(2024, 1, 1, tzinfo=pytz.UTC)
+
+
+@dataclass
+class FakeListedPullRequest:
+    number: int
+    updated_at: datetime
+    state: str = "open"
+    merged_at: Optional[datetime] = None
+    closed_at: Optional[datetime] = None
+
+
+class FakePaginatedList:
+    def __init__(self, prs, page_size, on_get_page=None):
+        self.prs = prs
+        self.page_size = page_size
+        self.on_get_page = on_get_page
+        self.pages_read = []
+
+    @property
+    def totalCount(self):
+        return len(self.prs)
+
+    def get_page(self, page):
+        self.pages_read.append(page)
+        prs = self.prs[page * self.page_size : (page + 1) * self.page_size]
+        if self.on_get_page:
+            self.on_get_page(self)
+        return prs
+
+
+class FakeGithubApiService:
+    def __init__(self, github_pull_requests):
+        self.github_pull_requests = github_pull_requests
+        self.fetched_pr_numbers = []
+
+    def get_repo(self, org_name, repo_name):
+        return repo_name
+
+    def get_pull_requests(self, github_repo):
+        return self.github_pull_requests
+
+    def get_pull_request(self, github_repo, number):
+        self.fetched_pr_numbers.append(number)
+        return next(pr for pr in self.github_pull_requests.prs if pr.number == number)
+
+
+def _get_listed_prs(*hours):
+    # The listing is sorted by updated_at, newest first
+    return [
+        FakeListedPullRequest(number=hour, updated_at=BOOKMARK + timedelta(hours=hour))
+        for hour in sorted(hours, reverse=True)
+    ]
+
+
+def _get_chunked_pr_numbers(monkeypatch, github_pull_requests):
+    monkeypatch.setattr(etl_github_handler, "PR_PROCESSING_CHUNK_SIZE", 2)
+    api = FakeGithubApiService(github_pull_requests)
+    handler = GithubETLHandler(ORG_ID, api, None, None, None)
+    handler._process_prs_chunk = lambda repo_id, prs_chunk: [
+        pr.number for pr in prs_chunk
+    ]
+    org_repo = OrgRepo(id=uuid4_str(), org_name="org", name="repo")
+    return api, handler.get_repo_pull_requests_data_chunks(org_repo, BOOKMARK)
 
 
 def test__to_pr_model_given_a_github_pr_returns_new_pr_model():
@@ -281,6 +348,65 @@ def test__to_pr_events_given_a_list_of_new_events_and_old_events_returns_a_list_
         assert compare_objects_as_dicts(event, expected_event, ["id"]) is True
 
 
+def test__to_pr_events_keeps_stored_ready_for_review_events_keyed_by_the_other_api():
+    pr_model = get_pull_request()
+    created_at = datetime(2022, 6, 29, 9, 53, 15, tzinfo=pytz.UTC)
+    stored_event = get_pull_request_event(
+        pull_request_id=str(pr_model.id),
+        org_repo_id=pr_model.repo_id,
+        created_at=created_at,
+        type="READY_FOR_REVIEW",
+        idempotency_key="123456",
+    )
+    graphql_event = get_github_pr_timeline_event(
+        event_type="ready_for_review",
+        raw_data={
+            "id": "RFRE_123",
+            "actor": {"login": "abc"},
+            "created_at": "2022-06-29T09:53:15Z",
+        },
+    )
+    later_graphql_event = get_github_pr_timeline_event(
+        event_type="ready_for_review",
+        raw_data={
+            "id": "RFRE_456",
+            "actor": {"login": "abc"},
+            "created_at": "2022-06-30T09:53:15Z",
+        },
+    )
+
+    pr_events = GithubETLHandler._to_pr_events(
+        [graphql_event, later_graphql_event], pr_model, [stored_event]
+    )
+
+    assert pr_events[0].id == stored_event.id
+    assert pr_events[0].idempotency_key == "123456"
+    assert pr_events[1].idempotency_key == "RFRE_456"
+    assert pr_events[1].id != stored_event.id
+
+
+def test__to_pr_events_review_events_keep_their_own_key():
+    pr_model = get_pull_request()
+    created_at = datetime(2022, 6, 29, 9, 53, 15, tzinfo=pytz.UTC)
+    stored_event = get_pull_request_event(
+        pull_request_id=str(pr_model.id),
+        org_repo_id=pr_model.repo_id,
+        created_at=created_at,
+        type="REVIEW",
+        idempotency_key="123456",
+    )
+    review_event = get_github_pr_timeline_event(
+        event_id="789012",
+        event_type="reviewed",
+        timestamp=created_at,
+    )
+
+    pr_events = GithubETLHandler._to_pr_events([review_event], pr_model, [stored_event])
+
+    assert pr_events[0].idempotency_key == "789012"
+    assert pr_events[0].id != stored_event.id
+
+
 def test__to_pr_commits_given_an_empty_list_of_commits_returns_an_empty_list():
     pr_model = get_pull_request()
     github_etl_handler = GithubETLHandler(ORG_ID, None, None, None, None)
@@ -396,3 +522,58 @@ def test__github_bot_filter_given_mixed_events_returns_non_bot_events():
     result = github_etl_handler._github_bot_filter([bot_event, human_event])
     assert len(result) == 1
     assert result[0] == human_event
+
+
+def test_get_repo_pull_requests_data_chunks_streams_pages_oldest_first(monkeypatch):
+    github_pull_requests = FakePaginatedList(_get_listed_prs(6, 5, 4, 3, 2, 0), 2)
+    _, chunks = _get_chunked_pr_numbers(monkeypatch, github_pull_requests)
+
+    assert next(chunks) == [2, 3]
+    # The listing was read newest first, then its pages again oldest first
+    assert github_pull_requests.pages_read == [0, 1, 2, 2, 1]
+    assert list(chunks) == [[4, 5], [6]]
+    assert github_pull_requests.pages_read == [0, 1, 2, 2, 1, 0]
+
+
+def test_get_repo_pull_requests_data_chunks_fetches_prs_shifted_into_read_pages(
+    monkeypatch,
+):
+    def _update_after_last_page_is_read(github_pull_requests):
+        if github_pull_requests.pages_read == [0, 1, 2, 2]:
+            # A new PR pushes PR 3 onto the page which was just read
+            github_pull_requests.prs = _get_listed_prs(7, 6, 5, 4, 3, 2, 0)
+
+    github_pull_requests = FakePaginatedList(
+        _get_listed_prs(6, 5, 4, 3, 2, 0), 2, _update_after_last_page_is_read
+    )
+    api, chunks = _get_chunked_pr_numbers(monkeypatch, github_pull_requests)
+
+    assert list(chunks) == [[2, 3], [4, 5], [6, 7]]
+    assert api.fetched_pr_numbers == [3]
+
+
+def test_get_repo_pull_requests_data_chunks_processes_prs_updated_while_syncing_once(
+    monkeypatch,
+):
+    def _update_after_last_page_is_read(github_pull_requests):
+        if github_pull_requests.pages_read == [0, 1, 2, 2]:
+            prs = _get_listed_prs(6, 5, 4, 2, 0)
+            github_pull_requests.prs = [
+                FakeListedPullRequest(number=3, updated_at=BOOKMARK + timedelta(days=1))
+            ] + prs
+
+    github_pull_requests = FakePaginatedList(
+        _get_listed_prs(6, 5, 4, 3, 2, 0), 2, _update_after_last_page_is_read
+    )
+    api, chunks = _get_chunked_pr_numbers(monkeypatch, github_pull_requests)
+
+    assert list(chunks) == [[2, 4], [5, 6], [3]]
+    assert api.fetched_pr_numbers == [3]
+
+
+def test_get_repo_pull_requests_data_chunks_without_updated_prs(monkeypatch):
+    github_pull_requests = FakePaginatedList(_get_listed_prs(0), 2)
+    _, chunks = _get_chunked_pr_numbers(monkeypatch, github_pull_requests)
+
+    assert list(chunks) == []
+    assert github_pull_requests.pages_read == [0]
@@ -1,4 +1,4 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 import pytz
 from tests.factories.models.exapi.gitlab import (
     get_gitlab_commit,
@@ -11,9 +11,99 @@ from tests.factories.models.code import (
 )
 from tests.factories.models.exapi.gitlab import get_gitlab_pull_request
 from tests.utilities import compare_objects_as_dicts
+from mhq.service.code.sync import etl_gitlab_handler
 from mhq.service.code.sync.etl_gitlab_handler import GitlabETLHandler
 from mhq.utils.string import uuid4_str
-from mhq.store.models.code import PullRequestState
+from mhq.store.models.code import OrgRepo, PullRequestState
+
+ORG_ID = uuid4_str()
+BOOKMARK = datetime(2024, 1, 1, tzinfo=pytz.UTC)
+
+
+def _get_merge_request(number: int, updated_at: datetime):
+    return {"iid": number, "updated_at": updated_at.isoformat()}
+
+
+class FakeGitlabApiService:
+    def __init__(self, merge_requests):
+        self.merge_requests = {mr["iid"]: mr for mr in merge_requests}
+        self.fetched_internal_ids = []
+        self.updated_while_syncing = {}
+
+    def get_project(self, project_id):
+        return type("FakeGitlabRepo", (), {"idempotency_key": project_id})
+
+    async def iter_project_merge_requests(self, project_id, updated_after):
+        merge_requests = list(self.merge_requests.values())
+        for index in range(0, len(merge_requests), 2):
+            yield merge_requests[index : index + 2]
+
+    def get_project_merge_requests_by_internal_ids(self, project_id, internal_ids):
+        self.fetched_internal_ids.append(list(internal_ids))
+        self.merge_requests.update(self.updated_while_syncing)
+        self.updated_while_syncing = {}
+        return [
+            self.merge_requests[int(iid)]
+            for iid in internal_ids
+            if int(iid) in self.merge_requests
+        ]
+
+
+def _get_chunked_pr_numbers(monkeypatch, api):
+    monkeypatch.setattr(etl_gitlab_handler, "PR_PROCESSING_CHUNK_SIZE", 2)
+    handler = GitlabETLHandler(ORG_ID, api, None, None, None)
+    handler._process_prs_chunk = lambda repo_id, project_id, prs_chunk: [
+        pr.number for pr in prs_chunk
+    ]
+    org_repo = OrgRepo(id=uuid4_str(), org_name="org", name="repo")
+    org_repo.idempotency_key = "1"
+    return handler.get_repo_pull_requests_data_chunks(org_repo, BOOKMARK)
+
+
+def test_get_repo_pull_requests_data_chunks_fetches_merge_requests_a_chunk_at_a_time(
+    monkeypatch,
+):
+    api = FakeGitlabApiService(
+        [
+            _get_merge_request(number, BOOKMARK + timedelta(hours=hours))
+            for number, hours in [(5, 1), (4, 5), (3, 2), (2, 4), (1, 3)]
+        ]
+    )
+
+    chunks = _get_chunked_pr_numbers(monkeypatch, api)
+
+    assert next(chunks) == ["5", "3"]
+    # Closing a chunk needs the first merge request of the next one
+    assert api.fetched_internal_ids == [["5", "3"], ["1", "2"]]
+    assert list(chunks) == [["1", "2"], ["4"]]
+    assert api.fetched_internal_ids == [["5", "3"], ["1", "2"], ["4"]]
+
+
+def test_get_repo_pull_requests_data_chunks_yields_merge_requests_updated_while_syncing_last(
+    monkeypatch,
+):
+    api = FakeGitlabApiService(
+        [
+            _get_merge_request(number, BOOKMARK + timedelta(hours=number))
+            for number in [3, 2, 1]
+        ]
+    )
+    api.updated_while_syncing = {
+        2: _get_merge_request(2, BOOKMARK + timedelta(hours=5))
+    }
+
+    chunks = _get_chunked_pr_numbers(monkeypatch, api)
+
+    assert list(chunks) == [["1", "3"], ["2"]]
+
+
+def test_get_repo_pull_requests_data_chunks_without_merge_requests_yields_nothing(
+    monkeypatch,
+):
+    api = FakeGitlabApiService([])
+
+    assert list(_get_chunked_pr_numbers(monkeypatch, api)) == []
+    assert api.fetched_internal_ids == []
 
 
 def test__to_pr_model_given_a_gitlab_pr_returns_new_pr_model():
@@ -0,0 +1,295 @@
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+import pytz
+from flask import Flask
+
+from mhq.service.code.sync.etl_handler import CodeETLHandler
+from mhq.store.models.code import OrgRepo, PullRequestState
+from mhq.utils.string import uuid4_str
+from tests.factories.models import get_pull_request
+
+ORG_ID = uuid4_str()
+BOOKMARK = datetime(2024, 1, 1, tzinfo=pytz.UTC)
+
+
+class FakeSetting:
+    def __init__(self):
+        self.specific_settings = type("Setting", (), {"default_sync_days": 31})()
+
+
+class FakeSettingsService:
+    def get_or_set_default_settings(self, **kwargs):
+        return FakeSetting()
+
+
+class FakeBookmarkService:
+    def __init__(self):
+        self.bookmarks = {}
+        self._lock = threading.Lock()
+
+    def get_bookmark(self, entity_id, bookmark_type, provider, default_sync_days=None):
+        return self.bookmarks.get(entity_id, BOOKMARK)
+
+    def update_bookmark(self, entity_id, bookmark_type, provider, bookmark):
+        with self._lock:
+            self.bookmarks[entity_id] = bookmark
+
+
+class FakeMTDBroker:
+    def __init__(self):
+        self.pushed_back = {}
+
+    def pushback_merge_to_deploy_bookmark(self, repo, prs):
+        self.pushed_back.setdefault(str(repo.id), []).extend(pr.id for pr in prs)
+
+
+class FakeCodeRepoService:
+    def __init__(self, org_repos):
+        self.org_repos = {str(repo.id): repo for repo in org_repos}
+        self.saved_prs = []
+        self.refreshed_weeks = {}
+        self.refreshed_days = {}
+
+    def get_active_org_repos_for_provider(self, org_id, provider):
+        return list(self.org_repos.values())
+
+    def update_org_repos(self, org_repos):
+        return org_repos
+
+    def get_repo_by_id(self, repo_id):
+        return self.org_repos.get(repo_id)
+
+    def save_pull_requests_data(self, prs, commits, events):
+        self.saved_prs.extend(prs)
+
+    def save_revert_pr_mappings(self, mappings):
+        pass
+
+    def refresh_repo_lead_time_rollups(self, repo_id, week_starts):
+        self.refreshed_weeks.setdefault(repo_id, []).append(week_starts)
+
+    def refresh_repo_deployment_rollups(self, repo_id, days):
+        self.refreshed_days.setdefault(repo_id, []).append(days)
+
+
+class FakeIncidentsRepoService:
+    def __init__(self):
+        self.stale_from = {}
+
+    def save_team_incident_rollups_stale_for_repo(self, repo_id, stale_from):
+        self.stale_from.setdefault(repo_id, []).append(stale_from)
+
+
+class FakeProviderETLHandler:
+    def __init__(self, prs_by_repo, failing_repo_ids=(), chunk_size=2, fail_after=None):
+        self.prs_by_repo = prs_by_repo
+        self.failing_repo_ids = failing_repo_ids
+        self.chunk_size = chunk_size
+        self.fail_after = fail_after
+        self.threads = set()
+
+    def check_pat_validity(self):
+        return True
+
+    def get_org_repos(self, org_repos):
+        return org_repos
+
+    def get_repo_pull_requests_data_chunks(self, org_repo, bookmark):
+        self.threads.add(threading.get_ident())
+        if str(org_repo.id) in self.failing_repo_ids:
+            raise Exception("Provider error")
+
+        prs = [
+            pr for pr in self.prs_by_repo[str(org_repo.id)] if pr.updated_at > bookmark
+        ]
+        for chunk_number, start in enumerate(range(0, len(prs), self.chunk_size)):
+            if chunk_number == self.fail_after:
+                raise Exception("Provider error")
+            end = start + self.chunk_size
+            yield prs[start:end], [], []
+
+    def get_revert_prs_mapping(self, prs):
+        return []
+
+
+def _get_org_repo(name: str) -> OrgRepo:
+    return OrgRepo(
+        id=uuid4_str(), org_id=ORG_ID, name=name, provider="github", is_active=True
+    )
+
+
+def _get_repo_prs(org_repo: OrgRepo, count: int):
+    return [
+        get_pull_request(
+            id=uuid4_str(),
+            repo_id=str(org_repo.id),
+            state=PullRequestState.MERGED,
+            updated_at=BOOKMARK + timedelta(hours=i + 1),
+            state_changed_at=BOOKMARK + timedelta(hours=i),
+        )
+        for i in range(count)
+    ]
+
+
+def test_sync_repo_pull_requests_data_commits_chunks_and_resumes_after_failure():
+    org_repo = _get_org_repo("repo")
+    prs = _get_repo_prs(org_repo, 5)
+    code_repo_service = FakeCodeRepoService([org_repo])
+    bookmark_service = FakeBookmarkService()
+
+    handler = CodeETLHandler(
+        code_repo_service,
+        FakeIncidentsRepoService(),
+        FakeProviderETLHandler({str(org_repo.id): prs}, fail_after=2),
+        FakeMTDBroker(),
+        bookmark_service,
+        FakeSettingsService(),
+    )
+    with pytest.raises(Exception):
+        handler.sync_repo(str(org_repo.id))
+
+    assert code_repo_service.saved_prs == prs[:4]
+    assert bookmark_service.bookmarks[str(org_repo.id)] == prs[3].updated_at
+
+    handler.etl_service = FakeProviderETLHandler({str(org_repo.id): prs})
+    handler.sync_repo(str(org_repo.id))
+
+    assert code_repo_service.saved_prs == prs
+    assert bookmark_service.bookmarks[str(org_repo.id)] == prs[4].updated_at
+
+
+def test_sync_repo_refreshes_rollups_once_for_the_saved_chunks():
+    org_repo = _get_org_repo("repo")
+    repo_id = str(org_repo.id)
+    prs = _get_repo_prs(org_repo, 5)
+    prs[1].state_changed_at = BOOKMARK + timedelta(days=8)
+    prs[4].state = PullRequestState.OPEN
+    prs[4].state_changed_at = BOOKMARK + timedelta(days=20)
+    code_repo_service = FakeCodeRepoService([org_repo])
+    incidents_repo_service = FakeIncidentsRepoService()
+
+    handler = CodeETLHandler(
+        code_repo_service,
+        incidents_repo_service,
+        FakeProviderETLHandler({repo_id: prs}, fail_after=1),
+        FakeMTDBroker(),
+        FakeBookmarkService(),
+        FakeSettingsService(),
+    )
+    with pytest.raises(Exception):
+        handler.sync_repo(repo_id)
+
+    # The saved chunk is refreshed even though the sync failed after it
+    assert code_repo_service.refreshed_weeks == {
+        repo_id: [{BOOKMARK, BOOKMARK + timedelta(days=7)}]
+    }
+    assert code_repo_service.refreshed_days == {
+        repo_id: [{BOOKMARK, BOOKMARK + timedelta(days=8)}]
+    }
+    assert incidents_repo_service.stale_from == {repo_id: [BOOKMARK]}
+
+    handler.etl_service = FakeProviderETLHandler({repo_id: prs})
+    handler.sync_repo(repo_id)
+
+    assert len(code_repo_service.refreshed_days[repo_id]) == 2
+    assert code_repo_service.refreshed_days[repo_id][1] == {BOOKMARK}
+    assert incidents_repo_service.stale_from[repo_id][1] == BOOKMARK
+
+
+def test_sync_repo_syncs_a_single_repo_task():
+    org_repos = [_get_org_repo(f"repo-{i}") for i in range(2)]
+    prs_by_repo = {str(repo.id): _get_repo_prs(repo, 2) for repo in org_repos}
+    code_repo_service = FakeCodeRepoService(org_repos)
+    bookmark_service = FakeBookmarkService()
+    etl_service = FakeProviderETLHandler(prs_by_repo)
+    handler = CodeETLHandler(
+        code_repo_service,
+        FakeIncidentsRepoService(),
+        etl_service,
+        FakeMTDBroker(),
+        bookmark_service,
+        FakeSettingsService(),
+    )
+
+    repos_to_sync = handler.get_org_repos_to_sync(ORG_ID, "github")
+    handler.sync_repo(str(org_repos[1].id))
+
+    assert repos_to_sync == org_repos
+    assert set(bookmark_service.bookmarks) == {str(org_repos[1].id)}
+    assert code_repo_service.saved_prs == prs_by_repo[str(org_repos[1].id)]
+
+    etl_service.check_pat_validity = lambda: False
+    assert handler.get_org_repos_to_sync(ORG_ID, "github") == []
+
+
+def test_sync_repos_with_worker_pool_syncs_every_repo_with_its_own_bookmark():
+    org_repos = [_get_org_repo(f"repo-{i}") for i in range(6)]
+    prs_by_repo = {
+        str(repo.id): _get_repo_prs(repo, i + 1) for i, repo in enumerate(org_repos)
+    }
+    code_repo_service = FakeCodeRepoService(org_repos)
+    bookmark_service = FakeBookmarkService()
+    mtd_broker = FakeMTDBroker()
+    worker_etl_services = []
+
+    def etl_service_factory():
+        etl_service = FakeProviderETLHandler(prs_by_repo)
+        worker_etl_services.append(etl_service)
+        return etl_service
+
+    handler = CodeETLHandler(
+        code_repo_service,
+        FakeIncidentsRepoService(),
+        FakeProviderETLHandler(prs_by_repo),
+        mtd_broker,
+        bookmark_service,
+        FakeSettingsService(),
+        etl_service_factory=etl_service_factory,
+        max_workers=3,
+    )
+
+    with Flask(__name__).app_context():
+        handler.sync_repos(ORG_ID, [str(repo.id) for repo in org_repos])
+
+    assert len(code_repo_service.saved_prs) == sum(
+        len(prs) for prs in prs_by_repo.values()
+    )
+    for i, repo in enumerate(org_repos):
+        repo_id = str(repo.id)
+        assert bookmark_service.bookmarks[repo_id] == BOOKMARK + timedelta(hours=i + 1)
+        assert mtd_broker.pushed_back[repo_id] == [pr.id for pr in prs_by_repo[repo_id]]
+
+    assert 1 <= len(worker_etl_services) <= 3
+    for etl_service in worker_etl_services:
+        assert len(etl_service.threads) == 1
+
+
+def test_sync_repos_with_worker_pool_isolates_repo_failures():
+    org_repos = [_get_org_repo(f"repo-{i}") for i in range(3)]
+    prs_by_repo = {str(repo.id): _get_repo_prs(repo, 2) for repo in org_repos}
+    failing_repo_id = str(org_repos[1].id)
+    bookmark_service = FakeBookmarkService()
+
+    handler = CodeETLHandler(
+        FakeCodeRepoService(org_repos),
+        FakeIncidentsRepoService(),
+        FakeProviderETLHandler(prs_by_repo),
+        FakeMTDBroker(),
+        bookmark_service,
+        FakeSettingsService(),
+        etl_service_factory=lambda: FakeProviderETLHandler(
+            prs_by_repo, failing_repo_ids=(failing_repo_id,)
+        ),
+        max_workers=2,
+    )
+
+    with Flask(__name__).app_context():
+        with pytest.raises(Exception, match=failing_repo_id):
+            handler.sync_repos(ORG_ID, [str(repo.id) for repo in org_repos])
+
+    assert set(bookmark_service.bookmarks) == {
+        str(org_repos[0].id),
+        str(org_repos[2].id),
+    }
@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta
+
+from mhq.service.code.sync.pr_chunks import (
+    chunk_prs_by_updated_at,
+    chunk_sorted_prs_by_updated_at,
+)
+from mhq.utils.time import time_now
+from tests.factories.models import get_pull_request
+
+
+def _get_prs(updated_ats):
+    return [
+        get_pull_request(number=str(number), updated_at=updated_at)
+        for number, updated_at in enumerate(updated_ats)
+    ]
+
+
+def _get_numbers(chunks):
+    return [[pr.number for pr in chunk] for chunk in chunks]
+
+
+def test_chunk_prs_by_updated_at_sorts_ascending():
+    now = time_now()
+    prs = _get_prs([now, now - timedelta(hours=2), now - timedelta(hours=1)])
+
+    chunks = list(chunk_prs_by_updated_at(prs, 2))
+
+    assert _get_numbers(chunks) == [["1", "2"], ["0"]]
+
+
+def test_chunk_prs_by_updated_at_keeps_ties_in_one_chunk():
+    updated_at = datetime(2024, 1, 1)
+    prs = _get_prs(
+        [
+            updated_at,
+            updated_at + timedelta(hours=1),
+            updated_at + timedelta(hours=1),
+            updated_at + timedelta(hours=1),
+            updated_at + timedelta(hours=2),
+        ]
+    )
+
+    chunks = list(chunk_prs_by_updated_at(prs, 2))
+
+    assert _get_numbers(chunks) == [["0", "1", "2", "3"], ["4"]]
+
+
+def test_chunk_prs_by_updated_at_with_no_prs():
+    assert list(chunk_prs_by_updated_at([], 2)) == []
+
+
+def test_chunk_sorted_prs_by_updated_at_yields_chunks_as_prs_stream_in():
+    updated_at = datetime(2024, 1, 1)
+    consumed = []
+
+    def _stream():
+        for pr in _get_prs([updated_at + timedelta(hours=i) for i in range(5)]):
+            consumed.append(pr.number)
+            yield pr
+
+    chunks = chunk_sorted_prs_by_updated_at(_stream(), 2)
+
+    assert _get_numbers([next(chunks)]) == [["0", "1"]]
+    assert consumed == ["0", "1", "2"]
+    assert _get_numbers(chunks) == [["2", "3"], ["4"]]
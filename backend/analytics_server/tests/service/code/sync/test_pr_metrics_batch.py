@@ -0,0 +1,165 @@
+from datetime import timedelta
+
+from hypothesis import given, settings
+from hypothesis import strategies as st
+
+from mhq.service.code.sync.etl_code_analytics import CodeETLAnalyticsService
+from mhq.store.models.code import PullRequestEventState, PullRequestState
+from mhq.store.models.code.enums import PullRequestEventType
+from mhq.utils.time import time_now
+from tests.factories.models.code import (
+    get_pull_request,
+    get_pull_request_commit,
+    get_pull_request_event,
+)
+
+BASE_TIME = time_now()
+ACTORS = ["author", "alice", "bob", "dependabot[bot]"]
+EVENT_TYPES = [
+    PullRequestEventType.REVIEW.value,
+    PullRequestEventType.READY_FOR_REVIEW.value,
+    PullRequestEventType.COMMENTED.value,
+]
+REVIEW_STATES = [state.value for state in PullRequestEventState]
+# Second offsets that often collide, so ties in the sort orders get exercised
+offsets = st.integers(min_value=0, max_value=8)
+
+events = st.lists(
+    st.tuples(
+        offsets,
+        st.sampled_from(EVENT_TYPES),
+        st.sampled_from(REVIEW_STATES),
+        st.sampled_from(ACTORS),
+    ),
+    max_size=8,
+)
+pull_requests = st.tuples(
+    st.sampled_from(list(PullRequestState)),
+    offsets,
+    offsets,
+    st.sampled_from(ACTORS[:2] + [None]),
+    events,
+    st.lists(offsets, max_size=5),
+)
+
+
+def _get_models(pr_data):
+    state, created_at, state_changed_at, author, event_rows, commit_offsets = pr_data
+    pr = get_pull_request(
+        state=state,
+        author=author,
+        created_at=BASE_TIME + timedelta(seconds=created_at),
+        state_changed_at=BASE_TIME + timedelta(seconds=state_changed_at),
+        reviewers=["previous"],
+    )
+    pr.author = author
+    pr.rework_cycles = 0
+    pr_events = [
+        get_pull_request_event(
+            pull_request_id=pr.id,
+            type=event_type,
+            reviewer=actor,
+            state=review_state,
+            created_at=BASE_TIME + timedelta(seconds=offset),
+        )
+        for offset, event_type, review_state, actor in event_rows
+    ]
+    pr_commits = [
+        get_pull_request_commit(
+            pr_id=pr.id, created_at=BASE_TIME + timedelta(seconds=offset)
+        )
+        for offset in commit_offsets
+    ]
+    return pr, pr_events, pr_commits
+
+
+def _get_metrics(pr):
+    return (
+        pr.first_response_time,
+        pr.rework_time,
+        pr.merge_time,
+        pr.cycle_time,
+        sorted(pr.reviewers),
+        pr.rework_cycles,
+        pr.first_commit_to_open,
+    )
+
+
+@settings(max_examples=300, deadline=None)
+@given(st.lists(pull_requests, max_size=6))
+def test_create_pr_metrics_batch_matches_create_pr_metrics(prs_data):
+    pr_service = CodeETLAnalyticsService()
+
+    expected = []
+    for pr_data in prs_data:
+        pr, pr_events, pr_commits = _get_models(pr_data)
+        expected.append(
+            _get_metrics(pr_service.create_pr_metrics(pr, pr_events, pr_commits))
+        )
+
+    batch = [_get_models(pr_data) for pr_data in prs_data]
+    prs = pr_service.create_pr_metrics_batch(
+        [pr for pr, _, _ in batch],
+        [pr_events for _, pr_events, _ in batch],
+        [pr_commits for _, _, pr_commits in batch],
+    )
+
+    assert [_get_metrics(pr) for pr in prs] == expected
+
+
+def test_create_pr_metrics_batch_leaves_open_prs_untouched():
+    pr_service = CodeETLAnalyticsService()
+    pr = get_pull_request(state=PullRequestState.OPEN, reviewers=["abc"])
+    review = get_pull_request_event(pull_request_id=pr.id, reviewer="bcd")
+
+    prs = pr_service.create_pr_metrics_batch([pr], [[review]], [[]])
+
+    assert prs == [pr]
+    assert pr.reviewers == ["abc"]
+    assert pr.first_response_time is None
+
+
+def test_create_pr_metrics_batch_counts_rework_cycles_per_pr():
+    pr_service = CodeETLAnalyticsService()
+    t1 = time_now()
+    prs, prs_events, prs_commits = [], [], []
+    for rework_cycles in [0, 1, 2]:
+        pr = get_pull_request(
+            state=PullRequestState.MERGED,
+            author="author",
+            created_at=t1,
+            state_changed_at=t1 + timedelta(hours=10),
+        )
+        pr_events = []
+        pr_commits = []
+        for cycle in range(rework_cycles):
+            pr_events.append(
+                get_pull_request_event(
+                    pull_request_id=pr.id,
+                    reviewer="reviewer",
+                    state=PullRequestEventState.CHANGES_REQUESTED.value,
+                    created_at=t1 + timedelta(hours=2 * cycle + 1),
+                )
+            )
+            pr_commits.append(
+                get_pull_request_commit(
+                    pr_id=pr.id, created_at=t1 + timedelta(hours=2 * cycle + 2)
+                )
+            )
+        pr_events.append(
+            get_pull_request_event(
+                pull_request_id=pr.id,
+                reviewer="reviewer",
+                created_at=t1 + timedelta(hours=9),
+            )
+        )
+        pr_commits.append(get_pull_request_commit(pr_id=pr.id, created_at=t1))
+        prs.append(pr)
+        prs_events.append(pr_events)
+        prs_commits.append(pr_commits)
+
+    prs = pr_service.create_pr_metrics_batch(prs, prs_events, prs_commits)
+
+    assert [pr.rework_cycles for pr in prs] == [0, 1, 2]
+    assert [pr.merge_time for pr in prs] == [3600, 3600, 3600]
+    assert [pr.reviewers for pr in prs] == [["reviewer"]] * 3
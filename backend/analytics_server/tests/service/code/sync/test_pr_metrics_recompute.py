@@ -0,0 +1,284 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import timedelta
+
+from mhq.service.code.sync.etl_code_analytics import CodeETLAnalyticsService
+from mhq.service.code.sync.pr_metrics_recompute import (
+    PRMetricsRecomputeService,
+    compute_chunk_pr_metrics,
+)
+from mhq.store.models.code import (
+    Bookmark,
+    CodeBookmarkType,
+    OrgRepo,
+    PullRequestEventState,
+    PullRequestState,
+)
+from mhq.store.models.code.enums import PullRequestEventType
+from mhq.utils.time import time_now
+from tests.factories.models.code import (
+    get_pull_request,
+    get_pull_request_commit,
+    get_pull_request_event,
+)
+
+
+class FakeCodeRepoService:
+    def __init__(self, prs, events, commits, bookmark=None):
+        self.prs = sorted(prs, key=lambda pr: str(pr.id))
+        self.events = events
+        self.commits = commits
+        self.bookmark = bookmark
+        self.updated_metrics = []
+        self.bookmark_updates = []
+
+    def delete_org_repo_bookmark(self, org_repo_id, bookmark_type):
+        self.bookmark = None
+
+    def get_org_repo_bookmark(self, org_repo_id, bookmark_type):
+        assert bookmark_type == CodeBookmarkType.PR_METRICS_RECOMPUTE
+        return self.bookmark
+
+    def update_org_repo_bookmark(self, bookmark):
+        self.bookmark = bookmark
+        self.bookmark_updates.append(bookmark.bookmark)
+
+    def _get_prs_after_id(self, after_pr_id):
+        return [
+            pr
+            for pr in self.prs
+            if pr.state != PullRequestState.OPEN
+            and (not after_pr_id or str(pr.id) > after_pr_id)
+        ]
+
+    def get_repo_closed_prs_count_after_id(self, repo_id, after_pr_id):
+        return len(self._get_prs_after_id(after_pr_id))
+
+    def get_repo_closed_prs_after_id(self, repo_id, after_pr_id, limit):
+        return self._get_prs_after_id(after_pr_id)[:limit]
+
+    def get_pr_events_with_data_by_pr_ids(self, pr_ids):
+        return [event for event in self.events if str(event.pull_request_id) in pr_ids]
+
+    def get_pr_commits_by_pr_ids(self, pr_ids):
+        return [
+            commit for commit in self.commits if str(commit.pull_request_id) in pr_ids
+        ]
+
+    def update_pr_metrics(self, prs_metrics):
+        self.updated_metrics += prs_metrics
+
+
+def _get_repo_data(pr_count):
+    t1 = time_now()
+    prs, events, commits = [], [], []
+    for index in range(pr_count):
+        pr = get_pull_request(
+            state=PullRequestState.MERGED,
+            author="author",
+            provider="github",
+            created_at=t1,
+            state_changed_at=t1 + timedelta(hours=4),
+            reviewers=[],
+        )
+        prs.append(pr)
+        blocking_review = get_pull_request_event(
+            pull_request_id=pr.id,
+            reviewer="reviewer",
+            state=PullRequestEventState.CHANGES_REQUESTED.value,
+            created_at=t1 + timedelta(hours=1),
+        )
+        # Stored events come back with the enum type
+        blocking_review.type = PullRequestEventType.REVIEW
+        approval = get_pull_request_event(
+            pull_request_id=pr.id,
+            reviewer="reviewer",
+            created_at=t1 + timedelta(hours=3),
+        )
+        bot_review = get_pull_request_event(
+            pull_request_id=pr.id,
+            reviewer="ci",
+            created_at=t1 + timedelta(minutes=index + 1),
+            data={"user": {"login": "ci", "type": "Bot"}, "state": "commented"},
+        )
+        events += [blocking_review, approval, bot_review]
+        commits.append(
+            get_pull_request_commit(
+                pr_id=pr.id, created_at=t1 + timedelta(hours=2) - timedelta(days=1)
+            )
+        )
+        commits.append(
+            get_pull_request_commit(pr_id=pr.id, created_at=t1 + timedelta(hours=2))
+        )
+    prs.append(get_pull_request(state=PullRequestState.OPEN))
+    return prs, events, commits
+
+
+def _get_org_repo():
+    return OrgRepo(id="repo1", org_id="org1", name="repo")
+
+
+class FakeAnalyticsCache:
+    def __init__(self):
+        self.invalidated_org_ids = []
+
+    def invalidate_org(self, org_id):
+        self.invalidated_org_ids.append(org_id)
+
+
+def test_recompute_repos_updates_metrics_of_closed_prs_in_chunks():
+    prs, events, commits = _get_repo_data(5)
+    code_repo_service = FakeCodeRepoService(prs, events, commits)
+    progress_updates = []
+
+    service = PRMetricsRecomputeService(
+        code_repo_service,
+        chunk_size=2,
+        processes=2,
+        executor_factory=ThreadPoolExecutor,
+    )
+    [progress] = service.recompute_repos(
+        [_get_org_repo()],
+        on_progress=lambda progress: progress_updates.append(progress.recomputed_prs),
+    )
+
+    closed_prs = [
+        pr for pr in code_repo_service.prs if pr.state != PullRequestState.OPEN
+    ]
+    assert progress.total_prs == progress.recomputed_prs == 5
+    assert progress_updates == [2, 4, 5]
+    assert code_repo_service.bookmark_updates == [
+        str(closed_prs[1].id),
+        str(closed_prs[3].id),
+        str(closed_prs[4].id),
+    ]
+    assert [metrics["id"] for metrics in code_repo_service.updated_metrics] == [
+        pr.id for pr in closed_prs
+    ]
+    for metrics in code_repo_service.updated_metrics:
+        assert metrics["first_response_time"] == 3600
+        assert metrics["rework_time"] == 7200
+        assert metrics["merge_time"] == 3600
+        assert metrics["cycle_time"] == 14400
+        assert metrics["reviewers"] == ["reviewer"]
+        assert metrics["rework_cycles"] == 1
+        assert metrics["first_commit_to_open"] == 79200
+
+
+def test_recompute_repos_resumes_after_bookmarked_pr():
+    prs, events, commits = _get_repo_data(4)
+    code_repo_service = FakeCodeRepoService(prs, events, commits)
+    closed_prs = [
+        pr for pr in code_repo_service.prs if pr.state != PullRequestState.OPEN
+    ]
+    code_repo_service.bookmark = Bookmark(
+        repo_id="repo1",
+        type=CodeBookmarkType.PR_METRICS_RECOMPUTE.value,
+        bookmark=str(closed_prs[1].id),
+    )
+
+    service = PRMetricsRecomputeService(code_repo_service, chunk_size=10, processes=1)
+    [progress] = service.recompute_repos([_get_org_repo()])
+
+    assert progress.total_prs == progress.recomputed_prs == 2
+    assert [metrics["id"] for metrics in code_repo_service.updated_metrics] == [
+        pr.id for pr in closed_prs[2:]
+    ]
+
+
+def test_recompute_repos_restart_starts_from_the_first_pr():
+    prs, events, commits = _get_repo_data(3)
+    code_repo_service = FakeCodeRepoService(prs, events, commits)
+    closed_prs = [
+        pr for pr in code_repo_service.prs if pr.state != PullRequestState.OPEN
+    ]
+    code_repo_service.bookmark = Bookmark(
+        repo_id="repo1",
+        type=CodeBookmarkType.PR_METRICS_RECOMPUTE.value,
+        bookmark=str(closed_prs[-1].id),
+    )
+
+    service = PRMetricsRecomputeService(code_repo_service, chunk_size=10, processes=1)
+    [progress] = service.recompute_repos([_get_org_repo()], restart=True)
+
+    assert progress.recomputed_prs == 3
+
+
+def test_recompute_repos_invalidates_cached_analytics_of_recomputed_repos():
+    prs, events, commits = _get_repo_data(3)
+    code_repo_service = FakeCodeRepoService(prs, events, commits)
+    analytics_cache = FakeAnalyticsCache()
+
+    service = PRMetricsRecomputeService(
+        code_repo_service,
+        chunk_size=2,
+        processes=1,
+        analytics_cache=analytics_cache,
+    )
+    service.recompute_repos([_get_org_repo()])
+
+    assert analytics_cache.invalidated_org_ids == ["org1"]
+
+    code_repo_service.prs = []
+    service.recompute_repos([_get_org_repo()])
+
+    assert analytics_cache.invalidated_org_ids == ["org1"]
+
+
+def test_recompute_repos_drops_the_bookmark_so_the_next_run_recomputes_every_pr():
+    prs, events, commits = _get_repo_data(3)
+    code_repo_service = FakeCodeRepoService(prs, events, commits)
+    service = PRMetricsRecomputeService(code_repo_service, chunk_size=2, processes=1)
+
+    [first_progress] = service.recompute_repos([_get_org_repo()])
+
+    assert code_repo_service.bookmark is None
+
+    [second_progress] = service.recompute_repos([_get_org_repo()])
+
+    assert first_progress.recomputed_prs == second_progress.recomputed_prs == 3
+    assert second_progress.total_prs == 3
+    assert len(code_repo_service.updated_metrics) == 6
+
+
+def test_compute_chunk_pr_metrics_runs_in_process_pool():
+    t1 = time_now()
+    pr_row = dict(
+        id="pr1",
+        author="author",
+        state=PullRequestState.MERGED,
+        created_at=t1,
+        state_changed_at=t1 + timedelta(hours=2),
+        requested_reviews=[],
+        reviewers=[],
+        rework_cycles=0,
+        first_commit_to_open=None,
+    )
+    event_row = dict(
+        id="event1",
+        type=PullRequestEventType.REVIEW.value,
+        data=dict(state=PullRequestEventState.APPROVED.value),
+        created_at=t1 + timedelta(hours=1),
+        actor_username="reviewer",
+    )
+    chunk = ([pr_row], [[event_row]], [[]])
+
+    with ProcessPoolExecutor(1) as executor:
+        [metrics] = executor.submit(compute_chunk_pr_metrics, chunk).result()
+
+    pr = get_pull_request(
+        state=PullRequestState.MERGED,
+        author="author",
+        created_at=t1,
+        state_changed_at=t1 + timedelta(hours=2),
+        reviewers=[],
+    )
+    event = get_pull_request_event(
+        pull_request_id=pr.id,
+        reviewer="reviewer",
+        created_at=t1 + timedelta(hours=1),
+    )
+    CodeETLAnalyticsService().create_pr_metrics(pr, [event], [])
+    assert metrics["merge_time"] == pr.merge_time == 3600
+    assert metrics["first_response_time"] == pr.first_response_time == 3600
+    assert metrics["cycle_time"] == pr.cycle_time == 7200
+    assert metrics["reviewers"] == pr.reviewers == ["reviewer"]
@@ -0,0 +1,50 @@
+from mhq.service.code.sync.pr_preload import preload_existing_prs
+from mhq.utils.string import uuid4_str
+from tests.factories.models.code import get_pull_request, get_pull_request_event
+
+
+class FakeCodeRepoService:
+    def __init__(self, pr_models, pr_event_models):
+        self.pr_models = pr_models
+        self.pr_event_models = pr_event_models
+        self.calls = []
+
+    def get_repo_prs_by_numbers(self, repo_id, pr_numbers):
+        self.calls.append(("get_repo_prs_by_numbers", pr_numbers))
+        return [
+            pr_model for pr_model in self.pr_models if pr_model.number in pr_numbers
+        ]
+
+    def get_pr_events_by_pr_ids(self, pr_ids):
+        self.calls.append(("get_pr_events_by_pr_ids", pr_ids))
+        return [
+            pr_event
+            for pr_event in self.pr_event_models
+            if str(pr_event.pull_request_id) in pr_ids
+        ]
+
+
+def test_preload_existing_prs_loads_prs_and_events_in_two_queries():
+    repo_id = uuid4_str()
+    first_pr = get_pull_request(id=uuid4_str(), repo_id=repo_id, number="1")
+    second_pr = get_pull_request(id=uuid4_str(), repo_id=repo_id, number="2")
+    first_pr_events = [
+        get_pull_request_event(pull_request_id=first_pr.id, idempotency_key="11"),
+        get_pull_request_event(pull_request_id=first_pr.id, idempotency_key="12"),
+    ]
+    second_pr_event = get_pull_request_event(
+        pull_request_id=second_pr.id, idempotency_key="21"
+    )
+    code_repo_service = FakeCodeRepoService(
+        [first_pr, second_pr], first_pr_events + [second_pr_event]
+    )
+
+    existing_prs = preload_existing_prs(code_repo_service, repo_id, [1, 2, 3])
+
+    assert len(code_repo_service.calls) == 2
+    assert existing_prs.get_pr_model(1) == first_pr
+    assert existing_prs.get_pr_model("2") == second_pr
+    assert existing_prs.get_pr_model(3) is None
+    assert existing_prs.get_pr_events(first_pr) == first_pr_events
+    assert existing_prs.get_pr_events(second_pr) == [second_pr_event]
+    assert existing_prs.get_pr_events(None) == []
@@ -32,7 +32,7 @@ def test_process_revert_prs_empty_list():
 
 def test_process_revert_prs_no_revert_prs():
     class FakeCodeRepoService:
-        def get_prs_by_head_branch_match_strings(self, repo_ids, match_strings):
+        def get_revert_prs_by_reverted_pr_refs(self, repo_ids, reverted_pr_refs):
             return []
 
         def get_reverted_prs_by_merge_commit_hash(self, repo_ids, merge_commit_hashes):
@@ -73,7 +73,7 @@ def test_process_revert_prs_with_revert_prs():
                 )
             ]
 
-        def get_prs_by_head_branch_match_strings(self, repo_ids, match_strings):
+        def get_revert_prs_by_reverted_pr_refs(self, repo_ids, reverted_pr_refs):
             return []
 
     handler = RevertPRsGitlabSyncHandler(FakeCodeRepoService())
@@ -106,7 +106,7 @@ def test_process_revert_prs_with_original_pr():
         def get_reverted_prs_by_merge_commit_hash(self, repo_ids, merge_commit_hashes):
             return []
 
-        def get_prs_by_head_branch_match_strings(self, repo_ids, match_strings):
+        def get_revert_prs_by_reverted_pr_refs(self, repo_ids, reverted_pr_refs):
             return [
                 PullRequest(
                     id="1",
@@ -114,6 +114,7 @@ def test_process_revert_prs_with_original_pr():
                     head_branch="revert-abcdef12",
                     state=PullRequestState.MERGED,
                     merge_commit_sha="1234567890abcdef",
+                    reverted_pr_ref="abcdef12",
                 )
             ]
 
@@ -151,7 +152,7 @@ def test_process_revert_prs_datetime():
                 )
             ]
 
-        def get_prs_by_head_branch_match_strings(self, repo_ids, match_strings):
+        def get_revert_prs_by_reverted_pr_refs(self, repo_ids, reverted_pr_refs):
             return []
 
     handler = RevertPRsGitlabSyncHandler(FakeCodeRepoService())
@@ -194,7 +195,7 @@ def test_process_revert_prs_with_no_mappings_found():
         def get_reverted_prs_by_merge_commit_hash(self, repo_ids, merge_commit_hashes):
             return []
 
-        def get_prs_by_head_branch_match_strings(self, repo_ids, match_strings):
+        def get_revert_prs_by_reverted_pr_refs(self, repo_ids, reverted_pr_refs):
             return []
 
     handler = RevertPRsGitlabSyncHandler(FakeCodeRepoService())
@@ -232,7 +233,7 @@ def test_process_revert_prs_with_duplicate_mappings():
                 )
             ]
 
-        def get_prs_by_head_branch_match_strings(self, repo_ids, match_strings):
+        def get_revert_prs_by_reverted_pr_refs(self, repo_ids, reverted_pr_refs):
             return [
                 PullRequest(
                     id="1",
@@ -240,6 +241,7 @@ def test_process_revert_prs_with_duplicate_mappings():
                     head_branch="revert-abcdef12",
                     state=PullRequestState.MERGED,
                     merge_commit_sha="1234567890abcdef",
+                    reverted_pr_ref="abcdef12",
                 )
             ]
 
@@ -266,3 +268,40 @@ def test_process_revert_prs_with_duplicate_mappings():
     assert isinstance(result[0], PullRequestRevertPRMapping)
     assert result[0].pr_id == "1"
     assert result[0].reverted_pr == "2"
+
+
+def test_process_revert_prs_looks_up_lower_cased_merge_commit_hashes():
+    class FakeCodeRepoService:
+        def __init__(self):
+            self.calls = []
+
+        def get_reverted_prs_by_merge_commit_hash(self, repo_ids, merge_commit_hashes):
+            self.calls.append(merge_commit_hashes)
+            return []
+
+        def get_revert_prs_by_reverted_pr_refs(self, repo_ids, reverted_pr_refs):
+            self.calls.append(reverted_pr_refs)
+            return []
+
+    code_repo_service = FakeCodeRepoService()
+    handler = RevertPRsGitlabSyncHandler(code_repo_service)
+    prs = [
+        PullRequest(
+            id="1",
+            repo_id="repo1",
+            head_branch="revert-ABCDEF12",
+            state=PullRequestState.MERGED,
+            merge_commit_sha="1234567890abcdef",
+        ),
+        PullRequest(
+            id="2",
+            repo_id="repo1",
+            head_branch="feature-branch",
+            state=PullRequestState.MERGED,
+            merge_commit_sha="ABCDEF1234567890",
+        ),
+    ]
+
+    handler.process_revert_prs(prs)
+
+    assert sorted(code_repo_service.calls) == [["abcdef12"], ["abcdef12"]]
@@ -0,0 +1,67 @@
+from mhq.service.code.sync.revert_prs_github_sync import (
+    RevertPRsGitHubSyncHandler,
+    get_github_reverted_pr_number,
+)
+from mhq.store.models.code.enums import PullRequestState
+from mhq.store.models.code.pull_requests import PullRequest
+
+
+def test_get_github_reverted_pr_number():
+    assert get_github_reverted_pr_number("revert-42-feature") == "42"
+    assert get_github_reverted_pr_number("revert-42") is None
+    assert get_github_reverted_pr_number("feature-branch") is None
+    assert get_github_reverted_pr_number(None) is None
+
+
+def test_process_revert_prs_maps_prs_by_reverted_pr_ref():
+    class FakeCodeRepoService:
+        def __init__(self):
+            self.calls = []
+
+        def get_reverted_prs_by_numbers(self, repo_ids, numbers):
+            self.calls.append(("get_reverted_prs_by_numbers", numbers))
+            return [
+                PullRequest(id="2", repo_id="repo1", number="42", head_branch="feature")
+            ]
+
+        def get_revert_prs_by_reverted_pr_refs(self, repo_ids, reverted_pr_refs):
+            self.calls.append(("get_revert_prs_by_reverted_pr_refs", reverted_pr_refs))
+            return [
+                PullRequest(
+                    id="3",
+                    repo_id="repo1",
+                    number="50",
+                    head_branch="revert-43-feature-2",
+                    reverted_pr_ref="43",
+                )
+            ]
+
+    code_repo_service = FakeCodeRepoService()
+    handler = RevertPRsGitHubSyncHandler(code_repo_service)
+    prs = [
+        PullRequest(
+            id="1",
+            repo_id="repo1",
+            number="51",
+            head_branch="revert-42-feature",
+            state=PullRequestState.MERGED,
+        ),
+        PullRequest(
+            id="4",
+            repo_id="repo1",
+            number="43",
+            head_branch="feature-2",
+            state=PullRequestState.MERGED,
+        ),
+    ]
+
+    result = handler.process_revert_prs(prs)
+
+    assert sorted((mapping.pr_id, mapping.reverted_pr) for mapping in result) == [
+        ("1", "2"),
+        ("3", "4"),
+    ]
+    assert sorted(code_repo_service.calls) == [
+        ("get_revert_prs_by_reverted_pr_refs", ["43"]),
+        ("get_reverted_prs_by_numbers", ["42"]),
+    ]
@@ -1,4 +1,10 @@
+from datetime import datetime, timedelta
+
+import pytz
+
+from mhq.store.models.code import PRFilter, PullRequestLeadTimeRollup
 from mhq.utils.string import uuid4_str
+from mhq.utils.time import Interval
 from tests.utilities import compare_objects_as_dicts
 from mhq.service.code.lead_time import LeadTimeService
 from mhq.service.code.models.lead_time import LeadTimeMetrics
@@ -196,3 +202,117 @@ def test_get_teams_avg_lead_time_metrics_returns_correct_values():
     }
     assert compare_objects_as_dicts(result[team_1], expected[team_1])
     assert compare_objects_as_dicts(result[team_2], expected[team_2])
+
+
+class FakeLeadTimeRollupsCodeRepoService:
+    def __init__(self, rollups, pr_rollups_by_interval, excluded_pr_rollups=None):
+        self.rollups = rollups
+        self.pr_rollups_by_interval = pr_rollups_by_interval
+        self.excluded_pr_rollups = excluded_pr_rollups or []
+
+    def get_lead_time_rollups(self, repo_ids, interval, pr_filter, has_non_null_mtd):
+        return self.rollups
+
+    def get_lead_time_rollups_for_prs_merged_in_interval(
+        self, repo_ids, interval, pr_filter, has_non_null_mtd, pr_ids=None
+    ):
+        if pr_ids is not None:
+            assert pr_filter.excluded_pr_ids is None
+            return self.excluded_pr_rollups
+        return self.pr_rollups_by_interval.get(interval.from_time, [])
+
+
+def _get_rollup(week_start, pr_count, first_response_time, merge_to_deploy=0):
+    return PullRequestLeadTimeRollup(
+        repo_id=uuid4_str(),
+        base_branch="main",
+        week_start=week_start,
+        has_merge_to_deploy=True,
+        pr_count=pr_count,
+        first_commit_to_open=0,
+        first_response_time=first_response_time,
+        rework_time=0,
+        merge_time=0,
+        merge_to_deploy=merge_to_deploy,
+    )
+
+
+def test_lead_time_rollup_metrics_sum_whole_and_partial_weeks_per_week():
+    first_week = datetime(2024, 1, 1, tzinfo=pytz.UTC)
+    second_week = first_week + timedelta(weeks=1)
+    third_week = second_week + timedelta(weeks=1)
+    from_time = first_week + timedelta(days=2)
+    code_repo_service = FakeLeadTimeRollupsCodeRepoService(
+        rollups=[
+            _get_rollup(second_week, 2, 200, merge_to_deploy=20),
+            _get_rollup(second_week, 1, 400, merge_to_deploy=70),
+        ],
+        pr_rollups_by_interval={
+            from_time: [_get_rollup(first_week, 1, 60)],
+            third_week: [_get_rollup(third_week, 2, 0)],
+        },
+    )
+    lead_time_service = LeadTimeService(code_repo_service, FakeDeploymentsService)
+
+    lead_time_metrics = lead_time_service._get_lead_time_rollup_metrics(
+        ["repo"],
+        Interval(from_time, third_week + timedelta(days=1)),
+        has_non_null_mtd=True,
+    )
+
+    week_start_to_metrics = {
+        metrics.merged_at: metrics for metrics in lead_time_metrics
+    }
+    assert week_start_to_metrics[first_week].first_response_time == 60
+    assert week_start_to_metrics[first_week].pr_count == 1
+    assert week_start_to_metrics[second_week].first_response_time == 200
+    assert week_start_to_metrics[second_week].merge_to_deploy == 30
+    assert week_start_to_metrics[second_week].pr_count == 3
+    assert week_start_to_metrics[third_week].pr_count == 2
+    assert (
+        lead_time_service._get_weighted_avg_lead_time_metrics(
+            lead_time_metrics
+        ).first_response_time
+        == (60 + 600) / 6
+    )
+
+
+def test_lead_time_rollup_metrics_leave_out_excluded_prs():
+    week = datetime(2024, 1, 1, tzinfo=pytz.UTC)
+    code_repo_service = FakeLeadTimeRollupsCodeRepoService(
+        rollups=[
+            _get_rollup(week, 3, 300),
+            _get_rollup(week + timedelta(weeks=1), 1, 10),
+        ],
+        pr_rollups_by_interval={},
+        excluded_pr_rollups=[
+            _get_rollup(week, 1, 200),
+            _get_rollup(week + timedelta(weeks=1), 1, 10),
+        ],
+    )
+    lead_time_service = LeadTimeService(code_repo_service, FakeDeploymentsService)
+
+    [lead_time_metrics] = lead_time_service._get_lead_time_rollup_metrics(
+        ["repo"],
+        Interval(week, week + timedelta(weeks=2, microseconds=-1)),
+        PRFilter(excluded_pr_ids=["pr1", "pr2"]),
+    )
+
+    assert lead_time_metrics.merged_at == week
+    assert lead_time_metrics.pr_count == 2
+    assert lead_time_metrics.first_response_time == 50
+
+
+def test_lead_time_rollups_are_not_used_for_author_or_cycle_time_filters():
+    lead_time_service = LeadTimeService(FakeCodeRepoService, FakeDeploymentsService)
+
+    assert lead_time_service._can_use_lead_time_rollups(None)
+    assert lead_time_service._can_use_lead_time_rollups(
+        PRFilter(base_branches=["^main$"], excluded_pr_ids=["pr1"])
+    )
+    assert not lead_time_service._can_use_lead_time_rollups(
+        PRFilter(authors=["author"])
+    )
+    assert not lead_time_service._can_use_lead_time_rollups(
+        PRFilter(max_cycle_time=3600)
+    )
@@ -0,0 +1,220 @@
+from datetime import timedelta
+
+from mhq.service.deployments.branch_graph import BranchFlowGraph, BranchFlowGraphStore
+from mhq.store.models.code import PullRequestState
+from mhq.utils.string import uuid4_str
+from mhq.utils.time import time_now
+from tests.factories.models.code import get_pull_request
+
+t = time_now()
+
+
+def _merged_pr(base_branch, head_branch, hours):
+    return get_pull_request(
+        id=uuid4_str(),
+        state=PullRequestState.MERGED,
+        base_branch=base_branch,
+        head_branch=head_branch,
+        state_changed_at=t + timedelta(hours=hours),
+    )
+
+
+def test_get_prs_reachable_walks_branches_up_to_their_last_merge():
+    release_pr = _merged_pr("main", "release", 10)
+    feature_pr = _merged_pr("release", "feature", 5)
+    late_feature_pr = _merged_pr("release", "feature-2", 12)
+    unrelated_pr = _merged_pr("other", "feature-3", 1)
+    branch_graph = BranchFlowGraph()
+    branch_graph.add_prs([late_feature_pr, unrelated_pr, feature_pr, release_pr])
+
+    assert branch_graph.get_prs_reachable("main", t + timedelta(hours=20)) == [
+        str(release_pr.id),
+        str(feature_pr.id),
+    ]
+    assert branch_graph.get_prs_reachable("main", t + timedelta(hours=9)) == []
+    assert branch_graph.get_prs_reachable("release", t + timedelta(hours=20)) == [
+        str(feature_pr.id),
+        str(late_feature_pr.id),
+    ]
+
+
+def test_get_prs_reachable_only_returns_prs_merged_in_window():
+    first_pr = _merged_pr("main", "feature-1", 1)
+    second_pr = _merged_pr("main", "feature-2", 3)
+    branch_graph = BranchFlowGraph()
+    branch_graph.add_prs([first_pr, second_pr])
+
+    assert branch_graph.get_prs_reachable(
+        "main", t + timedelta(hours=5), merged_after=t + timedelta(hours=1)
+    ) == [str(second_pr.id)]
+
+
+def test_get_prs_reachable_can_skip_prs_deployed_by_a_workflow():
+    deployed_pr = _merged_pr("main", "feature-1", 1)
+    pr = _merged_pr("main", "feature-2", 2)
+    workflow_id, other_workflow_id = uuid4_str(), uuid4_str()
+    branch_graph = BranchFlowGraph()
+    branch_graph.add_prs([deployed_pr, pr])
+    branch_graph.mark_deployed([deployed_pr.id], workflow_id)
+
+    assert branch_graph.get_prs_reachable(
+        "main", t + timedelta(hours=5), undeployed_by=workflow_id
+    ) == [str(pr.id)]
+
+    branch_graph.mark_deployed([pr.id], workflow_id)
+
+    assert (
+        branch_graph.get_prs_reachable(
+            "main", t + timedelta(hours=5), undeployed_by=workflow_id
+        )
+        == []
+    )
+    assert (
+        len(
+            branch_graph.get_prs_reachable(
+                "main", t + timedelta(hours=5), undeployed_by=other_workflow_id
+            )
+        )
+        == 2
+    )
+    assert len(branch_graph.get_prs_reachable("main", t + timedelta(hours=5))) == 2
+
+
+def test_add_prs_moves_updated_prs_and_drops_unmerged_ones():
+    pr = _merged_pr("main", "feature", 1)
+    branch_graph = BranchFlowGraph()
+    branch_graph.add_prs([pr])
+
+    pr.base_branch = "release"
+    branch_graph.add_prs([pr])
+
+    assert len(branch_graph) == 1
+    assert branch_graph.get_prs_reachable("main", t + timedelta(hours=5)) == []
+    assert branch_graph.get_prs_reachable("release", t + timedelta(hours=5)) == [
+        str(pr.id)
+    ]
+
+    pr.state = PullRequestState.OPEN
+    branch_graph.add_prs([pr])
+
+    assert len(branch_graph) == 0
+
+
+class FakeCodeRepoService:
+    def __init__(self, prs, deployed_pr_ids=None):
+        self.prs = prs
+        self.deployed_pr_ids = deployed_pr_ids or []
+        self.calls = []
+
+    def get_repo_prs_updated_after(self, repo_id, updated_after=None):
+        self.calls.append((repo_id, updated_after))
+        return self.prs
+
+    def get_repo_deployed_pr_ids_created_after(self, repo_id, created_after=None):
+        return self.deployed_pr_ids
+
+
+def test_graph_store_loads_a_repo_once_and_then_catches_up():
+    repo_id = uuid4_str()
+    first_pr = _merged_pr("main", "feature-1", 1)
+    code_repo_service = FakeCodeRepoService([first_pr])
+    store = BranchFlowGraphStore(code_repo_service, refresh_interval=timedelta(0))
+
+    branch_graph = store.get_graph(repo_id)
+    second_pr = _merged_pr("main", "feature-2", 2)
+    code_repo_service.prs = [second_pr]
+
+    assert store.get_graph(repo_id) is branch_graph
+    assert len(branch_graph) == 2
+    assert code_repo_service.calls[0] == (repo_id, None)
+    assert code_repo_service.calls[1][1] is not None
+
+    store.invalidate(repo_id)
+
+    assert store.get_graph(repo_id) is not branch_graph
+    assert code_repo_service.calls[2] == (repo_id, None)
+
+
+def test_graph_store_loads_the_prs_each_workflow_deployed():
+    repo_id, workflow_id = uuid4_str(), uuid4_str()
+    pr = _merged_pr("main", "feature-1", 1)
+    store = BranchFlowGraphStore(
+        FakeCodeRepoService([pr], deployed_pr_ids=[(workflow_id, str(pr.id))])
+    )
+
+    branch_graph = store.get_graph(repo_id)
+
+    assert branch_graph.is_deployed(pr.id, workflow_id)
+    assert not branch_graph.is_deployed(pr.id, uuid4_str())
+
+
+def test_graph_store_refreshes_at_most_once_per_interval():
+    repo_id = uuid4_str()
+    code_repo_service = FakeCodeRepoService([_merged_pr("main", "feature-1", 1)])
+    store = BranchFlowGraphStore(code_repo_service, refresh_interval=timedelta(hours=1))
+
+    branch_graph = store.get_graph(repo_id)
+    code_repo_service.prs = [_merged_pr("main", "feature-2", 2)]
+
+    assert store.get_graph(repo_id) is branch_graph
+    assert len(branch_graph) == 1
+    assert len(code_repo_service.calls) == 1
+
+    assert store.get_graph(repo_id, force_refresh=True) is branch_graph
+    assert len(branch_graph) == 2
+    assert len(code_repo_service.calls) == 2
+
+
+def test_graph_store_keeps_only_the_most_recently_used_repos():
+    first_repo_id, second_repo_id, third_repo_id = (
+        uuid4_str(),
+        uuid4_str(),
+        uuid4_str(),
+    )
+    code_repo_service = FakeCodeRepoService([_merged_pr("main", "feature-1", 1)])
+    store = BranchFlowGraphStore(
+        code_repo_service, max_repos=2, refresh_interval=timedelta(hours=1)
+    )
+
+    first_graph = store.get_graph(first_repo_id)
+    second_graph = store.get_graph(second_repo_id)
+    store.get_graph(first_repo_id)
+    store.get_graph(third_repo_id)
+
+    assert store.get_graph(first_repo_id) is first_graph
+    assert store.get_graph(second_repo_id) is not second_graph
+    assert [repo_id for repo_id, _ in code_repo_service.calls] == [
+        first_repo_id,
+        second_repo_id,
+        third_repo_id,
+        second_repo_id,
+    ]
+
+
+def test_graph_store_keeps_the_merged_prs_of_a_process_under_its_limit():
+    first_repo_id, second_repo_id, large_repo_id = (
+        uuid4_str(),
+        uuid4_str(),
+        uuid4_str(),
+    )
+    code_repo_service = FakeCodeRepoService(
+        [_merged_pr("main", "feature-1", 1), _merged_pr("main", "feature-2", 2)]
+    )
+    store = BranchFlowGraphStore(
+        code_repo_service, max_prs=3, refresh_interval=timedelta(hours=1)
+    )
+
+    first_graph = store.get_graph(first_repo_id)
+    second_graph = store.get_graph(second_repo_id)
+
+    assert store.get_graph(second_repo_id) is second_graph
+    assert store.get_graph(first_repo_id) is not first_graph
+
+    code_repo_service.prs = [
+        _merged_pr("main", f"feature-{day}", day) for day in range(1, 5)
+    ]
+    large_graph = store.get_graph(large_repo_id)
+
+    assert len(large_graph) == 4
+    assert store.get_graph(large_repo_id) is not large_graph
+    assert store._get_pr_count() == 0
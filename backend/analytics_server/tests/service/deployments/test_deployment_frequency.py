@@ -16,7 +16,7 @@ def test_deployment_frequency_for_no_deployments():
     from_time = first_week_2024 + timedelta(days=1)
     to_time = third_week_2024 + timedelta(days=2)
 
-    deployment_analytics_service = DeploymentAnalyticsService(None, None)
+    deployment_analytics_service = DeploymentAnalyticsService(None, None, None)
 
     assert (
         deployment_analytics_service._get_deployment_frequency_metrics(
@@ -39,7 +39,7 @@ def test_deployment_frequency_for_deployments_across_days():
         conducted_at=to_time + timedelta(days=20)
     )
 
-    deployment_analytics_service = DeploymentAnalyticsService(None, None)
+    deployment_analytics_service = DeploymentAnalyticsService(None, None, None)
 
     assert deployment_analytics_service._get_deployment_frequency_metrics(
         [deployment_1, deployment_2, deployment_3, deployment_outside_interval],
@@ -63,7 +63,7 @@ def test_deployment_frequency_for_deployments_across_weeks():
     deployment_5 = get_deployment(conducted_at=fourth_week_2024 - timedelta(hours=6))
     deployment_6 = get_deployment(conducted_at=fourth_week_2024 - timedelta(minutes=30))
 
-    deployment_analytics_service = DeploymentAnalyticsService(None, None)
+    deployment_analytics_service = DeploymentAnalyticsService(None, None, None)
 
     assert deployment_analytics_service._get_deployment_frequency_metrics(
         [
@@ -111,7 +111,7 @@ def test_deployment_frequency_for_deployments_across_months():
     deployment_12 = get_deployment(conducted_at=to_time - timedelta(days=1))
     deployment_13 = get_deployment(conducted_at=to_time - timedelta(days=1))
 
-    deployment_analytics_service = DeploymentAnalyticsService(None, None)
+    deployment_analytics_service = DeploymentAnalyticsService(None, None, None)
 
     assert deployment_analytics_service._get_deployment_frequency_metrics(
         [
@@ -138,7 +138,7 @@ def test_weekly_deployment_frequency_trends_for_no_deployments():
     from_time = first_week_2024 + timedelta(days=1)
     to_time = third_week_2024 + timedelta(days=2)
 
-    deployment_analytics_service = DeploymentAnalyticsService(None, None)
+    deployment_analytics_service = DeploymentAnalyticsService(None, None, None)
 
     assert deployment_analytics_service._get_weekly_deployment_frequency_trends(
         [], Interval(from_time, to_time)
@@ -161,7 +161,7 @@ def test_weekly_deployment_frequency_trends_for_deployments():
     deployment_5 = get_deployment(conducted_at=fourth_week_2024 - timedelta(hours=6))
     deployment_6 = get_deployment(conducted_at=fourth_week_2024 - timedelta(minutes=30))
 
-    deployment_analytics_service = DeploymentAnalyticsService(None, None)
+    deployment_analytics_service = DeploymentAnalyticsService(None, None, None)
 
     assert deployment_analytics_service._get_weekly_deployment_frequency_trends(
         [
@@ -179,3 +179,22 @@ def test_weekly_deployment_frequency_trends_for_deployments():
         third_week_2024: 4,
         fourth_week_2024: 0,
     }
+
+
+def test_deployment_frequency_from_day_counts():
+
+    from_time = first_week_2024
+    to_time = third_week_2024 - timedelta(microseconds=1)
+
+    deployment_analytics_service = DeploymentAnalyticsService(None, None, None)
+
+    assert (
+        deployment_analytics_service._get_deployment_frequency_metrics_from_day_counts(
+            {
+                first_week_2024 + timedelta(days=1): 4,
+                second_week_2024 + timedelta(days=3): 10,
+            },
+            Interval(from_time, to_time),
+        )
+        == get_deployment_frequency_metrics(14, 1, 7, 30)
+    )
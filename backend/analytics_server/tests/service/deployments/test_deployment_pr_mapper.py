@@ -1,7 +1,9 @@
 from datetime import timedelta
 
+from mhq.service.deployments.branch_graph import BranchFlowGraph
 from mhq.service.deployments.deployment_pr_mapper import DeploymentPRMapperService
 from mhq.store.models.code import PullRequestState
+from mhq.utils.string import uuid4_str
 from mhq.utils.time import time_now
 from tests.factories.models.code import get_pull_request, get_repo_workflow_run
 
@@ -181,3 +183,127 @@ def test_deployment_pr_mapper_ignores_sub_prs_merged_post_main_pr_merge():
     )
 
     assert sorted(prs) == sorted([first_feature_pr, pr_to_release])
+
+
+def test_get_prs_deployed_by_deployments_assigns_each_pr_to_its_first_deployment():
+    t = time_now()
+    first_pr = get_pull_request(
+        state=PullRequestState.MERGED,
+        head_branch="feature-1",
+        base_branch="main",
+        state_changed_at=t,
+    )
+    second_pr = get_pull_request(
+        state=PullRequestState.MERGED,
+        head_branch="feature-2",
+        base_branch="main",
+        state_changed_at=t + timedelta(days=2),
+    )
+    open_pr = get_pull_request(
+        state=PullRequestState.OPEN,
+        head_branch="feature-3",
+        base_branch="main",
+        state_changed_at=t,
+    )
+    workflow_id = uuid4_str()
+    first_deployment = get_repo_workflow_run(
+        repo_workflow_id=workflow_id,
+        head_branch="main",
+        conducted_at=t + timedelta(days=1),
+    )
+    second_deployment = get_repo_workflow_run(
+        repo_workflow_id=workflow_id,
+        head_branch="main",
+        conducted_at=t + timedelta(days=3),
+    )
+    third_deployment = get_repo_workflow_run(
+        repo_workflow_id=workflow_id,
+        head_branch="main",
+        conducted_at=t + timedelta(days=4),
+    )
+
+    branch_graph = BranchFlowGraph()
+    branch_graph.add_prs([second_pr, open_pr, first_pr])
+
+    assert DeploymentPRMapperService().get_prs_deployed_by_deployments(
+        branch_graph,
+        [third_deployment, first_deployment, second_deployment],
+    ) == [
+        (first_deployment, [str(first_pr.id)]),
+        (second_deployment, [str(second_pr.id)]),
+        (third_deployment, []),
+    ]
+    assert branch_graph.is_deployed(first_pr.id, workflow_id)
+    assert branch_graph.is_deployed(second_pr.id, workflow_id)
+
+
+def test_get_prs_deployed_by_deployments_maps_prs_per_workflow():
+    t = time_now()
+    pr = get_pull_request(
+        state=PullRequestState.MERGED,
+        head_branch="feature-1",
+        base_branch="main",
+        state_changed_at=t,
+    )
+    staging_deployment = get_repo_workflow_run(
+        repo_workflow_id=uuid4_str(),
+        head_branch="main",
+        conducted_at=t + timedelta(days=1),
+    )
+    prod_deployment = get_repo_workflow_run(
+        repo_workflow_id=uuid4_str(),
+        head_branch="main",
+        conducted_at=t + timedelta(days=2),
+    )
+    next_prod_deployment = get_repo_workflow_run(
+        repo_workflow_id=prod_deployment.repo_workflow_id,
+        head_branch="main",
+        conducted_at=t + timedelta(days=3),
+    )
+
+    branch_graph = BranchFlowGraph()
+    branch_graph.add_prs([pr])
+
+    assert DeploymentPRMapperService().get_prs_deployed_by_deployments(
+        branch_graph, [next_prod_deployment, prod_deployment, staging_deployment]
+    ) == [
+        (staging_deployment, [str(pr.id)]),
+        (prod_deployment, [str(pr.id)]),
+        (next_prod_deployment, []),
+    ]
+
+
+def test_get_prs_deployed_by_deployments_walks_prs_merged_after_the_previous_batch():
+    t = time_now()
+    old_pr = get_pull_request(
+        state=PullRequestState.MERGED,
+        head_branch="feature-1",
+        base_branch="main",
+        state_changed_at=t,
+    )
+    new_pr = get_pull_request(
+        state=PullRequestState.MERGED,
+        head_branch="feature-2",
+        base_branch="main",
+        state_changed_at=t + timedelta(days=2),
+    )
+    workflow_id = uuid4_str()
+    deployment = get_repo_workflow_run(
+        repo_workflow_id=workflow_id,
+        head_branch="main",
+        conducted_at=t + timedelta(days=3),
+    )
+    last_conducted_at_by_workflow = {(workflow_id, "main"): t + timedelta(days=1)}
+
+    branch_graph = BranchFlowGraph()
+    branch_graph.add_prs([old_pr, new_pr])
+
+    assert DeploymentPRMapperService().get_prs_deployed_by_deployments(
+        branch_graph, [deployment], last_conducted_at_by_workflow
+    ) == [(deployment, [str(new_pr.id)])]
+    assert last_conducted_at_by_workflow == {
+        (workflow_id, "main"): deployment.conducted_at
+    }
+    assert DeploymentPRMapperService().get_all_prs_deployed(
+        [old_pr, new_pr], deployment, merged_after=t + timedelta(days=1)
+    ) == [new_pr]
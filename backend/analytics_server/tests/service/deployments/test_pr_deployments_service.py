@@ -0,0 +1,75 @@
+from datetime import datetime, timedelta
+
+import pytz
+
+from mhq.service.deployments.pr_deployments_service import PRDeploymentsService
+from mhq.store.models.code import DeploymentDailyRollup, PRFilter
+from mhq.utils.string import uuid4_str
+from mhq.utils.time import Interval
+
+first_day_2024 = datetime(2024, 1, 1, 0, 0, 0, tzinfo=pytz.UTC)
+second_day_2024 = datetime(2024, 1, 2, 0, 0, 0, tzinfo=pytz.UTC)
+third_day_2024 = datetime(2024, 1, 3, 0, 0, 0, tzinfo=pytz.UTC)
+
+
+def _get_rollup(day: datetime, deployment_count: int) -> DeploymentDailyRollup:
+    return DeploymentDailyRollup(day=day, deployment_count=deployment_count)
+
+
+class FakeDeploymentRollupsCodeRepoService:
+    def __init__(self, rollups, prs_rollups, excluded_prs_rollups=None):
+        self.rollups = rollups
+        self.prs_rollups = prs_rollups
+        self.excluded_prs_rollups = excluded_prs_rollups or []
+        self.rollup_intervals = []
+        self.prs_intervals = []
+
+    def get_deployment_rollups(self, repo_ids, interval, pr_filter=None):
+        self.rollup_intervals.append(interval)
+        return self.rollups
+
+    def get_deployment_rollups_for_prs_merged_in_interval(
+        self, repo_ids, interval, pr_filter=None, pr_ids=None
+    ):
+        if pr_ids is not None:
+            return self.excluded_prs_rollups
+        self.prs_intervals.append(interval)
+        return self.prs_rollups
+
+
+def test_day_counts_read_whole_days_from_rollups_and_count_partial_days():
+    from_time = first_day_2024 + timedelta(hours=12)
+    to_time = third_day_2024 + timedelta(hours=6)
+    code_repo_service = FakeDeploymentRollupsCodeRepoService(
+        [_get_rollup(second_day_2024, 3), _get_rollup(second_day_2024, 2)],
+        [_get_rollup(first_day_2024, 1)],
+        [_get_rollup(second_day_2024, 1)],
+    )
+    pr_deployments_service = PRDeploymentsService(code_repo_service, None)
+
+    assert pr_deployments_service.get_repos_successful_deployment_day_counts(
+        [uuid4_str()],
+        Interval(from_time, to_time),
+        PRFilter(excluded_pr_ids=[uuid4_str()]),
+    ) == {first_day_2024: 2, second_day_2024: 4}
+    assert code_repo_service.rollup_intervals == [
+        Interval(second_day_2024, third_day_2024 - timedelta(microseconds=1))
+    ]
+    assert code_repo_service.prs_intervals == [
+        Interval(from_time, second_day_2024 - timedelta(microseconds=1)),
+        Interval(third_day_2024, to_time),
+    ]
+
+
+def test_day_counts_for_author_filter_are_counted_from_prs():
+    interval = Interval(first_day_2024, third_day_2024)
+    code_repo_service = FakeDeploymentRollupsCodeRepoService(
+        [_get_rollup(first_day_2024, 5)], [_get_rollup(second_day_2024, 1)]
+    )
+    pr_deployments_service = PRDeploymentsService(code_repo_service, None)
+
+    assert pr_deployments_service.get_repos_successful_deployment_day_counts(
+        [uuid4_str()], interval, PRFilter(authors=["author"])
+    ) == {second_day_2024: 1}
+    assert code_repo_service.rollup_intervals == []
+    assert code_repo_service.prs_intervals == [interval]
@@ -0,0 +1,121 @@
+from datetime import timedelta
+
+from mhq.service.deployments.models.models import DeploymentStatus
+from mhq.service.deployments.workflow_deployments_service import (
+    WorkflowDeploymentsService,
+)
+from mhq.store.models.code import BookmarkMergeToDeployBroker
+from mhq.utils.string import uuid4_str
+from mhq.utils.time import time_now
+from tests.factories.models.code import get_deployment, get_pull_request
+
+
+class FakeCodeRepoService:
+    def __init__(self, bookmarks, run_id_pr_pairs):
+        self.bookmarks = bookmarks
+        self.run_id_pr_pairs = run_id_pr_pairs
+        self.queried_run_ids = []
+
+    def get_merge_to_deploy_broker_bookmarks(self, repo_ids):
+        return [bookmark for bookmark in self.bookmarks if bookmark.repo_id in repo_ids]
+
+    def get_prs_deployed_by_workflow_runs(self, repo_workflow_run_ids, pr_filter=None):
+        self.queried_run_ids.append(repo_workflow_run_ids)
+        return [
+            (run_id, pr)
+            for run_id, pr in self.run_id_pr_pairs
+            if run_id in repo_workflow_run_ids
+        ]
+
+
+def test_get_mapped_prs_for_deployments_uses_persisted_mappings_up_to_bookmark():
+    t = time_now()
+    repo_id = uuid4_str()
+    unprocessed_repo_id = uuid4_str()
+    first_deployment = get_deployment(repo_id=repo_id, conducted_at=t)
+    second_deployment = get_deployment(
+        repo_id=repo_id, conducted_at=t + timedelta(hours=1)
+    )
+    failed_deployment = get_deployment(
+        repo_id=repo_id,
+        conducted_at=t + timedelta(hours=1),
+        status=DeploymentStatus.FAILURE,
+    )
+    deployment_after_bookmark = get_deployment(
+        repo_id=repo_id, conducted_at=t + timedelta(hours=2)
+    )
+    unprocessed_repo_deployment = get_deployment(
+        repo_id=unprocessed_repo_id, conducted_at=t
+    )
+    first_pr = get_pull_request(id=uuid4_str())
+    second_pr = get_pull_request(id=uuid4_str())
+    code_repo_service = FakeCodeRepoService(
+        [
+            BookmarkMergeToDeployBroker(
+                repo_id=repo_id, bookmark=(t + timedelta(hours=1)).isoformat()
+            )
+        ],
+        [
+            (first_deployment.entity_id, first_pr),
+            (first_deployment.entity_id, second_pr),
+        ],
+    )
+    service = WorkflowDeploymentsService(None, code_repo_service, None, None)
+
+    deployments_pr_map, unmapped_deployments = service.get_mapped_prs_for_deployments(
+        [
+            first_deployment,
+            second_deployment,
+            failed_deployment,
+            deployment_after_bookmark,
+            unprocessed_repo_deployment,
+        ]
+    )
+
+    assert deployments_pr_map == {
+        first_deployment: [first_pr, second_pr],
+        second_deployment: [],
+    }
+    assert unmapped_deployments == [
+        failed_deployment,
+        deployment_after_bookmark,
+        unprocessed_repo_deployment,
+    ]
+    assert code_repo_service.queried_run_ids == [
+        [first_deployment.entity_id, second_deployment.entity_id]
+    ]
+
+
+def test_get_mapped_prs_for_deployments_skips_query_when_nothing_is_processed():
+    deployment = get_deployment()
+    code_repo_service = FakeCodeRepoService([], [])
+    service = WorkflowDeploymentsService(None, code_repo_service, None, None)
+
+    assert service.get_mapped_prs_for_deployments([deployment]) == ({}, [deployment])
+    assert code_repo_service.queried_run_ids == []
+
+
+def test_get_mapped_prs_for_deployments_maps_runs_processed_before_persisting_live():
+    t = time_now()
+    repo_id = uuid4_str()
+    old_deployment = get_deployment(repo_id=repo_id, conducted_at=t)
+    new_deployment = get_deployment(
+        repo_id=repo_id, conducted_at=t + timedelta(hours=2)
+    )
+    pr = get_pull_request(id=uuid4_str())
+    code_repo_service = FakeCodeRepoService(
+        [
+            BookmarkMergeToDeployBroker(
+                repo_id=repo_id,
+                bookmark=(t + timedelta(hours=2)).isoformat(),
+                deployment_prs_mapped_from=t.isoformat(),
+            )
+        ],
+        [(new_deployment.entity_id, pr)],
+    )
+    service = WorkflowDeploymentsService(None, code_repo_service, None, None)
+
+    assert service.get_mapped_prs_for_deployments([old_deployment, new_deployment]) == (
+        {new_deployment: [pr]},
+        [old_deployment],
+    )
@@ -0,0 +1,363 @@
+import random
+from collections import defaultdict
+from datetime import timedelta
+
+from mhq.service.deployments import BranchFlowGraphStore, DeploymentPRMapperService
+from mhq.service.merge_to_deploy_broker.mtd_handler import MergeToDeployCacheHandler
+from mhq.store.models.code import OrgRepo, PullRequestState, RepoWorkflowRunsStatus
+from mhq.utils.string import uuid4_str
+from mhq.utils.time import get_given_weeks_monday, time_now
+from tests.factories.models.code import get_pull_request, get_repo_workflow_run
+
+T = time_now() - timedelta(days=30)
+BRANCHES = ["main", "release", "develop", "feature-a", "feature-b", "hotfix"]
+
+
+class FakeCodeRepoService:
+    def __init__(self, org_repo, prs):
+        self.org_repo = org_repo
+        self.prs = {str(pr.id): pr for pr in prs}
+        self.pr_queries = 0
+        self.updates = 0
+        self.graph_loads = []
+        self.deployment_pull_requests = {}
+        self.refreshed_weeks = []
+
+    def get_repo_by_id(self, repo_id):
+        return self.org_repo
+
+    def get_prs_in_repo_merged_before_given_date_not_deployed_by_workflow(
+        self, repo_id, repo_workflow_id, to_time
+    ):
+        self.pr_queries += 1
+        return [
+            pr
+            for pr in self.prs.values()
+            if pr.state == PullRequestState.MERGED
+            and pr.state_changed_at <= to_time
+            and (str(pr.id), repo_workflow_id) not in self.deployment_pull_requests
+        ]
+
+    def get_repo_prs_updated_after(self, repo_id, updated_after=None):
+        self.graph_loads.append(updated_after)
+        return [pr for pr in self.prs.values() if pr.state == PullRequestState.MERGED]
+
+    def get_repo_deployed_pr_ids_created_after(self, repo_id, created_after=None):
+        return [
+            (repo_workflow_id, pr_id)
+            for pr_id, repo_workflow_id in self.deployment_pull_requests
+        ]
+
+    def get_prs_by_ids(self, pr_ids):
+        self.pr_queries += 1
+        return [self.prs[pr_id] for pr_id in pr_ids]
+
+    def save_deployment_pull_requests(self, deployment_pull_requests):
+        for deployment_pull_request in deployment_pull_requests:
+            self.deployment_pull_requests[
+                (
+                    str(deployment_pull_request.pull_request_id),
+                    str(deployment_pull_request.repo_workflow_id),
+                )
+            ] = str(deployment_pull_request.repo_workflow_run_id)
+
+    def update_prs(self, prs):
+        self.updates += 1
+        for pr in prs:
+            self.prs[str(pr.id)] = pr
+
+    def refresh_repo_lead_time_rollups(self, repo_id, week_starts):
+        self.refreshed_weeks.append(week_starts)
+
+
+class FakeWorkflowRepoService:
+    def __init__(self, runs):
+        self.runs = sorted(runs, key=lambda run: run.conducted_at)
+
+    def get_repo_workflows_by_repo_id(self, repo_id):
+        return ["workflow"]
+
+    def get_repo_workflow_runs_conducted_after_time(
+        self, repo_id, from_time=None, limit_value=500
+    ):
+        runs = [
+            run
+            for run in self.runs
+            if run.status == RepoWorkflowRunsStatus.SUCCESS
+            and (not from_time or run.conducted_at >= from_time)
+        ]
+        return runs[:limit_value]
+
+    def get_previous_successful_workflow_run(self, workflow_run):
+        previous_runs = [
+            run
+            for run in self.runs
+            if run.repo_workflow_id == workflow_run.repo_workflow_id
+            and run.head_branch == workflow_run.head_branch
+            and run.status == RepoWorkflowRunsStatus.SUCCESS
+            and run.conducted_at < workflow_run.conducted_at
+        ]
+        return previous_runs[-1] if previous_runs else None
+
+
+class FakeBookmarkService:
+    def __init__(self):
+        self.bookmark = None
+
+    def get_bookmark(self, repo_id, bookmark_type, provider):
+        return self.bookmark
+
+    def update_bookmark(self, repo_id, bookmark_type, provider, bookmark):
+        self.bookmark = bookmark
+
+
+def _get_random_history(
+    seed: int, pr_count: int, run_count: int, workflow_count: int = 1
+):
+    rng = random.Random(seed)
+    workflow_ids = [uuid4_str() for _ in range(workflow_count)]
+    prs = []
+    for _ in range(pr_count):
+        base_branch, head_branch = rng.sample(BRANCHES, 2)
+        prs.append(
+            get_pull_request(
+                id=uuid4_str(),
+                state=rng.choice(
+                    [PullRequestState.MERGED] * 4 + [PullRequestState.OPEN]
+                ),
+                base_branch=base_branch,
+                head_branch=head_branch,
+                state_changed_at=T + timedelta(hours=rng.randint(0, 200)),
+            )
+        )
+    runs = [
+        get_repo_workflow_run(
+            id=uuid4_str(),
+            repo_workflow_id=rng.choice(workflow_ids),
+            head_branch=rng.choice(["main", "release"]),
+            conducted_at=T + timedelta(hours=rng.randint(0, 240)),
+        )
+        for _ in range(run_count)
+    ]
+    return prs, runs
+
+
+def _run_handler(prs, runs, sweep: bool, repeat: int = 1):
+    org_repo = OrgRepo(id=uuid4_str(), provider="github")
+    prs = [
+        get_pull_request(
+            id=pr.id,
+            state=pr.state,
+            base_branch=pr.base_branch,
+            head_branch=pr.head_branch,
+            state_changed_at=pr.state_changed_at,
+        )
+        for pr in prs
+    ]
+    code_repo_service = FakeCodeRepoService(org_repo, prs)
+    bookmark_service = FakeBookmarkService()
+    handler = MergeToDeployCacheHandler(
+        "org",
+        code_repo_service,
+        FakeWorkflowRepoService(runs),
+        DeploymentPRMapperService(),
+        bookmark_service,
+        BranchFlowGraphStore(code_repo_service),
+        sweep=sweep,
+    )
+    for _ in range(repeat):
+        handler.process_repo_mtd(str(org_repo.id))
+    merge_to_deploy = {
+        pr_id: pr.merge_to_deploy for pr_id, pr in code_repo_service.prs.items()
+    }
+    return merge_to_deploy, bookmark_service.bookmark, code_repo_service
+
+
+def test_sweep_matches_per_run_processing():
+    for seed in range(30):
+        prs, runs = _get_random_history(
+            seed, pr_count=60, run_count=15, workflow_count=1 + seed % 3
+        )
+
+        per_run_result, per_run_bookmark, per_run_service = _run_handler(
+            prs, runs, sweep=False
+        )
+        sweep_result, sweep_bookmark, sweep_service = _run_handler(
+            prs, runs, sweep=True
+        )
+
+        assert sweep_result == per_run_result, f"seed {seed}"
+        assert sweep_bookmark == per_run_bookmark
+        assert (
+            sweep_service.deployment_pull_requests
+            == per_run_service.deployment_pull_requests
+        )
+
+
+def test_deployed_prs_are_persisted_with_each_workflow_deployment():
+    prs, runs = _get_random_history(
+        seed=11, pr_count=60, run_count=15, workflow_count=2
+    )
+    run_by_id = {str(run.id): run for run in runs}
+
+    merge_to_deploy, _, code_repo_service = _run_handler(prs, runs, sweep=True)
+
+    assert code_repo_service.deployment_pull_requests
+    assert {pr_id for pr_id, _ in code_repo_service.deployment_pull_requests} == {
+        pr_id for pr_id, value in merge_to_deploy.items() if value is not None
+    }
+    pr_id_to_run_ids_map = defaultdict(list)
+    for (
+        pr_id,
+        repo_workflow_id,
+    ), run_id in code_repo_service.deployment_pull_requests.items():
+        assert str(run_by_id[run_id].repo_workflow_id) == repo_workflow_id
+        pr_id_to_run_ids_map[pr_id].append(run_id)
+    for pr_id, run_ids in pr_id_to_run_ids_map.items():
+        pr = code_repo_service.prs[pr_id]
+        first_run = min(
+            (run_by_id[run_id] for run_id in run_ids), key=lambda run: run.conducted_at
+        )
+        assert pr.merge_to_deploy == int(
+            (first_run.conducted_at - pr.state_changed_at).total_seconds()
+        )
+
+
+def test_every_workflow_deploying_a_branch_gets_its_prs():
+    staging_workflow_id, prod_workflow_id = uuid4_str(), uuid4_str()
+    pr = get_pull_request(
+        id=uuid4_str(),
+        state=PullRequestState.MERGED,
+        base_branch="main",
+        head_branch="feature",
+        state_changed_at=T,
+    )
+    staging_run = get_repo_workflow_run(
+        id=uuid4_str(),
+        repo_workflow_id=staging_workflow_id,
+        head_branch="main",
+        conducted_at=T + timedelta(hours=1),
+    )
+    prod_run = get_repo_workflow_run(
+        id=uuid4_str(),
+        repo_workflow_id=prod_workflow_id,
+        head_branch="main",
+        conducted_at=T + timedelta(hours=3),
+    )
+
+    for sweep in (True, False):
+        merge_to_deploy, _, code_repo_service = _run_handler(
+            [pr], [prod_run, staging_run], sweep=sweep
+        )
+
+        assert code_repo_service.deployment_pull_requests == {
+            (str(pr.id), staging_workflow_id): str(staging_run.id),
+            (str(pr.id), prod_workflow_id): str(prod_run.id),
+        }
+        assert merge_to_deploy[str(pr.id)] == 3600
+
+
+def test_sweep_queries_and_writes_once_per_batch_of_runs():
+    prs, runs = _get_random_history(seed=7, pr_count=100, run_count=40)
+
+    per_run_result, _, per_run_service = _run_handler(prs, runs, sweep=False)
+    sweep_result, _, sweep_service = _run_handler(prs, runs, sweep=True)
+
+    assert sweep_result == per_run_result
+    assert any(merge_to_deploy is not None for merge_to_deploy in sweep_result.values())
+    assert per_run_service.pr_queries == 40
+    assert sweep_service.graph_loads == [None]
+    assert sweep_service.pr_queries == 1
+    assert sweep_service.updates == 1
+
+
+def test_lead_time_rollups_are_refreshed_once_for_the_weeks_of_updated_prs():
+    prs, runs = _get_random_history(seed=7, pr_count=100, run_count=40)
+
+    for sweep in (True, False):
+        merge_to_deploy, _, code_repo_service = _run_handler(prs, runs, sweep=sweep)
+
+        assert code_repo_service.refreshed_weeks == [
+            {
+                get_given_weeks_monday(pr.state_changed_at)
+                for pr_id, pr in code_repo_service.prs.items()
+                if merge_to_deploy[pr_id] is not None
+            }
+        ]
+        assert code_repo_service.refreshed_weeks[0]
+
+
+def test_sweep_catches_up_the_branch_graph_instead_of_reloading_it():
+    prs, runs = _get_random_history(seed=5, pr_count=50, run_count=20)
+
+    single_result, _, _ = _run_handler(prs, runs, sweep=True)
+    repeated_result, _, code_repo_service = _run_handler(
+        prs, runs, sweep=True, repeat=3
+    )
+
+    assert repeated_result == single_result
+    assert len(code_repo_service.graph_loads) == 3
+    assert code_repo_service.graph_loads[0] is None
+    assert all(updated_after for updated_after in code_repo_service.graph_loads[1:])
+
+
+def test_sweep_processes_every_batch_in_one_call(monkeypatch):
+    monkeypatch.setattr(
+        "mhq.service.merge_to_deploy_broker.mtd_handler.DEPLOYMENTS_TO_PROCESS", 10
+    )
+    prs, runs = _get_random_history(seed=3, pr_count=80, run_count=35)
+
+    sweep_result, sweep_bookmark, sweep_service = _run_handler(prs, runs, sweep=True)
+
+    assert sweep_bookmark == max(run.conducted_at for run in runs)
+    assert len(sweep_service.graph_loads) == 1
+    assert sweep_service.pr_queries <= 4
+    pr_by_id = {str(pr.id): pr for pr in prs}
+    for pr_id, merge_to_deploy in sweep_result.items():
+        if merge_to_deploy is not None:
+            assert pr_by_id[pr_id].state == PullRequestState.MERGED
+            assert merge_to_deploy >= 0
+
+
+def test_sweep_from_a_kept_bookmark_starts_at_the_previous_deployment():
+    org_repo = OrgRepo(id=uuid4_str(), provider="github")
+    workflow_id = uuid4_str()
+    shipped_pr, new_pr = [
+        get_pull_request(
+            id=uuid4_str(),
+            state=PullRequestState.MERGED,
+            base_branch="main",
+            head_branch=f"feature-{hours}",
+            state_changed_at=T + timedelta(hours=hours),
+        )
+        for hours in (0, 2)
+    ]
+    processed_run, new_run = [
+        get_repo_workflow_run(
+            id=uuid4_str(),
+            repo_workflow_id=workflow_id,
+            head_branch="main",
+            conducted_at=T + timedelta(hours=hours),
+        )
+        for hours in (1, 3)
+    ]
+    code_repo_service = FakeCodeRepoService(org_repo, [shipped_pr, new_pr])
+    bookmark_service = FakeBookmarkService()
+
+    for sweep in (True, False):
+        # Processed before deployment prs were persisted, so nothing marks shipped_pr
+        bookmark_service.bookmark = processed_run.conducted_at + timedelta(minutes=1)
+        code_repo_service.deployment_pull_requests = {}
+        MergeToDeployCacheHandler(
+            "org",
+            code_repo_service,
+            FakeWorkflowRepoService([processed_run, new_run]),
+            DeploymentPRMapperService(),
+            bookmark_service,
+            BranchFlowGraphStore(code_repo_service),
+            sweep=sweep,
+        ).process_repo_mtd(str(org_repo.id))
+
+        assert code_repo_service.deployment_pull_requests == {
+            (str(new_pr.id), workflow_id): str(new_run.id)
+        }
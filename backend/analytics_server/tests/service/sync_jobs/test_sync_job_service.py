@@ -0,0 +1,539 @@
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from mhq.service.sync_jobs import (
+    InMemorySyncJobQueue,
+    SyncJob,
+    SyncJobService,
+    SyncJobStatus,
+    SyncStage,
+    SyncStageProgress,
+    SyncWorker,
+)
+import pytest
+
+from mhq.service.sync_jobs import stages
+from mhq.utils.time import time_now
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = time_now()
+
+    def __call__(self):
+        self.now += timedelta(seconds=1)
+        return self.now
+
+
+class FakeMonotonicClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeLocks:
+    def __init__(self):
+        self.keys = []
+
+    @contextmanager
+    def __call__(self, key):
+        self.keys.append(key)
+        yield
+
+
+class FakeStage:
+    def __init__(
+        self, name, repo_ids, depends_on=(), failing_repo_ids=None, plan_error=None
+    ):
+        self.name = name
+        self.repo_ids = repo_ids
+        self.depends_on = depends_on
+        self.failing_repo_ids = failing_repo_ids or []
+        self.plan_error = plan_error
+        self.runs = []
+
+    def plan(self, org_id):
+        if self.plan_error:
+            raise self.plan_error
+        return [{"repo_id": repo_id} for repo_id in self.repo_ids]
+
+    def run(self, org_id, params):
+        self.runs.append(params["repo_id"])
+        if params["repo_id"] in self.failing_repo_ids:
+            raise Exception(f"boom {params['repo_id']}")
+
+    def as_sync_stage(self):
+        return SyncStage(
+            self.name,
+            self.plan,
+            self.run,
+            lambda params: "{org_repo}:" + f"{params['repo_id']}:{self.name}",
+            depends_on=self.depends_on,
+            # Repos starting with "_" stand in for tasks that are not tied to a repo
+            get_dependency_keys=lambda params: (
+                []
+                if params["repo_id"].startswith("_")
+                else params["repo_id"].split("+")
+            ),
+        )
+
+
+def _get_service(job_queue, stages, locks=None):
+    return SyncJobService(
+        job_queue,
+        locks or FakeLocks(),
+        stages=[stage.as_sync_stage() for stage in stages],
+        clock=FakeClock(),
+    )
+
+
+def _pop_all(job_queue):
+    tasks = []
+    while True:
+        task = job_queue.pop(timeout=0)
+        if not task:
+            return tasks
+        tasks.append(task)
+
+
+def _drain(worker):
+    while worker.run_once(timeout=0):
+        pass
+
+
+def test_enqueue_org_sync_queues_planning_tasks_of_stages_without_upstream():
+    job_queue = InMemorySyncJobQueue()
+    service = _get_service(
+        job_queue,
+        [
+            FakeStage("code", ["r1"]),
+            FakeStage("workflows", ["r1"]),
+            FakeStage("mtd", ["r1"], depends_on=("code", "workflows")),
+        ],
+    )
+
+    job = service.enqueue_org_sync("org")
+
+    assert job.status == SyncJobStatus.RUNNING
+    assert [stage.name for stage in job.stages] == ["code", "workflows", "mtd"]
+    assert job.get_stage("mtd").depends_on == ["code", "workflows"]
+    assert all(stage.status == SyncJobStatus.QUEUED for stage in job.stages)
+    tasks = _pop_all(job_queue)
+    assert [(task.stage, task.is_planning) for task in tasks] == [
+        ("code", True),
+        ("workflows", True),
+    ]
+
+
+def test_enqueue_org_sync_returns_active_job_instead_of_queueing_again():
+    job_queue = InMemorySyncJobQueue()
+    service = _get_service(job_queue, [FakeStage("code", ["r1"])])
+
+    first_job = service.enqueue_org_sync("org")
+    second_job = service.enqueue_org_sync("org")
+    other_org_job = service.enqueue_org_sync("other_org")
+
+    assert second_job.id == first_job.id
+    assert other_org_job.id != first_job.id
+    assert [task.job_id for task in _pop_all(job_queue)] == [
+        first_job.id,
+        other_org_job.id,
+    ]
+
+
+def test_repo_task_starts_once_the_same_repos_upstream_tasks_are_done():
+    job_queue = InMemorySyncJobQueue()
+    mtd_stage = FakeStage("mtd", ["r1", "r2"], depends_on=("code", "workflows"))
+    service = _get_service(
+        job_queue,
+        [FakeStage("code", ["r1", "r2"]), FakeStage("workflows", ["r1"]), mtd_stage],
+    )
+    service.enqueue_org_sync("org")
+    for planning_task in _pop_all(job_queue):
+        service.run_task(planning_task)
+    # mtd is planned once code and workflows are planned
+    tasks = _pop_all(job_queue)
+    assert tasks[-1].stage == "mtd" and tasks[-1].is_planning
+    service.run_task(tasks[-1])
+    tasks = {(task.stage, task.params["repo_id"]): task for task in tasks[:-1]}
+    assert set(tasks) == {("code", "r1"), ("code", "r2"), ("workflows", "r1")}
+    assert _pop_all(job_queue) == []
+
+    service.run_task(tasks[("code", "r1")])
+    assert _pop_all(job_queue) == []
+
+    service.run_task(tasks[("workflows", "r1")])
+    ready_tasks = _pop_all(job_queue)
+    assert [(task.stage, task.params) for task in ready_tasks] == [
+        ("mtd", {"repo_id": "r1"})
+    ]
+
+    # r1 is processed while code sync of r2 is still pending
+    service.run_task(ready_tasks[0])
+    assert mtd_stage.runs == ["r1"]
+
+    service.run_task(tasks[("code", "r2")])
+    assert [task.params for task in _pop_all(job_queue)] == [{"repo_id": "r2"}]
+
+
+def test_repo_tasks_wait_for_an_upstream_task_syncing_several_repos():
+    job_queue = InMemorySyncJobQueue()
+    mtd_stage = FakeStage("mtd", ["r1", "r2", "r3"], depends_on=("code",))
+    service = _get_service(job_queue, [FakeStage("code", ["r1+r2", "r3"]), mtd_stage])
+    service.enqueue_org_sync("org")
+    service.run_task(job_queue.pop(timeout=0))
+    pooled_code_task, code_task, mtd_planning_task = _pop_all(job_queue)
+
+    service.run_task(mtd_planning_task)
+    assert _pop_all(job_queue) == []
+
+    service.run_task(code_task)
+    assert [task.params for task in _pop_all(job_queue)] == [{"repo_id": "r3"}]
+
+    service.run_task(pooled_code_task)
+    assert [task.params for task in _pop_all(job_queue)] == [
+        {"repo_id": "r1"},
+        {"repo_id": "r2"},
+    ]
+
+
+def test_tasks_without_dependency_key_do_not_wait_for_upstream_tasks():
+    job_queue = InMemorySyncJobQueue()
+    service = _get_service(
+        job_queue,
+        [
+            FakeStage("code", ["r1"]),
+            FakeStage("incidents", ["_pagerduty", "r1"], depends_on=("code",)),
+        ],
+    )
+    service.enqueue_org_sync("org")
+    service.run_task(job_queue.pop(timeout=0))
+    code_task, incidents_planning_task = _pop_all(job_queue)
+
+    service.run_task(incidents_planning_task)
+
+    tasks = _pop_all(job_queue)
+    assert [(task.stage, task.params) for task in tasks] == [
+        ("incidents", {"repo_id": "_pagerduty"})
+    ]
+    service.run_task(code_task)
+    assert [task.params for task in _pop_all(job_queue)] == [{"repo_id": "r1"}]
+
+
+def test_task_keyed_all_tasks_waits_for_every_upstream_task():
+    job_queue = InMemorySyncJobQueue()
+    rollups_stage = FakeStage("rollups", ["*"], depends_on=("code", "incidents"))
+    service = _get_service(
+        job_queue,
+        [
+            FakeStage("code", ["r1", "r2"]),
+            FakeStage("incidents", ["_pagerduty"]),
+            rollups_stage,
+        ],
+    )
+    service.enqueue_org_sync("org")
+    for planning_task in _pop_all(job_queue):
+        service.run_task(planning_task)
+    tasks = _pop_all(job_queue)
+    service.run_task(tasks[-1])
+    upstream_tasks = tasks[:-1]
+    assert len(upstream_tasks) == 3
+
+    for upstream_task in upstream_tasks:
+        assert _pop_all(job_queue) == []
+        service.run_task(upstream_task)
+
+    ready_tasks = _pop_all(job_queue)
+    assert [(task.stage, task.params) for task in ready_tasks] == [
+        ("rollups", {"repo_id": "*"})
+    ]
+
+
+def test_job_runs_every_task_under_its_lock_and_records_timings():
+    job_queue = InMemorySyncJobQueue()
+    locks = FakeLocks()
+    code_stage = FakeStage("code", ["r1", "r2"])
+    mtd_stage = FakeStage("mtd", ["r2"], depends_on=("code",))
+    service = _get_service(job_queue, [code_stage, mtd_stage], locks)
+    job = service.enqueue_org_sync("org")
+
+    _drain(SyncWorker(job_queue, service))
+
+    assert code_stage.runs == ["r1", "r2"]
+    assert mtd_stage.runs == ["r2"]
+    assert sorted(locks.keys) == [
+        "{org_repo}:r1:code",
+        "{org_repo}:r2:code",
+        "{org_repo}:r2:mtd",
+    ]
+    job = service.get_job(job.id)
+    assert job.status == SyncJobStatus.COMPLETED
+    code_progress, mtd_progress = job.stages
+    assert code_progress.status == SyncJobStatus.COMPLETED
+    assert code_progress.completed_tasks == 2
+    assert code_progress.duration_seconds > 0
+    assert mtd_progress.finished_at > code_progress.finished_at
+    assert job.critical_path == ["code", "mtd"]
+    assert job.finished_at
+    assert service.enqueue_org_sync("org").id != job.id
+
+
+def test_failed_task_fails_its_stage_but_dependents_still_run():
+    job_queue = InMemorySyncJobQueue()
+    mtd_stage = FakeStage("mtd", ["r1", "r2"], depends_on=("code",))
+    service = _get_service(
+        job_queue, [FakeStage("code", ["r1", "r2"], failing_repo_ids=["r1"]), mtd_stage]
+    )
+    job = service.enqueue_org_sync("org")
+
+    _drain(SyncWorker(job_queue, service))
+
+    job = service.get_job(job.id)
+    code_progress, mtd_progress = job.stages
+    assert code_progress.status == SyncJobStatus.FAILED
+    assert code_progress.completed_tasks == 1
+    assert code_progress.failed_tasks == 1
+    assert code_progress.error == "boom r1"
+    assert mtd_progress.status == SyncJobStatus.COMPLETED
+    assert sorted(mtd_stage.runs) == ["r1", "r2"]
+    assert job.status == SyncJobStatus.FAILED
+
+
+def test_stage_without_tasks_or_failing_to_plan_does_not_block_the_job():
+    job_queue = InMemorySyncJobQueue()
+    code_stage = FakeStage("code", ["r1"], depends_on=("workflows", "incidents"))
+    service = _get_service(
+        job_queue,
+        [
+            FakeStage("workflows", []),
+            FakeStage("incidents", ["s1"], plan_error=Exception("no token")),
+            code_stage,
+        ],
+    )
+    job = service.enqueue_org_sync("org")
+
+    _drain(SyncWorker(job_queue, service))
+
+    job = service.get_job(job.id)
+    assert job.get_stage("workflows").status == SyncJobStatus.COMPLETED
+    assert job.get_stage("incidents").status == SyncJobStatus.FAILED
+    assert job.get_stage("incidents").error == "no token"
+    assert code_stage.runs == ["r1"]
+    assert job.status == SyncJobStatus.FAILED
+
+
+def test_workers_share_the_queue():
+    class FakeApp:
+        def app_context(self):
+            return contextmanager(lambda: (yield))()
+
+    job_queue = InMemorySyncJobQueue()
+    repo_ids = [f"r{index}" for index in range(20)]
+    code_stage = FakeStage("code", repo_ids)
+    workflow_stage = FakeStage("workflows", repo_ids)
+    mtd_stage = FakeStage("mtd", repo_ids, depends_on=("code", "workflows"))
+    service = _get_service(job_queue, [code_stage, workflow_stage, mtd_stage])
+    job = service.enqueue_org_sync("org")
+    stop_event = threading.Event()
+
+    threads = [
+        threading.Thread(
+            target=SyncWorker(job_queue, service, poll_timeout=0.05).run_forever,
+            args=(FakeApp(), stop_event),
+        )
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for _ in range(200):
+        if service.get_job(job.id).status.is_finished:
+            break
+        stop_event.wait(0.05)
+    stop_event.set()
+    for thread in threads:
+        thread.join(timeout=10)
+
+    job = service.get_job(job.id)
+    assert job.status == SyncJobStatus.COMPLETED
+    assert sorted(code_stage.runs) == sorted(repo_ids)
+    assert sorted(mtd_stage.runs) == sorted(repo_ids)
+    assert job.get_stage("mtd").completed_tasks == 20
+
+
+def test_critical_path_follows_the_last_finished_upstream_stage():
+    now = time_now()
+    job = SyncJob(
+        id="job",
+        org_id="org",
+        created_at=now,
+        stages=[
+            SyncStageProgress(name="code", finished_at=now + timedelta(minutes=5)),
+            SyncStageProgress(name="workflows", finished_at=now + timedelta(minutes=8)),
+            SyncStageProgress(
+                name="mtd",
+                depends_on=["code", "workflows"],
+                finished_at=now + timedelta(minutes=9),
+            ),
+            SyncStageProgress(
+                name="incidents",
+                depends_on=["code"],
+                finished_at=now + timedelta(minutes=7),
+            ),
+        ],
+    )
+
+    assert job.critical_path == ["workflows", "mtd"]
+
+
+def test_sync_job_round_trips_through_fields():
+    job = SyncJob(
+        id="job",
+        org_id="org",
+        created_at=time_now(),
+        stages=[SyncStageProgress(name="mtd", depends_on=["code"])],
+    )
+
+    assert SyncJob.from_fields(job.id, job.to_fields()) == job
+
+
+def test_worker_backs_off_while_the_queue_keeps_failing():
+    class FakeApp:
+        def app_context(self):
+            return contextmanager(lambda: (yield))()
+
+    class BrokenQueue(InMemorySyncJobQueue):
+        def pop(self, timeout, worker_id=None):
+            raise ConnectionError("redis is down")
+
+    class StopAfterWaits(threading.Event):
+        def __init__(self, count):
+            super().__init__()
+            self.count = count
+            self.waits = []
+
+        def wait(self, timeout=None):
+            self.waits.append(timeout)
+            if len(self.waits) >= self.count:
+                self.set()
+            return self.is_set()
+
+    job_queue = BrokenQueue()
+    stop_event = StopAfterWaits(8)
+
+    SyncWorker(job_queue, _get_service(job_queue, [])).run_forever(
+        FakeApp(), stop_event
+    )
+
+    assert stop_event.waits == [1, 2, 4, 8, 16, 32, 60, 60]
+
+
+def test_task_of_a_worker_crashing_mid_task_is_run_by_another_worker():
+    class CrashingStage(FakeStage):
+        crash = True
+
+        def run(self, org_id, params):
+            if self.crash:
+                self.crash = False
+                raise SystemExit("worker killed")
+            super().run(org_id, params)
+
+    clock = FakeMonotonicClock()
+    job_queue = InMemorySyncJobQueue(visibility_timeout=30, clock=clock)
+    code_stage = CrashingStage("code", ["r1"])
+    service = _get_service(job_queue, [code_stage])
+    job = service.enqueue_org_sync("org")
+    crashing_worker = SyncWorker(job_queue, service, worker_id="crashing")
+    worker = SyncWorker(job_queue, service, worker_id="worker")
+    worker.run_once(timeout=0)
+
+    with pytest.raises(SystemExit):
+        crashing_worker.run_once(timeout=0)
+
+    assert worker.run_once(timeout=0) is None
+    clock.now += 31
+    _drain(worker)
+
+    job = service.get_job(job.id)
+    assert code_stage.runs == ["r1"]
+    assert job.status == SyncJobStatus.COMPLETED
+    assert job.get_stage("code").completed_tasks == 1
+
+
+def test_task_requeued_after_it_finished_is_not_run_again():
+    clock = FakeMonotonicClock()
+    job_queue = InMemorySyncJobQueue(visibility_timeout=30, clock=clock)
+    code_stage = FakeStage("code", ["r1"])
+    mtd_stage = FakeStage("mtd", ["r1"], depends_on=("code",))
+    service = _get_service(job_queue, [code_stage, mtd_stage])
+    job = service.enqueue_org_sync("org")
+    worker = SyncWorker(job_queue, service, worker_id="worker")
+    crashing_worker = SyncWorker(job_queue, service, worker_id="crashing")
+    worker.run_once(timeout=0)
+    worker.run_once(timeout=0)
+
+    ack = job_queue.ack
+
+    def _crash_before_ack(worker_id):
+        raise SystemExit("worker killed")
+
+    job_queue.ack = _crash_before_ack
+    with pytest.raises(SystemExit):
+        crashing_worker.run_once(timeout=0)
+    job_queue.ack = ack
+    clock.now += 31
+    _drain(worker)
+
+    job = service.get_job(job.id)
+    assert code_stage.runs == ["r1"]
+    assert mtd_stage.runs == ["r1"]
+    assert job.status == SyncJobStatus.COMPLETED
+    assert job.get_stage("code").completed_tasks == 1
+
+
+def test_worker_extends_its_lease_while_the_task_runs():
+    job_queue = InMemorySyncJobQueue(visibility_timeout=0.1)
+    requeued = []
+
+    class SlowStage(FakeStage):
+        def run(self, org_id, params):
+            time.sleep(0.3)
+            requeued.append(job_queue.requeue_expired_tasks())
+            super().run(org_id, params)
+
+    code_stage = SlowStage("code", ["r1"])
+    service = _get_service(job_queue, [code_stage])
+    job = service.enqueue_org_sync("org")
+
+    _drain(SyncWorker(job_queue, service, visibility_timeout=0.1))
+
+    assert requeued == [0]
+    assert code_stage.runs == ["r1"]
+    assert service.get_job(job.id).status == SyncJobStatus.COMPLETED
+
+
+def test_code_sync_plans_a_pooled_task_for_providers_with_sync_concurrency(
+    monkeypatch,
+):
+    monkeypatch.setattr(
+        stages,
+        "get_code_repos_to_sync",
+        lambda org_id: [("github", "r1"), ("github", "r2"), ("gitlab", "r3")],
+    )
+    monkeypatch.setenv("GITHUB_SYNC_CONCURRENCY", "4")
+    monkeypatch.delenv("GITLAB_SYNC_CONCURRENCY", raising=False)
+    code_stage = stages.get_sync_stages()[0]
+
+    tasks_params = code_stage.plan("org")
+
+    assert tasks_params == [
+        {"org_id": "org", "provider": "github", "repo_ids": "r1,r2"},
+        {"provider": "gitlab", "repo_id": "r3"},
+    ]
+    assert [code_stage.get_dependency_keys(params) for params in tasks_params] == [
+        ["r1", "r2"],
+        ["r3"],
+    ]
@@ -0,0 +1,193 @@
+from datetime import datetime, timedelta
+
+import pytz
+
+from mhq.service.analytics_cache import (
+    AnalyticsCache,
+    MemoryAnalyticsCacheStore,
+    RedisAnalyticsCacheStore,
+)
+from mhq.store.models.code.workflows.filter import WorkflowFilter
+
+from_time = datetime(2024, 1, 1, 0, 0, 0, tzinfo=pytz.UTC)
+to_time = datetime(2024, 1, 31, 0, 0, 0, tzinfo=pytz.UTC)
+
+
+class FakeVersionRepoService:
+    def __init__(self):
+        self.versions = {}
+
+    def get_versions(self, namespaces):
+        return {
+            namespace: self.versions[namespace]
+            for namespace in namespaces
+            if namespace in self.versions
+        }
+
+    def bump_version(self, namespace):
+        self.versions[namespace] = self.versions.get(namespace, 0) + 1
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {}
+        self.expiries = {}
+        self.hashes = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value, ex=None):
+        self.values[key] = value
+        self.expiries[key] = ex
+
+    def mget(self, keys):
+        return [self.values.get(key) for key in keys]
+
+    def incr(self, key):
+        self.values[key] = str(int(self.values.get(key, 0)) + 1).encode()
+
+    def hincrby(self, key, field, amount):
+        fields = self.hashes.setdefault(key, {})
+        fields[field.encode()] = str(int(fields.get(field.encode(), 0)) + amount)
+
+    def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    def delete(self, key):
+        self.hashes.pop(key, None)
+        self.values.pop(key, None)
+
+
+class Computation:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return {"calls": self.calls}
+
+
+def _get_cache(max_entries=10, clock=None):
+    return AnalyticsCache(
+        MemoryAnalyticsCacheStore(
+            FakeVersionRepoService(),
+            max_entries,
+            timedelta(minutes=30),
+            clock or FakeClock(),
+        )
+    )
+
+
+def _get(cache, compute, team_id="t1", endpoint="lead_time", **params):
+    params = {"from_time": from_time, "to_time": to_time, **params}
+    return cache.get_or_compute(endpoint, "o1", team_id, params, compute)
+
+
+def test_equivalent_filters_share_an_entry():
+    cache = _get_cache()
+    compute = Computation()
+
+    _get(
+        cache,
+        compute,
+        pr_filter={"authors": ["a", "b"], "base_branches": ["main"]},
+        workflow_filter=WorkflowFilter(head_branches=["^main$"]),
+    )
+    response = _get(
+        cache,
+        compute,
+        pr_filter={"base_branches": ["main"], "authors": ["b", "a"]},
+        workflow_filter=WorkflowFilter(head_branches=["^main$"], repo_filters=None),
+    )
+
+    assert response == {"calls": 1}
+    assert cache.get_stats() == {"lead_time": {"hits": 1, "misses": 1, "hit_rate": 0.5}}
+
+
+def test_entries_differ_by_team_interval_filters_and_endpoint():
+    cache = _get_cache()
+    compute = Computation()
+
+    _get(cache, compute)
+    _get(cache, compute, team_id="t2")
+    _get(cache, compute, to_time=to_time + timedelta(days=1))
+    _get(cache, compute, pr_filter={"authors": ["a"]})
+    _get(cache, compute, endpoint="lead_time_trends")
+
+    assert compute.calls == 5
+
+
+def test_version_bumps_retire_entries():
+    cache = _get_cache()
+    compute = Computation()
+
+    _get(cache, compute)
+    _get(cache, compute, team_id="t2")
+    cache.invalidate_team("t1")
+    assert _get(cache, compute) == {"calls": 3}
+    assert _get(cache, compute, team_id="t2") == {"calls": 2}
+
+    cache.invalidate_org("o1")
+    assert _get(cache, compute) == {"calls": 4}
+    assert _get(cache, compute, team_id="t2") == {"calls": 5}
+
+
+def test_memory_store_evicts_expired_and_least_recently_used_entries():
+    clock = FakeClock()
+    cache = _get_cache(max_entries=2, clock=clock)
+    compute = Computation()
+
+    _get(cache, compute, team_id="t1")
+    _get(cache, compute, team_id="t2")
+    _get(cache, compute, team_id="t1")
+    _get(cache, compute, team_id="t3")
+    assert compute.calls == 3
+    assert _get(cache, compute, team_id="t1") == {"calls": 1}
+    assert _get(cache, compute, team_id="t2") == {"calls": 4}
+
+    clock.now += timedelta(minutes=31).total_seconds()
+    assert _get(cache, compute, team_id="t2") == {"calls": 5}
+
+
+def test_cache_without_store_computes_every_request():
+    cache = AnalyticsCache()
+    compute = Computation()
+
+    _get(cache, compute)
+    _get(cache, compute)
+
+    assert compute.calls == 2
+    assert cache.get_stats() == {}
+
+
+def test_redis_stores_share_compressed_entries_versions_and_counts():
+    redis = FakeRedis()
+    worker_caches = [
+        AnalyticsCache(RedisAnalyticsCacheStore(redis, timedelta(minutes=30)))
+        for _ in range(2)
+    ]
+    compute = Computation()
+
+    _get(worker_caches[0], compute)
+    assert _get(worker_caches[1], compute) == {"calls": 1}
+    [entry_key] = [key for key in redis.values if ":entry:" in key]
+    assert redis.values[entry_key] != b'{"calls":1}'
+    assert redis.expiries[entry_key] == 1800
+
+    worker_caches[0].invalidate_team("t1")
+    assert _get(worker_caches[1], compute) == {"calls": 2}
+    assert worker_caches[0].get_stats() == {
+        "lead_time": {"hits": 1, "misses": 2, "hit_rate": 1 / 3}
+    }
+
+    worker_caches[1].log_stats()
+    assert worker_caches[0].get_stats() == {}
@@ -0,0 +1,79 @@
+from mhq.store.models.code import PullRequest, RawPayloadEntityType
+from mhq.store.models.code.workflows.workflows import RepoWorkflowRuns
+from mhq.store.raw_payloads import (
+    RawPayloadPolicy,
+    RawPayloadStorageMode,
+    compact_payload,
+)
+from mhq.utils.string import uuid4_str
+from tests.factories.models.code import (
+    get_pull_request_commit,
+    get_pull_request_event,
+)
+
+
+def test_compact_payload_keeps_whitelisted_fields():
+    payload = {
+        "state": "approved",
+        "body": "Looks good",
+        "user": {"login": "dependabot", "type": "Bot", "avatar_url": "url"},
+        "actor": "deleted",
+    }
+    whitelist = {
+        "state": None,
+        "user": {"login": None, "type": None},
+        "actor": {"login": None, "type": None},
+        "missing": None,
+    }
+
+    assert compact_payload(payload, whitelist) == {
+        "state": "approved",
+        "user": {"login": "dependabot", "type": "Bot"},
+        "actor": "deleted",
+    }
+
+
+def test_compact_mode_moves_full_payloads_to_archive():
+    event = get_pull_request_event(reviewer="reviewer", state="changes_requested")
+    full_payload = event.data
+    commit = get_pull_request_commit(data={"sha": "abc", "files": []})
+    policy = RawPayloadPolicy(RawPayloadStorageMode.COMPACT)
+
+    [event_archive] = policy.compact(
+        RawPayloadEntityType.PULL_REQUEST_EVENT, [event], "data"
+    )
+    [commit_archive] = policy.compact(
+        RawPayloadEntityType.PULL_REQUEST_COMMIT, [commit], "data", id_column="hash"
+    )
+
+    assert event.data == {"state": "changes_requested", "user": {"login": "reviewer"}}
+    assert event_archive.entity_type == "PullRequestEvent"
+    assert event_archive.entity_id == str(event.id)
+    assert event_archive.payload == full_payload
+    assert commit.data == {}
+    assert commit_archive.entity_id == str(commit.hash)
+    assert commit_archive.payload == {"sha": "abc", "files": []}
+
+
+def test_compact_mode_skips_unset_payloads():
+    pr = PullRequest(id=uuid4_str(), merge_to_deploy=60)
+    run = RepoWorkflowRuns(id=uuid4_str(), meta={"id": 1, "actor": {}})
+    policy = RawPayloadPolicy(RawPayloadStorageMode.COMPACT)
+
+    assert policy.compact(RawPayloadEntityType.PULL_REQUEST, [pr], "data") == []
+    [run_archive] = policy.compact(
+        RawPayloadEntityType.REPO_WORKFLOW_RUN, [run], "meta"
+    )
+    assert run.meta == {}
+    assert run_archive.payload == {"id": 1, "actor": {}}
+
+
+def test_full_mode_keeps_payloads_in_place():
+    event = get_pull_request_event()
+    full_payload = event.data
+    policy = RawPayloadPolicy(RawPayloadStorageMode.FULL)
+
+    assert (
+        policy.compact(RawPayloadEntityType.PULL_REQUEST_EVENT, [event], "data") == []
+    )
+    assert event.data == full_payload
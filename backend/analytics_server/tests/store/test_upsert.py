@@ -0,0 +1,53 @@
+from sqlalchemy.dialects import postgresql
+
+from mhq.store.models.code import PullRequest
+from mhq.store.models.code.workflows.workflows import RepoWorkflowRuns
+from mhq.store.upsert import get_upsert_batches
+from mhq.utils.string import uuid4_str
+from tests.factories.models.code import get_pull_request
+
+
+def _compile(statement, rows) -> str:
+    return str(
+        statement.compile(dialect=postgresql.dialect(), column_keys=list(rows[0]))
+    )
+
+
+def test_upsert_updates_only_columns_set_on_objects():
+    pr = PullRequest(id=uuid4_str(), merge_to_deploy=120)
+
+    [(statement, rows)] = get_upsert_batches(PullRequest, [pr])
+    sql = _compile(statement, rows)
+
+    assert rows == [{"id": pr.id, "merge_to_deploy": 120}]
+    assert "ON CONFLICT (id) DO UPDATE SET" in sql
+    assert "merge_to_deploy = excluded.merge_to_deploy" in sql
+    assert "updated_in_db_at = now()" in sql
+    assert "title" not in sql
+
+
+def test_upsert_groups_objects_by_columns_and_dedupes_primary_keys():
+    pr_id = uuid4_str()
+    prs = [
+        get_pull_request(id=pr_id, title="old"),
+        get_pull_request(id=pr_id, title="new"),
+        get_pull_request(),
+        PullRequest(id=uuid4_str(), merge_to_deploy=60),
+    ]
+
+    batches = get_upsert_batches(PullRequest, prs)
+
+    rows = [row for _, batch_rows in batches for row in batch_rows]
+    assert len(batches) == 2
+    assert len(rows) == 3
+    assert [row["title"] for row in rows if row["id"] == pr_id] == ["new"]
+
+
+def test_upsert_splits_batches_and_keeps_objects_without_primary_key():
+    runs = [
+        RepoWorkflowRuns(provider_workflow_run_id=str(run_id)) for run_id in range(5)
+    ]
+
+    batches = get_upsert_batches(RepoWorkflowRuns, runs, batch_size=2)
+
+    assert [len(rows) for _, rows in batches] == [2, 2, 1]
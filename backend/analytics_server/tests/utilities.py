@@ -1,3 +1,7 @@
+import json
+import threading
+
+
 def compare_objects_as_dicts(ob_1, ob_2, ignored_keys=None):
     """
     This method can be used to compare between two objects in tests while ignoring keys that are generated as side effects like uuids or autogenerated date time fields.
@@ -18,3 +22,60 @@ def compare_objects_as_dicts(ob_1, ob_2, ignored_keys=None):
         print(ob_1.__dict__, "!=", ob_2.__dict__)
         return False
     return True
+
+
+class FakeHTTPServer:
+    """
+    Serves JSON responses from a local HTTP server, for exercising api clients
+    without network access. respond receives the method, path, parsed JSON body and
+    headers of every request and returns a (status_code, json_payload) tuple,
+    optionally followed by a dict of response headers.
+    """
+
+    def __init__(self, respond):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        self.requests = []
+        fake_server = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def _serve(self):
+                content_length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(content_length) if content_length else b""
+                payload = json.loads(body) if body else None
+                fake_server.requests.append((self.command, self.path, payload))
+                status_code, response, *response_headers = respond(
+                    self.command, self.path, payload, dict(self.headers)
+                )
+                response_body = (
+                    json.dumps(response).encode() if response is not None else b""
+                )
+                self.send_response(status_code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(response_body)))
+                for header, value in (response_headers or [{}])[0].items():
+                    self.send_header(header, value)
+                self.end_headers()
+                self.wfile.write(response_body)
+
+            do_GET = _serve
+            do_POST = _serve
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self._server.shutdown()
+        self._server.server_close()
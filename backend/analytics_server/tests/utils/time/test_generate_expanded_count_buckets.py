@@ -0,0 +1,37 @@
+from datetime import datetime, timedelta
+
+import pytz
+
+from mhq.utils.time import Interval, generate_expanded_count_buckets
+
+first_week_2024 = datetime(2024, 1, 1, 0, 0, 0, tzinfo=pytz.UTC)
+second_week_2024 = datetime(2024, 1, 8, 0, 0, 0, tzinfo=pytz.UTC)
+third_week_2024 = datetime(2024, 1, 15, 0, 0, 0, tzinfo=pytz.UTC)
+
+
+def test_generate_expanded_count_buckets_sums_days_into_weeks():
+    day_to_count_map = {
+        first_week_2024 + timedelta(days=2): 2,
+        first_week_2024 + timedelta(days=6): 3,
+        third_week_2024: 1,
+    }
+
+    assert generate_expanded_count_buckets(
+        day_to_count_map,
+        Interval(first_week_2024 + timedelta(days=1), third_week_2024),
+        "weekly",
+    ) == {first_week_2024: 5, second_week_2024: 0, third_week_2024: 1}
+
+
+def test_generate_expanded_count_buckets_fills_empty_days():
+    day_to_count_map = {first_week_2024 + timedelta(days=1): 4}
+
+    assert generate_expanded_count_buckets(
+        day_to_count_map,
+        Interval(first_week_2024, first_week_2024 + timedelta(days=2, hours=1)),
+        "daily",
+    ) == {
+        first_week_2024: 0,
+        first_week_2024 + timedelta(days=1): 4,
+        first_week_2024 + timedelta(days=2): 0,
+    }
@@ -0,0 +1,44 @@
+from datetime import datetime, timedelta
+
+import pytz
+
+from mhq.utils.time import Interval, split_interval_on_whole_days
+
+last_moment = timedelta(microseconds=1)
+first_day_2024 = datetime(2024, 1, 1, 0, 0, 0, tzinfo=pytz.UTC)
+second_day_2024 = datetime(2024, 1, 2, 0, 0, 0, tzinfo=pytz.UTC)
+fourth_day_2024 = datetime(2024, 1, 4, 0, 0, 0, tzinfo=pytz.UTC)
+
+
+def test_split_interval_returns_partial_days_at_both_ends():
+    from_time = first_day_2024 + timedelta(hours=6)
+    to_time = fourth_day_2024 + timedelta(hours=12)
+
+    days_interval, partial_intervals = split_interval_on_whole_days(
+        Interval(from_time, to_time)
+    )
+
+    assert days_interval == Interval(second_day_2024, fourth_day_2024 - last_moment)
+    assert partial_intervals == [
+        Interval(from_time, second_day_2024 - last_moment),
+        Interval(fourth_day_2024, to_time),
+    ]
+
+
+def test_split_interval_converts_to_utc_days():
+    ist = pytz.timezone("Asia/Kolkata")
+    from_time = ist.localize(datetime(2024, 1, 2, 5, 30))
+    to_time = ist.localize(datetime(2024, 1, 4, 5, 30)) - last_moment
+
+    assert split_interval_on_whole_days(Interval(from_time, to_time)) == (
+        Interval(second_day_2024, fourth_day_2024 - last_moment),
+        [],
+    )
+
+
+def test_split_interval_within_a_day_has_no_whole_days():
+    interval = Interval(
+        first_day_2024 + timedelta(hours=1), first_day_2024 + timedelta(hours=23)
+    )
+
+    assert split_interval_on_whole_days(interval) == (None, [interval])
@@ -0,0 +1,40 @@
+from datetime import datetime, timedelta
+
+import pytz
+
+from mhq.utils.time import Interval, split_interval_on_whole_weeks
+
+last_moment = timedelta(microseconds=1)
+# Mondays
+first_week_2023 = datetime(2023, 1, 2, 0, 0, 0, tzinfo=pytz.UTC)
+second_week_2023 = datetime(2023, 1, 9, 0, 0, 0, tzinfo=pytz.UTC)
+third_week_2023 = datetime(2023, 1, 16, 0, 0, 0, tzinfo=pytz.UTC)
+
+
+def test_split_interval_of_whole_weeks_has_no_partial_intervals():
+    interval = Interval(first_week_2023, third_week_2023 - last_moment)
+
+    assert split_interval_on_whole_weeks(interval) == (interval, [])
+
+
+def test_split_interval_returns_partial_weeks_at_both_ends():
+    from_time = first_week_2023 + timedelta(days=3)
+    to_time = third_week_2023 + timedelta(days=1)
+
+    weeks_interval, partial_intervals = split_interval_on_whole_weeks(
+        Interval(from_time, to_time)
+    )
+
+    assert weeks_interval == Interval(second_week_2023, third_week_2023 - last_moment)
+    assert partial_intervals == [
+        Interval(from_time, second_week_2023 - last_moment),
+        Interval(third_week_2023, to_time),
+    ]
+
+
+def test_split_interval_within_a_week_has_no_whole_weeks():
+    interval = Interval(
+        first_week_2023 + timedelta(days=1), second_week_2023 + timedelta(days=2)
+    )
+
+    assert split_interval_on_whole_weeks(interval) == (None, [interval])
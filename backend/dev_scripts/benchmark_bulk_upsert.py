@@ -0,0 +1,154 @@
+"""
+This script compares rows/sec of the bulk upsert path against a session.merge loop
+when saving pull requests, their commits and events.
+
+Run it from this directory against a database with at least one OrgRepo:
+    python benchmark_bulk_upsert.py --repo-id <org repo id> --prs 2000
+
+Everything is written inside a transaction which is rolled back at the end.
+"""
+
+import argparse
+import os
+import sys
+import time
+import uuid
+from datetime import timedelta
+from typing import List, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../analytics_server"))
+os.chdir(os.path.join(os.path.dirname(__file__), "../analytics_server"))
+
+from flask import Flask  # noqa: E402
+
+from env import load_app_env  # noqa: E402
+
+load_app_env()
+
+from mhq.store import configure_db_with_app, db  # noqa: E402
+from mhq.store.models.code import (  # noqa: E402
+    PullRequest,
+    PullRequestCommit,
+    PullRequestEvent,
+    PullRequestEventType,
+    PullRequestState,
+)
+from mhq.store.upsert import bulk_upsert  # noqa: E402
+from mhq.utils.time import time_now  # noqa: E402
+
+EVENTS_PER_PR = 3
+COMMITS_PER_PR = 3
+
+
+def generate_rows(
+    repo_id: str, pr_count: int
+) -> Tuple[List[PullRequest], List[PullRequestCommit], List[PullRequestEvent]]:
+    now = time_now()
+    prs, commits, events = [], [], []
+    for number in range(pr_count):
+        pr_id = uuid.uuid4()
+        prs.append(
+            PullRequest(
+                id=pr_id,
+                repo_id=repo_id,
+                number=str(10_000_000 + number),
+                title=f"benchmark pr {number}",
+                author="benchmark",
+                state=PullRequestState.MERGED,
+                base_branch="main",
+                head_branch=f"benchmark-{number}",
+                data={"number": number},
+                created_at=now - timedelta(days=1),
+                updated_at=now,
+                state_changed_at=now,
+                requested_reviews=[],
+                reviewers=["reviewer"],
+                meta={},
+                provider="github",
+            )
+        )
+        for index in range(COMMITS_PER_PR):
+            commits.append(
+                PullRequestCommit(
+                    hash=uuid.uuid4().hex,
+                    pull_request_id=pr_id,
+                    message="benchmark commit",
+                    data={},
+                    author="benchmark",
+                    created_at=now - timedelta(hours=index),
+                    org_repo_id=repo_id,
+                )
+            )
+        for index in range(EVENTS_PER_PR):
+            events.append(
+                PullRequestEvent(
+                    id=uuid.uuid4(),
+                    pull_request_id=pr_id,
+                    type=PullRequestEventType.REVIEW.value,
+                    data={"state": "APPROVED"},
+                    created_at=now - timedelta(minutes=index),
+                    idempotency_key=uuid.uuid4().hex,
+                    org_repo_id=repo_id,
+                    actor_username="reviewer",
+                )
+            )
+    return prs, commits, events
+
+
+def rename_prs(prs: List[PullRequest], suffix: str):
+    # Changes a column so update runs write rows instead of finding nothing to do
+    for pr in prs:
+        pr.title = f"{pr.title} {suffix}"
+
+
+def save_with_merge(prs, commits, events):
+    for obj in prs + commits + events:
+        db.session.merge(obj)
+    db.session.flush()
+
+
+def save_with_upsert(prs, commits, events):
+    bulk_upsert(db.session, PullRequest, prs)
+    bulk_upsert(db.session, PullRequestCommit, commits)
+    bulk_upsert(db.session, PullRequestEvent, events)
+
+
+def measure(name: str, save, rows) -> float:
+    row_count = sum(len(objects) for objects in rows)
+    start = time.perf_counter()
+    save(*rows)
+    elapsed = time.perf_counter() - start
+    print(
+        f"{name:<24} {row_count:>8} rows {elapsed:>8.2f}s {row_count / elapsed:>10.0f} rows/sec"
+    )
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repo-id", required=True)
+    parser.add_argument("--prs", type=int, default=2000)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    configure_db_with_app(app)
+
+    with app.app_context():
+        try:
+            measure(
+                "merge insert", save_with_merge, generate_rows(args.repo_id, args.prs)
+            )
+            db.session.rollback()
+
+            rows = generate_rows(args.repo_id, args.prs)
+            measure("upsert insert", save_with_upsert, rows)
+            rename_prs(rows[0], "upsert")
+            measure("upsert update", save_with_upsert, rows)
+            rename_prs(rows[0], "merge")
+            measure("merge update", save_with_merge, rows)
+        finally:
+            db.session.rollback()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+-- migrate:up
+
+CREATE TABLE IF NOT EXISTS public."ExapiResponseCache" (
+    key character varying NOT NULL,
+    url character varying NOT NULL,
+    endpoint character varying NOT NULL,
+    etag character varying,
+    last_modified character varying,
+    headers jsonb DEFAULT '{}'::jsonb NOT NULL,
+    body bytea NOT NULL,
+    created_at timestamp with time zone DEFAULT now(),
+    accessed_at timestamp with time zone DEFAULT now()
+);
+
+ALTER TABLE ONLY public."ExapiResponseCache"
+    ADD CONSTRAINT "ExapiResponseCache_pkey" PRIMARY KEY (key);
+
+CREATE INDEX exapiresponsecache_accessed_at ON public."ExapiResponseCache" USING btree (accessed_at);
+
+-- migrate:down
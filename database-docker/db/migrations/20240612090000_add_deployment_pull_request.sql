@@ -0,0 +1,36 @@
+-- migrate:up
+
+CREATE TABLE IF NOT EXISTS public."DeploymentPullRequest" (
+    repo_workflow_run_id uuid NOT NULL,
+    pull_request_id uuid NOT NULL,
+    repo_id uuid NOT NULL,
+    repo_workflow_id uuid NOT NULL,
+    created_at timestamp with time zone DEFAULT now()
+);
+
+ALTER TABLE ONLY public."DeploymentPullRequest"
+    ADD CONSTRAINT "DeploymentPullRequest_pkey" PRIMARY KEY (repo_workflow_run_id, pull_request_id);
+
+ALTER TABLE ONLY public."DeploymentPullRequest"
+    ADD CONSTRAINT "DeploymentPullRequest_repo_workflow_run_id_fkey" FOREIGN KEY (repo_workflow_run_id) REFERENCES public."RepoWorkflowRuns"(id);
+
+ALTER TABLE ONLY public."DeploymentPullRequest"
+    ADD CONSTRAINT "DeploymentPullRequest_pull_request_id_fkey" FOREIGN KEY (pull_request_id) REFERENCES public."PullRequest"(id);
+
+ALTER TABLE ONLY public."DeploymentPullRequest"
+    ADD CONSTRAINT "DeploymentPullRequest_repo_id_fkey" FOREIGN KEY (repo_id) REFERENCES public."OrgRepo"(id);
+
+ALTER TABLE ONLY public."DeploymentPullRequest"
+    ADD CONSTRAINT "DeploymentPullRequest_repo_workflow_id_fkey" FOREIGN KEY (repo_workflow_id) REFERENCES public."RepoWorkflow"(id);
+
+CREATE INDEX deploymentpullrequest_pull_request_id ON public."DeploymentPullRequest" USING btree (pull_request_id);
+
+CREATE INDEX deploymentpullrequest_repo_id_created_at ON public."DeploymentPullRequest" USING btree (repo_id, created_at);
+
+ALTER TABLE public."BookmarkMergeToDeployBroker" ADD COLUMN IF NOT EXISTS deployment_prs_mapped_from character varying;
+
+-- Bookmarks are kept, so the broker only sweeps runs newer than them. Runs it processed
+-- before deployment prs were persisted keep being mapped live at read time.
+UPDATE public."BookmarkMergeToDeployBroker" SET deployment_prs_mapped_from = bookmark;
+
+-- migrate:down
@@ -0,0 +1,5 @@
+-- migrate:up
+
+CREATE INDEX IF NOT EXISTS pull_request_repo_id_updated_in_db_at_index ON public."PullRequest" USING btree (repo_id, updated_in_db_at);
+
+-- migrate:down
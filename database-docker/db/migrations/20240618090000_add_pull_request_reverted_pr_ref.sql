@@ -0,0 +1,19 @@
+-- migrate:up
+
+ALTER TABLE public."PullRequest" ADD COLUMN IF NOT EXISTS reverted_pr_ref character varying;
+
+COMMENT ON COLUMN public."PullRequest".reverted_pr_ref IS 'Number (GitHub) or merge commit sha prefix (GitLab) of the pull request this one reverts, parsed from its head branch';
+
+UPDATE public."PullRequest"
+SET reverted_pr_ref = substring(head_branch from 'revert-(\d+)-\w+')
+WHERE provider = 'github' AND head_branch ~ 'revert-(\d+)-\w+';
+
+UPDATE public."PullRequest"
+SET reverted_pr_ref = lower(substring(head_branch from '^revert-([a-fA-F0-9]{8})$'))
+WHERE provider = 'gitlab' AND head_branch ~ '^revert-([a-fA-F0-9]{8})$';
+
+CREATE INDEX IF NOT EXISTS pull_request_repo_id_reverted_pr_ref_index ON public."PullRequest" USING btree (repo_id, reverted_pr_ref) WHERE reverted_pr_ref IS NOT NULL;
+
+CREATE INDEX IF NOT EXISTS pull_request_repo_id_merge_commit_sha_prefix_index ON public."PullRequest" USING btree (repo_id, "left"((merge_commit_sha)::text, 8));
+
+-- migrate:down
@@ -0,0 +1,52 @@
+-- migrate:up
+
+CREATE TABLE IF NOT EXISTS public."RawPayloadArchive" (
+    entity_type character varying NOT NULL,
+    entity_id character varying NOT NULL,
+    payload jsonb COMPRESSION lz4,
+    created_at timestamp with time zone DEFAULT now(),
+    updated_at timestamp with time zone DEFAULT now()
+);
+
+ALTER TABLE ONLY public."RawPayloadArchive"
+    ADD CONSTRAINT "RawPayloadArchive_pkey" PRIMARY KEY (entity_type, entity_id);
+
+COMMENT ON TABLE public."RawPayloadArchive" IS 'Full provider payloads of pull requests, pull request events and commits, and workflow runs, whose own payload columns keep only the fields the app reads';
+
+-- Move the full payloads of existing rows to the archive and keep the whitelisted fields in place
+
+INSERT INTO public."RawPayloadArchive" (entity_type, entity_id, payload)
+SELECT 'PullRequest', id::text, data FROM public."PullRequest" WHERE data IS NOT NULL AND data <> '{}'::jsonb
+ON CONFLICT DO NOTHING;
+
+UPDATE public."PullRequest" SET data = '{}'::jsonb WHERE data IS NOT NULL AND data <> '{}'::jsonb;
+
+INSERT INTO public."RawPayloadArchive" (entity_type, entity_id, payload)
+SELECT 'PullRequestCommit', hash, data FROM public."PullRequestCommit" WHERE data IS NOT NULL AND data <> '{}'::jsonb
+ON CONFLICT DO NOTHING;
+
+UPDATE public."PullRequestCommit" SET data = '{}'::jsonb WHERE data IS NOT NULL AND data <> '{}'::jsonb;
+
+INSERT INTO public."RawPayloadArchive" (entity_type, entity_id, payload)
+SELECT 'PullRequestEvent', id::text, data FROM public."PullRequestEvent" WHERE data IS NOT NULL
+ON CONFLICT DO NOTHING;
+
+UPDATE public."PullRequestEvent"
+SET data = jsonb_strip_nulls(jsonb_build_object(
+    'state', data -> 'state',
+    'user', CASE WHEN jsonb_typeof(data -> 'user') = 'object'
+        THEN jsonb_strip_nulls(jsonb_build_object('login', data -> 'user' -> 'login', 'type', data -> 'user' -> 'type'))
+        ELSE data -> 'user' END,
+    'actor', CASE WHEN jsonb_typeof(data -> 'actor') = 'object'
+        THEN jsonb_strip_nulls(jsonb_build_object('login', data -> 'actor' -> 'login', 'type', data -> 'actor' -> 'type'))
+        ELSE data -> 'actor' END
+))
+WHERE data IS NOT NULL;
+
+INSERT INTO public."RawPayloadArchive" (entity_type, entity_id, payload)
+SELECT 'RepoWorkflowRuns', id::text, meta FROM public."RepoWorkflowRuns" WHERE meta IS NOT NULL AND meta <> '{}'::jsonb
+ON CONFLICT DO NOTHING;
+
+UPDATE public."RepoWorkflowRuns" SET meta = '{}'::jsonb WHERE meta IS NOT NULL AND meta <> '{}'::jsonb;
+
+-- migrate:down
@@ -0,0 +1,44 @@
+-- migrate:up
+
+CREATE TABLE IF NOT EXISTS public."PullRequestLeadTimeRollup" (
+    repo_id uuid NOT NULL,
+    base_branch character varying NOT NULL,
+    week_start timestamp with time zone NOT NULL,
+    has_merge_to_deploy boolean NOT NULL,
+    pr_count integer NOT NULL,
+    first_commit_to_open bigint NOT NULL,
+    first_response_time bigint NOT NULL,
+    rework_time bigint NOT NULL,
+    merge_time bigint NOT NULL,
+    merge_to_deploy bigint NOT NULL,
+    updated_at timestamp with time zone DEFAULT now()
+);
+
+ALTER TABLE ONLY public."PullRequestLeadTimeRollup"
+    ADD CONSTRAINT "PullRequestLeadTimeRollup_pkey" PRIMARY KEY (repo_id, base_branch, week_start, has_merge_to_deploy);
+
+COMMENT ON TABLE public."PullRequestLeadTimeRollup" IS 'Summed lead time components and counts of merged pull requests per repo, base branch and week (Monday, UTC), maintained on pull request writes';
+
+CREATE INDEX IF NOT EXISTS pull_request_lead_time_rollup_repo_id_week_start_index ON public."PullRequestLeadTimeRollup" USING btree (repo_id, week_start);
+
+INSERT INTO public."PullRequestLeadTimeRollup" (
+    repo_id, base_branch, week_start, has_merge_to_deploy, pr_count,
+    first_commit_to_open, first_response_time, rework_time, merge_time, merge_to_deploy
+)
+SELECT
+    repo_id,
+    base_branch,
+    timezone('UTC', date_trunc('week', timezone('UTC', state_changed_at))) AS week_start,
+    merge_to_deploy IS NOT NULL AS has_merge_to_deploy,
+    count(id),
+    sum(greatest(coalesce(first_commit_to_open, 0), 0)),
+    sum(coalesce(first_response_time, 0)),
+    sum(coalesce(rework_time, 0)),
+    sum(coalesce(merge_time, 0)),
+    sum(coalesce(merge_to_deploy, 0))
+FROM public."PullRequest"
+WHERE state = 'MERGED' AND state_changed_at IS NOT NULL AND base_branch IS NOT NULL
+GROUP BY repo_id, base_branch, week_start, has_merge_to_deploy
+ON CONFLICT DO NOTHING;
+
+-- migrate:down
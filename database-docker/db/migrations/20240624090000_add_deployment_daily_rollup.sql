@@ -0,0 +1,51 @@
+-- migrate:up
+
+CREATE TABLE IF NOT EXISTS public."DeploymentDailyRollup" (
+    deployment_type character varying NOT NULL,
+    source_id uuid NOT NULL,
+    head_branch character varying NOT NULL,
+    day timestamp with time zone NOT NULL,
+    repo_id uuid NOT NULL,
+    deployment_count integer NOT NULL,
+    updated_at timestamp with time zone DEFAULT now()
+);
+
+ALTER TABLE ONLY public."DeploymentDailyRollup"
+    ADD CONSTRAINT "DeploymentDailyRollup_pkey" PRIMARY KEY (deployment_type, source_id, head_branch, day);
+
+COMMENT ON TABLE public."DeploymentDailyRollup" IS 'Successful deployment counts per repo workflow or repo, head branch and day (UTC), maintained on workflow run and pull request writes';
+
+CREATE INDEX IF NOT EXISTS deployment_daily_rollup_repo_id_day_index ON public."DeploymentDailyRollup" USING btree (repo_id, day);
+
+INSERT INTO public."DeploymentDailyRollup" (
+    deployment_type, source_id, head_branch, day, repo_id, deployment_count
+)
+SELECT
+    'WORKFLOW',
+    rwr.repo_workflow_id,
+    coalesce(rwr.head_branch, '') AS head_branch,
+    timezone('UTC', date_trunc('day', timezone('UTC', rwr.conducted_at))) AS day,
+    rw.org_repo_id,
+    count(rwr.id)
+FROM public."RepoWorkflowRuns" rwr
+JOIN public."RepoWorkflow" rw ON rw.id = rwr.repo_workflow_id
+WHERE rwr.status = 'SUCCESS' AND rwr.conducted_at IS NOT NULL
+GROUP BY rwr.repo_workflow_id, coalesce(rwr.head_branch, ''), day, rw.org_repo_id
+ON CONFLICT DO NOTHING;
+
+INSERT INTO public."DeploymentDailyRollup" (
+    deployment_type, source_id, head_branch, day, repo_id, deployment_count
+)
+SELECT
+    'PR_MERGE',
+    repo_id,
+    base_branch,
+    timezone('UTC', date_trunc('day', timezone('UTC', state_changed_at))) AS day,
+    repo_id,
+    count(id)
+FROM public."PullRequest"
+WHERE state = 'MERGED' AND state_changed_at IS NOT NULL AND base_branch IS NOT NULL
+GROUP BY repo_id, base_branch, day
+ON CONFLICT DO NOTHING;
+
+-- migrate:down
@@ -0,0 +1,33 @@
+-- migrate:up
+
+CREATE TABLE IF NOT EXISTS public."TeamIncidentRollup" (
+    team_id uuid NOT NULL,
+    week_start timestamp with time zone NOT NULL,
+    resolved_incident_count integer NOT NULL,
+    recovery_time bigint NOT NULL,
+    failed_deployment_count integer NOT NULL,
+    deployment_count integer NOT NULL,
+    updated_at timestamp with time zone DEFAULT now()
+);
+
+ALTER TABLE ONLY public."TeamIncidentRollup"
+    ADD CONSTRAINT "TeamIncidentRollup_pkey" PRIMARY KEY (team_id, week_start);
+
+COMMENT ON TABLE public."TeamIncidentRollup" IS 'Resolved incident counts and recovery time, and deployment and failed deployment counts per team and week (UTC), refreshed after each sync';
+
+CREATE TABLE IF NOT EXISTS public."TeamIncidentRollupState" (
+    team_id uuid NOT NULL,
+    rollups_from timestamp with time zone,
+    stale_from timestamp with time zone,
+    refreshed_at timestamp with time zone,
+    updated_at timestamp with time zone DEFAULT now()
+);
+
+ALTER TABLE ONLY public."TeamIncidentRollupState"
+    ADD CONSTRAINT "TeamIncidentRollupState_pkey" PRIMARY KEY (team_id);
+
+COMMENT ON TABLE public."TeamIncidentRollupState" IS 'Time range covered by the incident rollups of a team and the earliest time written since their last refresh';
+
+-- Teams without a state get their rollups counted in full by the next refresh
+
+-- migrate:down
@@ -0,0 +1,14 @@
+-- migrate:up
+
+CREATE TABLE IF NOT EXISTS public."AnalyticsCacheVersion" (
+    namespace character varying NOT NULL,
+    version bigint DEFAULT 0 NOT NULL,
+    updated_at timestamp with time zone DEFAULT now()
+);
+
+ALTER TABLE ONLY public."AnalyticsCacheVersion"
+    ADD CONSTRAINT "AnalyticsCacheVersion_pkey" PRIMARY KEY (namespace);
+
+COMMENT ON TABLE public."AnalyticsCacheVersion" IS 'Data versions of orgs and teams, bumped on syncs and on settings and team writes to retire cached analytics responses';
+
+-- migrate:down
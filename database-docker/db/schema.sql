@@ -34,6 +34,24 @@ SET default_tablespace = '';
 
 SET default_table_access_method = heap;
 
+--
+-- Name: AnalyticsCacheVersion; Type: TABLE; Schema: public; Owner: -
+--
+
+CREATE TABLE public."AnalyticsCacheVersion" (
+    namespace character varying NOT NULL,
+    version bigint DEFAULT 0 NOT NULL,
+    updated_at timestamp with time zone DEFAULT now()
+);
+
+
+--
+-- Name: TABLE "AnalyticsCacheVersion"; Type: COMMENT; Schema: public; Owner: -
+--
+
+COMMENT ON TABLE public."AnalyticsCacheVersion" IS 'Data versions of orgs and teams, bumped on syncs and on settings and team writes to retire cached analytics responses';
+
+
 --
 -- Name: Bookmark; Type: TABLE; Schema: public; Owner: -
 --
@@ -55,7 +73,8 @@ CREATE TABLE public."BookmarkMergeToDeployBroker" (
     created_at timestamp with time zone DEFAULT now(),
     updated_at timestamp with time zone DEFAULT now(),
     repo_id uuid NOT NULL,
-    bookmark character varying NOT NULL
+    bookmark character varying NOT NULL,
+    deployment_prs_mapped_from character varying
 );
 
 
@@ -71,6 +90,58 @@ CREATE TABLE public."BookmarkPullRequestRevertPRMapping" (
 );
 
 
+--
+-- Name: DeploymentDailyRollup; Type: TABLE; Schema: public; Owner: -
+--
+
+CREATE TABLE public."DeploymentDailyRollup" (
+    deployment_type character varying NOT NULL,
+    source_id uuid NOT NULL,
+    head_branch character varying NOT NULL,
+    day timestamp with time zone NOT NULL,
+    repo_id uuid NOT NULL,
+    deployment_count integer NOT NULL,
+    updated_at timestamp with time zone DEFAULT now()
+);
+
+
+--
+-- Name: TABLE "DeploymentDailyRollup"; Type: COMMENT; Schema: public; Owner: -
+--
+
+COMMENT ON TABLE public."DeploymentDailyRollup" IS 'Successful deployment counts per repo workflow or repo, head branch and day (UTC), maintained on workflow run and pull request writes';
+
+
+--
+-- Name: DeploymentPullRequest; Type: TABLE; Schema: public; Owner: -
+--
+
+CREATE TABLE public."DeploymentPullRequest" (
+    repo_workflow_run_id uuid NOT NULL,
+    pull_request_id uuid NOT NULL,
+    repo_id uuid NOT NULL,
+    repo_workflow_id uuid NOT NULL,
+    created_at timestamp with time zone DEFAULT now()
+);
+
+
+--
+-- Name: ExapiResponseCache; Type: TABLE; Schema: public; Owner: -
+--
+
+CREATE TABLE public."ExapiResponseCache" (
+    key character varying NOT NULL,
+    url character varying NOT NULL,
+    endpoint character varying NOT NULL,
+    etag character varying,
+    last_modified character varying,
+    headers jsonb DEFAULT '{}'::jsonb NOT NULL,
+    body bytea NOT NULL,
+    created_at timestamp with time zone DEFAULT now(),
+    accessed_at timestamp with time zone DEFAULT now()
+);
+
+
 --
 -- Name: Incident; Type: TABLE; Schema: public; Owner: -
 --
@@ -226,7 +297,8 @@ CREATE TABLE public."PullRequest" (
     merge_to_deploy bigint,
     merge_commit_sha character varying,
     created_in_db_at timestamp with time zone DEFAULT now() NOT NULL,
-    updated_in_db_at timestamp with time zone DEFAULT now() NOT NULL
+    updated_in_db_at timestamp with time zone DEFAULT now() NOT NULL,
+    reverted_pr_ref character varying
 );
 
 
@@ -237,6 +309,13 @@ CREATE TABLE public."PullRequest" (
 COMMENT ON COLUMN public."PullRequest".meta IS 'Pull request meta data';
 
 
+--
+-- Name: COLUMN "PullRequest".reverted_pr_ref; Type: COMMENT; Schema: public; Owner: -
+--
+
+COMMENT ON COLUMN public."PullRequest".reverted_pr_ref IS 'Number (GitHub) or merge commit sha prefix (GitLab) of the pull request this one reverts, parsed from its head branch';
+
+
 --
 -- Name: PullRequestCommit; Type: TABLE; Schema: public; Owner: -
 --
@@ -280,6 +359,32 @@ CREATE TABLE public."PullRequestEvent" (
 COMMENT ON COLUMN public."PullRequestEvent".org_repo_id IS 'Cached repo id';
 
 
+--
+-- Name: PullRequestLeadTimeRollup; Type: TABLE; Schema: public; Owner: -
+--
+
+CREATE TABLE public."PullRequestLeadTimeRollup" (
+    repo_id uuid NOT NULL,
+    base_branch character varying NOT NULL,
+    week_start timestamp with time zone NOT NULL,
+    has_merge_to_deploy boolean NOT NULL,
+    pr_count integer NOT NULL,
+    first_commit_to_open bigint NOT NULL,
+    first_response_time bigint NOT NULL,
+    rework_time bigint NOT NULL,
+    merge_time bigint NOT NULL,
+    merge_to_deploy bigint NOT NULL,
+    updated_at timestamp with time zone DEFAULT now()
+);
+
+
+--
+-- Name: TABLE "PullRequestLeadTimeRollup"; Type: COMMENT; Schema: public; Owner: -
+--
+
+COMMENT ON TABLE public."PullRequestLeadTimeRollup" IS 'Summed lead time components and counts of merged pull requests per repo, base branch and week (Monday, UTC), maintained on pull request writes';
+
+
 --
 -- Name: PullRequestRevertPRMapping; Type: TABLE; Schema: public; Owner: -
 --
@@ -294,6 +399,26 @@ CREATE TABLE public."PullRequestRevertPRMapping" (
 );
 
 
+--
+-- Name: RawPayloadArchive; Type: TABLE; Schema: public; Owner: -
+--
+
+CREATE TABLE public."RawPayloadArchive" (
+    entity_type character varying NOT NULL,
+    entity_id character varying NOT NULL,
+    payload jsonb COMPRESSION lz4,
+    created_at timestamp with time zone DEFAULT now(),
+    updated_at timestamp with time zone DEFAULT now()
+);
+
+
+--
+-- Name: TABLE "RawPayloadArchive"; Type: COMMENT; Schema: public; Owner: -
+--
+
+COMMENT ON TABLE public."RawPayloadArchive" IS 'Full provider payloads of pull requests, pull request events and commits, and workflow runs, whose own payload columns keep only the fields the app reads';
+
+
 --
 -- Name: RepoSyncLogs; Type: TABLE; Schema: public; Owner: -
 --
@@ -387,6 +512,48 @@ CREATE TABLE public."Team" (
 );
 
 
+--
+-- Name: TeamIncidentRollup; Type: TABLE; Schema: public; Owner: -
+--
+
+CREATE TABLE public."TeamIncidentRollup" (
+    team_id uuid NOT NULL,
+    week_start timestamp with time zone NOT NULL,
+    resolved_incident_count integer NOT NULL,
+    recovery_time bigint NOT NULL,
+    failed_deployment_count integer NOT NULL,
+    deployment_count integer NOT NULL,
+    updated_at timestamp with time zone DEFAULT now()
+);
+
+
+--
+-- Name: TABLE "TeamIncidentRollup"; Type: COMMENT; Schema: public; Owner: -
+--
+
+COMMENT ON TABLE public."TeamIncidentRollup" IS 'Resolved incident counts and recovery time, and deployment and failed deployment counts per team and week (UTC), refreshed after each sync';
+
+
+--
+-- Name: TeamIncidentRollupState; Type: TABLE; Schema: public; Owner: -
+--
+
+CREATE TABLE public."TeamIncidentRollupState" (
+    team_id uuid NOT NULL,
+    rollups_from timestamp with time zone,
+    stale_from timestamp with time zone,
+    refreshed_at timestamp with time zone,
+    updated_at timestamp with time zone DEFAULT now()
+);
+
+
+--
+-- Name: TABLE "TeamIncidentRollupState"; Type: COMMENT; Schema: public; Owner: -
+--
+
+COMMENT ON TABLE public."TeamIncidentRollupState" IS 'Time range covered by the incident rollups of a team and the earliest time written since their last refresh';
+
+
 --
 -- Name: TeamIncidentService; Type: TABLE; Schema: public; Owner: -
 --
@@ -482,6 +649,38 @@ CREATE TABLE public.schema_migrations (
 );
 
 
+--
+-- Name: AnalyticsCacheVersion AnalyticsCacheVersion_pkey; Type: CONSTRAINT; Schema: public; Owner: -
+--
+
+ALTER TABLE ONLY public."AnalyticsCacheVersion"
+    ADD CONSTRAINT "AnalyticsCacheVersion_pkey" PRIMARY KEY (namespace);
+
+
+--
+-- Name: DeploymentDailyRollup DeploymentDailyRollup_pkey; Type: CONSTRAINT; Schema: public; Owner: -
+--
+
+ALTER TABLE ONLY public."DeploymentDailyRollup"
+    ADD CONSTRAINT "DeploymentDailyRollup_pkey" PRIMARY KEY (deployment_type, source_id, head_branch, day);
+
+
+--
+-- Name: DeploymentPullRequest DeploymentPullRequest_pkey; Type: CONSTRAINT; Schema: public; Owner: -
+--
+
+ALTER TABLE ONLY public."DeploymentPullRequest"
+    ADD CONSTRAINT "DeploymentPullRequest_pkey" PRIMARY KEY (repo_workflow_run_id, pull_request_id);
+
+
+--
+-- Name: ExapiResponseCache ExapiResponseCache_pkey; Type: CONSTRAINT; Schema: public; Owner: -
+--
+
+ALTER TABLE ONLY public."ExapiResponseCache"
+    ADD CONSTRAINT "ExapiResponseCache_pkey" PRIMARY KEY (key);
+
+
 --
 -- Name: IncidentOrgIncidentServiceMap IncidentOrgIncidentServiceMap_pkey; Type: CONSTRAINT; Schema: public; Owner: -
 --
@@ -594,6 +793,22 @@ ALTER TABLE ONLY public."PullRequestEvent"
     ADD CONSTRAINT "PullRequestEvent_pkey" PRIMARY KEY (id);
 
 
+--
+-- Name: PullRequestLeadTimeRollup PullRequestLeadTimeRollup_pkey; Type: CONSTRAINT; Schema: public; Owner: -
+--
+
+ALTER TABLE ONLY public."PullRequestLeadTimeRollup"
+    ADD CONSTRAINT "PullRequestLeadTimeRollup_pkey" PRIMARY KEY (repo_id, base_branch, week_start, has_merge_to_deploy);
+
+
+--
+-- Name: RawPayloadArchive RawPayloadArchive_pkey; Type: CONSTRAINT; Schema: public; Owner: -
+--
+
+ALTER TABLE ONLY public."RawPayloadArchive"
+    ADD CONSTRAINT "RawPayloadArchive_pkey" PRIMARY KEY (entity_type, entity_id);
+
+
 --
 -- Name: RepoSyncLogs RepoSyncLogs_pkey; Type: CONSTRAINT; Schema: public; Owner: -
 --
@@ -634,6 +849,22 @@ ALTER TABLE ONLY public."Settings"
     ADD CONSTRAINT "Settings_pkey" PRIMARY KEY (setting_type, entity_type, entity_id);
 
 
+--
+-- Name: TeamIncidentRollupState TeamIncidentRollupState_pkey; Type: CONSTRAINT; Schema: public; Owner: -
+--
+
+ALTER TABLE ONLY public."TeamIncidentRollupState"
+    ADD CONSTRAINT "TeamIncidentRollupState_pkey" PRIMARY KEY (team_id);
+
+
+--
+-- Name: TeamIncidentRollup TeamIncidentRollup_pkey; Type: CONSTRAINT; Schema: public; Owner: -
+--
+
+ALTER TABLE ONLY public."TeamIncidentRollup"
+    ADD CONSTRAINT "TeamIncidentRollup_pkey" PRIMARY KEY (team_id, week_start);
+
+
 --
 -- Name: TeamIncidentService TeamIncidentService_composite_pkey; Type: CONSTRAINT; Schema: public; Owner: -
 --
@@ -804,6 +1035,34 @@ CREATE INDEX "TeamIncidentService_team_id_index" ON public."TeamIncidentService"
 CREATE INDEX "Team_org_idx" ON public."Team" USING btree (org_id);
 
 
+--
+-- Name: deployment_daily_rollup_repo_id_day_index; Type: INDEX; Schema: public; Owner: -
+--
+
+CREATE INDEX deployment_daily_rollup_repo_id_day_index ON public."DeploymentDailyRollup" USING btree (repo_id, day);
+
+
+--
+-- Name: deploymentpullrequest_pull_request_id; Type: INDEX; Schema: public; Owner: -
+--
+
+CREATE INDEX deploymentpullrequest_pull_request_id ON public."DeploymentPullRequest" USING btree (pull_request_id);
+
+
+--
+-- Name: deploymentpullrequest_repo_id_created_at; Type: INDEX; Schema: public; Owner: -
+--
+
+CREATE INDEX deploymentpullrequest_repo_id_created_at ON public."DeploymentPullRequest" USING btree (repo_id, created_at);
+
+
+--
+-- Name: exapiresponsecache_accessed_at; Type: INDEX; Schema: public; Owner: -
+--
+
+CREATE INDEX exapiresponsecache_accessed_at ON public."ExapiResponseCache" USING btree (accessed_at);
+
+
 --
 -- Name: incident_resolved_date_index; Type: INDEX; Schema: public; Owner: -
 --
@@ -902,6 +1161,13 @@ CREATE INDEX pull_request_for_author_closed ON public."PullRequest" USING btree
 CREATE INDEX pull_request_for_metrics_by_repos_by_created ON public."PullRequest" USING btree (repo_id, created_at);
 
 
+--
+-- Name: pull_request_repo_id_merge_commit_sha_prefix_index; Type: INDEX; Schema: public; Owner: -
+--
+
+CREATE INDEX pull_request_repo_id_merge_commit_sha_prefix_index ON public."PullRequest" USING btree (repo_id, "left"((merge_commit_sha)::text, 8));
+
+
 --
 -- Name: pull_request_repo_id_number_unique_index; Type: INDEX; Schema: public; Owner: -
 --
@@ -909,6 +1175,20 @@ CREATE INDEX pull_request_for_metrics_by_repos_by_created ON public."PullRequest
 CREATE UNIQUE INDEX pull_request_repo_id_number_unique_index ON public."PullRequest" USING btree (repo_id, number);
 
 
+--
+-- Name: pull_request_repo_id_reverted_pr_ref_index; Type: INDEX; Schema: public; Owner: -
+--
+
+CREATE INDEX pull_request_repo_id_reverted_pr_ref_index ON public."PullRequest" USING btree (repo_id, reverted_pr_ref) WHERE (reverted_pr_ref IS NOT NULL);
+
+
+--
+-- Name: pull_request_repo_id_updated_in_db_at_index; Type: INDEX; Schema: public; Owner: -
+--
+
+CREATE INDEX pull_request_repo_id_updated_in_db_at_index ON public."PullRequest" USING btree (repo_id, updated_in_db_at);
+
+
 --
 -- Name: pull_request_repo_interval_index; Type: INDEX; Schema: public; Owner: -
 --
@@ -923,6 +1203,13 @@ CREATE INDEX pull_request_repo_interval_index ON public."PullRequest" USING btre
 CREATE INDEX pull_request_state_changed_interval_index ON public."PullRequest" USING btree (repo_id, state_changed_at, state);
 
 
+--
+-- Name: pull_request_lead_time_rollup_repo_id_week_start_index; Type: INDEX; Schema: public; Owner: -
+--
+
+CREATE INDEX pull_request_lead_time_rollup_repo_id_week_start_index ON public."PullRequestLeadTimeRollup" USING btree (repo_id, week_start);
+
+
 --
 -- Name: pullrequest_author_index; Type: INDEX; Schema: public; Owner: -
 --
@@ -1107,6 +1394,38 @@ ALTER TABLE ONLY public."Bookmark"
     ADD CONSTRAINT "Bookmark_repo_id_fkey" FOREIGN KEY (repo_id) REFERENCES public."OrgRepo"(id);
 
 
+--
+-- Name: DeploymentPullRequest DeploymentPullRequest_pull_request_id_fkey; Type: FK CONSTRAINT; Schema: public; Owner: -
+--
+
+ALTER TABLE ONLY public."DeploymentPullRequest"
+    ADD CONSTRAINT "DeploymentPullRequest_pull_request_id_fkey" FOREIGN KEY (pull_request_id) REFERENCES public."PullRequest"(id);
+
+
+--
+-- Name: DeploymentPullRequest DeploymentPullRequest_repo_id_fkey; Type: FK CONSTRAINT; Schema: public; Owner: -
+--
+
+ALTER TABLE ONLY public."DeploymentPullRequest"
+    ADD CONSTRAINT "DeploymentPullRequest_repo_id_fkey" FOREIGN KEY (repo_id) REFERENCES public."OrgRepo"(id);
+
+
+--
+-- Name: DeploymentPullRequest DeploymentPullRequest_repo_workflow_id_fkey; Type: FK CONSTRAINT; Schema: public; Owner: -
+--
+
+ALTER TABLE ONLY public."DeploymentPullRequest"
+    ADD CONSTRAINT "DeploymentPullRequest_repo_workflow_id_fkey" FOREIGN KEY (repo_workflow_id) REFERENCES public."RepoWorkflow"(id);
+
+
+--
+-- Name: DeploymentPullRequest DeploymentPullRequest_repo_workflow_run_id_fkey; Type: FK CONSTRAINT; Schema: public; Owner: -
+--
+
+ALTER TABLE ONLY public."DeploymentPullRequest"
+    ADD CONSTRAINT "DeploymentPullRequest_repo_workflow_run_id_fkey" FOREIGN KEY (repo_workflow_run_id) REFERENCES public."RepoWorkflowRuns"(id);
+
+
 --
 -- Name: IncidentOrgIncidentServiceMap IncidentOrgIncidentServiceMap_incident_id_fkey; Type: FK CONSTRAINT; Schema: public; Owner: -
 --
@@ -1360,4 +1679,13 @@ INSERT INTO public.schema_migrations (version) VALUES
     ('20240404142732'),
     ('20240430142502'),
     ('20240503060203'),
-    ('20240503073715');
+    ('20240503073715'),
+    ('20240601101500'),
+    ('20240612090000'),
+    ('20240615090000'),
+    ('20240618090000'),
+    ('20240620090000'),
+    ('20240622090000'),
+    ('20240624090000'),
+    ('20240626090000'),
+    ('20240628090000');
@@ -0,0 +1,33 @@
+#!/bin/bash
+
+set -u
+
+TOPIC="db_init"
+SUB_DIR="/tmp/pubsub"
+
+# Function to wait for message on a topic
+wait_for_message() {
+    while [ ! -f "$SUB_DIR/$TOPIC" ]; do
+        sleep 1
+    done
+    # Read message from topic file
+    MESSAGE=$(cat "$SUB_DIR/$TOPIC")
+    echo "Received message: $MESSAGE"
+}
+
+# Wait for message on the specified topic
+wait_for_message
+
+# One worker process per core unless told otherwise, sync tasks are shared through Redis
+SYNC_WORKER_PROCESSES=${SYNC_WORKER_PROCESSES:-$(nproc)}
+
+cd /app/backend/analytics_server || exit
+
+pids=()
+for _ in $(seq 1 "$SYNC_WORKER_PROCESSES"); do
+  /opt/venv/bin/python sync_worker.py &
+  pids+=($!)
+done
+
+trap 'kill -TERM "${pids[@]}"' TERM INT
+wait